@@ -0,0 +1,199 @@
+# backend/app/cache/backends.py
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Protocol, Tuple
+
+
+class CacheBackend(Protocol):
+    """Byte-oriented key/value store with per-entry TTL. Implementations must be thread-safe."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU bounded by a byte budget (key + value sizes).
+    Expired entries are dropped lazily on access.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _size(key: str, value: bytes) -> int:
+        return len(key) + len(value)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key, value)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        size = self._size(key, value)
+        if size > self._max_bytes:
+            return  # would evict everything else and still not fit
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= self._size(key, old[1])
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                old_key, (_, old_value) = self._entries.popitem(last=False)
+                self._bytes -= self._size(old_key, old_value)
+                self.evictions += 1
+
+    def _remove(self, key: str, value: bytes) -> None:
+        del self._entries[key]
+        self._bytes -= self._size(key, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._remove(key, entry[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def close(self) -> None:
+        self.clear()
+
+
+class SQLiteCacheBackend:
+    """
+    On-disk cache that survives restarts. Least-recently-read rows are pruned once
+    the table grows past `max_entries` (checked every `prune_every` writes).
+    """
+
+    def __init__(self, path: str, max_entries: int, prune_every: int = 100):
+        self._path = path
+        self._max_entries = max_entries
+        self._prune_every = max(prune_every, 1)
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rephrase_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS rephrase_cache_accessed ON rephrase_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[bytes]:
+        # Wall-clock time: entries must stay valid across process restarts.
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM rephrase_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM rephrase_cache WHERE key = ?", (key,))
+                self.expirations += 1
+                return None
+            self._conn.execute("UPDATE rephrase_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return bytes(value)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rephrase_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl_seconds, now),
+            )
+            self._writes += 1
+            if self._writes % self._prune_every == 0:
+                self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        cur = self._conn.execute("DELETE FROM rephrase_cache WHERE expires_at <= ?", (now,))
+        self.expirations += max(cur.rowcount, 0)
+
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM rephrase_cache").fetchone()
+        excess = count - self._max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM rephrase_cache WHERE key IN"
+                " (SELECT key FROM rephrase_cache ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rephrase_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rephrase_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM rephrase_cache").fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self._path,
+            "entries": count,
+            "max_entries": self._max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
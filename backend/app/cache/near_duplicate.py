@@ -0,0 +1,236 @@
+# backend/app/cache/near_duplicate.py
+"""
+Near-duplicate lookup for the response cache: finds an earlier input that is effectively the
+same text (other whitespace, casing or trailing punctuation, a word or two changed) so its
+cached result can be served instead of calling the LLM.
+
+Texts are reduced to a canonical form (case-folded, whitespace collapsed, trailing
+punctuation dropped) and compared by the Jaccard similarity of their character 4-gram sets,
+estimated with MinHash signatures. A locality-sensitive index over signature bands finds
+candidates without scanning every entry. Pure Python, no model or download.
+"""
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+import unicodedata
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from app.observability.metrics import REGISTRY, Counter, Gauge
+
+NEAR_DUPLICATE_LOOKUPS = REGISTRY.register(
+    Counter(
+        "response_cache_near_duplicate_lookups_total",
+        "Near-duplicate lookups after an exact cache miss (hit, miss, stale, skipped).",
+        ("outcome",),
+    )
+)
+NEAR_DUPLICATE_ENTRIES = REGISTRY.register(
+    Gauge("response_cache_near_duplicate_entries", "Inputs in the near-duplicate index.")
+)
+
+SHINGLE_CHARS = 4
+_PRIME = (1 << 61) - 1
+_MASK = 0xFFFFFFFF
+_SPACE = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s.!?,;:…]+$")
+
+
+def canonical_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _TRAILING.sub("", _SPACE.sub(" ", text).strip())
+
+
+def shingles(canonical: str) -> Set[str]:
+    if len(canonical) <= SHINGLE_CHARS:
+        return {canonical}
+    return {canonical[i : i + SHINGLE_CHARS] for i in range(len(canonical) - SHINGLE_CHARS + 1)}
+
+
+class Probe:
+    """A text prepared for the index; the MinHash signature is filled in by sign() when needed."""
+
+    __slots__ = ("canonical", "digest", "indexable", "signature")
+
+    def __init__(self, canonical: str, digest: bytes, indexable: bool):
+        self.canonical = canonical
+        self.digest = digest
+        self.indexable = indexable
+        self.signature: Optional[array] = None
+
+
+class NearDuplicateIndex:
+    """
+    Maps inputs to response cache keys. find() returns the key of an indexed input whose
+    estimated similarity to `text` is at least `threshold` (identical canonical forms match
+    outright). At most `max_entries` inputs are kept, least recently matched or added evicted
+    first; inputs longer than `max_chars` are neither indexed nor looked up.
+
+    Signatures have `num_perm` 32-bit MinHash values split into `bands` LSH bands; with the
+    defaults (16 bands of 4) pairs down to about 0.5 similarity become candidates, and each
+    candidate is then checked against the threshold.
+
+    Signatures cost milliseconds for long inputs, so callers on an event loop prepare a Probe
+    once per text, sign() it off the loop when needs_signature(), and pass it to find() and add().
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float = 0.9,
+        max_entries: int = 20000,
+        max_chars: int = 2000,
+        num_perm: int = 64,
+        bands: int = 16,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._rows = num_perm // bands
+        # Fixed seed: signatures must agree across processes and restarts
+        rng = random.Random(0x5EED)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        # cache key -> (canonical digest, signature)
+        self._entries: "OrderedDict[str, Tuple[bytes, array]]" = OrderedDict()
+        self._canonical: Dict[bytes, str] = {}
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    def empty_copy(self) -> "NearDuplicateIndex":
+        """A new, empty index with the same parameters."""
+        return NearDuplicateIndex(
+            threshold=self.threshold,
+            max_entries=self.max_entries,
+            max_chars=self.max_chars,
+            num_perm=len(self._perms),
+            bands=len(self._perms) // self._rows,
+        )
+
+    def _signature(self, canonical: str) -> array:
+        hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(canonical)]
+        return array("I", [min([(a * h + b) % _PRIME for h in hashes]) & _MASK for a, b in self._perms])
+
+    def _bands(self, signature: array) -> List[Tuple[int, bytes]]:
+        rows = self._rows
+        return [(i, signature[i * rows : (i + 1) * rows].tobytes()) for i in range(len(signature) // rows)]
+
+    @staticmethod
+    def _digest(canonical: str) -> bytes:
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+
+    @staticmethod
+    def similarity(a: array, b: array) -> float:
+        return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+    def probe(self, text: str) -> Probe:
+        canonical = canonical_text(text) if len(text) <= self.max_chars else ""
+        return Probe(canonical, self._digest(canonical), len(text) <= self.max_chars)
+
+    def needs_signature(self, probe: Probe) -> bool:
+        """Whether find() or add() would compute the signature (no indexed input has its canonical form)."""
+        return probe.indexable and probe.signature is None and probe.digest not in self._canonical
+
+    def sign(self, probe: Probe) -> None:
+        """Compute the probe's signature; pure computation, safe to run in a worker thread."""
+        if probe.signature is None:
+            probe.signature = self._signature(probe.canonical)
+
+    def find(self, text: Union[str, Probe]) -> Optional[Tuple[str, float]]:
+        """
+        (cache key, estimated similarity) of the closest indexed input above the threshold.
+        The caller reports whether the key still had a cached result: record_hit() or discard().
+        """
+        probe = self.probe(text) if isinstance(text, str) else text
+        if not probe.indexable:
+            self.skipped += 1
+            NEAR_DUPLICATE_LOOKUPS.labels("skipped").inc()
+            return None
+        key = self._canonical.get(probe.digest)
+        if key is not None:
+            return self._touch(key, 1.0)
+
+        self.sign(probe)
+        signature = probe.signature
+        assert signature is not None
+        candidates: Set[str] = set()
+        for band in self._bands(signature):
+            candidates |= self._buckets.get(band, set())
+        best: Optional[Tuple[str, float]] = None
+        for candidate in candidates:
+            score = self.similarity(signature, self._entries[candidate][1])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (candidate, score)
+        if best is None:
+            self.misses += 1
+            NEAR_DUPLICATE_LOOKUPS.labels("miss").inc()
+            return None
+        return self._touch(*best)
+
+    def _touch(self, key: str, score: float) -> Tuple[str, float]:
+        self._entries.move_to_end(key)
+        return key, score
+
+    def record_hit(self) -> None:
+        self.hits += 1
+        NEAR_DUPLICATE_LOOKUPS.labels("hit").inc()
+
+    def add(self, text: Union[str, Probe], key: str) -> None:
+        probe = self.probe(text) if isinstance(text, str) else text
+        if not probe.indexable or key in self._entries:
+            return
+        digest = probe.digest
+        if digest in self._canonical:
+            return  # an equivalent input is indexed already
+        self.sign(probe)
+        signature = probe.signature
+        assert signature is not None
+        self._entries[key] = (digest, signature)
+        self._canonical[digest] = key
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        NEAR_DUPLICATE_ENTRIES.set(len(self._entries))
+
+    def discard(self, key: str) -> None:
+        """Forget `key` after find() returned it but its cache entry had expired or been evicted."""
+        if key in self._entries:
+            self._remove(key)
+            self.stale += 1
+            NEAR_DUPLICATE_LOOKUPS.labels("stale").inc()
+            NEAR_DUPLICATE_ENTRIES.set(len(self._entries))
+
+    def _remove(self, key: str) -> None:
+        digest, signature = self._entries.pop(key)
+        self._canonical.pop(digest, None)
+        for band in self._bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.stale
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
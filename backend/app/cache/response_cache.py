@@ -0,0 +1,264 @@
+# backend/app/cache/response_cache.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.cache.backends import CacheBackend, MemoryCacheBackend, SQLiteCacheBackend
+from app.cache.near_duplicate import NearDuplicateIndex, Probe
+from app.cache.shared import SharedCacheBackend
+from app.config import Settings, get_settings
+from app.llm.prompt import PROMPT_VERSION
+from app.schemas.rephrase import RephraseResponse
+
+logger = logging.getLogger(__name__)
+
+# Near-duplicate probes of recent misses, kept so store() reuses the signature lookup() computed
+_MAX_PENDING_PROBES = 1024
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC, LF line endings, outer whitespace stripped."""
+    text = unicodedata.normalize("NFC", text)
+    return text.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def cache_key(text: str, prompt_version: str, deployment: str) -> str:
+    """Content address for a rephrase result. Any change to prompt or model yields a new key."""
+    h = hashlib.sha256()
+    for part in (prompt_version, deployment, normalize_text(text)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for RephraseResponse objects: an in-process LRU in front of an
+    optional persistent backend. Persistent hits are promoted into memory.
+    With a NearDuplicateIndex, lookup() also answers inputs that are nearly the same as a
+    cached one.
+    """
+
+    def __init__(
+        self,
+        memory: MemoryCacheBackend,
+        ttl_seconds: float,
+        *,
+        persistent: Optional[CacheBackend] = None,
+        namespace: str = "",
+        near: Optional[NearDuplicateIndex] = None,
+    ):
+        self._memory = memory
+        self._persistent = persistent
+        self.near = near
+        self._ttl = ttl_seconds
+        self._namespace = namespace
+        self._probes: "OrderedDict[str, Probe]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+
+    @property
+    def namespace(self) -> str:
+        return self._namespace
+
+    def rekeyed(self, namespace: str) -> "ResponseCache":
+        """
+        A cache over the same backends whose keys live in `namespace`. The near-duplicate index
+        starts empty, as the keys it holds belong to the old namespace.
+        """
+        cache = ResponseCache(
+            self._memory,
+            self._ttl,
+            persistent=self._persistent,
+            namespace=namespace,
+            near=self.near.empty_copy() if self.near is not None else None,
+        )
+        cache.hits, cache.misses, cache.persistent_hits = self.hits, self.misses, self.persistent_hits
+        return cache
+
+    def key_for(self, text: str) -> str:
+        return cache_key(text, PROMPT_VERSION, self._namespace)
+
+    async def _probe(self, text: str) -> Probe:
+        assert self.near is not None
+        probe = self.near.probe(text)
+        if self.near.needs_signature(probe):
+            # Milliseconds of pure Python for long inputs: keep it off the event loop
+            await asyncio.to_thread(self.near.sign, probe)
+        return probe
+
+    async def lookup(self, text: str) -> Optional[RephraseResponse]:
+        """The cached result for `text`, or for a near-duplicate of it."""
+        key = self.key_for(text)
+        value = await self.get(key)
+        if value is not None or self.near is None:
+            return value
+        probe = await self._probe(text)
+        match = self.near.find(probe)
+        if match is None:
+            self._probes[key] = probe
+            self._probes.move_to_end(key)
+            while len(self._probes) > _MAX_PENDING_PROBES:
+                self._probes.popitem(last=False)
+            return None
+        value = await self._load(match[0])
+        if value is None:
+            self.near.discard(match[0])
+        else:
+            self.near.record_hit()
+        return value
+
+    async def store(self, text: str, value: RephraseResponse) -> None:
+        key = self.key_for(text)
+        await self.set(key, value)
+        if self.near is not None:
+            probe = self._probes.pop(key, None)
+            if probe is None:
+                probe = await self._probe(text)
+            elif self.near.needs_signature(probe):
+                await asyncio.to_thread(self.near.sign, probe)
+            self.near.add(probe, key)
+
+    async def get(self, key: str) -> Optional[RephraseResponse]:
+        value = await self._load(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def _load(self, key: str) -> Optional[RephraseResponse]:
+        raw = self._memory.get(key)
+        if raw is None and self._persistent is not None:
+            raw = await asyncio.to_thread(self._persistent.get, key)
+            if raw is not None:
+                self.persistent_hits += 1
+                self._memory.set(key, raw, self._ttl)
+
+        if raw is None:
+            return None
+
+        try:
+            return RephraseResponse.model_validate_json(raw)
+        except ValueError:
+            # Written by an incompatible build; treat as a miss and drop it
+            logger.warning("Discarding undecodable rephrase cache entry %s", key)
+            await self.delete(key)
+            return None
+
+    async def set(self, key: str, value: RephraseResponse) -> None:
+        raw = value.model_dump_json().encode("utf-8")
+        self._memory.set(key, raw, self._ttl)
+        if self._persistent is not None:
+            await asyncio.to_thread(self._persistent.set, key, raw, self._ttl)
+
+    async def delete(self, key: str) -> None:
+        self._memory.delete(key)
+        if self._persistent is not None:
+            await asyncio.to_thread(self._persistent.delete, key)
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self._memory.stats()
+        stats: Dict[str, Any] = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": memory["evictions"],
+            "ttl_seconds": self._ttl,
+            "memory": memory,
+        }
+        if self._persistent is not None:
+            persistent = self._persistent.stats()
+            persistent["hits"] = self.persistent_hits
+            stats["persistent"] = persistent
+            stats["evictions"] += persistent["evictions"]
+        if self.near is not None:
+            stats["near_duplicate"] = self.near.stats()
+        return stats
+
+    def close(self) -> None:
+        self._memory.close()
+        if self._persistent is not None:
+            self._persistent.close()
+
+
+def cache_namespace(settings: Settings) -> str:
+    # Fake and real results (and different deployments) must never share entries
+    return f"{settings.llm_mode}:{settings.azure_deployment}"
+
+
+def build_response_cache(settings: Settings) -> Optional[ResponseCache]:
+    if not settings.response_cache_enabled:
+        return None
+
+    persistent: Optional[CacheBackend] = None
+    if settings.response_cache_backend == "sqlite":
+        persistent = SQLiteCacheBackend(
+            settings.response_cache_sqlite_path,
+            max_entries=settings.response_cache_sqlite_max_entries,
+        )
+    memory_bytes = settings.response_cache_max_bytes
+    if settings.response_cache_backend == "shared":
+        persistent = SharedCacheBackend(settings.response_cache_shared_socket)
+        memory_bytes = 0  # entries live once, in the launcher; a local copy could outlive a delete
+    near: Optional[NearDuplicateIndex] = None
+    if settings.response_cache_near_enabled:
+        near = NearDuplicateIndex(
+            threshold=settings.response_cache_near_threshold,
+            max_entries=settings.response_cache_near_max_entries,
+            max_chars=settings.response_cache_near_max_chars,
+        )
+
+    return ResponseCache(
+        MemoryCacheBackend(memory_bytes),
+        settings.response_cache_ttl_seconds,
+        persistent=persistent,
+        namespace=cache_namespace(settings),
+        near=near,
+    )
+
+
+# Process-wide cache; installed by the app lifespan, created lazily otherwise.
+_cache: Optional[ResponseCache] = None
+_cache_ready = False
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide cache, or None when caching is disabled."""
+    global _cache, _cache_ready
+    if not _cache_ready:
+        _cache = build_response_cache(get_settings())
+        _cache_ready = True
+    return _cache
+
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """Install `cache` as the process-wide cache (None disables caching until reset)."""
+    global _cache, _cache_ready
+    _cache, _cache_ready = cache, True
+
+
+def rekey_response_cache(settings: Settings) -> None:
+    """
+    After a config reload: key the process-wide cache for the (possibly new) LLM mode and
+    deployment. Requests already running keep the cache they started with, so a result
+    generated under the old configuration is stored under its old namespace.
+    """
+    global _cache
+    if _cache is None:
+        return
+    namespace = cache_namespace(settings)
+    if namespace != _cache.namespace:
+        logger.info("Response cache now keyed for %s (was %s).", namespace, _cache.namespace)
+        _cache = _cache.rekeyed(namespace)
+
+
+def reset_response_cache() -> None:
+    """Forget the process-wide cache; the next get_response_cache() rebuilds it from settings."""
+    global _cache, _cache_ready
+    _cache, _cache_ready = None, False
@@ -0,0 +1,181 @@
+# backend/app/cache/shared.py
+"""
+One response cache for all worker processes of a host (RESPONSE_CACHE_BACKEND=shared).
+
+The multi-worker launcher (app.serve) runs a CacheServer holding a MemoryCacheBackend; each
+worker talks to it over a Unix socket through SharedCacheBackend. Frames are length-prefixed:
+
+  request:  op (1 byte) | ttl (8-byte double) | key length (4) | value length (4) | key | value
+  response: status (1 byte) | value length (4) | value
+
+A worker that cannot reach the server treats the cache as empty rather than failing requests.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from app.cache.backends import MemoryCacheBackend
+
+logger = logging.getLogger(__name__)
+
+OP_GET, OP_SET, OP_DELETE, OP_CLEAR, OP_STATS = b"g", b"s", b"d", b"c", b"i"
+STATUS_OK, STATUS_MISS = b"+", b"-"
+
+_REQUEST = struct.Struct("!cdII")
+_RESPONSE = struct.Struct("!cI")
+
+
+def _read_exactly(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("cache socket closed")
+        buf += chunk
+    return bytes(buf)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "_UnixServer"
+
+    def handle(self) -> None:
+        backend = self.server.backend
+        sock = self.request
+        while True:
+            try:
+                op, ttl, klen, vlen = _REQUEST.unpack(_read_exactly(sock, _REQUEST.size))
+                body = _read_exactly(sock, klen + vlen)
+            except (ConnectionError, OSError):
+                return
+            key = body[:klen].decode("utf-8")
+            reply: Optional[bytes] = b""
+            if op == OP_GET:
+                reply = backend.get(key)
+            elif op == OP_SET:
+                backend.set(key, body[klen:], ttl)
+            elif op == OP_DELETE:
+                backend.delete(key)
+            elif op == OP_CLEAR:
+                backend.clear()
+            elif op == OP_STATS:
+                reply = json.dumps(backend.stats()).encode("utf-8")
+            status = STATUS_MISS if reply is None else STATUS_OK
+            reply = reply or b""
+            try:
+                sock.sendall(_RESPONSE.pack(status, len(reply)) + reply)
+            except OSError:
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    backend: MemoryCacheBackend
+
+
+class CacheServer:
+    """
+    Serves a MemoryCacheBackend of `max_bytes` on the Unix socket `path`. The socket is bound
+    on construction, so clients can connect as soon as this returns; serve_forever() runs in
+    the launcher's cache process (tests use start() for a background thread).
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)  # left over from a launcher that did not shut down cleanly
+        self._server = _UnixServer(path, _Handler)
+        self._server.backend = MemoryCacheBackend(max_bytes)
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, name="cache-server", daemon=True).start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self.close()
+
+    def close(self, unlink: bool = True) -> None:
+        self._server.server_close()
+        if unlink:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+class SharedCacheBackend:
+    """
+    CacheBackend client for a CacheServer. One connection per process, one call at a time;
+    calls reach it through asyncio.to_thread like the other non-memory backends.
+    """
+
+    def __init__(self, path: str, timeout_seconds: float = 1.0):
+        self._path = path
+        self._timeout = timeout_seconds
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self.errors = 0
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self._timeout)
+        try:
+            sock.connect(self._path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _call(self, op: bytes, key: str = "", value: bytes = b"", ttl: float = 0.0) -> Tuple[bool, bytes]:
+        raw_key = key.encode("utf-8")
+        frame = _REQUEST.pack(op, ttl, len(raw_key), len(value)) + raw_key + value
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._sock = self._connect()
+                self._sock.sendall(frame)
+                status, length = _RESPONSE.unpack(_read_exactly(self._sock, _RESPONSE.size))
+                return status == STATUS_OK, _read_exactly(self._sock, length)
+            except OSError as e:
+                # Reconnect on the next call; until then the cache is just empty
+                self.errors += 1
+                if self.errors == 1 or self.errors % 1000 == 0:
+                    logger.warning("Shared response cache at %s unreachable (%s).", self._path, e)
+                if self._sock is not None:
+                    self._sock.close()
+                    self._sock = None
+                return False, b""
+
+    def get(self, key: str) -> Optional[bytes]:
+        found, value = self._call(OP_GET, key)
+        return value if found else None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self._call(OP_SET, key, value, ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self._call(OP_DELETE, key)
+
+    def clear(self) -> None:
+        self._call(OP_CLEAR)
+
+    def stats(self) -> Dict[str, Any]:
+        found, raw = self._call(OP_STATS)
+        stats: Dict[str, Any] = json.loads(raw) if found else {"evictions": 0}
+        stats.update(backend="shared", path=self._path, errors=self.errors)
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
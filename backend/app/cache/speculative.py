@@ -0,0 +1,326 @@
+# backend/app/cache/speculative.py
+"""
+Speculative prefetch: POST /rephrase/prefetch starts generating a draft while the user is
+still typing. The generation runs in a background task (in the bulk lane, so real requests
+are admitted first) and its deltas are kept, keyed by a hash of the normalized text, for
+PREFETCH_TTL_SECONDS. A later /rephrase or /rephrase/stream for the same text attaches to it
+instead of calling upstream again: it replays the deltas produced so far and follows the rest.
+A request only attaches once the prefetch got past the admission queue: one still waiting
+there is cancelled ("preempted") and the request generates in its own lane, rather than
+waiting behind batch work.
+
+Drafts are cheap to start and mostly thrown away, so spend is capped: a newer draft from the
+same session cancels the previous one if nothing attached to it, at most PREFETCH_MAX_RUNNING
+generations run at once, and unused entries are dropped (running or not) once their TTL passes.
+Results only reach the response cache through the request that uses them.
+
+The store lives in one process, so a prefetch is only found by requests that reach the same
+one: with several server workers (SERVER_WORKERS != 1) prefetching is switched off.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set, Tuple
+
+from app.cache.response_cache import normalize_text
+from app.config import Settings, get_settings
+from app.llm.admission import on_admitted
+from app.llm.rephrase_generator import STYLES
+from app.observability.metrics import REGISTRY, Counter
+from app.schemas.rephrase import RephraseResponse
+
+logger = logging.getLogger(__name__)
+
+PREFETCHES = REGISTRY.register(
+    Counter(
+        "rephrase_prefetch_total",
+        "Speculative prefetches by outcome (started, skipped, used, preempted, superseded, unused).",
+        ("outcome",),
+    )
+)
+
+
+class PrefetchFailed(Exception):
+    """The prefetch a request attached to failed or was cancelled; the cause is chained."""
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class Prefetch:
+    """One speculative generation: the deltas produced so far and whether it has finished."""
+
+    def __init__(self, key: str, session_id: Optional[str]):
+        self.key = key
+        self.session_id = session_id
+        self.deltas: List[Tuple[str, str]] = []
+        self.completed: Set[str] = set()  # styles whose text is complete, filled in by the generator
+        self.created = time.monotonic()
+        self.admitted = False  # an upstream call got past the admission queue
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.used = False
+        self.attached = 0
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._changed: Optional["asyncio.Future[None]"] = None
+
+    def _notify(self) -> None:
+        if self._changed is not None and not self._changed.done():
+            self._changed.set_result(None)
+        self._changed = None
+
+    async def _next_change(self) -> None:
+        if self._changed is None:
+            self._changed = asyncio.get_running_loop().create_future()
+        # asyncio.wait: a follower that gives up must not cancel the shared future
+        await asyncio.wait({self._changed})
+
+    def admit(self) -> None:
+        self.admitted = True
+
+    def append(self, style: str, delta: str) -> None:
+        self.deltas.append((style, delta))
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def cancel(self) -> None:
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+    @property
+    def failed(self) -> bool:
+        return self.done and self.error is not None
+
+    def result(self) -> RephraseResponse:
+        assembled = dict.fromkeys(STYLES, "")
+        for style, delta in self.deltas:
+            assembled[style] += delta
+        return RephraseResponse(**{style: assembled[style].strip() for style in STYLES})
+
+    async def follow(self, completed: Optional[Set[str]] = None) -> AsyncGenerator[Dict[str, str], None]:
+        """
+        Yield {"style", "delta"} items from the start, live ones as they arrive. Styles are added
+        to `completed` once all of their deltas were yielded. Raises PrefetchFailed if it failed.
+        """
+        self.attached += 1
+        try:
+            seen = 0
+            while True:
+                while seen < len(self.deltas):
+                    style, delta = self.deltas[seen]
+                    seen += 1
+                    yield {"style": style, "delta": delta}
+                if completed is not None:
+                    completed.update(self.completed)
+                if self.done:
+                    break
+                await self._next_change()
+        finally:
+            self.attached -= 1
+        if self.error is not None:
+            raise PrefetchFailed("The prefetched generation did not finish.") from self.error
+
+    async def wait(self) -> Optional[RephraseResponse]:
+        """The finished result, or None if the generation failed."""
+        self.attached += 1
+        try:
+            while not self.done:
+                await self._next_change()
+        finally:
+            self.attached -= 1
+        return None if self.error is not None else self.result()
+
+
+class PrefetchStore:
+    """Process-wide speculative cache of prefetched drafts, with their background generations."""
+
+    def __init__(
+        self, *, ttl_seconds: float = 60.0, max_running: int = 16, min_chars: int = 20, admission: bool = True
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_running = max_running
+        self.min_chars = min_chars
+        self.admission = admission  # False: upstream calls are not queued, so prefetches start at once
+        # Oldest first
+        self._entries: "OrderedDict[str, Prefetch]" = OrderedDict()
+        self._sessions: Dict[str, str] = {}  # session id -> key of its latest draft
+        self.counts: Dict[str, int] = {
+            "started": 0,
+            "skipped": 0,
+            "used": 0,
+            "preempted": 0,
+            "superseded": 0,
+            "unused": 0,
+        }
+
+    def _count(self, outcome: str) -> None:
+        self.counts[outcome] += 1
+        PREFETCHES.labels(outcome).inc()
+
+    def _drop(self, key: str, outcome: Optional[str] = None) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        entry.cancel()
+        if entry.session_id is not None and self._sessions.get(entry.session_id) == key:
+            del self._sessions[entry.session_id]
+        if outcome is None and not entry.used:
+            outcome = "unused"
+        if outcome is not None:
+            self._count(outcome)
+
+    def _sweep(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for key, entry in list(self._entries.items()):
+            if entry.created >= cutoff:
+                break
+            if entry.attached == 0:
+                self._drop(key)
+
+    def get(self, key: str) -> Optional[Prefetch]:
+        """The running or finished prefetch of `key`; failed ones are forgotten."""
+        self._sweep()
+        entry = self._entries.get(key)
+        if entry is not None and entry.failed:
+            self._drop(key)
+            return None
+        return entry
+
+    def claim(self, key: str) -> Optional[Prefetch]:
+        """
+        Like get(), for a request about to use the prefetch. A prefetch still queued for
+        admission is cancelled instead: following it would hold the request in the bulk lane.
+        """
+        entry = self.get(key)
+        if entry is not None and not (entry.admitted or entry.deltas or entry.done):
+            self._drop(key, "preempted")
+            return None
+        if entry is not None and not entry.used:
+            entry.used = True
+            self._count("used")
+        return entry
+
+    def supersede(self, session_id: Optional[str], key: str) -> None:
+        """Make `key` the session's current draft, cancelling its previous one if nobody uses it."""
+        if session_id is None:
+            return
+        previous = self._sessions.get(session_id)
+        self._sessions[session_id] = key
+        if previous is None or previous == key:
+            return
+        entry = self._entries.get(previous)
+        if entry is not None and not entry.done and not entry.used:
+            self._drop(previous, "superseded")
+
+    def has_room(self) -> bool:
+        self._sweep()
+        if self.running() < self.max_running:
+            return True
+        self._count("skipped")
+        return False
+
+    def running(self) -> int:
+        return sum(1 for entry in self._entries.values() if not entry.done)
+
+    def start(
+        self, key: str, session_id: Optional[str], deltas: AsyncGenerator[Dict[str, str], None], completed: Set[str]
+    ) -> Prefetch:
+        """
+        Record the prefetch of `key` and produce `deltas` into it in the background.
+        `completed` is the set the generator fills in with the styles it finished.
+        """
+        entry = Prefetch(key, session_id)
+        entry.completed = completed
+        entry.admitted = not self.admission
+        self._drop(key)
+        self._entries[key] = entry
+        self._count("started")
+
+        async def produce() -> None:
+            on_admitted(entry.admit)  # in this task's context, so only its own calls report
+            try:
+                async with aclosing(deltas):
+                    async for item in deltas:
+                        entry.append(item["style"], item["delta"])
+            except asyncio.CancelledError as e:
+                entry.finish(e)
+                raise
+            except Exception as e:
+                logger.info("Prefetch %s failed: %s", key[:12], getattr(e, "code", None) or type(e).__name__)
+                entry.finish(e)
+            else:
+                entry.finish()
+
+        entry.task = asyncio.create_task(produce(), name=f"prefetch-{key[:12]}")
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "running": self.running(),
+            "max_running": self.max_running,
+            "ttl_seconds": self.ttl_seconds,
+            **self.counts,
+            "wasted": self.counts["superseded"] + self.counts["unused"],
+        }
+
+    async def aclose(self) -> None:
+        tasks = [entry.task for entry in self._entries.values() if entry.task is not None]
+        for key in list(self._entries):
+            self._drop(key)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def build_prefetch_store(settings: Settings) -> Optional[PrefetchStore]:
+    if not settings.prefetch_enabled:
+        return None
+    if settings.server_workers != 1:
+        # A draft prefetched in one worker would be generated again by whichever serves the request
+        logger.info("Speculative prefetch is off: it needs a single server worker.")
+        return None
+    return PrefetchStore(
+        ttl_seconds=settings.prefetch_ttl_seconds,
+        max_running=settings.prefetch_max_running,
+        min_chars=settings.prefetch_min_chars,
+        admission=settings.upstream_admission_enabled,
+    )
+
+
+# Process-wide store; installed by the app lifespan, created lazily otherwise.
+_store: Optional[PrefetchStore] = None
+_store_ready = False
+
+
+def get_prefetch_store() -> Optional[PrefetchStore]:
+    """Return the process-wide store, or None when prefetching is disabled."""
+    global _store, _store_ready
+    if not _store_ready:
+        _store = build_prefetch_store(get_settings())
+        _store_ready = True
+    return _store
+
+
+def set_prefetch_store(store: Optional[PrefetchStore]) -> None:
+    global _store, _store_ready
+    _store, _store_ready = store, True
+
+
+def reset_prefetch_store() -> None:
+    global _store, _store_ready
+    _store, _store_ready = None, False
+
+
+def claim_prefetch(text: str) -> Optional[Prefetch]:
+    """The prefetch of `text` for a request to attach to, if there is one."""
+    store = get_prefetch_store()
+    return store.claim(fingerprint(text)) if store is not None else None
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
-from dataclasses import dataclass
-from typing import Sequence
+import re
+from dataclasses import asdict, dataclass
+from functools import cached_property
+from typing import Dict, Optional, Sequence, Tuple
+
+from dotenv import dotenv_values, find_dotenv
 
 
 def _truthy(s: str | None) -> bool:
@@ -14,30 +20,260 @@ def _csv(name: str, default: str) -> list[str]:
     return [x.strip() for x in raw.split(",") if x.strip()]
 
 
+# LLMProviderError.error_class values raised by the upstream providers
+_UPSTREAM_ERROR_CLASSES = frozenset({"timeout", "connection", "server", "rate_limit", "auth", "not_found", "rejected"})
+
+# Request priority lanes, most urgent first (see app.llm.priority)
+PRIORITY_LANES = ("interactive", "standard", "bulk")
+
+
+def _lane_values(name: str, default: str) -> Tuple[float, ...]:
+    """Parse e.g. "interactive:6,bulk:1" into one value per lane; lanes not named keep the default."""
+    values: Dict[str, float] = {}
+    for raw in (default, os.getenv(name, "")):
+        for item in raw.split(","):
+            if not item.strip():
+                continue
+            lane, sep, value = item.partition(":")
+            lane = lane.strip().lower()
+            if not sep or lane not in PRIORITY_LANES:
+                raise ValueError(f"{name}: expected lane:value pairs with lanes from {', '.join(PRIORITY_LANES)}.")
+            values[lane] = float(value)
+    return tuple(values[lane] for lane in PRIORITY_LANES)
+
+
+def _lane_keys(name: str) -> Tuple[Tuple[str, str], ...]:
+    """Parse e.g. "key1:bulk,key2:interactive" into ((key, lane), ...)."""
+    keys = []
+    for item in _csv(name, ""):
+        key, sep, lane = item.rpartition(":")
+        lane = lane.strip().lower()
+        if not sep or not key.strip() or lane not in PRIORITY_LANES:
+            raise ValueError(f"{name}: expected api-key:lane pairs with lanes from {', '.join(PRIORITY_LANES)}.")
+        keys.append((key.strip(), lane))
+    return tuple(keys)
+
+
+@dataclass(frozen=True)
+class AzureBackend:
+    """One upstream deployment the router can send calls to."""
+
+    name: str
+    endpoint: str
+    api_key: str
+    api_version: str
+    deployment: str
+
+
+def _azure_backends(endpoint: str, api_key: str, api_version: str, deployment: str) -> Tuple[AzureBackend, ...]:
+    """
+    AZURE_OPENAI_BACKENDS=eastus,westeurope names the deployments to route across; each reads
+    AZURE_OPENAI_<NAME>_ENDPOINT / _API_KEY / _API_VERSION / _DEPLOYMENT, falling back to the
+    single-deployment AZURE_OPENAI_* values for any it does not set.
+    """
+    backends = []
+    for name in _csv("AZURE_OPENAI_BACKENDS", ""):
+        prefix = "AZURE_OPENAI_" + re.sub(r"[^A-Z0-9]", "_", name.upper()) + "_"
+        backend = AzureBackend(
+            name=name,
+            endpoint=os.getenv(prefix + "ENDPOINT", "").strip() or endpoint,
+            api_key=os.getenv(prefix + "API_KEY", "").strip() or api_key,
+            api_version=os.getenv(prefix + "API_VERSION", "").strip() or api_version,
+            deployment=os.getenv(prefix + "DEPLOYMENT", "").strip() or deployment,
+        )
+        if not backend.endpoint or not backend.deployment:
+            raise ValueError(f"Backend {name!r}: set {prefix}ENDPOINT and {prefix}DEPLOYMENT.")
+        backends.append(backend)
+    if len({b.name for b in backends}) != len(backends):
+        raise ValueError("AZURE_OPENAI_BACKENDS has duplicate names.")
+    return tuple(backends)
+
+
 @dataclass(frozen=True)
 class Settings:
-    llm_mode: str  # "fake" or "real"
+    llm_mode: str  # "fake", "real" or "replay"
     allow_real_llm: bool  # safety switch to ensure tokens aren't used unexpectedly
+    llm_record_path: str  # append every upstream call to this session file ("" = off)
+    llm_replay_path: str  # sessions played back when llm_mode == "replay"
+    llm_replay_speed: float  # 1 = recorded pacing, 2 = twice as fast, 0 = no delays
+    llm_replay_on_miss: str  # "nearest" (a recorded session of the same kind) or "error"
     azure_endpoint: str
     azure_api_key: str
     azure_api_version: str
     azure_deployment: str
     azure_timeout_seconds: float
+    # Ask for token usage on streams (stream_options.include_usage; API version 2024-09-01 or later)
+    azure_stream_usage: bool
+
+    # Shared upstream HTTP connection pool (one per process)
+    azure_max_connections: int
+    azure_max_keepalive_connections: int
+    azure_keepalive_expiry_seconds: float
+    azure_http2: bool
+
+    # Routing across several deployments (AZURE_OPENAI_BACKENDS); empty = the single one above
+    azure_backends: Tuple[AzureBackend, ...]
+    router_ewma_alpha: float  # weight of the newest latency / error observation
+    router_breaker_failures: int  # consecutive failures that eject a backend
+    router_breaker_cooldown_seconds: float  # before an ejected backend gets a probe call
+
+    # End-to-end deadline per request (X-Request-Timeout header, else the default)
+    request_timeout_seconds: float  # 0 = no deadline unless the client sends one
+    request_timeout_max_seconds: float  # cap on client-supplied values (0 = uncapped)
+
+    # Upstream admission control (token buckets + adaptive concurrency)
+    upstream_admission_enabled: bool
+    upstream_requests_per_minute: float  # 0 = no request bucket
+    upstream_tokens_per_minute: float  # 0 = no token bucket
+    upstream_expected_output_tokens: int
+    upstream_concurrency_initial: int
+    upstream_concurrency_min: int
+    upstream_concurrency_max: int
+    upstream_queue_size: int
+    upstream_queue_timeout_seconds: float
+    # Priority lanes scheduled by the admission queue, values in PRIORITY_LANES order
+    priority_lanes_enabled: bool
+    priority_lane_weights: Tuple[float, ...]  # share of upstream admissions while lanes compete
+    priority_queue_slo_seconds: Tuple[float, ...]  # target queue time; 0 = none
+    priority_bulk_max_share: float  # bulk calls hold at most this share of the concurrency limit
+    priority_api_keys: Tuple[Tuple[str, str], ...]  # (X-API-Key value, lane)
+
+    # Retries of transient upstream failures (jittered backoff, global budget) and hedging
+    retry_max_attempts: int  # 1 = no retries
+    retry_base_delay_seconds: float
+    retry_max_delay_seconds: float
+    retry_max_retry_after_seconds: float
+    retry_budget_ratio: float  # retries allowed per request, on average
+    retry_budget_min_per_second: float
+    hedge_enabled: bool
+    hedge_percentile: float
+    hedge_min_samples: int
+
+    # Circuit breaker around the upstream: fail fast while it is down
+    circuit_enabled: bool
+    circuit_failure_rate: float  # open once this share of recent calls failed...
+    circuit_min_calls: int  # ...out of at least this many in the window
+    circuit_window_seconds: float
+    circuit_consecutive_failures: int  # or after this many failures in a row (0 = off)
+    circuit_trip_on: Tuple[str, ...]  # error classes that count as failures
+    circuit_half_open_probes: int  # probe calls (all must succeed) before closing again
+    circuit_cooldown_seconds: float  # doubles after each failed probe, up to the max
+    circuit_max_cooldown_seconds: float
+
+    # Collapse concurrent identical upstream calls into one
+    single_flight_enabled: bool
+
+    # /rephrase/stream: "single_call" (one JSON prompt, parsed incrementally),
+    # "sequential" (one prompt per style, one after another) or "concurrent" (per-style fan-out)
+    stream_mode: str
+    stream_max_in_flight: int  # 0 = no cap on concurrently generating styles
+    # Deltas of a style are merged into one SSE event for up to this long / this many characters
+    sse_coalesce_seconds: float  # 0 = one event per upstream delta
+    sse_coalesce_chars: int
+    # Resumable streams (Last-Event-ID) backed by per-stream replay buffers
+    sse_resume_enabled: bool
+    sse_resume_grace_seconds: float  # keep generating this long after the last client detached
+    sse_resume_ttl_seconds: float  # keep finished streams resumable this long
+    sse_replay_max_bytes: int  # all replay buffers together
+    sse_replay_stream_max_bytes: int
+
+    # Long-input mode: texts over this many (estimated) tokens are split into chunks of about
+    # this size and rephrased in parallel; 0 = off
+    long_input_chunk_tokens: int
+    long_input_max_parallel: int  # chunks generating at once per request
+
+    # POST /rephrase/batch
+    batch_max_items: int
+    batch_max_parallel: int  # upstream calls in flight per batch request
+    batch_pack_size: int  # texts per packed prompt when the request asks for packing
+    batch_pack_max_chars: int  # only texts up to this length are packed
+
+    # Response cache in front of the LLM
+    response_cache_enabled: bool
+    response_cache_ttl_seconds: float
+    response_cache_max_bytes: int
+    response_cache_backend: str  # "memory", "sqlite" (memory LRU + on-disk tier) or "shared" (app.serve)
+    response_cache_sqlite_path: str
+    response_cache_sqlite_max_entries: int
+    response_cache_shared_socket: str  # Unix socket of the launcher's cache server
+    # Near-duplicate tier: serve the result of an earlier input at least this similar
+    response_cache_near_enabled: bool
+    response_cache_near_threshold: float  # estimated Jaccard similarity of character 4-grams
+    response_cache_near_max_entries: int
+    response_cache_near_max_chars: int  # longer inputs only use the exact cache
+
+    # Speculative prefetch of drafts (POST /rephrase/prefetch, app.cache.speculative)
+    prefetch_enabled: bool
+    prefetch_ttl_seconds: float  # unused drafts, generating or not, are dropped after this
+    prefetch_max_running: int  # generations in flight across all sessions; further drafts are skipped
+    prefetch_min_chars: int  # shorter drafts are not worth an upstream call
+
+    # Multi-worker launcher (python -m app.serve)
+    server_workers: int  # 0 = one per CPU; > 1 needs SSE_RESUME_ENABLED=0
+    server_drain_seconds: float  # how long a stopping worker may finish open requests and streams
+
+    # Sampled request tracing to a JSON-lines file of OTLP spans (app.observability.tracing)
+    trace_enabled: bool
+    trace_path: str
+    trace_sample_rate: float  # head sampling: share of requests traced from the start
+    trace_slow_seconds: float  # tail sampling: also keep slower (or failed) requests; 0 = off
+
+    # Hot reload (SIGHUP always; polling the .env file if > 0)
+    config_watch_seconds: float
+    config_drain_timeout_seconds: float  # how long a replaced provider may finish in-flight calls
 
     cors_origins: Sequence[str]
     cors_allow_credentials: bool
     cors_allow_methods: Sequence[str]
     cors_allow_headers: Sequence[str]
 
+    @cached_property
+    def version(self) -> str:
+        """Short content hash: equal settings share a version, any change yields a new one."""
+        raw = json.dumps(asdict(self), sort_keys=True, default=list)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+# Keys last applied from the .env file, so a reload can update or drop them
+_env_file_values: Dict[str, str] = {}
+
+
+def load_env_file(path: Optional[str] = None) -> Optional[str]:
+    """
+    Apply the .env file to os.environ; variables set by the real environment win.
+    Safe to call again on reload: keys that came from the file are updated, or removed
+    if they were deleted from it. Returns the file that was read, if any.
+    """
+    path = path or os.getenv("CONFIG_ENV_FILE", "").strip() or find_dotenv()
+    values = {k: v for k, v in dotenv_values(path).items() if v is not None} if path else {}
+
+    for key, old in _env_file_values.items():
+        if os.environ.get(key) == old and key not in values:
+            del os.environ[key]
+    applied: Dict[str, str] = {}
+    for key, value in values.items():
+        current = os.environ.get(key)
+        if current is None or current == _env_file_values.get(key):
+            os.environ[key] = value
+            applied[key] = value
+    _env_file_values.clear()
+    _env_file_values.update(applied)
+    return path or None
+
 
 def get_settings() -> Settings:
+    """
+    Build and validate a Settings snapshot from the environment.
+    Called once at startup (and on reload); request paths read the snapshot held by the
+    active ProviderRegistry instead of calling this.
+    """
     # ----- App environment -----
     env = os.getenv("ENV", "development").strip().lower()
 
     # ----- LLM settings -----
     mode = os.getenv("LLM_MODE", "fake").strip().lower()
-    if mode not in ("fake", "real"):
-        raise ValueError(f"Invalid LLM_MODE={mode!r}. Expected 'fake' or 'real'.")
+    if mode not in ("fake", "real", "replay"):
+        raise ValueError(f"Invalid LLM_MODE={mode!r}. Expected 'fake', 'real' or 'replay'.")
 
     allow = _truthy(os.getenv("ALLOW_REAL_LLM", "0"))
     endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "").strip()
@@ -45,6 +281,208 @@ def get_settings() -> Settings:
     api_version = os.getenv("AZURE_OPENAI_API_VERSION", "").strip() or "2024-10-21"
     deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT", "").strip()
     timeout = float(os.getenv("AZURE_OPENAI_TIMEOUT_SECONDS", "30"))
+    stream_usage = _truthy(os.getenv("AZURE_OPENAI_STREAM_USAGE", "1"))
+
+    # ----- Session recording / replay -----
+    record_path = os.getenv("LLM_RECORD_PATH", "").strip()
+    replay_path = os.getenv("LLM_REPLAY_PATH", "").strip()
+    replay_speed = float(os.getenv("LLM_REPLAY_SPEED", "1"))
+    replay_on_miss = os.getenv("LLM_REPLAY_ON_MISS", "nearest").strip().lower()
+    if mode == "replay" and not replay_path:
+        raise ValueError("LLM_REPLAY_PATH must be set when LLM_MODE=replay.")
+    if replay_speed < 0:
+        raise ValueError("LLM_REPLAY_SPEED must be >= 0.")
+    if replay_on_miss not in ("nearest", "error"):
+        raise ValueError(f"Invalid LLM_REPLAY_ON_MISS={replay_on_miss!r}. Expected 'nearest' or 'error'.")
+
+    # ----- Upstream connection pool -----
+    max_connections = int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "100"))
+    max_keepalive = int(os.getenv("AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    keepalive_expiry = float(os.getenv("AZURE_OPENAI_KEEPALIVE_EXPIRY_SECONDS", "30"))
+    http2 = _truthy(os.getenv("AZURE_OPENAI_HTTP2", "0"))
+    if max_connections < 1:
+        raise ValueError("AZURE_OPENAI_MAX_CONNECTIONS must be >= 1.")
+    if max_keepalive < 0 or max_keepalive > max_connections:
+        raise ValueError(
+            "AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS must be between 0 and AZURE_OPENAI_MAX_CONNECTIONS."
+        )
+
+    # ----- Multi-deployment routing -----
+    azure_backends = _azure_backends(endpoint, api_key, api_version, deployment)
+    router_ewma_alpha = float(os.getenv("ROUTER_EWMA_ALPHA", "0.3"))
+    router_breaker_failures = int(os.getenv("ROUTER_BREAKER_FAILURES", "5"))
+    router_breaker_cooldown = float(os.getenv("ROUTER_BREAKER_COOLDOWN_SECONDS", "10"))
+    if not 0 < router_ewma_alpha <= 1:
+        raise ValueError("ROUTER_EWMA_ALPHA must be in (0, 1].")
+    if router_breaker_failures < 1 or router_breaker_cooldown <= 0:
+        raise ValueError("ROUTER_BREAKER_FAILURES must be >= 1 and ROUTER_BREAKER_COOLDOWN_SECONDS > 0.")
+
+    # ----- Request deadline -----
+    request_timeout = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "60"))
+    request_timeout_max = float(os.getenv("REQUEST_TIMEOUT_MAX_SECONDS", "300"))
+    if request_timeout < 0 or request_timeout_max < 0:
+        raise ValueError("REQUEST_TIMEOUT_SECONDS and REQUEST_TIMEOUT_MAX_SECONDS must be >= 0.")
+
+    # ----- Upstream admission control -----
+    admission_enabled = _truthy(os.getenv("UPSTREAM_ADMISSION_ENABLED", "1"))
+    upstream_rpm = float(os.getenv("UPSTREAM_REQUESTS_PER_MINUTE", "0"))
+    upstream_tpm = float(os.getenv("UPSTREAM_TOKENS_PER_MINUTE", "0"))
+    expected_output_tokens = int(os.getenv("UPSTREAM_EXPECTED_OUTPUT_TOKENS", "256"))
+    concurrency_initial = int(os.getenv("UPSTREAM_CONCURRENCY_INITIAL", "32"))
+    concurrency_min = int(os.getenv("UPSTREAM_CONCURRENCY_MIN", "2"))
+    concurrency_max = int(os.getenv("UPSTREAM_CONCURRENCY_MAX", "128"))
+    queue_size = int(os.getenv("UPSTREAM_QUEUE_SIZE", "256"))
+    queue_timeout = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT_SECONDS", "10"))
+    if not 1 <= concurrency_min <= concurrency_initial <= concurrency_max:
+        raise ValueError(
+            "Expected 1 <= UPSTREAM_CONCURRENCY_MIN <= UPSTREAM_CONCURRENCY_INITIAL <= UPSTREAM_CONCURRENCY_MAX."
+        )
+
+    # ----- Priority lanes -----
+    priority_enabled = _truthy(os.getenv("PRIORITY_LANES_ENABLED", "1"))
+    priority_weights = _lane_values("PRIORITY_LANE_WEIGHTS", "interactive:6,standard:3,bulk:1")
+    priority_slo = _lane_values("PRIORITY_QUEUE_SLO_SECONDS", "interactive:1,standard:3,bulk:10")
+    priority_bulk_max_share = float(os.getenv("PRIORITY_BULK_MAX_SHARE", "0.5"))
+    priority_api_keys = _lane_keys("PRIORITY_API_KEYS")
+    if min(priority_weights) <= 0 or min(priority_slo) < 0:
+        raise ValueError("PRIORITY_LANE_WEIGHTS must be > 0 and PRIORITY_QUEUE_SLO_SECONDS >= 0.")
+    if not 0 < priority_bulk_max_share <= 1:
+        raise ValueError("PRIORITY_BULK_MAX_SHARE must be in (0, 1].")
+
+    # ----- Retries and hedging -----
+    retry_max_attempts = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+    retry_base_delay = float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.2"))
+    retry_max_delay = float(os.getenv("RETRY_MAX_DELAY_SECONDS", "4"))
+    retry_max_retry_after = float(os.getenv("RETRY_MAX_RETRY_AFTER_SECONDS", "10"))
+    retry_budget_ratio = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+    retry_budget_min = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1"))
+    hedge_enabled = _truthy(os.getenv("HEDGE_ENABLED", "0"))
+    hedge_percentile = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    hedge_min_samples = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+    if retry_max_attempts < 1:
+        raise ValueError("RETRY_MAX_ATTEMPTS must be >= 1.")
+    if retry_budget_ratio < 0 or retry_budget_min < 0:
+        raise ValueError("RETRY_BUDGET_RATIO and RETRY_BUDGET_MIN_PER_SECOND must be >= 0.")
+    if not 0 < hedge_percentile < 100:
+        raise ValueError("HEDGE_PERCENTILE must be between 0 and 100.")
+
+    # ----- Circuit breaker -----
+    circuit_enabled = _truthy(os.getenv("CIRCUIT_BREAKER_ENABLED", "1"))
+    circuit_failure_rate = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    circuit_min_calls = int(os.getenv("CIRCUIT_MIN_CALLS", "20"))
+    circuit_window = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "30"))
+    circuit_consecutive = int(os.getenv("CIRCUIT_CONSECUTIVE_FAILURES", "10"))
+    circuit_trip_on = tuple(c.lower() for c in _csv("CIRCUIT_TRIP_ON", "timeout,connection,server"))
+    circuit_probes = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "3"))
+    circuit_cooldown = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "15"))
+    circuit_max_cooldown = float(os.getenv("CIRCUIT_MAX_COOLDOWN_SECONDS", "120"))
+    if not 0 < circuit_failure_rate <= 1:
+        raise ValueError("CIRCUIT_FAILURE_RATE must be in (0, 1].")
+    if circuit_min_calls < 1 or circuit_probes < 1 or circuit_consecutive < 0:
+        raise ValueError(
+            "CIRCUIT_MIN_CALLS and CIRCUIT_HALF_OPEN_PROBES must be >= 1, CIRCUIT_CONSECUTIVE_FAILURES >= 0."
+        )
+    if circuit_window <= 0 or not 0 < circuit_cooldown <= circuit_max_cooldown:
+        raise ValueError(
+            "CIRCUIT_WINDOW_SECONDS must be > 0 and 0 < CIRCUIT_COOLDOWN_SECONDS <= CIRCUIT_MAX_COOLDOWN_SECONDS."
+        )
+    unknown = set(circuit_trip_on) - _UPSTREAM_ERROR_CLASSES
+    if unknown or not circuit_trip_on:
+        raise ValueError(f"CIRCUIT_TRIP_ON must list error classes from {sorted(_UPSTREAM_ERROR_CLASSES)}.")
+
+    single_flight = _truthy(os.getenv("SINGLE_FLIGHT_ENABLED", "1"))
+
+    # ----- Streaming settings -----
+    stream_mode = os.getenv("STREAM_MODE", "single_call").strip().lower()
+    if stream_mode not in ("single_call", "sequential", "concurrent"):
+        raise ValueError(
+            f"Invalid STREAM_MODE={stream_mode!r}. Expected 'single_call', 'sequential' or 'concurrent'."
+        )
+    stream_max_in_flight = int(os.getenv("STREAM_MAX_IN_FLIGHT", "0"))
+    if stream_max_in_flight < 0:
+        raise ValueError("STREAM_MAX_IN_FLIGHT must be >= 0.")
+    sse_coalesce_ms = float(os.getenv("SSE_COALESCE_MS", "20"))
+    sse_coalesce_chars = int(os.getenv("SSE_COALESCE_CHARS", "64"))
+    if sse_coalesce_ms < 0 or sse_coalesce_chars < 1:
+        raise ValueError("SSE_COALESCE_MS must be >= 0 and SSE_COALESCE_CHARS >= 1.")
+    sse_resume_enabled = _truthy(os.getenv("SSE_RESUME_ENABLED", "1"))
+    sse_resume_grace = float(os.getenv("SSE_RESUME_GRACE_SECONDS", "30"))
+    sse_resume_ttl = float(os.getenv("SSE_RESUME_TTL_SECONDS", "60"))
+    sse_replay_max_bytes = int(os.getenv("SSE_REPLAY_MAX_BYTES", str(8 * 1024 * 1024)))
+    sse_replay_stream_max_bytes = int(os.getenv("SSE_REPLAY_STREAM_MAX_BYTES", str(256 * 1024)))
+    if sse_resume_grace < 0 or sse_resume_ttl < 0:
+        raise ValueError("SSE_RESUME_GRACE_SECONDS and SSE_RESUME_TTL_SECONDS must be >= 0.")
+
+    # ----- Long-input chunking -----
+    long_input_chunk_tokens = int(os.getenv("LONG_INPUT_CHUNK_TOKENS", "0"))
+    long_input_max_parallel = int(os.getenv("LONG_INPUT_MAX_PARALLEL", "4"))
+    if long_input_chunk_tokens < 0:
+        raise ValueError("LONG_INPUT_CHUNK_TOKENS must be >= 0.")
+    if 0 < long_input_chunk_tokens < 32:
+        raise ValueError("LONG_INPUT_CHUNK_TOKENS must be 0 (off) or at least 32.")
+    if long_input_max_parallel < 1:
+        raise ValueError("LONG_INPUT_MAX_PARALLEL must be >= 1.")
+
+    # ----- Batch settings -----
+    batch_max_items = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+    batch_max_parallel = int(os.getenv("BATCH_MAX_PARALLEL", "8"))
+    batch_pack_size = int(os.getenv("BATCH_PACK_SIZE", "4"))
+    batch_pack_max_chars = int(os.getenv("BATCH_PACK_MAX_CHARS", "400"))
+    if batch_max_items < 1 or batch_max_parallel < 1 or batch_pack_size < 1:
+        raise ValueError("BATCH_MAX_ITEMS, BATCH_MAX_PARALLEL and BATCH_PACK_SIZE must be >= 1.")
+
+    # ----- Response cache settings -----
+    cache_enabled = _truthy(os.getenv("RESPONSE_CACHE_ENABLED", "1"))
+    cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    cache_max_bytes = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    cache_backend = os.getenv("RESPONSE_CACHE_BACKEND", "memory").strip().lower()
+    if cache_backend not in ("memory", "sqlite", "shared"):
+        raise ValueError(
+            f"Invalid RESPONSE_CACHE_BACKEND={cache_backend!r}. Expected 'memory', 'sqlite' or 'shared'."
+        )
+    cache_sqlite_path = os.getenv("RESPONSE_CACHE_SQLITE_PATH", "rephrase_cache.sqlite3").strip()
+    cache_sqlite_max_entries = int(os.getenv("RESPONSE_CACHE_SQLITE_MAX_ENTRIES", "100000"))
+    cache_shared_socket = os.getenv("RESPONSE_CACHE_SHARED_SOCKET", "").strip()
+    if cache_backend == "shared" and not cache_shared_socket:
+        raise ValueError("RESPONSE_CACHE_BACKEND=shared requires RESPONSE_CACHE_SHARED_SOCKET.")
+    cache_near_enabled = _truthy(os.getenv("RESPONSE_CACHE_NEAR_DUPLICATE_ENABLED", "0"))
+    cache_near_threshold = float(os.getenv("RESPONSE_CACHE_NEAR_DUPLICATE_THRESHOLD", "0.9"))
+    cache_near_max_entries = int(os.getenv("RESPONSE_CACHE_NEAR_DUPLICATE_MAX_ENTRIES", "20000"))
+    cache_near_max_chars = int(os.getenv("RESPONSE_CACHE_NEAR_DUPLICATE_MAX_CHARS", "2000"))
+    if not 0.5 <= cache_near_threshold <= 1:
+        raise ValueError("RESPONSE_CACHE_NEAR_DUPLICATE_THRESHOLD must be between 0.5 and 1.")
+    if cache_near_max_entries < 1 or cache_near_max_chars < 1:
+        raise ValueError("RESPONSE_CACHE_NEAR_DUPLICATE_MAX_ENTRIES and _MAX_CHARS must be >= 1.")
+
+    # ----- Speculative prefetch -----
+    prefetch_enabled = _truthy(os.getenv("PREFETCH_ENABLED", "1"))
+    prefetch_ttl = float(os.getenv("PREFETCH_TTL_SECONDS", "60"))
+    prefetch_max_running = int(os.getenv("PREFETCH_MAX_RUNNING", "16"))
+    prefetch_min_chars = int(os.getenv("PREFETCH_MIN_CHARS", "20"))
+    if prefetch_ttl <= 0 or prefetch_max_running < 1 or prefetch_min_chars < 1:
+        raise ValueError("PREFETCH_TTL_SECONDS must be > 0, PREFETCH_MAX_RUNNING and PREFETCH_MIN_CHARS >= 1.")
+
+    # ----- Multi-worker launcher -----
+    server_workers = int(os.getenv("SERVER_WORKERS", "1"))
+    server_drain_seconds = float(os.getenv("SERVER_DRAIN_SECONDS", "60"))
+    if server_workers < 0 or server_drain_seconds < 0:
+        raise ValueError("SERVER_WORKERS and SERVER_DRAIN_SECONDS must be >= 0.")
+
+    # ----- Tracing -----
+    trace_enabled = _truthy(os.getenv("TRACE_ENABLED", "0"))
+    trace_path = os.getenv("TRACE_PATH", "traces.jsonl").strip()
+    trace_sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+    trace_slow_ms = float(os.getenv("TRACE_SLOW_MS", "2000"))
+    if not 0 <= trace_sample_rate <= 1 or trace_slow_ms < 0:
+        raise ValueError("TRACE_SAMPLE_RATE must be in [0, 1] and TRACE_SLOW_MS >= 0.")
+    if trace_enabled and not trace_path:
+        raise ValueError("TRACE_PATH must be set when TRACE_ENABLED=1.")
+
+    # ----- Hot reload -----
+    config_watch_seconds = float(os.getenv("CONFIG_WATCH_SECONDS", "0"))
+    config_drain_timeout = float(os.getenv("CONFIG_DRAIN_TIMEOUT_SECONDS", "300"))
+    if config_watch_seconds < 0 or config_drain_timeout < 0:
+        raise ValueError("CONFIG_WATCH_SECONDS and CONFIG_DRAIN_TIMEOUT_SECONDS must be >= 0.")
 
     # ----- CORS settings -----
     raw_origins = os.getenv(
@@ -55,7 +493,7 @@ def get_settings() -> Settings:
 
     cors_allow_credentials = _truthy(os.getenv("CORS_ALLOW_CREDENTIALS", "0"))
     cors_allow_methods = _csv("CORS_ALLOW_METHODS", "POST,OPTIONS")
-    cors_allow_headers = _csv("CORS_ALLOW_HEADERS", "Content-Type")
+    cors_allow_headers = _csv("CORS_ALLOW_HEADERS", "Content-Type,Last-Event-ID,X-Request-Timeout")
 
     # Safety guard: locked-down production expectations
     if env in ("prod", "production"):
@@ -70,11 +508,97 @@ def get_settings() -> Settings:
     return Settings(
         llm_mode=mode,
         allow_real_llm=allow,
+        llm_record_path=record_path,
+        llm_replay_path=replay_path,
+        llm_replay_speed=replay_speed,
+        llm_replay_on_miss=replay_on_miss,
         azure_endpoint=endpoint,
         azure_api_key=api_key,
         azure_api_version=api_version,
         azure_deployment=deployment,
         azure_timeout_seconds=timeout,
+        azure_stream_usage=stream_usage,
+        azure_max_connections=max_connections,
+        azure_max_keepalive_connections=max_keepalive,
+        azure_keepalive_expiry_seconds=keepalive_expiry,
+        azure_http2=http2,
+        azure_backends=azure_backends,
+        router_ewma_alpha=router_ewma_alpha,
+        router_breaker_failures=router_breaker_failures,
+        router_breaker_cooldown_seconds=router_breaker_cooldown,
+        request_timeout_seconds=request_timeout,
+        request_timeout_max_seconds=request_timeout_max,
+        upstream_admission_enabled=admission_enabled,
+        upstream_requests_per_minute=upstream_rpm,
+        upstream_tokens_per_minute=upstream_tpm,
+        upstream_expected_output_tokens=expected_output_tokens,
+        upstream_concurrency_initial=concurrency_initial,
+        upstream_concurrency_min=concurrency_min,
+        upstream_concurrency_max=concurrency_max,
+        upstream_queue_size=queue_size,
+        upstream_queue_timeout_seconds=queue_timeout,
+        priority_lanes_enabled=priority_enabled,
+        priority_lane_weights=priority_weights,
+        priority_queue_slo_seconds=priority_slo,
+        priority_bulk_max_share=priority_bulk_max_share,
+        priority_api_keys=priority_api_keys,
+        retry_max_attempts=retry_max_attempts,
+        retry_base_delay_seconds=retry_base_delay,
+        retry_max_delay_seconds=retry_max_delay,
+        retry_max_retry_after_seconds=retry_max_retry_after,
+        retry_budget_ratio=retry_budget_ratio,
+        retry_budget_min_per_second=retry_budget_min,
+        hedge_enabled=hedge_enabled,
+        hedge_percentile=hedge_percentile,
+        hedge_min_samples=hedge_min_samples,
+        circuit_enabled=circuit_enabled,
+        circuit_failure_rate=circuit_failure_rate,
+        circuit_min_calls=circuit_min_calls,
+        circuit_window_seconds=circuit_window,
+        circuit_consecutive_failures=circuit_consecutive,
+        circuit_trip_on=circuit_trip_on,
+        circuit_half_open_probes=circuit_probes,
+        circuit_cooldown_seconds=circuit_cooldown,
+        circuit_max_cooldown_seconds=circuit_max_cooldown,
+        single_flight_enabled=single_flight,
+        stream_mode=stream_mode,
+        stream_max_in_flight=stream_max_in_flight,
+        sse_coalesce_seconds=sse_coalesce_ms / 1000.0,
+        sse_coalesce_chars=sse_coalesce_chars,
+        sse_resume_enabled=sse_resume_enabled,
+        sse_resume_grace_seconds=sse_resume_grace,
+        sse_resume_ttl_seconds=sse_resume_ttl,
+        sse_replay_max_bytes=sse_replay_max_bytes,
+        sse_replay_stream_max_bytes=sse_replay_stream_max_bytes,
+        long_input_chunk_tokens=long_input_chunk_tokens,
+        long_input_max_parallel=long_input_max_parallel,
+        batch_max_items=batch_max_items,
+        batch_max_parallel=batch_max_parallel,
+        batch_pack_size=batch_pack_size,
+        batch_pack_max_chars=batch_pack_max_chars,
+        response_cache_enabled=cache_enabled,
+        response_cache_ttl_seconds=cache_ttl,
+        response_cache_max_bytes=cache_max_bytes,
+        response_cache_backend=cache_backend,
+        response_cache_sqlite_path=cache_sqlite_path,
+        response_cache_sqlite_max_entries=cache_sqlite_max_entries,
+        response_cache_shared_socket=cache_shared_socket,
+        response_cache_near_enabled=cache_near_enabled,
+        response_cache_near_threshold=cache_near_threshold,
+        response_cache_near_max_entries=cache_near_max_entries,
+        response_cache_near_max_chars=cache_near_max_chars,
+        prefetch_enabled=prefetch_enabled,
+        prefetch_ttl_seconds=prefetch_ttl,
+        prefetch_max_running=prefetch_max_running,
+        prefetch_min_chars=prefetch_min_chars,
+        server_workers=server_workers,
+        server_drain_seconds=server_drain_seconds,
+        trace_enabled=trace_enabled,
+        trace_path=trace_path,
+        trace_sample_rate=trace_sample_rate,
+        trace_slow_seconds=trace_slow_ms / 1000.0,
+        config_watch_seconds=config_watch_seconds,
+        config_drain_timeout_seconds=config_drain_timeout,
         cors_origins=cors_origins,
         cors_allow_credentials=cors_allow_credentials,
         cors_allow_methods=cors_allow_methods,
@@ -0,0 +1,182 @@
+# backend/app/config_reload.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import find_dotenv
+
+import app.cache.response_cache as response_cache
+import app.llm.factory as llm_factory
+from app.config import get_settings, load_env_file
+from app.llm.provider import LLMProvider
+from app.llm.registry import ProviderRegistry
+from app.observability.metrics import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CONFIG_INFO = REGISTRY.register(
+    Gauge("app_config_info", "Configuration version in effect (1) and versions replaced by a reload (0).", ("version",))
+)
+CONFIG_RELOADS = REGISTRY.register(
+    Counter("app_config_reloads_total", "Configuration reload attempts by outcome.", ("outcome",))
+)
+
+# Settings that are read once at startup; changing them needs a restart
+_RESTART_ONLY = ("cors_", "response_cache_", "sse_resume_", "sse_replay_", "server_", "trace_", "prefetch_")
+
+
+class ConfigReloader:
+    """
+    Re-reads the environment (.env included) on SIGHUP or when the .env file changes and,
+    if the settings differ, installs a new ProviderRegistry built from the new snapshot.
+    The replaced registry keeps serving the calls already running on it and is closed once
+    they finish, so in-flight streams are not dropped. The response cache is re-keyed for the
+    new LLM mode and deployment.
+    An invalid configuration is logged and ignored; the current one stays active.
+    """
+
+    def __init__(
+        self,
+        registry: ProviderRegistry,
+        *,
+        base_provider: Optional[LLMProvider] = None,
+        env_file: Optional[str] = None,
+        on_swap: Optional[Callable[[ProviderRegistry], None]] = None,
+    ):
+        self._base_provider = base_provider
+        self._env_file = env_file
+        self._on_swap = on_swap
+        self._lock = asyncio.Lock()
+        self._retiring: Dict["asyncio.Task[None]", ProviderRegistry] = {}
+        self._watch_task: Optional["asyncio.Task[None]"] = None
+        self._signal_installed = False
+        self.generation = 1
+        self.loaded_at = time.time()
+        self.last_error: Optional[str] = None
+        self._version = registry.settings.version
+        CONFIG_INFO.labels(self._version).set(1)
+
+    @property
+    def version(self) -> str:
+        return self._version
+
+    async def reload(self, reason: str = "manual") -> bool:
+        """Returns True if a new configuration was applied."""
+        async with self._lock:
+            try:
+                load_env_file(self._env_file)
+                settings = get_settings()
+            except Exception as e:
+                self.last_error = str(e)
+                CONFIG_RELOADS.labels("failed").inc()
+                logger.error("Config reload (%s) rejected, keeping version %s: %s", reason, self._version, e)
+                return False
+
+            self.last_error = None
+            current = llm_factory.get_provider_registry()
+            if settings.version == self._version:
+                CONFIG_RELOADS.labels("unchanged").inc()
+                return False
+
+            for name in _changed_fields(current.settings, settings):
+                if name.startswith(_RESTART_ONLY):
+                    logger.warning("Config reload: %s changed but only takes effect after a restart.", name)
+
+            registry = ProviderRegistry(settings, base_provider=self._base_provider)
+            # Before the swap, so no request pairs the new provider with old-namespace entries
+            response_cache.rekey_response_cache(settings)
+            previous = llm_factory.set_provider_registry(registry)
+            if self._on_swap is not None:
+                self._on_swap(registry)
+            if previous is not None:
+                task = asyncio.create_task(previous.drain_and_close(settings.config_drain_timeout_seconds))
+                self._retiring[task] = previous
+                task.add_done_callback(lambda t: self._retiring.pop(t, None))
+
+            CONFIG_INFO.labels(self._version).set(0)
+            CONFIG_INFO.labels(settings.version).set(1)
+            logger.info("Config reloaded (%s): version %s -> %s", reason, self._version, settings.version)
+            self._version = settings.version
+            self.generation += 1
+            self.loaded_at = time.time()
+            CONFIG_RELOADS.labels("applied").inc()
+            return True
+
+    def _schedule(self, reason: str) -> None:
+        asyncio.ensure_future(self.reload(reason))
+
+    def install_signal_handler(self) -> bool:
+        """Reload on SIGHUP. Not available on Windows or outside the main thread."""
+        sighup = getattr(signal, "SIGHUP", None)
+        if sighup is None:
+            return False
+        try:
+            asyncio.get_running_loop().add_signal_handler(sighup, self._schedule, "SIGHUP")
+        except (NotImplementedError, RuntimeError, ValueError):
+            return False
+        self._signal_installed = True
+        return True
+
+    def watch(self, interval_seconds: float) -> None:
+        """Poll the .env file's modification time and reload when it changes."""
+        if interval_seconds > 0 and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(interval_seconds), name="config-watch")
+
+    async def _watch(self, interval_seconds: float) -> None:
+        last = _mtime(_env_path(self._env_file))
+        while True:
+            await asyncio.sleep(interval_seconds)
+            mtime = _mtime(_env_path(self._env_file))
+            if mtime != last:
+                last = mtime
+                await self.reload(".env changed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self._version,
+            "generation": self.generation,
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error,
+            "sighup": self._signal_installed,
+            "watching": self._watch_task is not None,
+            "draining_registries": len(self._retiring),
+        }
+
+    async def aclose(self) -> None:
+        if self._signal_installed:
+            try:
+                asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+        # Shutting down: replaced registries do not get to finish their drain
+        retiring = dict(self._retiring)
+        for task in retiring:
+            task.cancel()
+        await asyncio.gather(*retiring, return_exceptions=True)
+        for registry in retiring.values():
+            await registry.aclose()
+
+
+def _changed_fields(old: Any, new: Any) -> List[str]:
+    return [name for name in old.__dataclass_fields__ if getattr(old, name) != getattr(new, name)]
+
+
+def _env_path(env_file: Optional[str]) -> Optional[str]:
+    return env_file or os.getenv("CONFIG_ENV_FILE", "").strip() or find_dotenv() or None
+
+
+def _mtime(path: Optional[str]) -> Optional[float]:
+    if not path:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
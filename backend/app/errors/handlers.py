@@ -8,6 +8,7 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
 from app.llm.provider_errors import LLMProviderError
+from app.observability.metrics import record_error
 # Optional: if you want explicit typing here, uncomment:
 # from app.llm.parse import ModelOutputError
 
@@ -82,6 +83,7 @@ async def request_validation_exception_handler(
     else:
         message = "Invalid request."
 
+    record_error("VALIDATION_ERROR")
     return JSONResponse(
         status_code=400,
         content={"code": "VALIDATION_ERROR", "message": message, "details": details},
@@ -89,8 +91,10 @@ async def request_validation_exception_handler(
 
 
 async def llm_provider_exception_handler(request: Request, exc: LLMProviderError) -> JSONResponse:
+    record_error(exc.code)
     headers: Dict[str, str] = {}
-    if exc.status_code == 429 and exc.retry_after_seconds is not None:
+    # Throttling, and an open circuit breaker, tell the client when to come back
+    if exc.retry_after_seconds is not None:
         headers["Retry-After"] = str(exc.retry_after_seconds)
 
     return JSONResponse(
@@ -102,6 +106,7 @@ async def llm_provider_exception_handler(request: Request, exc: LLMProviderError
 
 async def model_output_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     # If you prefer explicit typing, change `exc: Exception` to `exc: ModelOutputError`
+    record_error("INTERNAL_ERROR")
     return JSONResponse(
         status_code=500,
         content={"code": "INTERNAL_ERROR", "message": "Invalid model output.", "details": []},
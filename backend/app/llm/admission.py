@@ -0,0 +1,553 @@
+# backend/app/llm/admission.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import mmap
+import multiprocessing
+import struct
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Sequence, Tuple
+
+from app.config import Settings
+from app.llm.deadline import current_deadline
+from app.llm.priority import DEFAULT_LANE, LANES, current_lane, rank
+from app.llm.provider import LLMProvider
+from app.llm.provider_errors import LLMProviderError
+from app.llm.tokens import estimate_tokens
+from app.observability.metrics import REGISTRY, Counter, Gauge, Histogram
+from app.observability.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+BULK_LANE = LANES[-1]  # shed first
+
+# Called when an upstream call made from this context is admitted (see on_admitted)
+_on_admitted: ContextVar[Optional[Callable[[], None]]] = ContextVar("upstream_on_admitted", default=None)
+
+UPSTREAM_CONCURRENCY_LIMIT = REGISTRY.register(
+    Gauge("llm_upstream_concurrency_limit", "Current adaptive limit on concurrent upstream calls.")
+)
+UPSTREAM_QUEUE_DEPTH = REGISTRY.register(
+    Gauge("llm_upstream_queue_depth", "Requests waiting for upstream admission.")
+)
+UPSTREAM_SHED = REGISTRY.register(
+    Counter("llm_upstream_shed_total", "Requests rejected before reaching the upstream.", ("reason", "lane"))
+)
+UPSTREAM_QUEUE_TIME = REGISTRY.register(
+    Histogram(
+        "llm_upstream_queue_seconds",
+        "Time upstream calls waited for admission, by priority lane.",
+        ("lane",),
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+)
+UPSTREAM_QUEUE_SLO_MISSED = REGISTRY.register(
+    Counter(
+        "llm_upstream_queue_slo_missed_total",
+        "Calls admitted after waiting longer than their lane's queue-time SLO.",
+        ("lane",),
+    )
+)
+UPSTREAM_THROTTLED = REGISTRY.register(
+    Counter("llm_upstream_throttled_total", "Upstream 429 responses seen by the admission controller.")
+)
+
+
+class TokenBucket:
+    """Continuously refilling bucket: `per_minute` units per minute, holding at most `per_minute`."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 if available now)."""
+        self._refill(now)
+        # A single request larger than the bucket may go once the bucket is full
+        amount = min(amount, self.capacity)
+        if self._level >= amount:
+            return 0.0
+        return (amount - self._level) / self._rate
+
+    def take(self, amount: float) -> None:
+        self._level -= min(amount, self.capacity)
+
+    @property
+    def level(self) -> float:
+        return self._level
+
+
+class SharedTokenBuckets:
+    """
+    Token bucket levels in anonymous shared memory, for worker processes forked from one
+    launcher (app.serve): created before the fork, every worker then draws from the same
+    requests/minute and tokens/minute budget. Each worker still applies its own per-minute rate.
+    """
+
+    SLOTS = ("requests", "tokens")
+    _FORMAT = struct.Struct("dd")  # level, last refill (time.monotonic is system-wide)
+
+    def __init__(self) -> None:
+        self._memory = mmap.mmap(-1, self._FORMAT.size * len(self.SLOTS))
+        self._lock = multiprocessing.Lock()
+
+    def bucket(self, name: str, per_minute: float) -> "SharedTokenBucket":
+        return SharedTokenBucket(self, self.SLOTS.index(name) * self._FORMAT.size, per_minute)
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket whose level lives in a SharedTokenBuckets slot."""
+
+    def __init__(self, shared: SharedTokenBuckets, offset: int, per_minute: float):
+        self.capacity = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._shared = shared
+        self._offset = offset
+
+    def _update(self, change: float, now: float) -> float:
+        fmt, memory = SharedTokenBuckets._FORMAT, self._shared._memory
+        with self._shared._lock:
+            level, updated = fmt.unpack_from(memory, self._offset)
+            if updated == 0.0:  # first use: start full
+                level, updated = self.capacity, now
+            level = min(self.capacity, level + max(now - updated, 0.0) * self._rate) - change
+            fmt.pack_into(memory, self._offset, level, max(now, updated))
+            return level
+
+    def time_until(self, amount: float, now: float) -> float:
+        level = self._update(0.0, now)
+        amount = min(amount, self.capacity)
+        if level >= amount:
+            return 0.0
+        return (amount - level) / self._rate
+
+    def take(self, amount: float) -> None:
+        # Another worker may have drawn in between; the level can go below zero, which only
+        # makes the next callers wait longer
+        self._update(min(amount, self.capacity), time.monotonic())
+
+    @property
+    def level(self) -> float:
+        return self._update(0.0, time.monotonic())
+
+
+# Installed by the multi-worker launcher before it forks; None in a single process
+_shared_buckets: Optional[SharedTokenBuckets] = None
+
+
+def share_token_buckets(buckets: Optional[SharedTokenBuckets]) -> None:
+    global _shared_buckets
+    _shared_buckets = buckets
+
+
+class AIMDLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+    Each success adds 1/limit (about +1 per full window); a throttle multiplies by
+    `backoff` at most once per `cooldown_seconds` so one burst of 429s counts once.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        backoff: float = 0.5,
+        cooldown_seconds: float = 1.0,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self._backoff = backoff
+        self._cooldown = cooldown_seconds
+        self._last_decrease = -math.inf
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self, now: float) -> None:
+        if now - self._last_decrease < self._cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * self._backoff)
+
+    @property
+    def permits(self) -> int:
+        return int(self.limit)
+
+
+class _Waiter:
+    __slots__ = ("lane", "since", "shed")
+
+    def __init__(self, lane: str, since: float):
+        self.lane = lane
+        self.since = since
+        self.shed: Optional[str] = None  # set when another caller sheds this waiter
+
+
+class _Lane:
+    """One priority lane: its queue, scheduling state and counters."""
+
+    __slots__ = (
+        "name",
+        "weight",
+        "slo",
+        "max_share",
+        "queue",
+        "pass_",
+        "in_flight",
+        "admitted",
+        "shed",
+        "slo_missed",
+    )
+
+    def __init__(self, name: str, weight: float, slo: float, max_share: float):
+        self.name = name
+        self.weight = weight
+        self.slo = slo
+        self.max_share = max_share
+        self.queue: Deque[_Waiter] = deque()
+        self.pass_ = 0.0  # virtual time of the lane's next admission
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.slo_missed = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "queue_slo_seconds": self.slo,
+            "max_share": self.max_share,
+            "queued": len(self.queue),
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "slo_missed": self.slo_missed,
+        }
+
+
+class AdmissionController:
+    """
+    Gatekeeper in front of the upstream: requests/minute and tokens/minute buckets plus an
+    adaptive concurrency limit. Waiters queue in a bounded queue and are shed (429 with
+    Retry-After) when the queue is full or they could not be admitted before their deadline.
+    An upstream `retry-after` pauses admission for that long.
+
+    The queue is split into priority lanes (app.llm.priority), FIFO within a lane. While lanes
+    compete, admissions are shared in proportion to `lane_weights` (stride scheduling: each
+    admission advances its lane's virtual time by 1/weight, the lane furthest behind goes
+    next), and bulk calls never hold more than `bulk_max_share` of the concurrency limit. Bulk
+    work is shed first: a full queue makes room by shedding the newest waiter of a lower lane,
+    and while a higher lane's oldest waiter is past its queue-time SLO, queued and arriving
+    bulk calls are shed.
+    """
+
+    def __init__(
+        self,
+        limiter: AIMDLimiter,
+        *,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_queue: int = 256,
+        max_wait_seconds: float = 10.0,
+        shared: Optional[SharedTokenBuckets] = None,
+        lane_weights: Sequence[float] = (1.0, 1.0, 1.0),
+        queue_slo_seconds: Sequence[float] = (0.0, 0.0, 0.0),
+        bulk_max_share: float = 1.0,
+    ):
+        self.limiter = limiter
+        self._rpm: Optional[TokenBucket] = None
+        self._tpm: Optional[TokenBucket] = None
+        if requests_per_minute > 0:
+            self._rpm = (
+                shared.bucket("requests", requests_per_minute) if shared else TokenBucket(requests_per_minute)
+            )
+        if tokens_per_minute > 0:
+            self._tpm = shared.bucket("tokens", tokens_per_minute) if shared else TokenBucket(tokens_per_minute)
+        self._max_queue = max_queue
+        self._max_wait = max_wait_seconds
+        self._lanes: Dict[str, _Lane] = {
+            name: _Lane(name, weight, slo, bulk_max_share if name == BULK_LANE else 1.0)
+            for name, weight, slo in zip(LANES, lane_weights, queue_slo_seconds)
+        }
+        self._vtime = 0.0
+        self._changed = asyncio.Event()
+        self._paused_until = 0.0
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.throttled = 0
+        UPSTREAM_CONCURRENCY_LIMIT.set(self.limiter.permits)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(lane.queue) for lane in self._lanes.values())
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _rate_wait(self, tokens: int, now: float) -> float:
+        wait = self._paused_until - now
+        if self._rpm is not None:
+            wait = max(wait, self._rpm.time_until(1, now))
+        if self._tpm is not None:
+            wait = max(wait, self._tpm.time_until(tokens, now))
+        return max(wait, 0.0)
+
+    def _shed(self, reason: str, retry_after: float, lane: str) -> LLMProviderError:
+        self.shed += 1
+        self._lanes[lane].shed += 1
+        UPSTREAM_SHED.labels(reason, lane).inc()
+        return LLMProviderError(
+            status_code=429,
+            code="RATE_LIMIT_EXCEEDED",
+            message="Too many requests. Please retry after the specified time.",
+            retry_after_seconds=max(1, math.ceil(retry_after)),
+        )
+
+    def _has_room(self, lane: _Lane) -> bool:
+        return lane.max_share >= 1 or lane.in_flight < max(1, int(self.limiter.permits * lane.max_share))
+
+    def _next(self) -> Optional[_Waiter]:
+        """The waiter to admit next: the head of the lane furthest behind in virtual time."""
+        best: Optional[_Lane] = None
+        for lane in self._lanes.values():  # most urgent first, so it wins ties
+            if lane.queue and self._has_room(lane) and (best is None or lane.pass_ < best.pass_):
+                best = lane
+        return best.queue[0] if best is not None else None
+
+    def _overdue(self, now: float) -> bool:
+        """Whether the oldest waiter of a lane above bulk has waited longer than its lane's SLO."""
+        return any(
+            lane.slo and lane.queue and now - lane.queue[0].since > lane.slo
+            for lane in self._lanes.values()
+            if lane.name != BULK_LANE
+        )
+
+    def _shed_bulk_if_overdue(self, now: float) -> None:
+        bulk = self._lanes[BULK_LANE]
+        if bulk.queue and self._overdue(now):
+            for waiter in bulk.queue:
+                waiter.shed = "priority"
+            bulk.queue.clear()
+            self._notify()
+
+    def _make_room(self, lane: str) -> bool:
+        """Shed the newest waiter of the lowest lane below `lane`; False if there is none."""
+        for victim_lane in reversed(self._lanes.values()):
+            if rank(victim_lane.name) <= rank(lane):
+                return False
+            if victim_lane.queue:
+                victim_lane.queue.pop().shed = "priority"
+                self._notify()
+                return True
+        return False
+
+    def _admit(self, waiter: _Waiter, now: float) -> None:
+        lane = self._lanes[waiter.lane]
+        self._vtime = lane.pass_
+        lane.pass_ += 1.0 / lane.weight
+        lane.in_flight += 1
+        lane.admitted += 1
+        self.in_flight += 1
+        self.admitted += 1
+        waited = now - waiter.since
+        UPSTREAM_QUEUE_TIME.labels(lane.name).observe(waited)
+        if lane.slo and waited > lane.slo:
+            lane.slo_missed += 1
+            UPSTREAM_QUEUE_SLO_MISSED.labels(lane.name).inc()
+
+    async def acquire(self, tokens: int, timeout: Optional[float] = None, lane: str = DEFAULT_LANE) -> None:
+        now = time.monotonic()
+        if lane == BULK_LANE and self._overdue(now):
+            raise self._shed("priority", self._max_wait, lane)
+        if self.queued >= self._max_queue and not self._make_room(lane):
+            raise self._shed("queue_full", self._max_wait, lane)
+
+        budget = self._max_wait if timeout is None else min(timeout, self._max_wait)
+        deadline = now + budget
+        waiter = _Waiter(lane, now)
+        own = self._lanes[lane]
+        if not own.queue:
+            # An idle lane rejoins at the current virtual time instead of spending saved-up credit
+            own.pass_ = max(own.pass_, self._vtime)
+        own.queue.append(waiter)
+        UPSTREAM_QUEUE_DEPTH.set(self.queued)
+        try:
+            while True:
+                now = time.monotonic()
+                self._shed_bulk_if_overdue(now)
+                if waiter.shed is not None:
+                    raise self._shed(waiter.shed, self._max_wait, lane)
+                changed = self._changed
+                wait: Optional[float] = None  # None = wait for a slot to free up
+                if self._next() is waiter and self.in_flight < self.limiter.permits:
+                    wait = self._rate_wait(tokens, now)
+                    if wait <= 0:
+                        if self._rpm is not None:
+                            self._rpm.take(1)
+                        if self._tpm is not None:
+                            self._tpm.take(tokens)
+                        self._admit(waiter, now)
+                        return
+                    if now + wait > deadline:
+                        # Known in advance that we cannot make it: fail fast instead of queueing
+                        raise self._shed("deadline", wait, lane)
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise self._shed("deadline", self._rate_wait(tokens, now) or 1.0, lane)
+                sleep = min(remaining, wait) if wait else remaining
+                until_slo = waiter.since + own.slo - now
+                if lane != BULK_LANE and own.slo and until_slo > 0:
+                    sleep = min(sleep, until_slo)  # wake up to shed bulk work once over the SLO
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=sleep)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            try:
+                own.queue.remove(waiter)
+            except ValueError:
+                pass
+            UPSTREAM_QUEUE_DEPTH.set(self.queued)
+            self._notify()
+
+    def release(
+        self, outcome: str = "success", retry_after: Optional[float] = None, lane: str = DEFAULT_LANE
+    ) -> None:
+        """outcome: "success" grows the limit, "throttled" shrinks it, anything else leaves it alone."""
+        self.in_flight -= 1
+        self._lanes[lane].in_flight -= 1
+        now = time.monotonic()
+        if outcome == "throttled":
+            self.throttled += 1
+            UPSTREAM_THROTTLED.inc()
+            self.limiter.on_throttle(now)
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            logger.warning(
+                "Upstream throttled; concurrency limit now %d%s.",
+                self.limiter.permits,
+                f", pausing {retry_after}s" if retry_after else "",
+            )
+        elif outcome == "success":
+            self.limiter.on_success()
+        UPSTREAM_CONCURRENCY_LIMIT.set(self.limiter.permits)
+        self._notify()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "concurrency_limit": self.limiter.permits,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "throttled": self.throttled,
+            "paused_for_seconds": round(max(self._paused_until - now, 0.0), 3),
+            "requests_bucket": round(self._rpm.level, 1) if self._rpm is not None else None,
+            "tokens_bucket": round(self._tpm.level, 1) if self._tpm is not None else None,
+            "lanes": {name: lane.stats() for name, lane in self._lanes.items()},
+        }
+
+
+def build_admission_controller(settings: Settings) -> AdmissionController:
+    return AdmissionController(
+        AIMDLimiter(
+            initial=settings.upstream_concurrency_initial,
+            minimum=settings.upstream_concurrency_min,
+            maximum=settings.upstream_concurrency_max,
+        ),
+        requests_per_minute=settings.upstream_requests_per_minute,
+        tokens_per_minute=settings.upstream_tokens_per_minute,
+        max_queue=settings.upstream_queue_size,
+        max_wait_seconds=settings.upstream_queue_timeout_seconds,
+        shared=_shared_buckets,
+        lane_weights=settings.priority_lane_weights,
+        queue_slo_seconds=settings.priority_queue_slo_seconds,
+        bulk_max_share=settings.priority_bulk_max_share,
+    )
+
+
+def on_admitted(callback: Callable[[], None]) -> None:
+    """
+    Call `callback` whenever an upstream call made from the current context, or from tasks it
+    starts later, leaves the admission queue. For work started in the background, such as
+    speculative prefetch, to tell whether it is still waiting in its lane.
+    """
+    _on_admitted.set(callback)
+
+
+class AdmissionControlledProvider:
+    """
+    LLMProvider wrapper that admits each upstream call through an AdmissionController.
+    Token cost is estimated from the prompt plus `expected_output_tokens`.
+    """
+
+    def __init__(self, inner: LLMProvider, controller: AdmissionController, expected_output_tokens: int = 256):
+        self.inner = inner
+        self.controller = controller
+        self._output_tokens = expected_output_tokens
+
+    def _cost(self, prompt: str) -> int:
+        return estimate_tokens(prompt) + self._output_tokens
+
+    async def _acquire(self, prompt: str) -> str:
+        # Never queue past the request's deadline
+        deadline = current_deadline()
+        lane = current_lane()
+        timeout = None if deadline is None else deadline.remaining()
+        with start_span("upstream.admission", lane=lane):
+            await self.controller.acquire(self._cost(prompt), timeout, lane)
+        callback = _on_admitted.get()
+        if callback is not None:
+            callback()
+        return lane
+
+    # Explicit try/finally rather than a context manager: contextlib assigns __traceback__
+    # on re-raise, which the frozen LLMProviderError dataclass does not allow.
+
+    async def complete(self, prompt: str) -> str:
+        lane = await self._acquire(prompt)
+        outcome, retry_after = "error", None  # cancelled / client went away unless proven otherwise
+        try:
+            result = await self.inner.complete(prompt)
+            outcome = "success"
+            return result
+        except LLMProviderError as e:
+            outcome, retry_after = _classify(e)
+            raise
+        finally:
+            self.controller.release(outcome, retry_after, lane)
+
+    async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        # The concurrency slot is held until the stream ends
+        lane = await self._acquire(prompt)
+        outcome, retry_after = "error", None
+        try:
+            async for delta in self.inner.complete_stream(prompt):
+                yield delta
+            outcome = "success"
+        except LLMProviderError as e:
+            outcome, retry_after = _classify(e)
+            raise
+        finally:
+            self.controller.release(outcome, retry_after, lane)
+
+
+def _classify(e: LLMProviderError) -> Tuple[str, Optional[float]]:
+    if e.code == "RATE_LIMIT_EXCEEDED":
+        return "throttled", e.retry_after_seconds
+    return "error", None
@@ -0,0 +1,95 @@
+# backend/app/llm/chunking.py
+"""
+Splitting long inputs into token-budgeted chunks on paragraph and sentence boundaries, so each
+chunk can be rephrased on its own (in parallel) and the outputs stitched back in order.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Tuple
+
+from app.llm.tokens import estimate_tokens
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+# Whitespace after sentence-ending punctuation, optionally followed by closing quotes/brackets
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+")
+_WORD_BREAK = re.compile(r"\s+")
+
+PARAGRAPH_SEP = "\n\n"
+
+
+@dataclass(frozen=True)
+class Chunk:
+    text: str
+    # What goes between this chunk's output and the next one's ("" after the last chunk)
+    sep: str
+
+
+def _split(pattern: "re.Pattern[str]", text: str) -> Iterator[Tuple[str, str]]:
+    """(piece, whitespace kind that followed it) for the pieces of `text` between matches."""
+    start = 0
+    for m in pattern.finditer(text):
+        end = m.start() + len(m.group(0)) - len(m.group(0).lstrip("\"'”’)]"))
+        piece = text[start:end]
+        if piece.strip():
+            yield piece.strip(), "\n" if "\n" in m.group(0) else " "
+        start = m.end()
+    tail = text[start:].strip()
+    if tail:
+        yield tail, " "
+
+
+def split_text(text: str, max_tokens: int, count_tokens: Callable[[str], int] = estimate_tokens) -> List[Chunk]:
+    """
+    Pack `text` into chunks of at most ~`max_tokens` tokens. Chunks end at paragraph breaks
+    where possible, else at sentence ends; a single sentence longer than the budget is split
+    between words. Text that fits in one chunk comes back as one chunk.
+    """
+    units: List[Tuple[str, str]] = []  # (text, separator after it), each within budget
+    paragraphs = list(_split(_PARAGRAPH_BREAK, text))
+    for i, (paragraph, _) in enumerate(paragraphs):
+        sep = PARAGRAPH_SEP if i < len(paragraphs) - 1 else ""
+        if count_tokens(paragraph) <= max_tokens:
+            units.append((paragraph, sep))
+            continue
+        pieces: List[Tuple[str, str]] = []
+        for sentence, ws in _split(_SENTENCE_BREAK, paragraph):
+            if count_tokens(sentence) <= max_tokens:
+                pieces.append((sentence, ws))
+            else:
+                pieces.extend(_split_words(sentence, max_tokens, count_tokens))
+                pieces[-1] = (pieces[-1][0], ws)
+        pieces[-1] = (pieces[-1][0], sep)
+        units.extend(pieces)
+
+    chunks: List[Chunk] = []
+    parts: List[str] = []
+    used = 0
+    previous_sep = ""
+    for unit, sep in units:
+        cost = count_tokens(unit)
+        if parts and used + cost > max_tokens:
+            chunks.append(Chunk("".join(parts).rstrip(), previous_sep))
+            parts, used = [], 0
+        parts.append(unit + sep)
+        used += cost
+        previous_sep = sep
+    if parts:
+        chunks.append(Chunk("".join(parts).rstrip(), ""))
+    return chunks
+
+
+def _split_words(sentence: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[Tuple[str, str]]:
+    pieces: List[Tuple[str, str]] = []
+    words: List[str] = []
+    used = 0
+    for word in _WORD_BREAK.split(sentence):
+        cost = count_tokens(" " + word)
+        if words and used + cost > max_tokens:
+            pieces.append((" ".join(words), " "))
+            words, used = [], 0
+        words.append(word)
+        used += cost
+    pieces.append((" ".join(words), " "))
+    return pieces
@@ -0,0 +1,308 @@
+# backend/app/llm/circuit.py
+"""
+Circuit breakers. When an upstream keeps failing, calls to it are rejected at once instead of
+each waiting out its own timeout, and after a cooldown a few probe calls decide whether it is
+back. Used per deployment by the router and, through CircuitBreakerProvider, around the whole
+upstream so that an outage fails requests fast rather than piling them up.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, FrozenSet, Iterable, List, Optional
+
+from app.config import Settings
+from app.llm.provider import LLMProvider
+from app.llm.provider_errors import LLMProviderError
+from app.observability.metrics import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values for the states
+STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = REGISTRY.register(
+    Gauge("llm_circuit_state", "Upstream circuit breaker: 0 closed, 1 half-open, 2 open.")
+)
+CIRCUIT_TRANSITIONS = REGISTRY.register(
+    Counter("llm_circuit_transitions_total", "Upstream circuit breaker state changes.", ("to",))
+)
+CIRCUIT_REJECTED = REGISTRY.register(
+    Counter("llm_circuit_rejected_total", "Upstream calls failed fast by an open circuit breaker.")
+)
+
+SUCCESS = "success"
+
+
+class FailureWindow:
+    """Call outcomes of the last `window_seconds`, per error class ("success" for calls that worked)."""
+
+    def __init__(self, window_seconds: float, clock: Callable[[], float] = time.monotonic, buckets: int = 10):
+        self._width = window_seconds / buckets
+        self._buckets = buckets
+        self._clock = clock
+        self._slots: Deque[List[Any]] = deque()  # [bucket index, {class: count}], oldest first
+
+    def _prune(self, now_index: int) -> None:
+        while self._slots and self._slots[0][0] <= now_index - self._buckets:
+            self._slots.popleft()
+
+    def add(self, outcome: str) -> None:
+        index = math.floor(self._clock() / self._width)
+        self._prune(index)
+        if not self._slots or self._slots[-1][0] != index:
+            self._slots.append([index, {}])
+        counts = self._slots[-1][1]
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+    def counts(self) -> Dict[str, int]:
+        self._prune(math.floor(self._clock() / self._width))
+        total: Dict[str, int] = {}
+        for _, counts in self._slots:
+            for outcome, n in counts.items():
+                total[outcome] = total.get(outcome, 0) + n
+        return total
+
+    def clear(self) -> None:
+        self._slots.clear()
+
+
+class CircuitBreaker:
+    """
+    Closed: calls flow. The breaker opens after `failure_threshold` consecutive failures (0 = no
+    such limit) or, with `failure_rate` set, once at least `min_calls` calls in the last
+    `window_seconds` failed at that rate. Open: calls are rejected for `cooldown_seconds`, then it
+    turns half-open and lets `probes` calls through; as many successes close it, any failure
+    re-opens it with the cooldown doubled (up to `max_cooldown_seconds`).
+
+    Callers check available() while choosing, then acquire() before the call and report the
+    outcome with record(True/False), or record(None) for one that says nothing about the
+    upstream's health (cancelled, rejected as a bad request). Failures may name an error class;
+    with `trip_on` set, only those classes count against the upstream.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        failure_rate: Optional[float] = None,
+        min_calls: int = 20,
+        window_seconds: float = 30.0,
+        trip_on: Optional[Iterable[str]] = None,
+        probes: int = 1,
+        cooldown_seconds: float = 10.0,
+        max_cooldown_seconds: float = 120.0,
+        clock: Callable[[], float] = time.monotonic,
+        on_change: Optional[Callable[[str, str, str], None]] = None,
+    ):
+        self.name = name
+        self._threshold = failure_threshold
+        self._rate = failure_rate
+        self._min_calls = min_calls
+        self._trip_on: Optional[FrozenSet[str]] = frozenset(trip_on) if trip_on is not None else None
+        self._probes = probes
+        self._base_cooldown = cooldown_seconds
+        self._max_cooldown = max_cooldown_seconds
+        self._cooldown = cooldown_seconds
+        self._clock = clock
+        self._on_change = on_change
+        self.window = FailureWindow(window_seconds, clock)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.opened = 0
+
+    def _set(self, state: str, reason: str = "") -> None:
+        if state == self._state:
+            return
+        old, self._state = self._state, state
+        self._probes_in_flight = self._probe_successes = 0
+        if state == OPEN:
+            self.opened += 1
+            logger.warning("Circuit %s opened for %.1fs (%s).", self.name, self._cooldown, reason)
+        else:
+            logger.info("Circuit %s is %s (was %s).", self.name, state, old)
+        if self._on_change is not None:
+            self._on_change(self.name, old, state)
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self._cooldown:
+            self._set(HALF_OPEN)
+        return self._state
+
+    def available(self) -> bool:
+        state = self.state
+        if state == HALF_OPEN:
+            return self._probes_in_flight + self._probe_successes < self._probes
+        return state == CLOSED
+
+    def acquire(self) -> None:
+        if self.state == HALF_OPEN:
+            self._probes_in_flight += 1
+
+    def _counts_against(self, error_class: Optional[str]) -> bool:
+        return self._trip_on is None or error_class in self._trip_on
+
+    def record(self, ok: Optional[bool], error_class: Optional[str] = None) -> None:
+        # Only probes are let through while half-open; calls that started before the breaker
+        # opened and end now are taken as probes too, which errs on the cautious side
+        probe = self._state == HALF_OPEN and self._probes_in_flight > 0
+        if probe:
+            self._probes_in_flight -= 1
+        if ok is None:
+            return
+        if not ok and not self._counts_against(error_class):
+            # Failed, but not the upstream's fault; visible in the window, neutral for the breaker
+            self.window.add(error_class or "other")
+            return
+        self.window.add(SUCCESS if ok else (error_class or "error"))
+
+        if ok:
+            self._consecutive_failures = 0
+            if probe:
+                self._probe_successes += 1
+                if self._probe_successes >= self._probes:
+                    self._cooldown = self._base_cooldown
+                    self.window.clear()
+                    self._set(CLOSED)
+            return
+
+        self._consecutive_failures += 1
+        if probe:
+            self._cooldown = min(self._cooldown * 2, self._max_cooldown)
+            self._open(f"probe failed: {error_class or 'error'}")
+        elif self._state == CLOSED:
+            reason = self._trip_reason()
+            if reason:
+                self._open(reason)
+
+    def _trip_reason(self) -> str:
+        if self._threshold and self._consecutive_failures >= self._threshold:
+            return f"{self._consecutive_failures} consecutive failures"
+        if self._rate is not None:
+            counts = self.window.counts()
+            calls = sum(n for outcome, n in counts.items() if outcome == SUCCESS or self._counts_against(outcome))
+            failures = calls - counts.get(SUCCESS, 0)
+            if calls >= self._min_calls and failures >= self._rate * calls:
+                return f"{failures}/{calls} calls failed"
+        return ""
+
+    def _open(self, reason: str) -> None:
+        self._opened_at = self._clock()
+        self._set(OPEN, reason)
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a probe through (0 if it would now)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(self._cooldown - (self._clock() - self._opened_at), 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        counts = self.window.counts()
+        calls = sum(counts.values())
+        return {
+            "state": self.state,
+            "opened": self.opened,
+            "retry_after_seconds": round(self.retry_after(), 1),
+            "cooldown_seconds": self._cooldown,
+            "consecutive_failures": self._consecutive_failures,
+            "window_calls": calls,
+            "window_failure_rates": {
+                outcome: round(n / calls, 4) for outcome, n in sorted(counts.items()) if outcome != SUCCESS
+            },
+        }
+
+
+def circuit_open_error(retry_after: float) -> LLMProviderError:
+    # The API contract has no 503; callers get the usual provider failure, plus a Retry-After
+    return LLMProviderError(
+        status_code=502,
+        code="LLM_PROVIDER_FAILURE",
+        message="The upstream LLM provider is unavailable. Please retry after the specified time.",
+        retry_after_seconds=max(1, math.ceil(retry_after)),
+    )
+
+
+class CircuitBreakerProvider:
+    """
+    LLMProvider wrapper that fails calls fast while `breaker` is open. Outcomes feed the breaker:
+    a stream counts as a success once it has finished.
+    """
+
+    def __init__(self, inner: LLMProvider, breaker: CircuitBreaker):
+        self.inner = inner
+        self.breaker = breaker
+        self.rejected = 0
+
+    def _admit(self) -> None:
+        if not self.breaker.available():
+            self.rejected += 1
+            CIRCUIT_REJECTED.inc()
+            # Half-open with every probe slot taken: the answer is only a moment away
+            raise circuit_open_error(self.breaker.retry_after())
+        self.breaker.acquire()
+
+    # Explicit try/finally rather than a context manager: contextlib assigns __traceback__
+    # on re-raise, which the frozen LLMProviderError dataclass does not allow.
+
+    async def complete(self, prompt: str) -> str:
+        self._admit()
+        ok: Optional[bool] = None
+        error_class: Optional[str] = None
+        try:
+            result = await self.inner.complete(prompt)
+            ok = True
+            return result
+        except LLMProviderError as e:
+            ok, error_class = False, e.error_class
+            raise
+        finally:
+            self.breaker.record(ok, error_class)
+
+    async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        self._admit()
+        ok: Optional[bool] = None
+        error_class: Optional[str] = None
+        try:
+            async for delta in self.inner.complete_stream(prompt):
+                yield delta
+            ok = True
+        except LLMProviderError as e:
+            ok, error_class = False, e.error_class
+            raise
+        finally:
+            self.breaker.record(ok, error_class)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.breaker.stats(), "rejected": self.rejected}
+
+
+def _on_upstream_change(name: str, old: str, new: str) -> None:
+    CIRCUIT_STATE.set(STATE_VALUE[new])
+    CIRCUIT_TRANSITIONS.labels(new).inc()
+
+
+def build_circuit_breaker(settings: Settings) -> CircuitBreaker:
+    CIRCUIT_STATE.set(STATE_VALUE[CLOSED])
+    return CircuitBreaker(
+        "upstream",
+        failure_threshold=settings.circuit_consecutive_failures,
+        failure_rate=settings.circuit_failure_rate,
+        min_calls=settings.circuit_min_calls,
+        window_seconds=settings.circuit_window_seconds,
+        trip_on=settings.circuit_trip_on,
+        probes=settings.circuit_half_open_probes,
+        cooldown_seconds=settings.circuit_cooldown_seconds,
+        max_cooldown_seconds=settings.circuit_max_cooldown_seconds,
+        on_change=_on_upstream_change,
+    )
@@ -0,0 +1,139 @@
+# backend/app/llm/deadline.py
+"""
+End-to-end request deadlines. The route turns the request header (or the configured default)
+into a Deadline and passes it explicitly to the service and generator layer, which bound their
+upstream calls with within() / bounded_stream(). Those also make the deadline current for the
+duration of each call, so provider wrappers further down read current_deadline() to clamp
+per-call timeouts, queue waits and retry backoff to what is left.
+
+The context variable is only ever set around a single await, never across a yield: stream
+consumers may advance a generator from different tasks (and so different contexts).
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from contextvars import ContextVar
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Optional, TypeVar
+
+from app.llm.provider_errors import LLMProviderError
+
+T = TypeVar("T")
+
+_current: ContextVar[Optional["Deadline"]] = ContextVar("rephrase_deadline", default=None)
+
+
+class Deadline:
+    """A point on the monotonic clock by which a request must be answered."""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def clamp(self, timeout: Optional[float]) -> float:
+        """`timeout` shrunk to the time left (a None timeout becomes the time left)."""
+        left = self.remaining()
+        return left if timeout is None else min(timeout, left)
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+
+def deadline_exceeded() -> LLMProviderError:
+    return LLMProviderError(status_code=504, code="LLM_TIMEOUT", message="The request deadline was exceeded.")
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def earliest(a: Optional[Deadline], b: Optional[Deadline]) -> Optional[Deadline]:
+    if a is None or b is None:
+        return a or b
+    return a if a.expires_at <= b.expires_at else b
+
+
+def parse_timeout_header(raw: Optional[str], *, default: float, maximum: float) -> Optional[Deadline]:
+    """
+    Deadline for a request from its X-Request-Timeout header (seconds), else `default`.
+    Header values are capped at `maximum` (0 = uncapped); a `default` of 0 means no deadline.
+    Raises ValueError on a malformed header.
+    """
+    seconds = default
+    if raw is not None and raw.strip():
+        seconds = float(raw)
+        if not math.isfinite(seconds) or seconds <= 0:
+            raise ValueError("X-Request-Timeout must be a positive number of seconds.")
+        if maximum > 0:
+            seconds = min(seconds, maximum)
+    return Deadline.after(seconds) if seconds > 0 else None
+
+
+async def within(awaitable: Awaitable[T], deadline: Optional[Deadline]) -> T:
+    """Await `awaitable`, cancelling it and raising LLM_TIMEOUT if the deadline passes first."""
+    if deadline is None:
+        return await awaitable
+    deadline = earliest(_current.get(), deadline)
+    timeout = asyncio.timeout_at(_loop_time(deadline))
+    token = _current.set(deadline)
+    try:
+        async with timeout:
+            return await awaitable
+    except TimeoutError:
+        if timeout.expired():
+            raise deadline_exceeded() from None
+        raise
+    finally:
+        _current.reset(token)
+
+
+async def bounded_stream(stream: AsyncIterator[T], deadline: Optional[Deadline]) -> AsyncGenerator[T, None]:
+    """
+    Re-yield `stream`, raising LLM_TIMEOUT if it has not finished by the deadline.
+    Each wait for the next item is bounded separately, so nothing times out across a yield.
+    """
+    it = stream.__aiter__()
+    try:
+        if deadline is None:
+            async for item in it:
+                yield item
+            return
+        while True:
+            effective = earliest(_current.get(), deadline)
+            assert effective is not None
+            timeout = asyncio.timeout_at(_loop_time(effective))
+            token = _current.set(effective)
+            try:
+                async with timeout:
+                    item = await it.__anext__()
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                if timeout.expired():
+                    raise deadline_exceeded() from None
+                raise
+            finally:
+                _current.reset(token)
+            yield item
+    finally:
+        aclose = getattr(it, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def _loop_time(deadline: Deadline) -> float:
+    # The event loop clock is time.monotonic() by default, but convert rather than assume
+    return asyncio.get_running_loop().time() + (deadline.expires_at - time.monotonic())
@@ -1,25 +1,29 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from app.config import get_settings
 from app.llm.provider import LLMProvider
-from app.llm.fake_provider import FakeLLMProvider
-from app.llm.openai_provider import AzureOpenAIProvider
-from app.llm.provider_errors import LLMProviderError 
+from app.llm.registry import ProviderRegistry
 
+# Process-wide registry. Installed by the app lifespan; created lazily otherwise
+# (e.g. TestClient used without a `with` block, scripts importing the service directly).
+_registry: Optional[ProviderRegistry] = None
 
-def get_llm_provider() -> LLMProvider:
-    settings = get_settings()
 
-    if settings.llm_mode == "fake":
-        return FakeLLMProvider()
+def get_provider_registry() -> ProviderRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ProviderRegistry(get_settings())
+    return _registry
+
 
-    if settings.llm_mode == "real":
-        if not settings.allow_real_llm:
-            raise LLMProviderError(
-                status_code=403,
-                code="REAL_LLM_DISABLED",
-                message="Real LLM calls are disabled. Set ALLOW_REAL_LLM=1 to enable.",
-            )
-        return AzureOpenAIProvider(settings)
+def set_provider_registry(registry: Optional[ProviderRegistry]) -> Optional[ProviderRegistry]:
+    """Install `registry` as the process-wide registry and return the previous one."""
+    global _registry
+    previous, _registry = _registry, registry
+    return previous
 
-    raise RuntimeError(f"Unsupported LLM_MODE: {settings.llm_mode!r}")
\ No newline at end of file
+
+def get_llm_provider() -> LLMProvider:
+    return get_provider_registry().get_provider()
@@ -4,8 +4,38 @@ from __future__ import annotations
 import asyncio
 import json
 import os
+import re
+import time
 from typing import AsyncIterator
 
+from app.llm.usage import estimated_usage, report_usage
+
+# Set by build_batch_rephrase_prompt
+_BATCH_ITEMS = re.compile(r"^Number of items: (\d+)$", re.MULTILINE)
+
+
+def wants_json(prompt: str) -> bool:
+    """True for the single JSON prompt (build_rephrase_prompt) rather than a per-style one."""
+    return "Return ONLY valid JSON" in prompt
+
+
+def wants_batch(prompt: str) -> bool:
+    """True for a packed prompt (build_batch_rephrase_prompt)."""
+    return _BATCH_ITEMS.search(prompt) is not None
+
+
+def detect_style(prompt: str) -> str:
+    """Pick the intended style of a per-style stream prompt from its wording."""
+    style = "professional"
+    p = prompt.lower()
+    if " casual " in f" {p} ":
+        style = "casual"
+    elif " polite " in f" {p} ":
+        style = "polite"
+    elif " social " in f" {p} " or "social media" in p:
+        style = "social"
+    return style
+
 
 class FakeLLMProvider:
     async def complete(self, prompt: str) -> str:
@@ -16,23 +46,22 @@ class FakeLLMProvider:
             "polite": "Could you please review the attached document?",
             "social": "Hey everyone, check this out!",
         }
-        return "Sure! Here is the JSON:\n" + json.dumps(payload)
+        batch = _BATCH_ITEMS.search(prompt)
+        if batch is not None:
+            items = [{"id": i, **payload} for i in range(int(batch.group(1)))]
+            result = "Sure! Here is the JSON:\n" + json.dumps({"items": items})
+        else:
+            result = "Sure! Here is the JSON:\n" + json.dumps(payload)
+        # Usage is reported like the real upstream's, estimated locally
+        report_usage(prompt, estimated_usage(prompt, result), 0.0)
+        return result
 
     async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
         """
         Streaming path (per-style) expects PLAIN TEXT for ONE style.
         We detect the requested style from the prompt and stream only that text.
+        The single-call path (JSON prompt) gets the whole JSON object streamed instead.
         """
-        # Pick the intended style based on the prompt content
-        style = "professional"
-        p = prompt.lower()
-        if " casual " in f" {p} ":
-            style = "casual"
-        elif " polite " in f" {p} ":
-            style = "polite"
-        elif " social " in f" {p} " or "social media" in p:
-            style = "social"
-
         outputs = {
             "professional": "Please review the attached document.",
             "casual": "Hey, can you take a look at this?",
@@ -40,13 +69,19 @@ class FakeLLMProvider:
             "social": "Hey everyone, check this out!",
         }
 
-        text = outputs[style]
+        if wants_json(prompt):
+            text = json.dumps(outputs)
+        else:
+            # Pick the intended style based on the prompt content
+            text = outputs[detect_style(prompt)]
 
         chunk_size = int(os.getenv("FAKE_STREAM_CHUNK_SIZE", "8"))
         delay_ms = int(os.getenv("FAKE_STREAM_DELAY_MS", "120"))
         delay_s = max(delay_ms, 0) / 1000.0
 
+        start = time.perf_counter()
         for i in range(0, len(text), chunk_size):
             yield text[i : i + chunk_size]
             if delay_s:
                 await asyncio.sleep(delay_s)
+        report_usage(prompt, estimated_usage(prompt, text), time.perf_counter() - start)
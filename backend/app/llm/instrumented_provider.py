@@ -0,0 +1,57 @@
+# backend/app/llm/instrumented_provider.py
+from __future__ import annotations
+
+import time
+from typing import AsyncIterator
+
+from app.llm.provider import LLMProvider
+from app.llm.usage import style_label
+from app.observability.metrics import UPSTREAM_LATENCY, UPSTREAM_TTFT
+from app.observability.tracing import KIND_CLIENT, NOOP_SPAN, current_trace, start_span
+
+
+def _span(name: str, prompt: str):
+    if current_trace() is None:
+        return NOOP_SPAN
+    attributes = {"llm.style": style_label(prompt), "llm.prompt_template": getattr(prompt, "template", "")}
+    return start_span(name, kind=KIND_CLIENT, **attributes)
+
+
+class InstrumentedProvider:
+    """
+    LLMProvider wrapper timing real upstream calls: time to first token (streams) and
+    total duration, also as trace spans. Sits directly around the base provider so coalesced
+    calls count once.
+    """
+
+    def __init__(self, inner: LLMProvider):
+        self.inner = inner
+
+    async def complete(self, prompt: str) -> str:
+        start = time.perf_counter()
+        try:
+            with _span("llm.complete", prompt):
+                return await self.inner.complete(prompt)
+        finally:
+            UPSTREAM_LATENCY.labels("complete").observe(time.perf_counter() - start)
+
+    async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        first = True
+        span = _span("llm.stream", prompt)  # ended by hand: it spans yields
+        deltas = 0
+        try:
+            async for delta in self.inner.complete_stream(prompt):
+                if first:
+                    UPSTREAM_TTFT.labels("stream").observe(time.perf_counter() - start)
+                    span.event("first_token")
+                    first = False
+                deltas += 1
+                yield delta
+        except Exception as e:
+            span.fail(e)
+            raise
+        finally:
+            UPSTREAM_LATENCY.labels("stream").observe(time.perf_counter() - start)
+            span.set("llm.deltas", deltas)
+            span.end()
@@ -1,10 +1,15 @@
 # backend/app/llm/openai_provider.py
 from __future__ import annotations
 
-from typing import AsyncIterator, Optional
+import importlib.util
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
 
+import httpx
 from openai import (
     AsyncAzureOpenAI,
+    DefaultAsyncHttpxClient,
     APIConnectionError,
     APITimeoutError,
     AuthenticationError,
@@ -15,8 +20,12 @@ from openai import (
     InternalServerError,
 )
 
-from app.config import Settings
+from app.config import AzureBackend, Settings
+from app.llm.deadline import current_deadline, deadline_exceeded
 from app.llm.provider_errors import LLMProviderError
+from app.llm.usage import TokenUsage, estimated_usage, report_usage
+
+logger = logging.getLogger(__name__)
 
 
 def _try_retry_after_seconds(exc: Exception) -> Optional[int]:
@@ -35,161 +44,200 @@ def _try_retry_after_seconds(exc: Exception) -> Optional[int]:
         return None
 
 
+def _normalize_error(e: Exception) -> LLMProviderError:
+    """Map an OpenAI SDK exception onto the API's normalized error. `retryable` marks transient failures."""
+    if isinstance(e, RateLimitError):
+        return LLMProviderError(
+            status_code=429,
+            code="RATE_LIMIT_EXCEEDED",
+            message="Too many requests. Please retry after the specified time.",
+            retry_after_seconds=_try_retry_after_seconds(e),
+            retryable=True,
+            error_class="rate_limit",
+        )
+    # APITimeoutError subclasses APIConnectionError, so it must be checked first
+    if isinstance(e, APITimeoutError):
+        return LLMProviderError(
+            status_code=504,
+            code="LLM_TIMEOUT",
+            message="The LLM request timed out.",
+            retryable=True,
+            error_class="timeout",
+        )
+    if isinstance(e, APIConnectionError):
+        return LLMProviderError(
+            status_code=502,
+            code="LLM_PROVIDER_FAILURE",
+            message="Failed to connect to the upstream LLM provider.",
+            retryable=True,
+            error_class="connection",
+        )
+    if isinstance(e, (AuthenticationError, PermissionDeniedError)):
+        return LLMProviderError(
+            status_code=502,
+            code="LLM_PROVIDER_FAILURE",
+            message="Upstream authentication/authorization failed.",
+            error_class="auth",
+        )
+    if isinstance(e, NotFoundError):
+        return LLMProviderError(
+            status_code=502,
+            code="LLM_PROVIDER_FAILURE",
+            message="Upstream model/deployment was not found.",
+            error_class="not_found",
+        )
+    if isinstance(e, BadRequestError):
+        return LLMProviderError(
+            status_code=502,
+            code="LLM_PROVIDER_FAILURE",
+            message="Upstream rejected the request.",
+            error_class="rejected",
+        )
+    if isinstance(e, InternalServerError):
+        return LLMProviderError(
+            status_code=502,
+            code="LLM_PROVIDER_FAILURE",
+            message="Upstream provider encountered an internal error.",
+            retryable=True,
+            error_class="server",
+        )
+    return LLMProviderError(
+        status_code=502,
+        code="LLM_PROVIDER_FAILURE",
+        message="Upstream provider request failed.",
+        error_class="server",
+    )
+
+
+def _messages(prompt: str) -> List[Dict[str, str]]:
+    # Templated prompts (app.llm.prompt.Prompt) carry system + user messages; plain text is one user turn
+    messages = getattr(prompt, "messages", None)
+    return list(messages) if messages else [{"role": "user", "content": prompt}]
+
+
+def _usage(raw: Any) -> Optional[TokenUsage]:
+    """TokenUsage from the `usage` object of a completion (or the last stream event), if any."""
+    if raw is None or getattr(raw, "prompt_tokens", None) is None:
+        return None
+    details = getattr(raw, "prompt_tokens_details", None)
+    return TokenUsage(
+        prompt_tokens=raw.prompt_tokens,
+        completion_tokens=getattr(raw, "completion_tokens", None) or 0,
+        cached_tokens=getattr(details, "cached_tokens", None) or 0,
+    )
+
+
+def build_http_client(settings: Settings) -> httpx.AsyncClient:
+    """
+    Build the process-wide HTTP client (and connection pool) used for upstream calls.
+    Owned by the ProviderRegistry, which closes it on shutdown.
+    """
+    http2 = settings.azure_http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("AZURE_OPENAI_HTTP2=1 but the 'h2' package is not installed; falling back to HTTP/1.1.")
+        http2 = False
+
+    return DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=settings.azure_max_connections,
+            max_keepalive_connections=settings.azure_max_keepalive_connections,
+            keepalive_expiry=settings.azure_keepalive_expiry_seconds,
+        ),
+        timeout=settings.azure_timeout_seconds,
+        http2=http2,
+    )
+
+
 class AzureOpenAIProvider:
-    def __init__(self, settings: Settings):
-        if not settings.azure_endpoint:
+    def __init__(
+        self,
+        settings: Settings,
+        http_client: Optional[httpx.AsyncClient] = None,
+        backend: Optional[AzureBackend] = None,
+    ):
+        # `backend` (one of settings.azure_backends) replaces the single-deployment AZURE_OPENAI_* values
+        endpoint = backend.endpoint if backend else settings.azure_endpoint
+        api_key = backend.api_key if backend else settings.azure_api_key
+        api_version = backend.api_version if backend else settings.azure_api_version
+        deployment = backend.deployment if backend else settings.azure_deployment
+        if not endpoint:
             raise RuntimeError("AZURE_OPENAI_ENDPOINT is not set.")
-        if not settings.azure_api_key:
+        if not api_key:
             raise RuntimeError("AZURE_OPENAI_API_KEY is not set.")
-        if not settings.azure_api_version:
+        if not api_version:
             raise RuntimeError("AZURE_OPENAI_API_VERSION is not set.")
-        if not settings.azure_deployment:
+        if not deployment:
             raise RuntimeError("AZURE_OPENAI_DEPLOYMENT is not set.")
 
-        self._deployment = settings.azure_deployment
+        self._deployment = deployment
         self._client = AsyncAzureOpenAI(
-            azure_endpoint=settings.azure_endpoint,
-            api_key=settings.azure_api_key,
-            api_version=settings.azure_api_version,
+            azure_endpoint=endpoint,
+            api_key=api_key,
+            api_version=api_version,
+            http_client=http_client,
+            # Retries are owned by app.llm.retry (budgeted, deadline-aware), not the SDK
+            max_retries=0,
         )
         self._timeout = settings.azure_timeout_seconds
-    
+        self._stream_options = {"include_usage": True} if settings.azure_stream_usage else None
+
+    def _call_timeout(self) -> float:
+        """The configured per-call timeout, shrunk to what is left of the request deadline."""
+        deadline = current_deadline()
+        if deadline is None:
+            return self._timeout
+        if deadline.expired:
+            raise deadline_exceeded()
+        return deadline.clamp(self._timeout)
+
     async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        timeout = self._call_timeout()
+        start = time.perf_counter()
+        usage: Optional[TokenUsage] = None
+        parts: List[str] = []
+        extra: Dict[str, Any] = {}
+        if self._stream_options is not None:
+            extra["stream_options"] = self._stream_options
         try:
             stream = await self._client.chat.completions.create(
                 model=self._deployment,
-                messages=[{"role": "user", "content": prompt}],
-                timeout=self._timeout,
+                messages=_messages(prompt),
+                timeout=timeout,
                 stream=True,
                 temperature=0,
+                **extra,
             )
 
             async for event in stream:
-                # Each event has choices; each choice has a delta with optional content
+                # Each event has choices; each choice has a delta with optional content.
+                # With include_usage, a last event with no choices carries the usage.
+                usage = _usage(getattr(event, "usage", None)) or usage
                 for choice in getattr(event, "choices", []) or []:
                     delta = getattr(choice, "delta", None)
                     content = getattr(delta, "content", None) if delta is not None else None
                     if content:
+                        parts.append(content)
                         yield content
 
-        except RateLimitError as e:
-            raise LLMProviderError(
-                status_code=429,
-                code="RATE_LIMIT_EXCEEDED",
-                message="Too many requests. Please retry after the specified time.",
-                retry_after_seconds=_try_retry_after_seconds(e),
-            ) from e
-
-        except APITimeoutError as e:
-            raise LLMProviderError(
-                status_code=504,
-                code="LLM_TIMEOUT",
-                message="The LLM request timed out.",
-            ) from e
-
-        except APIConnectionError as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Failed to connect to the upstream LLM provider.",
-            ) from e
-
-        except (AuthenticationError, PermissionDeniedError) as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Upstream authentication/authorization failed.",
-            ) from e
-
-        except NotFoundError as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Upstream model/deployment was not found.",
-            ) from e
-
-        except BadRequestError as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Upstream rejected the request.",
-            ) from e
-
-        except InternalServerError as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Upstream provider encountered an internal error.",
-            ) from e
-
         except Exception as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Upstream provider request failed.",
-            ) from e
-    
+            raise _normalize_error(e) from e
+        # Only streams that ran to the end are reported; the upstream bills abandoned ones too,
+        # but without usage to go by
+        report_usage(prompt, usage or estimated_usage(prompt, "".join(parts)), time.perf_counter() - start)
+
     async def complete(self, prompt: str) -> str:
+        timeout = self._call_timeout()
+        start = time.perf_counter()
         try:
             resp = await self._client.chat.completions.create(
                 model=self._deployment,
-                messages=[{"role": "user", "content": prompt}],
-                timeout=self._timeout,
+                messages=_messages(prompt),
+                timeout=timeout,
             )
-            return resp.choices[0].message.content or ""
-
-        except RateLimitError as e:
-            raise LLMProviderError(
-                status_code=429,
-                code="RATE_LIMIT_EXCEEDED",
-                message="Too many requests. Please retry after the specified time.",
-                retry_after_seconds=_try_retry_after_seconds(e),
-            ) from e
-
-        except APITimeoutError as e:
-            raise LLMProviderError(
-                status_code=504,
-                code="LLM_TIMEOUT",
-                message="The LLM request timed out.",
-            ) from e
-
-        except APIConnectionError as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Failed to connect to the upstream LLM provider.",
-            ) from e
-
-        except (AuthenticationError, PermissionDeniedError) as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Upstream authentication/authorization failed.",
-            ) from e
-
-        except NotFoundError as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Upstream model/deployment was not found.",
-            ) from e
-
-        except BadRequestError as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Upstream rejected the request.",
-            ) from e
-
-        except InternalServerError as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Upstream provider encountered an internal error.",
-            ) from e
+            content = resp.choices[0].message.content or ""
+
         except Exception as e:
-            raise LLMProviderError(
-                status_code=502,
-                code="LLM_PROVIDER_FAILURE",
-                message="Upstream provider request failed.",
-            ) from e
\ No newline at end of file
+            raise _normalize_error(e) from e
+        usage = _usage(getattr(resp, "usage", None)) or estimated_usage(prompt, content)
+        report_usage(prompt, usage, time.perf_counter() - start)
+        return content
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 import json
-from typing import Any
+from typing import Any, List, Optional
 
 from app.schemas.rephrase import RephraseResponse
 
@@ -40,11 +40,7 @@ def _extract_json_object(s: str) -> str:
     return s[start : end + 1]
 
 
-def parse_rephrase_response(model_text: str) -> RephraseResponse:
-    """
-    Convert raw model output -> validated RephraseResponse.
-    Raises ModelOutputError on parse/validation problems.
-    """
+def _load_json_object(model_text: str) -> Any:
     if not isinstance(model_text, str) or not model_text.strip():
         raise ModelOutputError("Empty model output.")
 
@@ -52,12 +48,46 @@ def parse_rephrase_response(model_text: str) -> RephraseResponse:
     json_str = _extract_json_object(cleaned)
 
     try:
-        data: Any = json.loads(json_str)
+        return json.loads(json_str)
     except json.JSONDecodeError as e:
         raise ModelOutputError(f"Invalid JSON: {e.msg}") from e
 
+
+def parse_rephrase_response(model_text: str) -> RephraseResponse:
+    """
+    Convert raw model output -> validated RephraseResponse.
+    Raises ModelOutputError on parse/validation problems.
+    """
+    data = _load_json_object(model_text)
+
     # Validate against frozen contract
     try:
         return RephraseResponse.model_validate(data)
     except Exception as e:
         raise ModelOutputError("JSON did not match the frozen response contract.") from e
+
+
+def parse_rephrase_batch_response(model_text: str, count: int) -> List[Optional[RephraseResponse]]:
+    """
+    Convert the output of a packed multi-item prompt ({"items": [{"id": i, <styles>}, ...]})
+    -> one entry per input item, in input order.
+    An item that is missing or does not match the contract comes back as None so the caller
+    can retry it on its own; ModelOutputError is raised only if the output is unusable as a whole.
+    """
+    data = _load_json_object(model_text)
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise ModelOutputError('Batch output has no "items" list.')
+
+    results: List[Optional[RephraseResponse]] = [None] * count
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("id")
+        if not isinstance(index, int) or not 0 <= index < count or results[index] is not None:
+            continue
+        try:
+            results[index] = RephraseResponse.model_validate(item)
+        except Exception:
+            continue
+    return results
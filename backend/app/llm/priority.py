@@ -0,0 +1,83 @@
+# backend/app/llm/priority.py
+"""
+Priority lanes for upstream calls. Every request is assigned one lane:
+
+- interactive: POST /rephrase/stream (the SPA, someone watching the text appear)
+- standard:    POST /rephrase and anything else
+- bulk:        POST /rephrase/batch, and the generations POST /rephrase/prefetch starts
+
+An API key listed in PRIORITY_API_KEYS (sent as X-API-Key) puts its requests in the lane it is
+mapped to, up or down. Any client may move its own request to a lower lane with X-Priority;
+asking for a higher lane is ignored.
+
+The lane is held in a context variable for the whole request, so the admission controller
+(app.llm.admission), which schedules the lanes, reads it from any task the request starts.
+"""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import PRIORITY_LANES, Settings
+
+LANES = PRIORITY_LANES
+DEFAULT_LANE = "standard"
+PRIORITY_HEADER = "X-Priority"
+API_KEY_HEADER = "X-API-Key"
+
+ROUTE_LANES = {
+    "/rephrase/stream": "interactive",
+    "/rephrase": "standard",
+    "/rephrase/batch": "bulk",
+    "/rephrase/prefetch": "bulk",
+}
+
+_lane: ContextVar[str] = ContextVar("rephrase_lane", default=DEFAULT_LANE)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+def rank(lane: str) -> int:
+    """0 for the most urgent lane; higher numbers are shed first."""
+    return LANES.index(lane)
+
+
+def resolve_lane(settings: Settings, path: str, priority: Optional[str], api_key: Optional[str]) -> str:
+    lane = ROUTE_LANES.get(path, DEFAULT_LANE)
+    if api_key:
+        lane = dict(settings.priority_api_keys).get(api_key, lane)
+    requested = (priority or "").strip().lower()
+    if requested in LANES and rank(requested) > rank(lane):
+        lane = requested
+    return lane
+
+
+class PriorityLaneMiddleware:
+    """Pure ASGI middleware that sets the request's lane before routing."""
+
+    def __init__(self, app: ASGIApp, settings: Callable[[], Settings]):
+        self.app = app
+        self._settings = settings
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        settings = self._settings() if scope["type"] == "http" else None
+        if settings is None or not settings.priority_lanes_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        lane = resolve_lane(
+            settings,
+            scope["path"],
+            headers.get(PRIORITY_HEADER.lower().encode(), b"").decode("latin-1"),
+            headers.get(API_KEY_HEADER.lower().encode(), b"").decode("latin-1"),
+        )
+        token = _lane.set(lane)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _lane.reset(token)
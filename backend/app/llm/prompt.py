@@ -1,13 +1,83 @@
 # backend/app/llm/prompt.py
+"""
+Prompt templates. Each prompt is a system message that never varies between calls, followed by
+a user message with the input. Upstream prompt caching matches on the longest shared prefix, so
+everything that is the same across calls comes first: the fixed instructions, then the input
+text, and only then (per-style prompts) the style, so the four calls of one request share all
+but their last line.
+
+Templates are compiled once at import; PROMPT_VERSION is derived from their content and is part
+of every response cache key, so rewording a template stops old results being served.
+"""
 from __future__ import annotations
 
+import hashlib
+import json
+from string import Formatter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Message = Dict[str, str]
+
 
-def build_rephrase_prompt(text: str) -> str:
+class Prompt(str):
     """
-    Build a single prompt that asks for STRICT JSON output with the frozen keys.
-    Keep this as a pure function for easy testing.
+    A rendered prompt. As a str it is the whole prompt text (system, blank line, user), which is
+    what coalescing, token estimates and the fake providers key on; `messages` is the chat form
+    providers send upstream. `template` ("name@version") and `style` label usage statistics.
     """
-    return f"""You are a writing assistant.
+
+    messages: Tuple[Message, ...]
+    template: str
+    style: Optional[str]
+
+    def __new__(
+        cls, text: str, messages: Tuple[Message, ...], template: str = "", style: Optional[str] = None
+    ) -> "Prompt":
+        self = super().__new__(cls, text)
+        self.messages = messages
+        self.template = template
+        self.style = style
+        return self
+
+
+class PromptTemplate:
+    """
+    A fixed system message plus a user message with {named} placeholders. The user template is
+    parsed once here, so render() only joins strings; its result is a Prompt.
+    """
+
+    def __init__(self, name: str, system: str, user: str):
+        self.name = name
+        self.system = system
+        self.user = user
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in Formatter().parse(user):
+            if spec or conversion:
+                raise ValueError(f"Prompt template {name!r}: format specs/conversions are not supported.")
+            if field is not None and not field.isidentifier():
+                raise ValueError(f"Prompt template {name!r}: invalid placeholder {{{field}}}.")
+            self._parts.append((literal, field))
+        self.fields = frozenset(f for _, f in self._parts if f is not None)
+        self._prefix = system + "\n\n"
+        # Shared by every rendered prompt; providers must not mutate messages
+        self._system_message: Message = {"role": "system", "content": system}
+        self.version = hashlib.sha256(f"{name}\0{system}\0{user}".encode("utf-8")).hexdigest()[:8]
+        self._label = f"{name}@{self.version}"
+
+    def render(self, **values: str) -> Prompt:
+        pieces: List[str] = []
+        for literal, field in self._parts:
+            pieces.append(literal)
+            if field is not None:
+                pieces.append(values[field])
+        user = "".join(pieces)
+        messages = (self._system_message, {"role": "user", "content": user})
+        return Prompt(self._prefix + user, messages, self._label, values.get("style"))
+
+
+REPHRASE_TEMPLATE = PromptTemplate(
+    "rephrase",
+    system="""You are a writing assistant.
 
 Rephrase the input text into exactly four styles:
 - professional
@@ -18,8 +88,58 @@ Rephrase the input text into exactly four styles:
 Return ONLY valid JSON with exactly these keys:
 professional, casual, polite, social
 
-No markdown. No code fences. No extra keys. No explanations.
+No markdown. No code fences. No extra keys. No explanations.""",
+    user="Input text:\n{text}\n",
+)
 
-Input text:
-{text}
-"""
+# The system message names no style, so it is identical for all four calls
+STYLE_TEMPLATE = PromptTemplate(
+    "style",
+    system="""You are a writing assistant.
+Rules:
+- Return ONLY the rewritten text.
+- Do NOT include quotes, code fences, JSON, or extra commentary.
+- Preserve meaning.""",
+    user="INPUT:\n{text}\n\nRewrite the INPUT in a {style} style.\n",
+)
+
+BATCH_TEMPLATE = PromptTemplate(
+    "batch",
+    system="""You are a writing assistant.
+
+Rephrase EACH input item into exactly four styles:
+- professional
+- casual
+- polite
+- social
+
+Return ONLY valid JSON of this form, with one entry per input item:
+{"items": [{"id": <item id>, "professional": "...", "casual": "...", "polite": "...", "social": "..."}]}
+
+No markdown. No code fences. No extra keys. No explanations.""",
+    # The fake providers read the item count from this line
+    user="Number of items: {count}\n\nInput items:\n{items}\n",
+)
+
+TEMPLATES: Tuple[PromptTemplate, ...] = (REPHRASE_TEMPLATE, STYLE_TEMPLATE, BATCH_TEMPLATE)
+
+PROMPT_VERSION = hashlib.sha256("\0".join(t.version for t in TEMPLATES).encode("ascii")).hexdigest()[:12]
+
+
+def build_rephrase_prompt(text: str) -> Prompt:
+    """Single prompt asking for STRICT JSON output with the frozen keys."""
+    return REPHRASE_TEMPLATE.render(text=text)
+
+
+def build_style_prompt(text: str, style: str) -> Prompt:
+    """Per-style stream prompt: plain text for ONE style, no JSON, no markdown."""
+    return STYLE_TEMPLATE.render(text=text, style=style)
+
+
+def build_batch_rephrase_prompt(texts: Sequence[str]) -> Prompt:
+    """
+    Pack several inputs into one prompt; the model answers with one entry per item id.
+    Parsed by parse_rephrase_batch_response.
+    """
+    items = json.dumps([{"id": i, "text": t} for i, t in enumerate(texts)], ensure_ascii=False)
+    return BATCH_TEMPLATE.render(count=str(len(texts)), items=items)
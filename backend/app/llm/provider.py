@@ -5,6 +5,12 @@ from typing import AsyncIterator, Protocol
 
 
 class LLMProvider(Protocol):
+    """
+    Upstream text completion. A request deadline, if any, is not a parameter: callers bound
+    calls with app.llm.deadline.within()/bounded_stream(), and implementations that hold
+    timers of their own (HTTP timeouts, queues, backoff) read deadline.current_deadline().
+    """
+
     async def complete(self, prompt: str) -> str:
         """Non-streaming completion."""
         ...
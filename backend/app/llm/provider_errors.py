@@ -12,3 +12,8 @@ class LLMProviderError(Exception):
     code: str
     message: str
     retry_after_seconds: Optional[int] = None
+    # Transient upstream failure (timeout, connection, 5xx, upstream 429) that may succeed if retried
+    retryable: bool = False
+    # Kind of upstream failure ("timeout", "connection", "server", "rate_limit", "auth", "not_found",
+    # "rejected"); None for errors raised on this side (deadline, admission, circuit breaker)
+    error_class: Optional[str] = None
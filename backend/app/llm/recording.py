@@ -0,0 +1,289 @@
+# backend/app/llm/recording.py
+"""
+Recording upstream sessions and replaying them offline.
+
+RecordingProvider wraps a provider and appends every finished call to a session file;
+ReplayProvider (LLM_MODE=replay) plays those sessions back with their original chunking and
+timing, optionally sped up or slowed down, so load tests and profiles of /rephrase/stream see
+realistic output sizes and cadence without network access.
+
+Session files are JSON lines. The first line names the format; each following line is one call:
+
+  {"k": "3f9a...", "p": "style:casual", "m": "s", "c": [[412, "Hey"], [18, ", can"], ...]}
+  {"k": "...", "p": "json", "m": "c", "c": [[1830, "{...}"]], "e": {...}, "ed": 0}
+
+k: hash of the prompt; p: prompt kind (fallback when a prompt was never recorded); m: "c" for
+complete(), "s" for complete_stream(); c: [milliseconds since the previous chunk (or the call
+start), text] pairs; e / ed: the error the call ended with and the milliseconds before it.
+Prompts themselves are not stored. Files ending in .gz are read gzip-compressed.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import replace
+from typing import IO, Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.llm.fake_provider import detect_style, wants_batch, wants_json
+from app.llm.provider import LLMProvider
+from app.llm.provider_errors import LLMProviderError
+from app.llm.usage import estimated_usage, report_usage
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "rephrase-sessions"
+FORMAT_VERSION = 1
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def prompt_kind(prompt: str) -> str:
+    """Which sessions can stand in for this prompt when it was never recorded."""
+    if wants_batch(prompt):
+        return "batch"
+    if wants_json(prompt):
+        return "json"
+    return "style:" + detect_style(prompt)
+
+
+def _ms(seconds: float) -> int:
+    return max(0, round(seconds * 1000.0))
+
+
+def _error_record(e: LLMProviderError) -> Dict[str, Any]:
+    return {
+        "status": e.status_code,
+        "code": e.code,
+        "message": e.message,
+        "retry_after": e.retry_after_seconds,
+        "retryable": e.retryable,
+        "class": e.error_class,
+    }
+
+
+def _error_from_record(raw: Dict[str, Any]) -> LLMProviderError:
+    return LLMProviderError(
+        status_code=raw["status"],
+        code=raw["code"],
+        message=raw["message"],
+        retry_after_seconds=raw.get("retry_after"),
+        retryable=raw.get("retryable", False),
+        error_class=raw.get("class"),
+    )
+
+
+class SessionRecorder:
+    """
+    Appends session records to `path`, one line per call, flushed as it is written so that
+    several recorders (e.g. across a config reload) can share a file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+                if self._file.tell() == 0:
+                    self._file.write(json.dumps({"format": FORMAT, "v": FORMAT_VERSION}) + "\n")
+            self._file.write(line)
+            self._file.flush()
+            self.recorded += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class RecordingProvider:
+    """LLMProvider wrapper that records each call that ran to completion (or to an upstream error)."""
+
+    def __init__(self, inner: LLMProvider, recorder: SessionRecorder):
+        self.inner = inner
+        self.recorder = recorder
+
+    def _record(
+        self, prompt: str, mode: str, chunks: List[List[Any]], error: Optional[Tuple[LLMProviderError, float]]
+    ) -> None:
+        record: Dict[str, Any] = {"k": prompt_key(prompt), "p": prompt_kind(prompt), "m": mode, "c": chunks}
+        if error is not None:
+            record["e"] = _error_record(error[0])
+            record["ed"] = _ms(error[1])
+        try:
+            self.recorder.write(record)
+        except OSError:
+            logger.exception("Could not record LLM session to %s.", self.recorder.path)
+
+    async def complete(self, prompt: str) -> str:
+        start = time.perf_counter()
+        try:
+            result = await self.inner.complete(prompt)
+        except LLMProviderError as e:
+            self._record(prompt, "c", [], (e, time.perf_counter() - start))
+            raise
+        self._record(prompt, "c", [[_ms(time.perf_counter() - start), result]], None)
+        return result
+
+    async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        chunks: List[List[Any]] = []
+        last = time.perf_counter()
+        try:
+            async for delta in self.inner.complete_stream(prompt):
+                now = time.perf_counter()
+                chunks.append([_ms(now - last), delta])
+                last = now
+                yield delta
+        except LLMProviderError as e:
+            self._record(prompt, "s", chunks, (e, time.perf_counter() - last))
+            raise
+        # A stream the consumer abandoned (GeneratorExit / cancellation) is not recorded
+        self._record(prompt, "s", chunks, None)
+
+
+class Session:
+    __slots__ = ("mode", "chunks", "error", "error_delay")
+
+    def __init__(
+        self, mode: str, chunks: List[Tuple[float, str]], error: Optional[LLMProviderError], error_delay: float
+    ):
+        self.mode = mode
+        self.chunks = chunks  # (seconds since the previous chunk, text)
+        self.error = error
+        self.error_delay = error_delay
+
+
+def load_sessions(path: str) -> List[Tuple[str, str, Session]]:
+    """(prompt key, prompt kind, session) for every record in a session file."""
+    opener = gzip.open if path.endswith(".gz") else open
+    sessions: List[Tuple[str, str, Session]] = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            if "format" in raw:
+                if raw["format"] != FORMAT or raw.get("v") != FORMAT_VERSION:
+                    raise ValueError(f"{path}:{lineno}: unsupported session format {raw!r}.")
+                continue
+            error = _error_from_record(raw["e"]) if "e" in raw else None
+            session = Session(
+                raw["m"], [(ms / 1000.0, text) for ms, text in raw["c"]], error, raw.get("ed", 0) / 1000.0
+            )
+            sessions.append((raw["k"], raw["p"], session))
+    return sessions
+
+
+def _no_session_error() -> LLMProviderError:
+    return LLMProviderError(
+        status_code=502,
+        code="LLM_PROVIDER_FAILURE",
+        message="No recorded session matches this prompt.",
+    )
+
+
+class ReplayProvider:
+    """
+    Plays recorded sessions back. A prompt that was recorded gets its own sessions (several
+    recordings of one prompt take turns); any other prompt gets a recorded session of the same
+    kind, picked by its hash so that the same prompt always replays the same session, unless
+    `on_miss` is "error". Delays are divided by `speed` (2.0 = twice as fast, 0 = no delays).
+    """
+
+    def __init__(self, sessions: List[Tuple[str, str, Session]], *, speed: float = 1.0, on_miss: str = "nearest"):
+        self._by_key: Dict[str, List[Session]] = {}
+        self._by_kind: Dict[str, List[Session]] = {}
+        for key, kind, session in sessions:
+            self._by_key.setdefault(key, []).append(session)
+            self._by_kind.setdefault(kind, []).append(session)
+        self._turn: Dict[str, int] = {}
+        self._speed = speed
+        self._on_miss = on_miss
+        self.sessions = len(sessions)
+        self.calls = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> "ReplayProvider":
+        if not os.path.exists(path):
+            raise RuntimeError(f"LLM_REPLAY_PATH {path!r} does not exist.")
+        provider = cls(load_sessions(path), **kwargs)
+        logger.info("Replaying %d recorded LLM sessions from %s.", provider.sessions, path)
+        return provider
+
+    def _pick(self, prompt: str, mode: str) -> Session:
+        self.calls += 1
+        key = prompt_key(prompt)
+        recorded = self._by_key.get(key)
+        if recorded:
+            self.hits += 1
+            # Prefer sessions recorded through the same method
+            candidates = [s for s in recorded if s.mode == mode] or recorded
+            turn = self._turn.get(key, 0)
+            self._turn[key] = turn + 1
+            return candidates[turn % len(candidates)]
+        self.misses += 1
+        similar = self._by_kind.get(prompt_kind(prompt))
+        if self._on_miss == "error" or not similar:
+            raise _no_session_error()
+        return similar[int(key, 16) % len(similar)]
+
+    async def _pace(self, target: float) -> None:
+        delay = target - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _scaled(self, seconds: float) -> float:
+        return seconds / self._speed if self._speed > 0 else 0.0
+
+    async def complete(self, prompt: str) -> str:
+        session = self._pick(prompt, "c")
+        # A streamed session answers a complete() call once its last chunk would have arrived
+        await asyncio.sleep(self._scaled(sum(delay for delay, _ in session.chunks) + session.error_delay))
+        if session.error is not None:
+            self.errors += 1
+            raise replace(session.error)  # a fresh exception per call
+        result = "".join(text for _, text in session.chunks)
+        report_usage(prompt, estimated_usage(prompt, result), self._scaled(sum(d for d, _ in session.chunks)))
+        return result
+
+    async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        session = self._pick(prompt, "s")
+        # Chunks are due at their recorded offsets from the start, so pacing does not drift
+        start = due = asyncio.get_running_loop().time()
+        for delay, text in session.chunks:
+            due += self._scaled(delay)
+            await self._pace(due)
+            yield text
+        if session.error is not None:
+            await self._pace(due + self._scaled(session.error_delay))
+            self.errors += 1
+            raise replace(session.error)  # a fresh exception per call
+        completion = "".join(text for _, text in session.chunks)
+        report_usage(prompt, estimated_usage(prompt, completion), asyncio.get_running_loop().time() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": self.sessions,
+            "calls": self.calls,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors_replayed": self.errors,
+            "speed": self._speed,
+        }
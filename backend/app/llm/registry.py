@@ -0,0 +1,212 @@
+# backend/app/llm/registry.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from app.config import Settings
+from app.llm.admission import AdmissionController, AdmissionControlledProvider, build_admission_controller
+from app.llm.circuit import CircuitBreakerProvider, build_circuit_breaker
+from app.llm.fake_provider import FakeLLMProvider
+from app.llm.instrumented_provider import InstrumentedProvider
+from app.llm.openai_provider import AzureOpenAIProvider, build_http_client
+from app.llm.provider import LLMProvider
+from app.llm.provider_errors import LLMProviderError
+from app.llm.recording import RecordingProvider, ReplayProvider, SessionRecorder
+from app.llm.retry import RetryingProvider, build_retrying_provider
+from app.llm.router import RouterProvider, build_router
+from app.llm.singleflight import CoalescingProvider, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def _pool_stats(client: Optional[httpx.AsyncClient]) -> Dict[str, Any]:
+    """
+    Best-effort snapshot of the httpcore connection pool behind an httpx client.
+    Reads pool internals defensively; unknown values are reported as None.
+    """
+    stats: Dict[str, Any] = {"in_use": None, "idle": None, "waiting": None}
+    if client is None:
+        return stats
+
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is not None:
+        in_use = idle = 0
+        for conn in connections:
+            if conn.is_idle():
+                idle += 1
+            elif not conn.is_closed():
+                in_use += 1
+        stats["in_use"] = in_use
+        stats["idle"] = idle
+
+    requests = getattr(pool, "_requests", None)
+    if requests is not None:
+        stats["waiting"] = sum(1 for r in requests if getattr(r, "connection", None) is None)
+
+    return stats
+
+
+class _LeasedProvider:
+    """Outermost wrapper: counts upstream calls in flight so a replaced registry can drain."""
+
+    def __init__(self, inner: LLMProvider, registry: "ProviderRegistry"):
+        self.inner = inner
+        self._registry = registry
+
+    async def complete(self, prompt: str) -> str:
+        self._registry.in_flight += 1
+        try:
+            return await self.inner.complete(prompt)
+        finally:
+            self._registry.in_flight -= 1
+
+    async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        self._registry.in_flight += 1
+        try:
+            async for delta in self.inner.complete_stream(prompt):
+                yield delta
+        finally:
+            self._registry.in_flight -= 1
+
+
+class ProviderRegistry:
+    """
+    Owns the process-wide LLM provider and the upstream HTTP connection pool behind it.
+    Created once in the app lifespan; routes reach it through app.llm.factory.
+    """
+
+    def __init__(self, settings: Settings, base_provider: Optional[LLMProvider] = None):
+        self._settings = settings
+        # Overrides the LLM_MODE-selected provider (benchmarks, embedding); still gets the usual wrappers.
+        self._base_provider = base_provider
+        self._provider: Optional[LLMProvider] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._closed = False
+        self.in_flight = 0
+        self.flights = SingleFlight()
+        self.admission: Optional[AdmissionController] = (
+            build_admission_controller(settings) if settings.upstream_admission_enabled else None
+        )
+        self.retry: Optional[RetryingProvider] = None
+        self.router: Optional[RouterProvider] = None
+        self.circuit: Optional[CircuitBreakerProvider] = None
+        self.recorder: Optional[SessionRecorder] = None
+        self.replay: Optional[ReplayProvider] = None
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings
+
+    def get_provider(self) -> LLMProvider:
+        if self._closed:
+            raise RuntimeError("ProviderRegistry is closed.")
+        # Built lazily so that a misconfigured real mode fails per request (as before), not at startup.
+        if self._provider is None:
+            # Wrappers, innermost first: (session recording) -> timing -> admission control -> circuit
+            # breaker -> retries -> request coalescing. Retries sit outside admission so that every attempt
+            # is admitted (and counted) on its own; the breaker sits outside admission so an outage fails
+            # fast instead of queueing.
+            provider: LLMProvider = self._build_provider()
+            if self._settings.llm_record_path and self._settings.llm_mode != "replay":
+                self.recorder = SessionRecorder(self._settings.llm_record_path)
+                provider = RecordingProvider(provider, self.recorder)
+            provider = InstrumentedProvider(provider)
+            if self.admission is not None:
+                provider = AdmissionControlledProvider(
+                    provider, self.admission, self._settings.upstream_expected_output_tokens
+                )
+            if self._settings.circuit_enabled:
+                provider = self.circuit = CircuitBreakerProvider(provider, build_circuit_breaker(self._settings))
+            if self._settings.retry_max_attempts > 1:
+                provider = self.retry = build_retrying_provider(provider, self._settings)
+            if self._settings.single_flight_enabled:
+                provider = CoalescingProvider(provider, self.flights)
+            self._provider = _LeasedProvider(provider, self)
+        return self._provider
+
+    def _build_provider(self) -> LLMProvider:
+        settings = self._settings
+
+        if self._base_provider is not None:
+            return self._base_provider
+
+        if settings.llm_mode == "fake":
+            return FakeLLMProvider()
+
+        if settings.llm_mode == "replay":
+            self.replay = ReplayProvider.from_file(
+                settings.llm_replay_path, speed=settings.llm_replay_speed, on_miss=settings.llm_replay_on_miss
+            )
+            return self.replay
+
+        if settings.llm_mode == "real":
+            if not settings.allow_real_llm:
+                raise LLMProviderError(
+                    status_code=403,
+                    code="REAL_LLM_DISABLED",
+                    message="Real LLM calls are disabled. Set ALLOW_REAL_LLM=1 to enable.",
+                )
+            # A client that never sent a request holds no sockets, so a config error here leaks nothing.
+            http_client = build_http_client(settings)
+            provider: LLMProvider
+            if settings.azure_backends:
+                # One pool for all deployments: httpx keeps connections per host anyway
+                backends = [
+                    (b.name, AzureOpenAIProvider(settings, http_client=http_client, backend=b))
+                    for b in settings.azure_backends
+                ]
+                provider = self.router = build_router(settings, backends)
+            else:
+                provider = AzureOpenAIProvider(settings, http_client=http_client)
+            self._http_client = http_client
+            return provider
+
+        raise RuntimeError(f"Unsupported LLM_MODE: {settings.llm_mode!r}")
+
+    def pool_stats(self) -> Dict[str, Any]:
+        settings = self._settings
+        stats = _pool_stats(self._http_client)
+        stats.update(
+            {
+                "llm_mode": settings.llm_mode,
+                "initialized": self._http_client is not None,
+                "max_connections": settings.azure_max_connections,
+                "max_keepalive_connections": settings.azure_max_keepalive_connections,
+                "keepalive_expiry_seconds": settings.azure_keepalive_expiry_seconds,
+                "http2": settings.azure_http2,
+            }
+        )
+        return stats
+
+    async def drain_and_close(self, timeout: float, poll_seconds: float = 0.1) -> None:
+        """
+        Close once the calls already running on this registry have finished (or `timeout` passed).
+        Used after a config reload swapped in a new registry: streams that started on this one
+        keep its provider and connection pool until they end.
+        """
+        deadline = time.monotonic() + timeout
+        # Always wait one poll: a request may have fetched the provider but not started its call yet
+        await asyncio.sleep(poll_seconds)
+        while self.in_flight > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(poll_seconds)
+        if self.in_flight > 0:
+            logger.warning("Closing replaced LLM provider with %d call(s) still in flight.", self.in_flight)
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._provider = None
+        if self.recorder is not None:
+            self.recorder.close()
+        if self._http_client is not None:
+            client, self._http_client = self._http_client, None
+            await client.aclose()
+            logger.info("Closed upstream LLM connection pool.")
@@ -1,46 +1,322 @@
 # backend/app/llm/rephrase_generator.py
 from __future__ import annotations
 
-from typing import AsyncGenerator, Dict, Literal
+import asyncio
+from contextlib import aclosing
+from typing import AsyncGenerator, Dict, List, Literal, Optional, Set, Tuple, Union
 
+from app.llm.chunking import Chunk, split_text
+from app.llm.deadline import Deadline, bounded_stream, within
 from app.llm.parse import parse_rephrase_response
-from app.llm.prompt import build_rephrase_prompt
+from app.llm.prompt import build_rephrase_prompt, build_style_prompt
 from app.llm.provider import LLMProvider
+from app.llm.stream_parse import JsonFieldStreamParser
+from app.llm.tokens import estimate_tokens
+from app.observability.metrics import stage_timer
 from app.schemas.rephrase import RephraseResponse
 
 
-async def generate_rephrases(provider: LLMProvider, text: str) -> RephraseResponse:
+def plan_chunks(text: str, chunk_tokens: int) -> Optional[List[Chunk]]:
+    """Chunks for long-input mode, or None when the text fits one prompt (or chunking is off)."""
+    if chunk_tokens <= 0 or estimate_tokens(text) <= chunk_tokens:
+        return None
+    chunks = split_text(text, chunk_tokens)
+    return chunks if len(chunks) > 1 else None
+
+
+async def generate_rephrases(
+    provider: LLMProvider,
+    text: str,
+    *,
+    deadline: Optional[Deadline] = None,
+    chunk_tokens: int = 0,
+    max_parallel_chunks: int = 4,
+) -> RephraseResponse:
+    """
+    Raises LLMProviderError (LLM_TIMEOUT) if `deadline` passes before the model answers.
+    With `chunk_tokens` > 0, longer texts are split (plan_chunks), the chunks rephrased in
+    parallel (at most `max_parallel_chunks` at a time) and each style stitched back in order.
+    """
+    chunks = plan_chunks(text, chunk_tokens)
+    if chunks is not None:
+        return await _generate_chunked(provider, chunks, deadline, max_parallel_chunks)
     prompt = build_rephrase_prompt(text)
-    raw = await provider.complete(prompt)
-    return parse_rephrase_response(raw)
+    raw = await within(provider.complete(prompt), deadline)
+    with stage_timer("parse_response"):
+        return parse_rephrase_response(raw)
 
-Style = Literal["professional", "casual", "polite", "social"]
 
+async def _generate_chunked(
+    provider: LLMProvider, chunks: List[Chunk], deadline: Optional[Deadline], max_parallel: int
+) -> RephraseResponse:
+    limit = asyncio.Semaphore(max_parallel)
 
-def _build_single_style_prompt(text: str, style: Style) -> str:
-    # Keep it boring and explicit: return ONLY plain text, no JSON, no markdown.
-    # This makes token streaming trivial to map into one panel.
-    return (
-        f"You are a writing assistant.\n"
-        f"Rewrite the INPUT in a {style} style.\n"
-        f"Rules:\n"
-        f"- Return ONLY the rewritten text.\n"
-        f"- Do NOT include quotes, code fences, JSON, or extra commentary.\n"
-        f"- Preserve meaning.\n\n"
-        f"INPUT:\n{text}\n"
-    )
+    async def one(chunk: Chunk) -> RephraseResponse:
+        async with limit:
+            raw = await within(provider.complete(build_rephrase_prompt(chunk.text)), deadline)
+        with stage_timer("parse_response"):
+            return parse_rephrase_response(raw)
+
+    tasks = [asyncio.create_task(one(chunk), name=f"rephrase-chunk-{i}") for i, chunk in enumerate(chunks)]
+    try:
+        parts = await asyncio.gather(*tasks)
+    finally:
+        # One chunk failed (or we were cancelled): the rest are of no use
+        for task in tasks:
+            task.cancel()
+    stitched = {
+        style: "".join(getattr(part, style).strip() + chunk.sep for part, chunk in zip(parts, chunks)).strip()
+        for style in STYLES
+    }
+    return RephraseResponse(**stitched)
+
+Style = Literal["professional", "casual", "polite", "social"]
+
+STYLES: Tuple[Style, ...] = ("professional", "casual", "polite", "social")
 
 
 async def generate_rephrases_stream(
-    provider: LLMProvider, text: str
+    provider: LLMProvider,
+    text: str,
+    *,
+    concurrent: bool = False,
+    max_in_flight: Optional[int] = None,
+    single_call: bool = False,
+    deadline: Optional[Deadline] = None,
+    completed: Optional[Set[str]] = None,
+    chunk_tokens: int = 0,
+    max_parallel_chunks: int = 4,
 ) -> AsyncGenerator[Dict[str, str], None]:
     """
     Streams per-style deltas:
       yields {"style": "<style>", "delta": "<text_delta>"}
     At the end, yields {"final": "<json_string>"} is NOT done here (route will assemble final).
+
+    concurrent=False generates the styles one after another.
+    concurrent=True starts every style at once (at most `max_in_flight` at a time, if set)
+    and yields deltas in arrival order, so styles interleave.
+    single_call=True makes one upstream call with the JSON prompt (build_rephrase_prompt) and
+    extracts each style's deltas from the JSON as it streams; styles arrive in the order the
+    model writes them. Raises ModelOutputError if the JSON ends without all four styles.
+
+    Upstream calls are cancelled once `deadline` passes and LLMProviderError (LLM_TIMEOUT) is
+    raised. Styles whose text is complete are added to `completed` as they finish, so a
+    caller can tell which of the deltas it has seen add up to a whole result.
+
+    With `chunk_tokens` > 0, longer texts are split (plan_chunks) and the chunks generated in
+    parallel, each in the mode above. Every style still streams in input order: a chunk's
+    deltas are forwarded live once all earlier chunks of that style are complete, and held
+    back until then.
     """
-    styles: list[Style] = ["professional", "casual", "polite", "social"]
-    for style in styles:
-        prompt = _build_single_style_prompt(text, style)
-        async for delta in provider.complete_stream(prompt):
-            yield {"style": style, "delta": delta}
\ No newline at end of file
+    done: Set[str] = completed if completed is not None else set()
+
+    chunks = plan_chunks(text, chunk_tokens)
+    if chunks is not None:
+        stream = _generate_chunked_stream(
+            provider,
+            chunks,
+            max_parallel_chunks,
+            deadline,
+            done,
+            concurrent=concurrent,
+            max_in_flight=max_in_flight,
+            single_call=single_call,
+        )
+        async with aclosing(stream):
+            async for item in stream:
+                yield item
+        return
+
+    if single_call:
+        async for item in _generate_single_call(provider, text, deadline, done):
+            yield item
+        return
+
+    if concurrent:
+        async for item in _generate_concurrently(provider, text, max_in_flight, deadline, done):
+            yield item
+        return
+
+    for style in STYLES:
+        prompt = build_style_prompt(text, style)
+        async with aclosing(bounded_stream(provider.complete_stream(prompt), deadline)) as deltas:
+            async for delta in deltas:
+                yield {"style": style, "delta": delta}
+        done.add(style)
+
+
+async def _generate_single_call(
+    provider: LLMProvider, text: str, deadline: Optional[Deadline], done: Set[str]
+) -> AsyncGenerator[Dict[str, str], None]:
+    parser = JsonFieldStreamParser(STYLES)
+    async with aclosing(bounded_stream(provider.complete_stream(build_rephrase_prompt(text)), deadline)) as chunks:
+        async for chunk in chunks:
+            for style, delta in parser.feed(chunk):
+                yield {"style": style, "delta": delta}
+            done.update(parser.complete)
+    with stage_timer("parse_response"):
+        parser.close()
+
+
+# Queue message emitted by a style task when it has finished cleanly.
+_DONE = object()
+
+_QueueItem = Tuple[Style, Union[str, object, BaseException]]
+
+
+async def _generate_concurrently(
+    provider: LLMProvider, text: str, max_in_flight: Optional[int], deadline: Optional[Deadline], done: Set[str]
+) -> AsyncGenerator[Dict[str, str], None]:
+    queue: "asyncio.Queue[_QueueItem]" = asyncio.Queue()
+    limit = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+
+    async def run_style(style: Style) -> None:
+        try:
+            if limit is None:
+                await _pump_style(style)
+            else:
+                async with limit:
+                    await _pump_style(style)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            queue.put_nowait((style, e))
+        else:
+            queue.put_nowait((style, _DONE))
+
+    async def _pump_style(style: Style) -> None:
+        prompt = build_style_prompt(text, style)
+        async with aclosing(bounded_stream(provider.complete_stream(prompt), deadline)) as deltas:
+            async for delta in deltas:
+                queue.put_nowait((style, delta))
+
+    # One task per style so each can be cancelled on its own
+    tasks: Dict[Style, asyncio.Task[None]] = {
+        style: asyncio.create_task(run_style(style), name=f"rephrase-stream-{style}") for style in STYLES
+    }
+    try:
+        remaining = len(tasks)
+        while remaining:
+            style, item = await queue.get()
+            if item is _DONE:
+                remaining -= 1
+                done.add(style)
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield {"style": style, "delta": item}  # type: ignore[dict-item]
+    finally:
+        # Client went away, a style failed, or we finished: stop whatever is still generating.
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+class _ChunkTrim:
+    """Strips the whitespace around one chunk's output of one style as its deltas stream past."""
+
+    def __init__(self) -> None:
+        self._started = False
+        self._held = ""
+
+    def feed(self, delta: str) -> str:
+        if not self._started:
+            delta = delta.lstrip()
+            if not delta:
+                return ""
+            self._started = True
+        body = delta.rstrip()
+        if not body:
+            self._held += delta
+            return ""
+        # Trailing whitespace is only passed on once more text follows it
+        out, self._held = self._held + body, delta[len(body):]
+        return out
+
+
+# Queue message from a chunk task: (chunk index, style, delta | None = style complete | error)
+_ChunkItem = Tuple[int, str, Union[str, None, object, BaseException]]
+
+
+async def _generate_chunked_stream(
+    provider: LLMProvider,
+    chunks: List[Chunk],
+    max_parallel: int,
+    deadline: Optional[Deadline],
+    done: Set[str],
+    **mode: object,
+) -> AsyncGenerator[Dict[str, str], None]:
+    queue: "asyncio.Queue[_ChunkItem]" = asyncio.Queue()
+    limit = asyncio.Semaphore(max_parallel)
+
+    async def run_chunk(index: int, chunk: Chunk) -> None:
+        finished: Set[str] = set()
+        reported: Set[str] = set()
+        trims = {style: _ChunkTrim() for style in STYLES}
+        try:
+            async with limit:
+                deltas = generate_rephrases_stream(
+                    provider, chunk.text, deadline=deadline, completed=finished, **mode  # type: ignore[arg-type]
+                )
+                async with aclosing(deltas):
+                    async for item in deltas:
+                        text = trims[item["style"]].feed(item["delta"])
+                        if text:
+                            queue.put_nowait((index, item["style"], text))
+                        for style in finished - reported:
+                            reported.add(style)
+                            queue.put_nowait((index, style, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            queue.put_nowait((index, "", e))
+            return
+        for style in STYLES:
+            if style not in reported:
+                queue.put_nowait((index, style, None))
+        queue.put_nowait((index, "", _DONE))
+
+    tasks = [asyncio.create_task(run_chunk(i, c), name=f"rephrase-stream-chunk-{i}") for i, c in enumerate(chunks)]
+
+    # Per style: the chunk currently streamed live, later chunks' deltas held back, chunks complete
+    cursor: Dict[str, int] = {style: 0 for style in STYLES}
+    held: Dict[str, Dict[int, List[str]]] = {style: {} for style in STYLES}
+    complete: Dict[str, Set[int]] = {style: set() for style in STYLES}
+    wrote: Dict[str, int] = {}  # style -> last chunk that produced text
+
+    def emit(style: str, index: int, text: str) -> Dict[str, str]:
+        if style in wrote and wrote[style] != index:
+            # First text of a new chunk: put back the break that separated it from the previous one
+            text = chunks[index - 1].sep + text
+        wrote[style] = index
+        return {"style": style, "delta": text}
+
+    try:
+        remaining = len(tasks)
+        while remaining:
+            index, style, item = await queue.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            elif item is not None:
+                if index == cursor[style]:
+                    yield emit(style, index, item)  # type: ignore[arg-type]
+                else:
+                    held[style].setdefault(index, []).append(item)  # type: ignore[arg-type]
+            else:
+                complete[style].add(index)
+                while cursor[style] in complete[style]:
+                    cursor[style] += 1
+                    if cursor[style] == len(chunks):
+                        done.add(style)
+                        break
+                    backlog = held[style].pop(cursor[style], None)
+                    if backlog:
+                        yield emit(style, cursor[style], "".join(backlog))
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,236 @@
+# backend/app/llm/retry.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from app.config import Settings
+from app.llm.deadline import current_deadline
+from app.llm.provider import LLMProvider
+from app.llm.provider_errors import LLMProviderError
+from app.observability.metrics import REGISTRY, Counter
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_RETRIES = REGISTRY.register(
+    Counter("llm_upstream_retries_total", "Upstream retries by the error code that triggered them.", ("code",))
+)
+UPSTREAM_HEDGES = REGISTRY.register(
+    Counter("llm_upstream_hedges_total", "Hedged complete() attempts (fired) and how many of them won.", ("outcome",))
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay_seconds: float = 0.2
+    max_delay_seconds: float = 4.0
+    # An upstream retry-after longer than this is surfaced to the client instead of waited out
+    max_retry_after_seconds: float = 10.0
+
+    def delay(self, attempt: int, error: LLMProviderError, rng: random.Random) -> Optional[float]:
+        """Seconds to wait before retry number `attempt` (1-based), or None to give up."""
+        if error.retry_after_seconds is not None:
+            if error.retry_after_seconds > self.max_retry_after_seconds:
+                return None
+            return float(error.retry_after_seconds)
+        # Capped exponential backoff with full jitter
+        cap = min(self.max_delay_seconds, self.base_delay_seconds * (2 ** (attempt - 1)))
+        return rng.uniform(0, cap)
+
+
+class RetryBudget:
+    """
+    Caps retries (and hedges) to a fraction of traffic so retries cannot amplify an outage.
+    Every request deposits `ratio` tokens; a retry spends one. `min_per_second` keeps a
+    trickle of retries available at low traffic.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, cap: float = 100.0):
+        self._ratio = ratio
+        self._min_per_second = min_per_second
+        self._cap = cap
+        self._balance = min(cap, max(min_per_second, 1.0))
+        self._updated = time.monotonic()
+        self.exhausted = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._balance = min(self._cap, self._balance + (now - self._updated) * self._min_per_second)
+        self._updated = now
+
+    def record_request(self) -> None:
+        self._refill()
+        self._balance = min(self._cap, self._balance + self._ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self._balance >= 1.0:
+            self._balance -= 1.0
+            return True
+        self.exhausted += 1
+        return False
+
+    @property
+    def balance(self) -> float:
+        return self._balance
+
+
+class LatencyTracker:
+    """Sliding window of recent successful complete() latencies for the hedging trigger."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        if len(self._samples) < min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100.0))]
+
+
+class RetryingProvider:
+    """
+    LLMProvider wrapper that retries transient upstream failures (LLMProviderError.retryable)
+    with capped, jittered exponential backoff, honoring upstream retry-after and a global
+    retry budget.
+
+    complete() can additionally hedge: if the first attempt has not returned within the
+    observed p95, a second attempt is fired and whichever finishes first wins.
+    complete_stream() only retries before the first delta has been yielded.
+    """
+
+    def __init__(
+        self,
+        inner: LLMProvider,
+        policy: RetryPolicy,
+        budget: RetryBudget,
+        *,
+        hedge: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        rng: Optional[random.Random] = None,
+    ):
+        self.inner = inner
+        self.policy = policy
+        self.budget = budget
+        self.latency = LatencyTracker()
+        self._hedge = hedge
+        self._hedge_percentile = hedge_percentile
+        self._hedge_min_samples = hedge_min_samples
+        self._rng = rng or random.Random()
+
+    async def _backoff_or_raise(self, attempt: int, error: LLMProviderError) -> None:
+        if not error.retryable or attempt >= self.policy.max_attempts:
+            raise error
+        delay = self.policy.delay(attempt, error, self._rng)
+        if delay is None:
+            raise error
+        deadline = current_deadline()
+        if deadline is not None and delay >= deadline.remaining():
+            # The retry could not finish in time anyway; do not spend budget on it
+            raise error
+        if not self.budget.try_spend():
+            raise error
+        UPSTREAM_RETRIES.labels(error.code).inc()
+        logger.info("Retrying upstream call after %s (attempt %d) in %.2fs", error.code, attempt + 1, delay)
+        await asyncio.sleep(delay)
+
+    async def complete(self, prompt: str) -> str:
+        self.budget.record_request()
+        attempt = 1
+        while True:
+            try:
+                return await self._attempt(prompt)
+            except LLMProviderError as e:
+                await self._backoff_or_raise(attempt, e)
+            attempt += 1
+
+    async def _timed_complete(self, prompt: str) -> str:
+        start = time.perf_counter()
+        result = await self.inner.complete(prompt)
+        self.latency.observe(time.perf_counter() - start)
+        return result
+
+    async def _attempt(self, prompt: str) -> str:
+        threshold = (
+            self.latency.percentile(self._hedge_percentile, self._hedge_min_samples) if self._hedge else None
+        )
+        if threshold is None:
+            return await self._timed_complete(prompt)
+
+        primary = asyncio.ensure_future(self._timed_complete(prompt))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if not done and self.budget.try_spend():
+                UPSTREAM_HEDGES.labels("fired").inc()
+                tasks.add(asyncio.ensure_future(self._timed_complete(prompt)))
+
+            # First success wins; an error only counts once every attempt has failed
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            UPSTREAM_HEDGES.labels("won").inc()
+                        return task.result()
+                    error = error or task.exception()
+            assert error is not None
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        self.budget.record_request()
+        attempt = 1
+        while True:
+            emitted = False
+            try:
+                async for delta in self.inner.complete_stream(prompt):
+                    emitted = True
+                    yield delta
+                return
+            except LLMProviderError as e:
+                # Once text reached the client a retry would duplicate it
+                if emitted:
+                    raise
+                await self._backoff_or_raise(attempt, e)
+            attempt += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "max_attempts": self.policy.max_attempts,
+            "budget_balance": round(self.budget.balance, 2),
+            "budget_exhausted": self.budget.exhausted,
+            "hedging": self._hedge,
+            "hedge_threshold_seconds": self.latency.percentile(self._hedge_percentile, self._hedge_min_samples),
+        }
+
+
+def build_retrying_provider(inner: LLMProvider, settings: Settings) -> RetryingProvider:
+    return RetryingProvider(
+        inner,
+        RetryPolicy(
+            max_attempts=settings.retry_max_attempts,
+            base_delay_seconds=settings.retry_base_delay_seconds,
+            max_delay_seconds=settings.retry_max_delay_seconds,
+            max_retry_after_seconds=settings.retry_max_retry_after_seconds,
+        ),
+        RetryBudget(ratio=settings.retry_budget_ratio, min_per_second=settings.retry_budget_min_per_second),
+        hedge=settings.hedge_enabled,
+        hedge_percentile=settings.hedge_percentile,
+        hedge_min_samples=settings.hedge_min_samples,
+    )
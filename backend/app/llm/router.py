@@ -0,0 +1,241 @@
+# backend/app/llm/router.py
+"""
+Routing over several upstream deployments (regions). Each call goes to the better of two
+randomly drawn healthy backends ("power of two choices"), scored by an EWMA of observed latency
+and error rate and by the calls already in flight there. Failing backends are ejected by a
+circuit breaker, and a call that fails with a transient error moves to another backend, for
+streams only before the first delta.
+"""
+from __future__ import annotations
+
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.config import Settings
+from app.llm.circuit import STATE_VALUE, CircuitBreaker
+from app.llm.deadline import current_deadline
+from app.llm.provider import LLMProvider
+from app.llm.provider_errors import LLMProviderError
+from app.observability.metrics import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+ROUTER_CALLS = REGISTRY.register(
+    Counter("llm_router_calls_total", "Upstream calls per backend by outcome.", ("backend", "outcome"))
+)
+ROUTER_FAILOVERS = REGISTRY.register(
+    Counter("llm_router_failovers_total", "Calls moved off a backend after it failed them.", ("backend",))
+)
+BACKEND_CIRCUIT_STATE = REGISTRY.register(
+    Gauge("llm_backend_circuit_state", "Circuit breaker per backend: 0 closed, 1 half-open, 2 open.", ("backend",))
+)
+BACKEND_LATENCY = REGISTRY.register(
+    Gauge("llm_backend_latency_ewma_seconds", "EWMA of time to first token / completion per backend.", ("backend",))
+)
+
+
+def _on_circuit_change(name: str, old: str, new: str) -> None:
+    BACKEND_CIRCUIT_STATE.labels(name).set(STATE_VALUE[new])
+
+
+def no_backend_error() -> LLMProviderError:
+    return LLMProviderError(
+        status_code=502,
+        code="LLM_PROVIDER_FAILURE",
+        message="No healthy upstream deployment is available.",
+    )
+
+
+class RoutedBackend:
+    """One upstream deployment and what the router has observed of it."""
+
+    def __init__(self, name: str, provider: LLMProvider, breaker: CircuitBreaker, *, alpha: float = 0.3):
+        self.name = name
+        self.provider = provider
+        self.breaker = breaker
+        self._alpha = alpha
+        self.latency: Optional[float] = None  # EWMA seconds; None until the first observation
+        self.error_rate = 0.0  # EWMA of failed calls (0..1)
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+
+    def score(self) -> float:
+        """Lower is better. Unmeasured backends score 0 so they get traffic (and a measurement)."""
+        if self.latency is None:
+            return 0.0
+        return self.latency * (self.in_flight + 1) / max(1.0 - self.error_rate, 0.05)
+
+    def observe_latency(self, seconds: float) -> None:
+        self.latency = seconds if self.latency is None else self.latency + self._alpha * (seconds - self.latency)
+        BACKEND_LATENCY.labels(self.name).set(self.latency)
+
+    def record(self, ok: Optional[bool]) -> None:
+        """ok=None: the call ended without saying anything about this backend's health."""
+        self.in_flight -= 1
+        self.breaker.record(ok)
+        outcome = "cancelled" if ok is None else ("success" if ok else "error")
+        ROUTER_CALLS.labels(self.name, outcome).inc()
+        if ok is None:
+            return
+        self.error_rate += self._alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if not ok:
+            self.failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "latency_ewma_ms": None if self.latency is None else round(self.latency * 1000.0, 1),
+            "error_rate_ewma": round(self.error_rate, 4),
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "failures": self.failures,
+            "circuit_opened": self.breaker.opened,
+            "retry_after_seconds": round(self.breaker.retry_after(), 1),
+        }
+
+
+def _health_outcome(e: LLMProviderError) -> Optional[bool]:
+    # Transient failures (timeouts, 5xx, throttling) count against the backend; a request the
+    # upstream rejected on its merits says nothing about the backend
+    return False if e.retryable else None
+
+
+class RouterProvider:
+    """LLMProvider over several backends; see the module docstring."""
+
+    def __init__(
+        self,
+        backends: Sequence[RoutedBackend],
+        *,
+        rng: Optional[random.Random] = None,
+        decision_log_size: int = 100,
+    ):
+        if not backends:
+            raise ValueError("RouterProvider needs at least one backend.")
+        self.backends: List[RoutedBackend] = list(backends)
+        self._rng = rng or random.Random()
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=decision_log_size)
+        self.failovers = 0
+        self.unavailable = 0
+        for backend in self.backends:
+            BACKEND_CIRCUIT_STATE.labels(backend.name).set(STATE_VALUE[backend.breaker.state])
+
+    def _choose(self, kind: str, exclude: Set[RoutedBackend]) -> Optional[RoutedBackend]:
+        candidates = [b for b in self.backends if b not in exclude and b.breaker.available()]
+        if not candidates:
+            return None
+        drawn = candidates if len(candidates) <= 2 else self._rng.sample(candidates, 2)
+        picked = min(drawn, key=lambda b: b.score())
+        self.decisions.append(
+            {
+                "at": round(time.time(), 3),
+                "kind": kind,
+                "attempt": len(exclude) + 1,
+                "scores": {b.name: round(b.score(), 4) for b in drawn},
+                "picked": picked.name,
+            }
+        )
+        picked.breaker.acquire()
+        picked.in_flight += 1
+        picked.calls += 1
+        return picked
+
+    def _give_up(self, error: Optional[LLMProviderError]) -> LLMProviderError:
+        if error is not None:
+            return error
+        self.unavailable += 1
+        return no_backend_error()
+
+    def _can_fail_over(self, error: LLMProviderError, tried: Set[RoutedBackend]) -> bool:
+        if not error.retryable or len(tried) >= len(self.backends):
+            return False
+        deadline = current_deadline()
+        return deadline is None or not deadline.expired
+
+    async def complete(self, prompt: str) -> str:
+        tried: Set[RoutedBackend] = set()
+        error: Optional[LLMProviderError] = None
+        while True:
+            backend = self._choose("complete", tried)
+            if backend is None:
+                raise self._give_up(error)
+            tried.add(backend)
+            start = time.perf_counter()
+            ok: Optional[bool] = None
+            try:
+                result = await backend.provider.complete(prompt)
+                backend.observe_latency(time.perf_counter() - start)
+                ok = True
+                return result
+            except LLMProviderError as e:
+                ok, error = _health_outcome(e), e
+                if not self._can_fail_over(e, tried):
+                    raise
+            finally:
+                backend.record(ok)
+            self._failed_over(backend, error)
+
+    async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        tried: Set[RoutedBackend] = set()
+        error: Optional[LLMProviderError] = None
+        while True:
+            backend = self._choose("stream", tried)
+            if backend is None:
+                raise self._give_up(error)
+            tried.add(backend)
+            start = time.perf_counter()
+            emitted = False
+            ok: Optional[bool] = None
+            try:
+                async for delta in backend.provider.complete_stream(prompt):
+                    if not emitted:
+                        backend.observe_latency(time.perf_counter() - start)
+                        emitted = True
+                    yield delta
+                ok = True
+                return
+            except LLMProviderError as e:
+                ok, error = _health_outcome(e), e
+                # Once text has reached the caller, another backend would start over mid-sentence
+                if emitted or not self._can_fail_over(e, tried):
+                    raise
+            finally:
+                backend.record(ok)
+            self._failed_over(backend, error)
+
+    def _failed_over(self, backend: RoutedBackend, error: Optional[LLMProviderError]) -> None:
+        self.failovers += 1
+        ROUTER_FAILOVERS.labels(backend.name).inc()
+        logger.info("Failing over from %s after %s.", backend.name, error.code if error else "error")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backends": {b.name: b.stats() for b in self.backends},
+            "failovers": self.failovers,
+            "unavailable": self.unavailable,
+            "recent_decisions": list(self.decisions)[-20:],
+        }
+
+
+def build_router(settings: Settings, providers: Sequence[Tuple[str, LLMProvider]]) -> RouterProvider:
+    """A RouterProvider over (name, provider) pairs, tuned by the ROUTER_* settings."""
+    return RouterProvider(
+        [
+            RoutedBackend(
+                name,
+                provider,
+                CircuitBreaker(
+                    name,
+                    failure_threshold=settings.router_breaker_failures,
+                    cooldown_seconds=settings.router_breaker_cooldown_seconds,
+                    on_change=_on_circuit_change,
+                ),
+                alpha=settings.router_ewma_alpha,
+            )
+            for name, provider in providers
+        ]
+    )
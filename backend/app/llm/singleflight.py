@@ -0,0 +1,162 @@
+# backend/app/llm/singleflight.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from app.llm.provider import LLMProvider
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamFlight:
+    """
+    One upstream stream fanned out to any number of subscribers.
+    Every delta is kept in `backlog` so late joiners replay from the start.
+    """
+
+    def __init__(self) -> None:
+        self.backlog: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def pump(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for delta in source:
+                self.backlog.append(delta)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        except asyncio.CancelledError as e:
+            # Cut off: a follower must not take the backlog for the complete text
+            self.error = e
+            raise
+        finally:
+            self.done = True
+            self._notify()
+
+    async def follow(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            changed = self._changed
+            if i < len(self.backlog):
+                yield self.backlog[i]
+                i += 1
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical upstream calls into one.
+
+    Waiters share the single result (or exception). The upstream work is reference
+    counted: it is cancelled only once every waiter/subscriber has gone away.
+    Completed calls are forgotten immediately; caching results is the ResponseCache's job.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self.coalesced_calls = 0
+        self.coalesced_streams = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _t, c=call: self._forget(self._calls, key, c))
+        else:
+            self.coalesced_calls += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Forget it first, so a caller arriving before the task unwinds starts a new one
+                self._forget(self._calls, key, call)
+                call.task.cancel()
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _StreamFlight()
+            flight.task = asyncio.create_task(flight.pump(factory()))
+            self._streams[key] = flight
+            flight.task.add_done_callback(lambda _t, f=flight: self._forget(self._streams, key, f))
+        else:
+            self.coalesced_streams += 1
+
+        flight.subscribers += 1
+        try:
+            async for delta in flight.follow():
+                yield delta
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and flight.task is not None and not flight.task.done():
+                self._forget(self._streams, key, flight)
+                flight.task.cancel()
+
+    @staticmethod
+    def _forget(table: Dict[str, Any], key: str, entry: Any) -> None:
+        if table.get(key) is entry:
+            del table[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight_calls": len(self._calls),
+            "in_flight_streams": len(self._streams),
+            "stream_subscribers": sum(f.subscribers for f in self._streams.values()),
+            "coalesced_calls": self.coalesced_calls,
+            "coalesced_streams": self.coalesced_streams,
+        }
+
+
+class CoalescingProvider:
+    """
+    LLMProvider wrapper that runs at most one upstream call per distinct prompt.
+
+    Prompts are rendered deterministically from (text, style) by the versioned templates in
+    app.llm.prompt, so the prompt digest is exactly the (text, style, prompt version) identity
+    of a call.
+    """
+
+    def __init__(self, inner: LLMProvider, flights: Optional[SingleFlight] = None):
+        self.inner = inner
+        self.flights = flights or SingleFlight()
+
+    @staticmethod
+    def _key(kind: str, prompt: str) -> str:
+        return kind + ":" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    async def complete(self, prompt: str) -> str:
+        return await self.flights.do(self._key("complete", prompt), lambda: self.inner.complete(prompt))
+
+    async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        key = self._key("stream", prompt)
+        # aclosing: release our subscription as soon as the caller stops reading
+        async with aclosing(self.flights.stream(key, lambda: self.inner.complete_stream(prompt))) as deltas:
+            async for delta in deltas:
+                yield delta
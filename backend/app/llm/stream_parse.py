@@ -0,0 +1,168 @@
+# backend/app/llm/stream_parse.py
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.llm.parse import ModelOutputError
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldStreamParser:
+    """
+    Incremental extractor for the top-level string fields of a JSON object arriving in
+    arbitrary chunks (LLM tokens). feed() returns the newly decoded text per wanted field,
+    so callers can forward `partial` deltas while the object is still being generated.
+
+    Handles escapes (including \\uXXXX and surrogate pairs) split across chunks. Text before
+    the opening brace (preamble, code fences) and after the closing one is ignored. Nested
+    values are skipped. Full validation is left to the caller (see missing()).
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self._wanted = frozenset(fields)
+        self.values: Dict[str, str] = {}
+        self._complete: set[str] = set()
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._expect_key = False  # next string at depth 1 is a key
+        self._role = ""  # of the current string: "key", "field" (wanted value) or "skip"
+        self._key: List[str] = []
+        self._field = ""
+        self._escape = False
+        self._unicode: Optional[str] = None  # hex digits of a \u escape collected so far
+        self._high_surrogate: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume the next chunk; return [(field, delta), ...] in the order decoded."""
+        out: List[Tuple[str, str]] = []
+        buf: List[str] = []
+        i, n = 0, len(chunk)
+        while i < n and not self._finished:
+            if self._in_string:
+                i = self._consume_string(chunk, i, buf, out)
+                continue
+            c = chunk[i]
+            i += 1
+            if not self._started:
+                if c == "{":
+                    self._started, self._depth, self._expect_key = True, 1, True
+                continue
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._role = "key"
+                    self._key = []
+                elif self._depth == 1 and self._field:
+                    self._role = "field"
+                else:
+                    self._role = "skip"
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finished = True
+            elif self._depth == 1:
+                if c == ":":
+                    self._expect_key = False
+                elif c == ",":
+                    self._expect_key = True
+                    self._field = ""
+        self._flush(buf, out)
+        return out
+
+    def _consume_string(self, chunk: str, i: int, buf: List[str], out: List[Tuple[str, str]]) -> int:
+        n = len(chunk)
+        if not self._escape and self._unicode is None:
+            # Fast path: copy plain runs up to the next quote or backslash in one slice
+            j = i
+            while j < n and chunk[j] != '"' and chunk[j] != "\\":
+                j += 1
+            if j > i:
+                self._emit(chunk[i:j], buf)
+            if j == n:
+                return n
+            if chunk[j] == '"':
+                self._end_string(buf, out)
+            else:
+                self._escape = True
+            return j + 1
+
+        c = chunk[i]
+        if self._unicode is not None:
+            self._unicode += c
+            if len(self._unicode) == 4:
+                try:
+                    code = int(self._unicode, 16)
+                except ValueError:
+                    raise ModelOutputError(f"Invalid \\u escape in model output: {self._unicode!r}") from None
+                self._emit_codepoint(code, buf)
+                self._unicode = None
+            return i + 1
+
+        self._escape = False
+        if c == "u":
+            self._unicode = ""
+        else:
+            self._emit(_ESCAPES.get(c, c), buf)
+        return i + 1
+
+    def _emit_codepoint(self, code: int, buf: List[str]) -> None:
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+        elif 0xDC00 <= code < 0xE000:
+            code = 0xFFFD
+        self._emit(chr(code), buf)
+
+    def _emit(self, text: str, buf: List[str]) -> None:
+        if self._high_surrogate is not None:
+            # A high surrogate not followed by a low one
+            self._high_surrogate = None
+            self._emit("\ufffd", buf)
+        if self._role == "key":
+            self._key.append(text)
+        elif self._role == "field":
+            buf.append(text)
+
+    def _end_string(self, buf: List[str], out: List[Tuple[str, str]]) -> None:
+        self._in_string = False
+        if self._role == "key":
+            key = "".join(self._key)
+            self._field = key if key in self._wanted else ""
+        elif self._role == "field":
+            self._flush(buf, out)
+            self._complete.add(self._field)
+            self._field = ""
+
+    def _flush(self, buf: List[str], out: List[Tuple[str, str]]) -> None:
+        if self._role != "field" or not buf:
+            return
+        delta = "".join(buf)
+        buf.clear()
+        self.values[self._field] = self.values.get(self._field, "") + delta
+        out.append((self._field, delta))
+
+    @property
+    def complete(self) -> frozenset[str]:
+        """Wanted fields whose string value has been fully received."""
+        return frozenset(self._complete)
+
+    def missing(self) -> List[str]:
+        """Wanted fields whose string value has not been fully received."""
+        return sorted(self._wanted - self._complete)
+
+    def close(self) -> Dict[str, str]:
+        """End of input: return the decoded fields, or raise ModelOutputError if any is incomplete."""
+        if not self._started:
+            raise ModelOutputError("No JSON object found in model output.")
+        missing = self.missing()
+        if missing:
+            raise ModelOutputError(f"Streamed JSON is missing fields: {', '.join(missing)}")
+        return dict(self.values)
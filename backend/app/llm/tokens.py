@@ -0,0 +1,71 @@
+# backend/app/llm/tokens.py
+"""
+Local token counts, used before a request is sent (admission token buckets, long-input
+chunking) and to check estimates against the usage the upstream reports.
+
+With the optional `tiktoken` package installed (and its encoding available offline or
+downloadable once), counts are exact for TOKENIZER_ENCODING. Otherwise a pre-tokenizer in the
+style of the GPT BPE encoders splits text into words, number groups, punctuation runs and
+whitespace and estimates each piece; for English prose this lands within a few percent of
+cl100k/o200k counts and errs on the high side.
+"""
+from __future__ import annotations
+
+import importlib.util
+import logging
+import math
+import os
+import re
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Same split as the BPE encoders: contractions, letter runs (with one leading space),
+# up to three digits, punctuation runs, whitespace
+_PIECES = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?(?:[^\s\w]|_)+|\s+", re.IGNORECASE)
+# ASCII words up to this long are usually a single token; longer ones split every few letters
+_WORD_CHARS = 10
+
+
+def _estimate_piece(piece: str) -> int:
+    core = piece.lstrip(" ") or piece
+    first = core[0]
+    if first.isalpha():
+        if core.isascii():
+            return 1 if len(core) <= _WORD_CHARS else 1 + math.ceil((len(core) - _WORD_CHARS) / 5)
+        # Accented and non-Latin scripts encode to more tokens; roughly one per 2-3 UTF-8 bytes
+        return max(1, math.ceil(len(core.encode("utf-8")) / 2.5))
+    if first.isdigit() or first == "'":
+        return 1
+    if first.isspace():
+        return 1 + core.count("\n") // 2
+    return max(1, math.ceil(len(core) / 2))  # punctuation and symbols
+
+
+def heuristic_tokens(text: str) -> int:
+    return max(1, sum(_estimate_piece(p) for p in _PIECES.findall(text)))
+
+
+def _load_tiktoken() -> Optional[Callable[[str], int]]:
+    if importlib.util.find_spec("tiktoken") is None:
+        return None
+    name = os.getenv("TOKENIZER_ENCODING", "o200k_base").strip()
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(name)
+    except Exception as e:  # unknown encoding, or no network for the first download
+        logger.warning("tiktoken encoding %r unavailable (%s); using the built-in token estimate.", name, e)
+        return None
+    return lambda text: max(1, len(encoding.encode(text, disallowed_special=())))
+
+
+_count: Optional[Callable[[str], int]] = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens `text` encodes to: exact with tiktoken, estimated otherwise."""
+    global _count
+    if _count is None:
+        _count = _load_tiktoken() or heuristic_tokens
+    return _count(text)
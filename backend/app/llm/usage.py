@@ -0,0 +1,236 @@
+# backend/app/llm/usage.py
+"""
+Upstream token usage: what each call consumed, per request and in aggregate.
+
+Providers report every finished call with report_usage(): AzureOpenAIProvider passes on the
+usage the upstream returns (for streams via stream_options.include_usage), and falls back to
+local estimates (app.llm.tokens) where the upstream sent none, as the fake provider always
+does. Each report is
+- added to the current request's RequestUsage, opened by the HTTP middleware, so a request's
+  tokens can be set against its latency;
+- aggregated into rolling windows per style and per prompt template version (GET /ops/usage);
+- counted in llm_tokens_total.
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import deque
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.llm.tokens import estimate_tokens
+from app.observability.metrics import REGISTRY, Counter, Histogram
+
+TOKENS = REGISTRY.register(
+    Counter(
+        "llm_tokens_total", "Upstream tokens by type (prompt, completion, cached) and style.", ("type", "style")
+    )
+)
+REQUEST_TOKENS = REGISTRY.register(
+    Histogram(
+        "rephrase_request_tokens",
+        "Upstream tokens (prompt + completion) spent on one HTTP request.",
+        ("route",),
+        buckets=(50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000),
+    )
+)
+
+# Calls kept per style / template window, and requests kept for the most-expensive list
+WINDOW_CALLS = 1000
+EXPENSIVE_SHOWN = 10
+
+
+@dataclass(frozen=True)
+class TokenUsage:
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int = 0  # prompt tokens served from the upstream's prompt cache
+    estimated: bool = False  # counted locally, not reported by the upstream
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+def estimated_usage(prompt: str, completion: str) -> TokenUsage:
+    return TokenUsage(estimate_tokens(prompt), estimate_tokens(completion) if completion else 0, estimated=True)
+
+
+def style_label(prompt: str) -> str:
+    """The style a prompt generates: one of the four, "all" for the JSON prompt, or its template name."""
+    style = getattr(prompt, "style", None)
+    if style:
+        return style
+    template = getattr(prompt, "template", "")
+    if template.startswith("rephrase@"):
+        return "all"
+    return template.split("@", 1)[0] or "other"
+
+
+class RequestUsage:
+    """Upstream calls made on behalf of one HTTP request."""
+
+    __slots__ = (
+        "route",
+        "input_hash",
+        "input_chars",
+        "calls",
+        "prompt_tokens",
+        "completion_tokens",
+        "cached_tokens",
+        "upstream_seconds",
+        "estimated",
+    )
+
+    def __init__(self) -> None:
+        self.route = ""
+        self.input_hash = ""
+        self.input_chars = 0
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.upstream_seconds = 0.0
+        self.estimated = False
+
+    def add(self, usage: TokenUsage, seconds: float) -> None:
+        self.calls += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.cached_tokens += usage.cached_tokens
+        self.upstream_seconds += seconds
+        self.estimated = self.estimated or usage.estimated
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "route": self.route,
+            "input_hash": self.input_hash,
+            "input_chars": self.input_chars,
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "upstream_seconds": round(self.upstream_seconds, 3),
+            "estimated": self.estimated,
+        }
+
+
+# Set for the duration of an HTTP request; tasks started by the request inherit it
+_request: ContextVar[Optional[RequestUsage]] = ContextVar("rephrase_request_usage", default=None)
+
+
+def current_request_usage() -> Optional[RequestUsage]:
+    return _request.get()
+
+
+def begin_request() -> Tuple[RequestUsage, Token]:
+    usage = RequestUsage()
+    return usage, _request.set(usage)
+
+
+def end_request(usage: RequestUsage, token: Token, route: str) -> None:
+    _request.reset(token)
+    if usage.calls:
+        usage.route = route
+        REQUEST_TOKENS.labels(route).observe(usage.total_tokens)
+        USAGE.add_request(usage)
+
+
+def note_input(text: str) -> None:
+    """Identify the current request's input (by hash and size) in the most-expensive list."""
+    usage = _request.get()
+    if usage is not None:
+        usage.input_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        usage.input_chars = len(text)
+
+
+class _Window:
+    """The last WINDOW_CALLS calls of one style or template."""
+
+    def __init__(self) -> None:
+        # (prompt tokens, completion tokens, cached tokens, seconds, reported / estimated prompt tokens)
+        self._calls: Deque[Tuple[int, int, int, float, Optional[float]]] = deque(maxlen=WINDOW_CALLS)
+
+    def add(self, usage: TokenUsage, seconds: float, estimate_ratio: Optional[float]) -> None:
+        self._calls.append(
+            (usage.prompt_tokens, usage.completion_tokens, usage.cached_tokens, seconds, estimate_ratio)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        calls = len(self._calls)
+        prompt = sum(c[0] for c in self._calls)
+        completion = sum(c[1] for c in self._calls)
+        seconds = sum(c[3] for c in self._calls)
+        ratios = [c[4] for c in self._calls if c[4] is not None]
+        return {
+            "calls": calls,
+            "avg_prompt_tokens": round(prompt / calls, 1),
+            "avg_completion_tokens": round(completion / calls, 1),
+            "cached_share": round(sum(c[2] for c in self._calls) / prompt, 4) if prompt else 0.0,
+            "avg_seconds": round(seconds / calls, 3),
+            # Generation speed, for relating latency to output size
+            "completion_tokens_per_second": round(completion / seconds, 1) if seconds else None,
+            # How the local estimate compares with what the upstream counted (1.0 = exact)
+            "prompt_estimate_ratio": round(sum(ratios) / len(ratios), 3) if ratios else None,
+        }
+
+
+class UsageStats:
+    def __init__(self) -> None:
+        self.by_style: Dict[str, _Window] = {}
+        self.by_template: Dict[str, _Window] = {}
+        self._requests: Deque[RequestUsage] = deque(maxlen=WINDOW_CALLS)
+        self.calls = 0
+        self.estimated_calls = 0
+
+    def add(self, prompt: str, usage: TokenUsage, seconds: float) -> None:
+        style = style_label(prompt)
+        template = getattr(prompt, "template", "") or "untemplated"
+        ratio = None
+        if not usage.estimated:
+            ratio = estimate_tokens(prompt) / max(usage.prompt_tokens, 1)
+        self.by_style.setdefault(style, _Window()).add(usage, seconds, ratio)
+        self.by_template.setdefault(template, _Window()).add(usage, seconds, ratio)
+        self.calls += 1
+        self.estimated_calls += usage.estimated
+
+    def add_request(self, usage: RequestUsage) -> None:
+        self._requests.append(usage)
+
+    def stats(self) -> Dict[str, Any]:
+        expensive: List[RequestUsage] = sorted(self._requests, key=lambda r: r.total_tokens, reverse=True)
+        return {
+            "calls": self.calls,
+            "estimated_calls": self.estimated_calls,
+            "window_calls": WINDOW_CALLS,
+            "by_style": {k: w.stats() for k, w in sorted(self.by_style.items())},
+            "by_prompt_version": {k: w.stats() for k, w in sorted(self.by_template.items())},
+            "most_expensive_requests": [r.as_dict() for r in expensive[:EXPENSIVE_SHOWN]],
+        }
+
+    def reset(self) -> None:
+        self.by_style.clear()
+        self.by_template.clear()
+        self._requests.clear()
+        self.calls = self.estimated_calls = 0
+
+
+USAGE = UsageStats()
+
+
+def report_usage(prompt: str, usage: TokenUsage, seconds: float) -> None:
+    """Record one finished upstream call (see the module docstring)."""
+    style = style_label(prompt)
+    TOKENS.labels("prompt", style).inc(usage.prompt_tokens)
+    TOKENS.labels("completion", style).inc(usage.completion_tokens)
+    if usage.cached_tokens:
+        TOKENS.labels("cached", style).inc(usage.cached_tokens)
+    request = _request.get()
+    if request is not None:
+        request.add(usage, seconds)
+    USAGE.add(prompt, usage, seconds)
@@ -1,18 +1,80 @@
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
 
-from app.config import get_settings
+import app.cache.response_cache as response_cache
+import app.cache.speculative as speculative
+import app.llm.factory as llm_factory
+import app.observability.tracing as tracing
+import app.routes.sse_replay as sse_replay
+from app.config import get_settings, load_env_file
+from app.config_reload import ConfigReloader
 from app.errors.register import register_exception_handlers
+from app.llm.priority import PriorityLaneMiddleware
+from app.llm.provider import LLMProvider
+from app.llm.registry import ProviderRegistry
+from app.observability.middleware import MetricsMiddleware
+from app.routes.metrics import router as metrics_router
+from app.routes.ops import router as ops_router
 from app.routes.rephrase import router as rephrase_router
 
-load_dotenv()
+load_env_file()
 
 
-def create_app() -> FastAPI:
+def create_app(llm_provider: Optional[LLMProvider] = None) -> FastAPI:
+    """
+    `llm_provider` replaces the provider selected by LLM_MODE (used by the benchmark suite
+    to plug in a simulated upstream).
+    """
     settings = get_settings()
 
-    app = FastAPI()
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # One provider (and one upstream connection pool) per process, closed on shutdown.
+        registry = ProviderRegistry(settings, base_provider=llm_provider)
+        llm_factory.set_provider_registry(registry)
+        app.state.llm_registry = registry
+
+        cache = response_cache.build_response_cache(settings)
+        response_cache.set_response_cache(cache)
+        streams = sse_replay.build_stream_store(settings)
+        sse_replay.set_stream_store(streams)
+        prefetches = speculative.build_prefetch_store(settings)
+        speculative.set_prefetch_store(prefetches)
+        tracer = tracing.build_tracer(settings)
+        tracing.set_tracer(tracer)
+
+        # SIGHUP (and optionally a .env watch) swaps in a registry built from fresh settings
+        reloader = ConfigReloader(
+            registry,
+            base_provider=llm_provider,
+            on_swap=lambda new: setattr(app.state, "llm_registry", new),
+        )
+        reloader.install_signal_handler()
+        reloader.watch(settings.config_watch_seconds)
+        app.state.config_reloader = reloader
+        try:
+            yield
+        finally:
+            await reloader.aclose()
+            sse_replay.reset_stream_store()
+            if streams is not None:
+                await streams.aclose()
+            speculative.reset_prefetch_store()
+            if prefetches is not None:
+                await prefetches.aclose()
+            current = llm_factory.set_provider_registry(None)
+            await (current or registry).aclose()
+            response_cache.reset_response_cache()
+            if cache is not None:
+                cache.close()
+            tracing.set_tracer(None)
+            if tracer is not None:
+                tracer.close()
+
+    app = FastAPI(lifespan=lifespan)
 
     app.add_middleware(
         CORSMiddleware,
@@ -20,12 +82,22 @@ def create_app() -> FastAPI:
         allow_credentials=settings.cors_allow_credentials,
         allow_methods=list(settings.cors_allow_methods),
         allow_headers=list(settings.cors_allow_headers),
-        expose_headers=["Content-Type"],
+        expose_headers=["Content-Type", "X-Stream-Id", tracing.TRACE_HEADER],
     )
 
+    # Lanes follow the active settings, so PRIORITY_* changes apply on hot reload
+    app.add_middleware(PriorityLaneMiddleware, settings=lambda: llm_factory.get_provider_registry().settings)
+
+    app.add_middleware(tracing.TracingMiddleware)
+
+    # Added last so it is outermost and times the full response, CORS included
+    app.add_middleware(MetricsMiddleware)
+
     register_exception_handlers(app)
     app.include_router(rephrase_router)
+    app.include_router(ops_router)
+    app.include_router(metrics_router)
     return app
 
 
-app = create_app()
\ No newline at end of file
+app = create_app()
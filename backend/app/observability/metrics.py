@@ -0,0 +1,254 @@
+# backend/app/observability/metrics.py
+"""
+Minimal in-process Prometheus metrics (text exposition format 0.0.4).
+
+Recording is a dict lookup plus an integer/float add (histograms add a bisect),
+so it stays in the low microseconds on the request path. No external dependency.
+"""
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from app.observability.tracing import start_span
+
+# Latency buckets in seconds: sub-millisecond internal stages up to multi-second upstream calls
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._children: Dict[Tuple[str, ...], _CounterChild] = {}
+
+    def labels(self, *values: str) -> _CounterChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, _CounterChild())
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def value(self, *values: str) -> float:
+        child = self._children.get(values)
+        return child.value if child is not None else 0.0
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in self._children.items()
+        ]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def labels(self, *values: str) -> _GaugeChild:  # type: ignore[override]
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, _GaugeChild())
+        return child  # type: ignore[return-value]
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class _HistogramChild:
+    __slots__ = ("_upper", "counts", "sum", "count")
+
+    def __init__(self, upper: Tuple[float, ...]) -> None:
+        self._upper = upper
+        self.counts = [0] * (len(upper) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self._upper, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._upper = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, _HistogramChild(self._upper))
+        return child
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def child(self, *values: str) -> Optional[_HistogramChild]:
+        return self._children.get(values)
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for values, child in self._children.items():
+            cumulative = 0
+            for upper, n in zip(self._upper + (float("inf"),), child.counts):
+                cumulative += n
+                le = f'le="{_format_value(upper)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+_M = TypeVar("_M", bound=_Metric)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: "_M") -> "_M":
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# ----- HTTP layer -----
+HTTP_REQUESTS = REGISTRY.register(
+    Counter("http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"))
+)
+HTTP_LATENCY = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from request start until the response (including streamed bodies) completed.",
+        ("method", "route"),
+    )
+)
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge("http_requests_in_flight", "HTTP requests currently being served."))
+
+# ----- Rephrase pipeline -----
+STAGE_LATENCY = REGISTRY.register(
+    Histogram(
+        "rephrase_stage_duration_seconds",
+        "Duration of internal stages (validate_input, provider_acquire, parse_response).",
+        ("stage",),
+    )
+)
+UPSTREAM_TTFT = REGISTRY.register(
+    Histogram("llm_upstream_ttft_seconds", "Upstream time to first token (streaming calls).", ("kind",))
+)
+UPSTREAM_LATENCY = REGISTRY.register(
+    Histogram("llm_upstream_duration_seconds", "Total upstream call duration.", ("kind",))
+)
+SSE_BYTES = REGISTRY.register(Counter("sse_bytes_written_total", "Bytes written to SSE response bodies."))
+ERRORS = REGISTRY.register(
+    Counter("rephrase_errors_total", "Errors returned to clients, by normalized error code.", ("code",))
+)
+
+
+class stage_timer:
+    """
+    Time a block into rephrase_stage_duration_seconds{stage=...} (recorded even if it raises),
+    and as a span of the request's trace when it is traced.
+    """
+
+    # A class rather than @contextmanager: contextlib assigns __traceback__ when it re-raises,
+    # which the frozen LLMProviderError dataclass does not allow.
+
+    def __init__(self, stage: str):
+        self._child = STAGE_LATENCY.labels(stage)
+        self._stage = stage
+
+    def __enter__(self) -> None:
+        self._span = start_span(self._stage)
+        self._span.__enter__()
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        try:
+            self._span.__exit__(exc_type, exc, tb)
+        finally:
+            self._child.observe(time.perf_counter() - self._start)
+
+
+def record_error(code: str) -> None:
+    ERRORS.labels(code).inc()
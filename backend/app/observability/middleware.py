@@ -0,0 +1,48 @@
+# backend/app/observability/middleware.py
+from __future__ import annotations
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.llm.usage import begin_request, end_request
+from app.observability.metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request count, status and latency per route.
+    Latency covers the whole response, so streamed (SSE) bodies are included.
+    Routes are labelled by their template (e.g. "/rephrase/stream"), never the raw path.
+    Also opens the request's upstream token usage record (app.llm.usage).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        usage, usage_token = begin_request()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # FastAPI stores the matched route in the (shared) scope during routing
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            end_request(usage, usage_token, route)
@@ -0,0 +1,421 @@
+# backend/app/observability/tracing.py
+"""
+Sampled request tracing, written as OpenTelemetry (OTLP/JSON) spans to a local JSON-lines file.
+
+Each traced HTTP request gets a root span (TracingMiddleware) and child spans for its stages:
+the stage_timer() blocks (validate_input, provider_acquire, parse_response), the response cache
+lookup, generation, upstream admission, every upstream call (with a first_token event for
+streams) and, on /rephrase/stream, one span per style from the start of generation to that
+style's last delta. The trace id is returned in the X-Trace-Id header; an incoming W3C
+`traceparent` header is continued (same trace id, its span as parent, its sampled flag).
+
+Sampling: a request is head-sampled with probability TRACE_SAMPLE_RATE. With TRACE_SLOW_MS
+set, every request is recorded in memory and, besides the head-sampled ones, those slower than
+that or that failed are kept (tail sampling); the rest are dropped when they finish. A request
+has failed when it answered 5xx or an upstream call or generation failed; rejected client
+input (validation errors, other 4xx) is not a failure here.
+With tracing off, or a request neither head-sampled nor eligible for tail sampling,
+start_span() returns a shared no-op span, so instrumented code pays one context lookup.
+
+One line per kept trace, in the format of the OTel Collector's otlpjsonfile receiver:
+  {"resourceSpans": [{"resource": {...}, "scopeSpans": [{"scope": {...}, "spans": [...]}]}]}
+Kept traces are serialized and written by a background thread, never on the event loop.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import IO, Any, Dict, List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import Settings
+from app.llm.provider_errors import LLMProviderError
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace-Id"
+SERVICE_NAME = "rephrase-backend"
+# Spans kept per trace; later ones are counted but not recorded
+MAX_SPANS = 512
+# Kept traces waiting for the writer thread; more are dropped (and counted) while the disk lags
+MAX_PENDING_WRITES = 1000
+
+# OTLP enum values
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_ERROR = 0, 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_trace: ContextVar[Optional["Trace"]] = ContextVar("rephrase_trace", default=None)
+# Parent of spans started now; only set by `with span:` blocks that contain no yield
+_span: ContextVar[Optional["Span"]] = ContextVar("rephrase_span", default=None)
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Span:
+    """
+    One timed operation. Use as `with start_span(...):` around code without a yield (the span
+    is then the parent of spans started inside), or call end() yourself, e.g. across a stream.
+    """
+
+    __slots__ = (
+        "trace",
+        "span_id",
+        "parent_id",
+        "name",
+        "kind",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "events",
+        "status",
+        "message",
+        "_token",
+    )
+
+    def __init__(
+        self,
+        trace: "Trace",
+        name: str,
+        parent_id: str,
+        attributes: Dict[str, Any],
+        kind: int = KIND_INTERNAL,
+        start_ns: Optional[int] = None,
+    ):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.events: List[Dict[str, Any]] = []
+        self.status = STATUS_UNSET
+        self.message = ""
+        self._token: Any = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def event(self, name: str, **attributes: Any) -> None:
+        event: Dict[str, Any] = {"timeUnixNano": str(time.time_ns()), "name": name}
+        if attributes:
+            event["attributes"] = [_attribute(k, v) for k, v in attributes.items()]
+        self.events.append(event)
+
+    def fail(self, error: object, *, server_error: Optional[bool] = None) -> None:
+        """
+        Mark the span failed; `error` is an exception or a message. The trace counts as failed
+        (kept by tail sampling) for `server_error`, by default: a failed root (5xx) or upstream
+        call span, or an LLMProviderError anywhere. Rejected client input only marks the span.
+        """
+        self.status = STATUS_ERROR
+        self.message = error if isinstance(error, str) else getattr(error, "code", None) or type(error).__name__
+        if server_error is None:
+            server_error = self.kind != KIND_INTERNAL or isinstance(error, LLMProviderError)
+        if server_error:
+            self.trace.error = True
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        if not self.end_ns:
+            self.end_ns = end_ns or time.time_ns()
+            self.trace.span_ended()
+
+    def __enter__(self) -> "Span":
+        self._token = _span.set(self)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        _span.reset(self._token)
+        if isinstance(exc, Exception):  # not cancellation
+            self.fail(exc)
+        self.end()
+
+    def as_otlp(self) -> Dict[str, Any]:
+        span: Dict[str, Any] = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.message} if self.status else {},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.events:
+            span["events"] = self.events
+        return span
+
+
+class _NoopSpan:
+    """Returned by start_span() when the request is not being traced."""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def event(self, name: str, **attributes: Any) -> None:
+        pass
+
+    def fail(self, error: object, *, server_error: Optional[bool] = None) -> None:
+        pass
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """The spans of one request, handed to the tracer once the root and every other span ended."""
+
+    def __init__(self, tracer: "Tracer", trace_id: str, sampled: bool):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.error = False
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        self.root: Optional[Span] = None
+        self.finished = False
+        self._open = 0
+
+    def span(self, name: str, parent_id: str, attributes: Dict[str, Any], **kwargs: Any) -> Span:
+        span = Span(self, name, parent_id, attributes, **kwargs)
+        self._open += 1
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped_spans += 1
+        return span
+
+    def span_ended(self) -> None:
+        # Streams on resumable sessions may outlive the request; the trace waits for them
+        self._open -= 1
+        if self._open == 0:
+            self.finished = True
+            self.tracer.finish(self)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def start_span(
+    name: str,
+    *,
+    parent: Optional[Span] = None,
+    start_ns: Optional[int] = None,
+    kind: int = KIND_INTERNAL,
+    **attributes: Any,
+):
+    """A child of `parent` (default: the current span) in the current trace, or NOOP_SPAN when there is none."""
+    trace = _trace.get()
+    if trace is None or trace.finished:
+        return NOOP_SPAN
+    parent = parent or _span.get()
+    parent_id = parent.span_id if parent is not None and parent.trace is trace else ""
+    return trace.span(name, parent_id, attributes, kind=kind, start_ns=start_ns)
+
+
+class Tracer:
+    """Starts traces with the configured sampling and appends the kept ones to `path`."""
+
+    def __init__(self, path: str, *, sample_rate: float = 0.01, slow_seconds: float = 0.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self._file: Optional[IO[str]] = None
+        self._pending: "queue.Queue[Optional[Trace]]" = queue.Queue(MAX_PENDING_WRITES)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.started = 0
+        self.kept: Dict[str, int] = {"head": 0, "slow": 0, "error": 0}
+        self.dropped = 0
+        self.write_dropped = 0
+
+    def start_trace(self, traceparent: Optional[str]) -> Optional[Trace]:
+        """A Trace for a new request, or None if it can be neither head- nor tail-sampled."""
+        match = _TRACEPARENT.match((traceparent or "").strip().lower())
+        if match and match.group(1) != "0" * 32:
+            trace_id, parent_id, flags = match.groups()
+            sampled = bool(int(flags, 16) & 1)
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), ""
+            sampled = random.random() < self.sample_rate
+        if not sampled and self.slow_seconds <= 0:
+            return None
+        self.started += 1
+        trace = Trace(self, trace_id, sampled)
+        trace.root = trace.span("request", parent_id, {}, kind=KIND_SERVER)
+        return trace
+
+    def _outcome(self, trace: Trace) -> Optional[str]:
+        if trace.sampled:
+            return "head"
+        if trace.error:
+            return "error"
+        root = trace.root
+        if root is not None and (root.end_ns - root.start_ns) / 1e9 >= self.slow_seconds:
+            return "slow"
+        return None
+
+    def finish(self, trace: Trace) -> None:
+        outcome = self._outcome(trace)
+        if outcome is None:
+            self.dropped += 1
+            return
+        self.kept[outcome] += 1
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_pending, name="trace-writer", daemon=True)
+                self._writer.start()
+        try:
+            self._pending.put_nowait(trace)
+        except queue.Full:
+            self.write_dropped += 1
+
+    def _write_pending(self) -> None:
+        while True:
+            trace = self._pending.get()
+            if trace is None:
+                return
+            try:
+                self.write(trace)
+            except OSError:
+                logger.exception("Could not write trace to %s.", self.path)
+
+    def write(self, trace: Trace) -> None:
+        """Append `trace` to the file; called from the writer thread (flushes once it is idle)."""
+        record = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "app.observability.tracing"},
+                            "spans": [span.as_otlp() for span in trace.spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line)
+        if self._pending.empty():
+            self._file.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "sample_rate": self.sample_rate,
+            "slow_seconds": self.slow_seconds,
+            "started": self.started,
+            "kept": dict(self.kept),
+            "dropped": self.dropped,
+            "write_dropped": self.write_dropped,
+        }
+
+    def close(self) -> None:
+        """Write out the traces still queued, then close the file."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._pending.put(None)
+            writer.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_tracer: Optional[Tracer] = None
+
+
+def build_tracer(settings: Settings) -> Optional[Tracer]:
+    if not settings.trace_enabled:
+        return None
+    return Tracer(
+        settings.trace_path, sample_rate=settings.trace_sample_rate, slow_seconds=settings.trace_slow_seconds
+    )
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    global _tracer
+    _tracer = tracer
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening the root span and returning the trace id in X-Trace-Id."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        tracer = _tracer
+        trace = None
+        if tracer is not None and scope["type"] == "http":
+            trace = tracer.start_trace(dict(scope["headers"]).get(b"traceparent", b"").decode("latin-1"))
+        if trace is None:
+            await self.app(scope, receive, send)
+            return
+
+        root = trace.root
+        assert root is not None
+        status = 500
+        header = (TRACE_HEADER.lower().encode(), trace.trace_id.encode())
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        trace_token, span_token = _trace.set(trace), _span.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _span.reset(span_token)
+            _trace.reset(trace_token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            root.name = f"{scope['method']} {route}"
+            root.set("http.request.method", scope["method"])
+            root.set("http.route", route)
+            root.set("http.response.status_code", status)
+            if status >= 500:
+                root.fail(f"HTTP {status}")
+            root.end()
@@ -0,0 +1,123 @@
+# backend/app/routes/ops.py
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Request
+
+import app.cache.response_cache as response_cache
+import app.cache.speculative as speculative
+import app.llm.factory as llm_factory
+import app.observability.tracing as tracing
+import app.routes.sse_replay as sse_replay
+from app.llm.usage import USAGE
+
+router = APIRouter(prefix="/ops", tags=["ops"])
+
+
+@router.get("/pool")
+async def pool_stats_endpoint() -> Dict[str, Any]:
+    """Upstream connection pool usage (in-use / idle / waiting) for operators."""
+    return llm_factory.get_provider_registry().pool_stats()
+
+
+@router.get("/cache")
+async def cache_stats_endpoint() -> Dict[str, Any]:
+    """Response cache hit/miss/eviction counters."""
+    cache = response_cache.get_response_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@router.get("/singleflight")
+async def single_flight_stats_endpoint() -> Dict[str, Any]:
+    """In-flight deduplicated upstream calls and how many requests were coalesced."""
+    return llm_factory.get_provider_registry().flights.stats()
+
+
+@router.get("/admission")
+async def admission_stats_endpoint() -> Dict[str, Any]:
+    """Upstream admission control: adaptive concurrency limit, queue depth, shed/throttle counts."""
+    admission = llm_factory.get_provider_registry().admission
+    if admission is None:
+        return {"enabled": False}
+    return {"enabled": True, **admission.stats()}
+
+
+@router.get("/retry")
+async def retry_stats_endpoint() -> Dict[str, Any]:
+    """Upstream retry budget and hedging threshold."""
+    retry = llm_factory.get_provider_registry().retry
+    if retry is None:
+        return {"enabled": False}
+    return {"enabled": True, **retry.stats()}
+
+
+@router.get("/circuit")
+async def circuit_stats_endpoint() -> Dict[str, Any]:
+    """Upstream circuit breaker: state, failure rates per error class in the window, rejected calls."""
+    circuit = llm_factory.get_provider_registry().circuit
+    if circuit is None:
+        return {"enabled": False}
+    return {"enabled": True, **circuit.stats()}
+
+
+@router.get("/router")
+async def router_stats_endpoint() -> Dict[str, Any]:
+    """Multi-deployment routing: per-backend latency/error EWMAs, circuit state, recent decisions."""
+    upstream_router = llm_factory.get_provider_registry().router
+    if upstream_router is None:
+        return {"enabled": False}
+    return {"enabled": True, **upstream_router.stats()}
+
+
+@router.get("/replay")
+async def replay_stats_endpoint() -> Dict[str, Any]:
+    """LLM_MODE=replay: recorded sessions loaded, prompts replayed exactly vs. by kind."""
+    replay = llm_factory.get_provider_registry().replay
+    if replay is None:
+        return {"enabled": False}
+    return {"enabled": True, **replay.stats()}
+
+
+@router.get("/config")
+async def config_endpoint(request: Request) -> Dict[str, Any]:
+    """Version of the configuration in effect (changes on every applied reload)."""
+    reloader = getattr(request.app.state, "config_reloader", None)
+    if reloader is None:
+        return {"version": llm_factory.get_provider_registry().settings.version, "hot_reload": False}
+    return {**reloader.stats(), "hot_reload": True}
+
+
+@router.get("/streams")
+async def stream_store_endpoint() -> Dict[str, Any]:
+    """Resumable SSE streams: running / detached counts and replay buffer memory."""
+    store = sse_replay.get_stream_store()
+    if store is None:
+        return {"enabled": False}
+    return {"enabled": True, **store.stats()}
+
+
+@router.get("/prefetch")
+async def prefetch_endpoint() -> Dict[str, Any]:
+    """Speculative prefetch: drafts generating or ready, and how many were used vs. wasted."""
+    store = speculative.get_prefetch_store()
+    if store is None:
+        return {"enabled": False}
+    return {"enabled": True, **store.stats()}
+
+
+@router.get("/usage")
+async def usage_endpoint() -> Dict[str, Any]:
+    """Upstream token usage: rolling per-style and per-prompt-version stats, most expensive requests."""
+    return USAGE.stats()
+
+
+@router.get("/tracing")
+async def tracing_endpoint() -> Dict[str, Any]:
+    """Request tracing: sampling settings and traces kept (head, slow, error) or dropped."""
+    tracer = tracing.get_tracer()
+    if tracer is None:
+        return {"enabled": False}
+    return {"enabled": True, **tracer.stats()}
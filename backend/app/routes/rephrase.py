@@ -3,108 +3,382 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import AsyncGenerator, Dict, Iterable
+import time
+from contextlib import aclosing
+from typing import AsyncGenerator, Callable, Dict, Iterable, Optional, Set
 
 from fastapi import APIRouter, HTTPException, Request
 from starlette.responses import StreamingResponse
 
-from app.schemas.rephrase import RephraseRequest, RephraseResponse
-from app.services.rephrase import rephrase_service, ValidationError
-from app.llm.factory import get_llm_provider
-from app.llm.rephrase_generator import generate_rephrases, generate_rephrases_stream
+from app.schemas.rephrase import PrefetchRequest, RephraseBatchRequest, RephraseRequest, RephraseResponse
+from app.services.rephrase import rephrase_service, validate_text, ValidationError
+from app.services.rephrase_batch import rephrase_batch_service
+import app.cache.response_cache as response_cache
+import app.cache.speculative as speculative
+import app.routes.sse_replay as sse_replay
+import app.llm.factory as llm_factory
+from app.llm.deadline import Deadline, bounded_stream, parse_timeout_header
+from app.llm.rephrase_generator import STYLES, generate_rephrases, generate_rephrases_stream
 from app.llm.provider_errors import LLMProviderError
 from app.llm.parse import ModelOutputError
+from app.llm.usage import note_input
+from app.observability.metrics import SSE_BYTES, record_error, stage_timer
+from app.observability.tracing import current_trace, start_span
+from app.routes.sse import DisconnectWatcher, coalesce_deltas, encode_partial
 
 router = APIRouter()
 
+# Cached results are replayed as partial events of this many characters
+_REPLAY_CHUNK_CHARS = 32
+
+# Seconds the client is prepared to wait for the whole request
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+
+def _request_deadline(request: Request) -> Optional[Deadline]:
+    settings = llm_factory.get_provider_registry().settings
+    try:
+        return parse_timeout_header(
+            request.headers.get(TIMEOUT_HEADER),
+            default=settings.request_timeout_seconds,
+            maximum=settings.request_timeout_max_seconds,
+        )
+    except ValueError as e:
+        record_error("VALIDATION_ERROR")
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
 
 @router.post("/rephrase", response_model=RephraseResponse)
-async def rephrase_endpoint(req: RephraseRequest):
+async def rephrase_endpoint(req: RephraseRequest, request: Request):
+    deadline = _request_deadline(request)
     try:
-        return await rephrase_service(req)
+        return await rephrase_service(req, deadline)
     except ValidationError as e:
+        record_error("VALIDATION_ERROR")
         raise HTTPException(status_code=400, detail=str(e)) from e
 
 
+@router.post("/rephrase/batch")
+async def rephrase_batch_endpoint(req: RephraseBatchRequest):
+    """
+    Streams NDJSON, one line per input text in completion order:
+      {"index": 0, "result": {...}} or {"index": 1, "error": {"code": ..., "message": ..., "details": []}}
+    """
+    settings = llm_factory.get_provider_registry().settings
+    if len(req.texts) > settings.batch_max_items:
+        record_error("VALIDATION_ERROR")
+        raise HTTPException(status_code=400, detail=f'"texts" must contain at most {settings.batch_max_items} items')
+
+    lines = rephrase_batch_service(
+        req.texts,
+        max_parallel=settings.batch_max_parallel,
+        pack_size=settings.batch_pack_size if req.pack else 1,
+        pack_max_chars=settings.batch_pack_max_chars,
+    )
+
+    async def body() -> AsyncGenerator[bytes, None]:
+        async with aclosing(lines):
+            async for line in lines:
+                yield (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/rephrase/prefetch", status_code=202)
+async def rephrase_prefetch_endpoint(req: PrefetchRequest) -> Dict[str, str]:
+    """
+    Start generating a draft in the background so a later /rephrase or /rephrase/stream of the
+    same text can attach to it. Returns {"status": ...}:
+      started, running or ready (already prefetched), cached (in the response cache),
+      skipped (too short, or too many prefetches running) or disabled.
+    """
+    store = speculative.get_prefetch_store()
+    if store is None:
+        return {"status": "disabled"}
+    try:
+        text = validate_text(req.text)
+    except ValidationError as e:
+        record_error("VALIDATION_ERROR")
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if len(text) < store.min_chars:
+        return {"status": "skipped"}
+
+    key = speculative.fingerprint(text)
+    store.supersede(req.session_id, key)
+    existing = store.get(key)
+    if existing is not None:
+        return {"status": "ready" if existing.done else "running"}
+    cache = response_cache.get_response_cache()
+    if cache is not None and await cache.lookup(text) is not None:
+        return {"status": "cached"}
+    if not store.has_room():
+        return {"status": "skipped"}
+
+    note_input(text)
+    provider = llm_factory.get_llm_provider()
+    settings = llm_factory.get_provider_registry().settings
+    completed: Set[str] = set()
+    # Started from this request, the generation inherits its (bulk) lane
+    deltas = generate_rephrases_stream(
+        provider,
+        text,
+        concurrent=settings.stream_mode == "concurrent",
+        max_in_flight=settings.stream_max_in_flight or None,
+        single_call=settings.stream_mode == "single_call",
+        completed=completed,
+        chunk_tokens=settings.long_input_chunk_tokens,
+        max_parallel_chunks=settings.long_input_max_parallel,
+    )
+    store.start(key, req.session_id, deltas, completed)
+    return {"status": "started"}
+
+
 def _sse(event: str, data: Dict) -> bytes:
     payload = json.dumps(data, ensure_ascii=False)
     return f"event: {event}\n" f"data: {payload}\n\n".encode("utf-8")
 
 
+def _sse_error(code: str, message: str) -> bytes:
+    record_error(code)
+    return _sse("error", {"code": code, "message": message, "details": []})
+
+
+def _sse_timeout(error: LLMProviderError, assembled: Dict[str, str], completed: Set[str]) -> bytes:
+    """Terminal event when the deadline passes mid-stream: the styles that did finish, and the rest."""
+    record_error(error.code)
+    return _sse(
+        "timeout",
+        {
+            "code": error.code,
+            "message": error.message,
+            "details": [],
+            "completed": {style: assembled[style].strip() for style in STYLES if style in completed},
+            "pending": [style for style in STYLES if style not in completed],
+        },
+    )
+
+
+async def _metered(stream: AsyncGenerator[bytes, None]) -> AsyncGenerator[bytes, None]:
+    async with aclosing(stream):
+        async for chunk in stream:
+            SSE_BYTES.inc(len(chunk))
+            yield chunk
+
+
 def _chunks(s: str, size: int) -> Iterable[str]:
     for i in range(0, len(s), size):
         yield s[i : i + size]
 
 
-@router.post("/rephrase/stream")
-async def rephrase_stream_endpoint(req: RephraseRequest, request: Request):
-    async def event_stream() -> AsyncGenerator[bytes, None]:
-        yield b": stream-open\n\n"
-        if await request.is_disconnected():
-            return
+def _stopped(stop: "Optional[asyncio.Future[None]]") -> bool:
+    return stop is not None and stop.done()
 
-        text = req.text.strip()
-        if not text:
-            yield _sse(
-                "error",
-                {"code": "VALIDATION_ERROR", "message": "Invalid request: text (min_length)", "details": []},
-            )
-            return
 
-        try:
-            provider = get_llm_provider()
+async def _traced_styles(
+    deltas: AsyncGenerator[Dict[str, str], None], mode: str
+) -> AsyncGenerator[Dict[str, str], None]:
+    """
+    Re-yield `deltas` with a generate_rephrases_stream span and, under it, one span per style
+    from the start of generation to its last delta (first_token event on its first).
+    """
+    if current_trace() is None:
+        async with aclosing(deltas):
+            async for item in deltas:
+                yield item
+        return
 
-            if await request.is_disconnected():
-                return
+    generation = start_span("generate_rephrases_stream", **{"stream.mode": mode})
+    styles = {style: start_span("stream." + style, parent=generation, style=style) for style in STYLES}
+    chars = dict.fromkeys(STYLES, 0)
+    last: Dict[str, int] = {}
+    try:
+        async with aclosing(deltas):
+            async for item in deltas:
+                style = item["style"]
+                if style not in last:
+                    styles[style].event("first_token")
+                last[style] = time.time_ns()
+                chars[style] += len(item["delta"])
+                yield item
+    except Exception as e:
+        generation.fail(e, server_error=True)  # input was validated before generation started
+        raise
+    finally:
+        for style, span in styles.items():
+            span.set("stream.chars", chars[style])
+            span.end(last.get(style))
+        generation.end()
 
-            # Assemble per-style outputs 
-            assembled: Dict[str, str] = {
-                "professional": "",
-                "casual": "",
-                "polite": "",
-                "social": "",
-            }
 
-            async for item in generate_rephrases_stream(provider, text):
-                if await request.is_disconnected():
-                    return
-                style = item["style"]
-                delta = item["delta"]
-                assembled[style] += delta
-                yield _sse("partial", {"style": style, "delta": delta})
-
-            final = RephraseResponse(
-                professional=assembled["professional"].strip(),
-                casual=assembled["casual"].strip(),
-                polite=assembled["polite"].strip(),
-                social=assembled["social"].strip(),
-            )
+async def _prefetched(
+    prefetch: speculative.Prefetch,
+    fresh: Callable[[], AsyncGenerator[Dict[str, str], None]],
+    completed: Set[str],
+    deadline: Optional[Deadline],
+) -> AsyncGenerator[Dict[str, str], None]:
+    """Deltas of a prefetched generation; a `fresh` one if the prefetch fails before yielding anything."""
+    delivered = False
+    try:
+        items = bounded_stream(prefetch.follow(completed), deadline)
+        async with aclosing(items):
+            async for item in items:
+                delivered = True
+                yield item
+        return
+    except speculative.PrefetchFailed as e:
+        if delivered:
+            raise (e.__cause__ if isinstance(e.__cause__, Exception) else e)
+    deltas = fresh()
+    async with aclosing(deltas):
+        async for item in deltas:
+            yield item
 
-        except LLMProviderError as e:
-            yield _sse("error", {"code": e.code, "message": e.message, "details": []})
-            return
-        except ModelOutputError:
-            yield _sse("error", {"code": "INTERNAL_ERROR", "message": "Invalid model output.", "details": []})
+
+async def _rephrase_events(
+    req: RephraseRequest,
+    stop: "Optional[asyncio.Future[None]]" = None,
+    deadline: Optional[Deadline] = None,
+) -> AsyncGenerator[bytes, None]:
+    """
+    SSE frames for one generation; ends early (without final) once `stop` completes.
+    If `deadline` passes first, ends with a `timeout` event carrying the styles that finished.
+    """
+    if _stopped(stop):
+        return
+
+    # Assemble per-style outputs
+    assembled: Dict[str, str] = {style: "" for style in STYLES}
+    completed: Set[str] = set()
+
+    with stage_timer("validate_input"):
+        text = req.text.strip()
+    if not text:
+        yield _sse_error("VALIDATION_ERROR", "Invalid request: text (min_length)")
+        return
+    note_input(text)
+
+    try:
+        cache = response_cache.get_response_cache()
+        cached = None
+        if cache is not None:
+            with start_span("cache.lookup") as span:
+                cached = await cache.lookup(text)
+                span.set("cache.hit", cached is not None)
+        if cached is not None:
+            # Same event sequence as a live stream, minus the upstream wait
+            for style in STYLES:
+                for piece in _chunks(getattr(cached, style), _REPLAY_CHUNK_CHARS):
+                    yield encode_partial(style, piece)
+            yield _sse("final", cached.model_dump())
             return
-        except Exception:
-            yield _sse("error", {"code": "INTERNAL_ERROR", "message": "An unexpected error occurred.", "details": []})
+
+        with stage_timer("provider_acquire"):
+            provider = llm_factory.get_llm_provider()
+            settings = llm_factory.get_provider_registry().settings
+
+        if _stopped(stop):
             return
 
-        if await request.is_disconnected():
+        def generate() -> AsyncGenerator[Dict[str, str], None]:
+            return generate_rephrases_stream(
+                provider,
+                text,
+                concurrent=settings.stream_mode == "concurrent",
+                max_in_flight=settings.stream_max_in_flight or None,
+                single_call=settings.stream_mode == "single_call",
+                deadline=deadline,
+                completed=completed,
+                chunk_tokens=settings.long_input_chunk_tokens,
+                max_parallel_chunks=settings.long_input_max_parallel,
+            )
+
+        prefetch = speculative.claim_prefetch(text)
+        source = generate() if prefetch is None else _prefetched(prefetch, generate, completed, deadline)
+        deltas = _traced_styles(source, settings.stream_mode)
+        # aclosing: on disconnect, cancel every in-flight style right away
+        async with aclosing(deltas):
+            pieces = coalesce_deltas(
+                deltas,
+                window_seconds=settings.sse_coalesce_seconds,
+                max_chars=settings.sse_coalesce_chars,
+                stop=stop,
+            )
+            async with aclosing(pieces):
+                async for style, piece in pieces:
+                    assembled[style] += piece
+                    yield encode_partial(style, piece)
+        if _stopped(stop):
             return
 
-        yield _sse(
-            "final",
-            {
-                "professional": final.professional,
-                "casual": final.casual,
-                "polite": final.polite,
-                "social": final.social,
-            },
+        final = RephraseResponse(
+            professional=assembled["professional"].strip(),
+            casual=assembled["casual"].strip(),
+            polite=assembled["polite"].strip(),
+            social=assembled["social"].strip(),
         )
+        if cache is not None:
+            await cache.store(text, final)
+
+    except LLMProviderError as e:
+        if e.code == "LLM_TIMEOUT":
+            yield _sse_timeout(e, assembled, completed)
+        else:
+            yield _sse_error(e.code, e.message)
+        return
+    except ModelOutputError:
+        yield _sse_error("INTERNAL_ERROR", "Invalid model output.")
+        return
+    except Exception:
+        yield _sse_error("INTERNAL_ERROR", "An unexpected error occurred.")
+        return
+
+    if _stopped(stop):
+        return
+
+    yield _sse(
+        "final",
+        {
+            "professional": final.professional,
+            "casual": final.casual,
+            "polite": final.polite,
+            "social": final.social,
+        },
+    )
+
+
+@router.post("/rephrase/stream")
+async def rephrase_stream_endpoint(req: RephraseRequest, request: Request):
+    headers = {"Cache-Control": "no-cache", "Connection": "keep-alive"}
+    deadline = _request_deadline(request)
+    store = sse_replay.get_stream_store()
+    if store is None:
+
+        async def event_stream() -> AsyncGenerator[bytes, None]:
+            yield b": stream-open\n\n"
+            async with DisconnectWatcher(request) as watcher:
+                events = _rephrase_events(req, watcher.gone, deadline)
+                async with aclosing(events):
+                    async for frame in events:
+                        yield frame
+
+        return StreamingResponse(_metered(event_stream()), media_type="text/event-stream", headers=headers)
+
+    # Resumable: generation outlives the connection; the response just follows the replay buffer
+    fingerprint = sse_replay.fingerprint(req.text)
+    last_event_id = request.headers.get("last-event-id")
+    resumed = store.resume(last_event_id, fingerprint) if last_event_id else None
+    if resumed is not None:
+        session, after = resumed
+    else:
+        session, after = store.start(fingerprint, _rephrase_events(req, deadline=deadline)), 0
+    headers["X-Stream-Id"] = session.id
+
+    async def follow_stream() -> AsyncGenerator[bytes, None]:
+        yield b": stream-open\n\n"
+        async with DisconnectWatcher(request) as watcher:
+            frames = session.follow(after, watcher.gone)
+            async with aclosing(frames):
+                async for frame in frames:
+                    yield frame
 
-    return StreamingResponse(
-        event_stream(),
-        media_type="text/event-stream",
-        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
-    )
\ No newline at end of file
+    return StreamingResponse(_metered(follow_stream()), media_type="text/event-stream", headers=headers)
\ No newline at end of file
@@ -0,0 +1,126 @@
+# backend/app/routes/sse.py
+"""
+Server-sent events plumbing for /rephrase/stream: pre-encoded `partial` framing,
+per-style delta coalescing and a single background disconnect watcher per connection.
+"""
+from __future__ import annotations
+
+import asyncio
+from json.encoder import encode_basestring  # json.dumps(str, ensure_ascii=False) without the dumps overhead
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
+
+from starlette.requests import Request
+
+from app.llm.rephrase_generator import STYLES
+
+# `event: partial` frames differ only in style and delta: everything else is encoded once.
+# Byte-for-byte what json.dumps({"style": style, "delta": delta}) would produce.
+_PARTIAL_HEAD: Dict[str, bytes] = {
+    style: f'event: partial\ndata: {{"style": "{style}", "delta": '.encode("utf-8") for style in STYLES
+}
+_FRAME_TAIL = b"}\n\n"
+
+
+def encode_partial(style: str, delta: str) -> bytes:
+    return _PARTIAL_HEAD[style] + encode_basestring(delta).encode("utf-8") + _FRAME_TAIL
+
+
+class DisconnectWatcher:
+    """
+    Waits for `http.disconnect` in one background task, so the stream can check
+    `disconnected` (an attribute read) instead of calling request.is_disconnected() per event.
+    `gone` is a future that completes on disconnect, for use in asyncio.wait().
+    """
+
+    def __init__(self, request: Request):
+        self._request = request
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.gone: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+
+    @property
+    def disconnected(self) -> bool:
+        return self.gone.done()
+
+    async def _watch(self) -> None:
+        while True:
+            message = await self._request.receive()
+            if message["type"] == "http.disconnect":
+                self.gone.set_result(None)
+                return
+
+    async def __aenter__(self) -> "DisconnectWatcher":
+        self._task = asyncio.create_task(self._watch(), name="sse-disconnect-watcher")
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def coalesce_deltas(
+    deltas: AsyncIterator[Dict[str, str]],
+    *,
+    window_seconds: float,
+    max_chars: int,
+    stop: Optional["asyncio.Future[None]"] = None,
+) -> AsyncGenerator[Tuple[str, str], None]:
+    """
+    Merge {"style", "delta"} items into fewer, larger (style, text) pieces.
+    A style's buffer is flushed once it holds `max_chars` characters, and every buffer is
+    flushed `window_seconds` after the oldest delta in it arrived (0 = no batching).
+    Per-style order is preserved. Stops quietly, dropping buffered text, once `stop` completes.
+    """
+    loop = asyncio.get_running_loop()
+    buffers: Dict[str, List[str]] = {}
+    sizes: Dict[str, int] = {}
+    deadline: Optional[float] = None
+    it = deltas.__aiter__()
+    pending: Optional["asyncio.Future[Dict[str, str]]"] = None
+
+    def take(style: str) -> Tuple[str, str]:
+        sizes.pop(style)
+        return style, "".join(buffers.pop(style))
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(it.__anext__())
+            waiters = {pending} if stop is None else {pending, stop}
+            timeout = None if deadline is None else max(deadline - loop.time(), 0.0)
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if stop is not None and stop.done():
+                return
+
+            if pending.done():
+                next_item, pending = pending, None
+                try:
+                    item = next_item.result()
+                except StopAsyncIteration:
+                    break
+                except Exception:
+                    # Deliver what already arrived before the error event
+                    for style in list(buffers):
+                        yield take(style)
+                    raise
+                style, delta = item["style"], item["delta"]
+                buffers.setdefault(style, []).append(delta)
+                sizes[style] = sizes.get(style, 0) + len(delta)
+                if window_seconds <= 0 or sizes[style] >= max_chars:
+                    yield take(style)
+                elif deadline is None:
+                    deadline = loop.time() + window_seconds
+
+            if not buffers:
+                deadline = None
+            elif deadline is not None and loop.time() >= deadline:
+                for style in list(buffers):
+                    yield take(style)
+                deadline = None
+
+        for style in list(buffers):
+            yield take(style)
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
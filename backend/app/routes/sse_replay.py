@@ -0,0 +1,287 @@
+# backend/app/routes/sse_replay.py
+"""
+Resumable /rephrase/stream: generation runs in a background task that writes numbered SSE
+frames into a bounded per-stream replay buffer; HTTP connections only follow that buffer.
+A client that drops can reconnect with `Last-Event-ID: <stream id>:<seq>` and continue
+from the buffer while the stream keeps generating (for a grace period with nobody attached).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, AsyncGenerator, Deque, Dict, Optional, Tuple
+
+from app.cache.response_cache import normalize_text
+from app.config import Settings, get_settings
+from app.observability.metrics import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+SSE_REPLAY_BYTES = REGISTRY.register(Gauge("sse_replay_buffer_bytes", "Bytes held in SSE replay buffers."))
+SSE_RESUMES = REGISTRY.register(
+    Counter("sse_stream_resumes_total", "Reconnects with Last-Event-ID by outcome.", ("outcome",))
+)
+SSE_REPLAY_EVICTIONS = REGISTRY.register(
+    Counter("sse_replay_evictions_total", "Streams dropped from the replay store.", ("reason",))
+)
+
+
+def fingerprint(text: str) -> str:
+    """Identifies the input of a stream, so a Last-Event-ID is only honoured for the same text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class StreamSession:
+    """One generation: its numbered frames (seq starts at 1) and the connections following it."""
+
+    def __init__(self, store: "StreamSessionStore", stream_id: str, fingerprint: str):
+        self._store = store
+        self.id = stream_id
+        self.fingerprint = fingerprint
+        self._frames: Deque[bytes] = deque()
+        self.first_seq = 1  # seq of _frames[0]; grows when the buffer is trimmed
+        self.next_seq = 1
+        self.nbytes = 0
+        self.done = False
+        self.cancelled = False
+        self.subscribers = 0
+        self.last_active = time.monotonic()
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._changed: Optional["asyncio.Future[None]"] = None
+        self._grace: Optional[asyncio.TimerHandle] = None
+
+    def _notify(self) -> None:
+        if self._changed is not None and not self._changed.done():
+            self._changed.set_result(None)
+        self._changed = None
+
+    def append(self, frame: bytes) -> None:
+        # `id:` goes last so frames still start with their `event:` line
+        framed = frame[:-1] + f"id: {self.id}:{self.next_seq}\n\n".encode("ascii")
+        self._frames.append(framed)
+        self.next_seq += 1
+        self.nbytes += len(framed)
+        self._store._grow(len(framed))
+        # Bounded per stream: forget the oldest frames (those can no longer be resumed from)
+        while self.nbytes > self._store.max_stream_bytes and len(self._frames) > 1:
+            dropped = self._frames.popleft()
+            self.first_seq += 1
+            self.nbytes -= len(dropped)
+            self._store._grow(-len(dropped))
+        self._notify()
+        self._store._enforce_budget(self)
+
+    def finish(self) -> None:
+        self.done = True
+        self.last_active = time.monotonic()
+        self._notify()
+
+    def release(self) -> int:
+        """Drop the buffered frames; returns the bytes freed."""
+        freed = self.nbytes
+        self._frames.clear()
+        self.first_seq = self.next_seq
+        self.nbytes = 0
+        self._store._grow(-freed)
+        return freed
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self._grace is not None:
+            self._grace.cancel()
+            self._grace = None
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+    def can_resume_after(self, seq: int) -> bool:
+        return not self.cancelled and self.first_seq <= seq + 1 <= self.next_seq
+
+    async def follow(self, after: int, gone: "Optional[asyncio.Future[None]]" = None) -> AsyncGenerator[bytes, None]:
+        """Yield frames with seq > `after` as they arrive, until the stream ends or `gone` completes."""
+        loop = asyncio.get_running_loop()
+        self.subscribers += 1
+        if self._grace is not None:
+            self._grace.cancel()
+            self._grace = None
+        seq = after + 1
+        try:
+            while True:
+                if seq < self.first_seq:
+                    # Fell further behind than the replay buffer reaches: give up on this connection
+                    logger.warning("SSE follower of %s lost frames %d..%d.", self.id, seq, self.first_seq - 1)
+                    return
+                while seq < self.next_seq:
+                    yield self._frames[seq - self.first_seq]
+                    seq += 1
+                if self.done or self.cancelled:
+                    return
+                if self._changed is None:
+                    self._changed = loop.create_future()
+                waiters = {self._changed} if gone is None else {self._changed, gone}
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                if gone is not None and gone.done():
+                    return
+        finally:
+            self.subscribers -= 1
+            self.last_active = time.monotonic()
+            if self.subscribers == 0 and not self.done and not self.cancelled:
+                # Nobody is listening: keep generating for a while in case the client comes back
+                self._grace = loop.call_later(self._store.grace_seconds, self._expire)
+
+    def _expire(self) -> None:
+        self._grace = None
+        if self.subscribers == 0 and not self.done:
+            logger.info("SSE stream %s abandoned after the resume grace period.", self.id)
+            self._store._evict(self.id, "abandoned")
+
+
+class StreamSessionStore:
+    """Process-wide registry of resumable streams, capped at `max_bytes` of buffered frames."""
+
+    def __init__(
+        self,
+        *,
+        grace_seconds: float = 30.0,
+        ttl_seconds: float = 60.0,
+        max_bytes: int = 8 * 1024 * 1024,
+        max_stream_bytes: int = 256 * 1024,
+    ):
+        self.grace_seconds = grace_seconds
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_stream_bytes = max_stream_bytes
+        # Least recently active first
+        self._sessions: "OrderedDict[str, StreamSession]" = OrderedDict()
+        self.total_bytes = 0
+        self.started = 0
+        self.resumed = 0
+        self.evicted = 0
+
+    def _grow(self, delta: int) -> None:
+        self.total_bytes += delta
+        SSE_REPLAY_BYTES.inc(delta)
+
+    def start(self, fingerprint: str, frames: AsyncGenerator[bytes, None]) -> StreamSession:
+        """Register a new stream and start producing `frames` into it in the background."""
+        self._sweep()
+        session = StreamSession(self, uuid.uuid4().hex, fingerprint)
+        self._sessions[session.id] = session
+        self.started += 1
+
+        async def produce() -> None:
+            try:
+                async for frame in frames:
+                    session.append(frame)
+            finally:
+                await frames.aclose()
+                session.finish()
+
+        session.task = asyncio.create_task(produce(), name=f"sse-stream-{session.id}")
+        return session
+
+    def resume(self, last_event_id: str, fingerprint: str) -> Optional[Tuple[StreamSession, int]]:
+        """Find the stream a `Last-Event-ID` belongs to; returns (session, last seq seen) or None."""
+        self._sweep()
+        stream_id, _, raw_seq = last_event_id.strip().partition(":")
+        session = self._sessions.get(stream_id)
+        outcome = "resumed"
+        try:
+            seq = int(raw_seq)
+        except ValueError:
+            seq, outcome = -1, "invalid"
+        if session is None:
+            outcome = "unknown" if outcome == "resumed" else outcome
+        elif session.fingerprint != fingerprint:
+            outcome = "mismatch"
+        elif outcome == "resumed" and not session.can_resume_after(seq):
+            outcome = "expired"
+        SSE_RESUMES.labels(outcome).inc()
+        if outcome != "resumed" or session is None:
+            return None
+        self.resumed += 1
+        session.last_active = time.monotonic()
+        self._sessions.move_to_end(session.id)
+        return session, seq
+
+    def _evict(self, stream_id: str, reason: str) -> None:
+        session = self._sessions.pop(stream_id, None)
+        if session is None:
+            return
+        session.cancel()
+        session.release()
+        self.evicted += 1
+        SSE_REPLAY_EVICTIONS.labels(reason).inc()
+
+    def _sweep(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for stream_id, session in list(self._sessions.items()):
+            if session.done and session.subscribers == 0 and session.last_active < cutoff:
+                self._evict(stream_id, "expired")
+
+    def _enforce_budget(self, keep: StreamSession) -> None:
+        if self.total_bytes <= self.max_bytes:
+            return
+        # Finished streams first, then ones nobody is attached to; live connections are never cut off
+        for wanted in (lambda s: s.done, lambda s: s.subscribers == 0):
+            for stream_id, session in list(self._sessions.items()):
+                if self.total_bytes <= self.max_bytes:
+                    return
+                if session is not keep and session.subscribers == 0 and wanted(session):
+                    self._evict(stream_id, "memory")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "streams": len(self._sessions),
+            "running": sum(1 for s in self._sessions.values() if not s.done),
+            "detached": sum(1 for s in self._sessions.values() if not s.done and s.subscribers == 0),
+            "buffered_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "started": self.started,
+            "resumed": self.resumed,
+            "evicted": self.evicted,
+        }
+
+    async def aclose(self) -> None:
+        tasks = [s.task for s in self._sessions.values() if s.task is not None]
+        for stream_id in list(self._sessions):
+            self._evict(stream_id, "shutdown")
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def build_stream_store(settings: Settings) -> Optional[StreamSessionStore]:
+    if not settings.sse_resume_enabled:
+        return None
+    return StreamSessionStore(
+        grace_seconds=settings.sse_resume_grace_seconds,
+        ttl_seconds=settings.sse_resume_ttl_seconds,
+        max_bytes=settings.sse_replay_max_bytes,
+        max_stream_bytes=settings.sse_replay_stream_max_bytes,
+    )
+
+
+# Process-wide store; installed by the app lifespan, created lazily otherwise.
+_store: Optional[StreamSessionStore] = None
+_store_ready = False
+
+
+def get_stream_store() -> Optional[StreamSessionStore]:
+    """Return the process-wide store, or None when resumable streams are disabled."""
+    global _store, _store_ready
+    if not _store_ready:
+        _store = build_stream_store(get_settings())
+        _store_ready = True
+    return _store
+
+
+def set_stream_store(store: Optional[StreamSessionStore]) -> None:
+    global _store, _store_ready
+    _store, _store_ready = store, True
+
+
+def reset_stream_store() -> None:
+    global _store, _store_ready
+    _store, _store_ready = None, False
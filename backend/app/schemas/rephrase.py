@@ -5,6 +5,8 @@ Implements RephraseRequest / RephraseResponse
 as defined in SPA-Project/api/openapi.yml
 """
 
+from typing import List, Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -39,6 +41,33 @@ class RephraseResponse(BaseModel):
     )
 
 
+class RephraseBatchRequest(BaseModel):
+    # Items are validated one by one so a bad entry fails alone, not the whole batch
+    texts: List[str] = Field(
+        ...,
+        description="Input texts to be rephrased; each follows the RephraseRequest.text rules",
+        min_length=1,
+    )
+    pack: bool = Field(
+        False,
+        description="Pack several short texts into one upstream prompt",
+    )
+
+
+class PrefetchRequest(BaseModel):
+    text: str = Field(
+        ...,
+        description="Draft text the user is still typing; follows the RephraseRequest.text rules",
+        min_length=1,
+        max_length=5000,
+    )
+    session_id: Optional[str] = Field(
+        None,
+        description="Identifies the editor; a newer draft cancels the session's previous prefetch",
+        max_length=128,
+    )
+
+
 class ErrorResponse(BaseModel):
     code: str
     message: str
@@ -0,0 +1,353 @@
+# backend/app/serve.py
+"""
+Multi-worker launcher: python -m app.serve [--workers N] [--host H] [--port P]
+
+The launcher binds the listening socket, imports the app once (workers start from the
+preloaded modules) and forks N uvicorn workers that accept on the shared socket. Workers run
+uvloop and httptools when those are installed. What the workers share:
+
+- the response cache (RESPONSE_CACHE_BACKEND memory or shared): one cache held by a cache
+  process forked from the launcher, reached over a Unix socket (app.cache.shared);
+- the upstream requests/minute and tokens/minute budgets (shared-memory token buckets).
+
+Signals to the launcher:
+  SIGTERM / SIGINT  stop: workers stop accepting and finish open requests and SSE streams
+                    for up to SERVER_DRAIN_SECONDS
+  SIGHUP            forwarded to the workers (config hot reload)
+  SIGUSR2           rolling restart: re-read .env, then replace the workers one at a time,
+                    each old worker draining only after its replacement is accepting
+
+Everything else stays in each worker's memory, and nothing routes a client back to the same
+worker: resumable streams (so several workers are refused while SSE_RESUME_ENABLED=1),
+request coalescing, the circuit breaker and adaptive concurrency limit, the near-duplicate
+cache index, speculative prefetch (switched off), /ops and /metrics.
+
+Without os.fork (Windows) or with one worker, the app runs in a single uvicorn process.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+
+from app.config import Settings, get_settings, load_env_file
+from app.llm.admission import SharedTokenBuckets, share_token_buckets
+
+logger = logging.getLogger("app.serve")
+
+LOOP = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+HTTP = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+# A worker that is not accepting this long after its fork is taken to have failed to start
+_READY_TIMEOUT_SECONDS = 60.0
+# Workers that die sooner than this after starting are respawned with a delay
+_MIN_UPTIME_SECONDS = 1.0
+
+
+class _WorkerServer(uvicorn.Server):
+    """Tells the launcher, through `ready_fd`, once the app has started and accepts connections."""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self._ready_fd = ready_fd
+
+    async def startup(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        await super().startup(sockets)
+        try:
+            if self.started:
+                os.write(self._ready_fd, b"1")
+        except OSError:
+            pass  # the launcher was not waiting for this worker
+        os.close(self._ready_fd)
+
+
+def _uvicorn_config(app: object, settings: Settings, log_level: str, **kwargs: object) -> uvicorn.Config:
+    return uvicorn.Config(
+        app,
+        loop=LOOP,
+        http=HTTP,
+        log_level=log_level,
+        timeout_graceful_shutdown=int(settings.server_drain_seconds),
+        **kwargs,
+    )
+
+
+class _Worker:
+    __slots__ = ("pid", "ready_fd", "started_at", "retiring")
+
+    def __init__(self, pid: int, ready_fd: int):
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.started_at = time.monotonic()
+        self.retiring = False
+
+
+class Launcher:
+    def __init__(self, settings: Settings, *, host: str, port: int, workers: int, log_level: str):
+        self.settings = settings
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.log_level = log_level
+        self._children: Dict[int, _Worker] = {}
+        self._cache_pid: Optional[int] = None
+        self._cache_path: Optional[str] = None
+        self._stopping = False
+        self._restart_requested = False
+        self._sock: Optional[socket.socket] = None
+
+    # ----- setup (before any fork) -----
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _share_state(self) -> None:
+        settings = self.settings
+        # Lets the workers switch off what only works when every request reaches the same process
+        os.environ["SERVER_WORKERS"] = str(self.workers)
+        if settings.response_cache_enabled and settings.response_cache_backend in ("memory", "shared"):
+            # Workers inherit the environment, so their settings (and reloads) name the shared cache
+            path = settings.response_cache_shared_socket or os.path.join(
+                tempfile.gettempdir(), f"rephrase-cache-{os.getpid()}.sock"
+            )
+            os.environ["RESPONSE_CACHE_BACKEND"] = "shared"
+            os.environ["RESPONSE_CACHE_SHARED_SOCKET"] = path
+            self._cache_path = path
+        if settings.upstream_admission_enabled:
+            share_token_buckets(SharedTokenBuckets())
+
+    def _spawn_cache(self) -> None:
+        from app.cache.shared import CacheServer
+
+        server = CacheServer(self._cache_path, self.settings.response_cache_max_bytes)
+        pid = os.fork()
+        if pid:
+            server.close(unlink=False)
+            self._cache_pid = pid
+            return
+        code = 0
+        try:
+            self._reset_signals()
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)  # nothing to drain; the launcher removes the socket
+            server.serve_forever()
+        except BaseException:
+            logger.exception("Cache server failed.")
+            code = 1
+        finally:
+            os._exit(code)
+
+    # ----- workers -----
+
+    @staticmethod
+    def _reset_signals() -> None:
+        # uvicorn installs its own SIGTERM/SIGINT handlers while serving, and the app a SIGHUP one
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR2):
+            signal.signal(sig, signal.SIG_IGN)
+
+    def _spawn(self) -> _Worker:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(write_fd)
+            worker = _Worker(pid, read_fd)
+            self._children[pid] = worker
+            return worker
+
+        os.close(read_fd)
+        code = 0
+        try:
+            self._reset_signals()
+            random.seed()  # children would otherwise share the launcher's jitter sequence
+            from app.main import create_app
+
+            # Built fresh, so a rolling restart picks up settings that a hot reload cannot change
+            app = create_app()
+            server = _WorkerServer(_uvicorn_config(app, get_settings(), self.log_level), write_fd)
+            server.run(sockets=[self._sock])
+        except BaseException:
+            logger.exception("Worker %d failed.", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+
+    @staticmethod
+    def _wait_ready(worker: _Worker, timeout: float) -> bool:
+        try:
+            readable, _, _ = select.select([worker.ready_fd], [], [], timeout)
+            return bool(readable) and os.read(worker.ready_fd, 1) == b"1"
+        finally:
+            os.close(worker.ready_fd)
+
+    def _signal(self, pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _rolling_restart(self) -> None:
+        try:
+            load_env_file()
+            self.settings = get_settings()
+        except Exception as e:
+            logger.error("Rolling restart cancelled, the new configuration is invalid: %s", e)
+            return
+        old = [w for w in self._children.values() if not w.retiring]
+        logger.info("Rolling restart of %d workers.", len(old))
+        for worker in old:
+            replacement = self._spawn()
+            if not self._wait_ready(replacement, _READY_TIMEOUT_SECONDS):
+                logger.error("Replacement worker %d did not start; keeping the remaining workers.", replacement.pid)
+                replacement.retiring = True
+                self._signal(replacement.pid, signal.SIGKILL)
+                return
+            worker.retiring = True
+            self._signal(worker.pid, signal.SIGTERM)  # drains its requests and streams, then exits
+            if self._stopping:
+                return
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid == self._cache_pid:
+                self._cache_pid = None
+                if not self._stopping:
+                    logger.error("Cache server exited (status %d); restarting it empty.", status)
+                    self._spawn_cache()
+                continue
+            worker = self._children.pop(pid, None)
+            if worker is None or worker.retiring or self._stopping:
+                continue
+            logger.error("Worker %d exited unexpectedly (status %d); starting a new one.", pid, status)
+            if time.monotonic() - worker.started_at < _MIN_UPTIME_SECONDS:
+                time.sleep(_MIN_UPTIME_SECONDS)  # do not spin on a worker that cannot start
+            os.close(self._spawn().ready_fd)
+
+    # ----- main loop -----
+
+    def _on_stop(self, sig: int, frame: object) -> None:
+        self._stopping = True
+
+    def _on_reload(self, sig: int, frame: object) -> None:
+        for pid in list(self._children):
+            self._signal(pid, signal.SIGHUP)
+
+    def _on_restart(self, sig: int, frame: object) -> None:
+        self._restart_requested = True
+
+    def run(self) -> None:
+        self._sock = self._bind()
+        self._share_state()
+        if self._cache_path is not None:
+            self._spawn_cache()
+        import app.main  # noqa: F401  preload: workers fork with the app's modules already imported
+
+        logger.info(
+            "Starting %d workers on %s:%d (loop=%s, http=%s).", self.workers, self.host, self.port, LOOP, HTTP
+        )
+        for _ in range(self.workers):
+            os.close(self._spawn().ready_fd)
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        signal.signal(signal.SIGUSR2, self._on_restart)
+        try:
+            while not self._stopping:
+                if self._restart_requested:
+                    self._restart_requested = False
+                    self._rolling_restart()
+                self._reap()
+                time.sleep(0.2)
+        finally:
+            self._shutdown()
+
+    def _shutdown(self) -> None:
+        logger.info("Stopping %d workers.", len(self._children))
+        for pid in list(self._children):
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.settings.server_drain_seconds + 5.0
+        while self._children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.1)
+            self._children.pop(pid, None)
+        for pid in list(self._children):
+            logger.warning("Worker %d did not stop in time; killing it.", pid)
+            self._signal(pid, signal.SIGKILL)
+        if self._cache_pid is not None:
+            self._signal(self._cache_pid, signal.SIGTERM)
+        while True:
+            try:
+                os.wait()
+            except ChildProcessError:
+                break
+        if self._cache_path is not None and os.path.exists(self._cache_path):
+            os.unlink(self._cache_path)
+        if self._sock is not None:
+            self._sock.close()
+
+
+def check_workers(settings: Settings, workers: int) -> None:
+    """Refuse several workers with settings whose state must be reached by the same process."""
+    if workers > 1 and settings.sse_resume_enabled:
+        raise SystemExit(
+            f"Refusing to start {workers} workers with SSE_RESUME_ENABLED=1: a reconnect with "
+            "Last-Event-ID may reach a worker without the stream's replay buffer. "
+            "Set SSE_RESUME_ENABLED=0 or run one worker."
+        )
+    if workers > 1:
+        logger.warning(
+            "Running %d workers: request coalescing, the circuit breaker, the adaptive concurrency limit "
+            "and the near-duplicate index are per worker, and /ops and /metrics report one worker each.",
+            workers,
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.serve", description="Run the API with several workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=None, help="default: SERVER_WORKERS, 0 = one per CPU")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    load_env_file()
+    settings = get_settings()
+    workers = args.workers if args.workers is not None else settings.server_workers
+    workers = workers or os.cpu_count() or 1
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s:     %(message)s")
+
+    if workers == 1 or not hasattr(os, "fork"):
+        config = _uvicorn_config("app.main:app", settings, args.log_level, host=args.host, port=args.port)
+        uvicorn.Server(config).run()
+        return
+    check_workers(settings, workers)
+    Launcher(settings, host=args.host, port=args.port, workers=workers, log_level=args.log_level).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
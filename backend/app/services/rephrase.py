@@ -1,8 +1,16 @@
 """rephrase_service"""
 
+from typing import Optional
+
 from app.schemas.rephrase import RephraseRequest, RephraseResponse
+import app.cache.response_cache as response_cache
+import app.cache.speculative as speculative
 import app.llm.factory as llm_factory
+from app.llm.deadline import Deadline, within
 from app.llm.rephrase_generator import generate_rephrases
+from app.llm.usage import note_input
+from app.observability.metrics import stage_timer
+from app.observability.tracing import start_span
 
 
 class ValidationError(Exception):
@@ -11,7 +19,11 @@ class ValidationError(Exception):
 
 
 def validate_input(input: RephraseRequest) -> str:
-    trimmed = input.text.strip()
+    return validate_text(input.text)
+
+
+def validate_text(text: str) -> str:
+    trimmed = text.strip()
     if len(trimmed) == 0:
         raise ValidationError('"text" must not be empty')
 
@@ -21,7 +33,40 @@ def validate_input(input: RephraseRequest) -> str:
 
     return trimmed
 
-async def rephrase_service(input: RephraseRequest) -> RephraseResponse:
-    text = validate_input(input)
-    provider = llm_factory.get_llm_provider()
-    return await generate_rephrases(provider, text)
\ No newline at end of file
+async def rephrase_service(input: RephraseRequest, deadline: Optional[Deadline] = None) -> RephraseResponse:
+    with stage_timer("validate_input"):
+        text = validate_input(input)
+    note_input(text)
+
+    cache = response_cache.get_response_cache()
+    if cache is not None:
+        with start_span("cache.lookup") as span:
+            cached = await cache.lookup(text)
+            span.set("cache.hit", cached is not None)
+        if cached is not None:
+            return cached
+
+    result = None
+    prefetch = speculative.claim_prefetch(text)
+    if prefetch is not None:
+        # Attach to the draft generated while the user was typing; if that failed, generate afresh
+        with start_span("prefetch.wait") as span:
+            result = await within(prefetch.wait(), deadline)
+            span.set("prefetch.ok", result is not None)
+
+    if result is None:
+        with stage_timer("provider_acquire"):
+            provider = llm_factory.get_llm_provider()
+            settings = llm_factory.get_provider_registry().settings
+        with start_span("generate_rephrases"):
+            result = await generate_rephrases(
+                provider,
+                text,
+                deadline=deadline,
+                chunk_tokens=settings.long_input_chunk_tokens,
+                max_parallel_chunks=settings.long_input_max_parallel,
+            )
+
+    if cache is not None:
+        await cache.store(text, result)
+    return result
@@ -0,0 +1,175 @@
+"""rephrase_batch_service"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncGenerator, Deque, Dict, List, Sequence, Tuple, Union
+
+import app.cache.response_cache as response_cache
+import app.llm.factory as llm_factory
+from app.cache.response_cache import normalize_text
+from app.llm.parse import ModelOutputError, parse_rephrase_batch_response
+from app.llm.prompt import build_batch_rephrase_prompt
+from app.llm.provider import LLMProvider
+from app.llm.provider_errors import LLMProviderError
+from app.llm.rephrase_generator import generate_rephrases
+from app.observability.metrics import record_error, stage_timer
+from app.schemas.rephrase import RephraseResponse
+from app.services.rephrase import ValidationError, validate_text
+
+logger = logging.getLogger(__name__)
+
+_Outcome = Union[RephraseResponse, Exception]
+
+
+def _result_line(index: int, result: RephraseResponse) -> Dict[str, Any]:
+    return {"index": index, "result": result.model_dump()}
+
+
+def _error_line(index: int, code: str, message: str) -> Dict[str, Any]:
+    return {"index": index, "error": {"code": code, "message": message, "details": []}}
+
+
+def _describe(e: Exception) -> Tuple[str, str]:
+    if isinstance(e, LLMProviderError):
+        return e.code, e.message
+    if isinstance(e, ModelOutputError):
+        return "INTERNAL_ERROR", "Invalid model output."
+    logger.warning("Unexpected error in batch item: %r", e)
+    return "INTERNAL_ERROR", "An unexpected error occurred."
+
+
+def plan_units(texts: Sequence[str], pack_size: int, pack_max_chars: int) -> List[List[str]]:
+    """Group texts into upstream calls: short texts share a packed prompt, the rest go alone."""
+    if pack_size <= 1:
+        return [[t] for t in texts]
+    short = [t for t in texts if len(t) <= pack_max_chars]
+    long = [t for t in texts if len(t) > pack_max_chars]
+    packs = [short[i : i + pack_size] for i in range(0, len(short), pack_size)]
+    return packs + [[t] for t in long]
+
+
+async def _outcome(provider: LLMProvider, text: str) -> _Outcome:
+    try:
+        return await generate_rephrases(provider, text)
+    except Exception as e:
+        return e
+
+
+async def _run_unit(provider: LLMProvider, unit: List[str]) -> List[Tuple[str, _Outcome]]:
+    if len(unit) == 1:
+        return [(unit[0], await _outcome(provider, unit[0]))]
+
+    try:
+        raw = await provider.complete(build_batch_rephrase_prompt(unit))
+        with stage_timer("parse_response"):
+            parsed = parse_rephrase_batch_response(raw, len(unit))
+    except ModelOutputError:
+        parsed = [None] * len(unit)
+    except Exception as e:
+        # An upstream failure would most likely repeat per item: report it for the whole pack
+        return [(text, e) for text in unit]
+
+    out: List[Tuple[str, _Outcome]] = []
+    for text, result in zip(unit, parsed):
+        # Items the model dropped or garbled are retried on their own
+        out.append((text, result if result is not None else await _outcome(provider, text)))
+    return out
+
+
+async def rephrase_batch_service(
+    texts: Sequence[str],
+    *,
+    max_parallel: int,
+    pack_size: int = 1,
+    pack_max_chars: int = 0,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Rephrase many texts, yielding one line per input index in completion order:
+      {"index": i, "result": {<four styles>}}
+      {"index": i, "error": {"code": ..., "message": ..., "details": []}}
+    Identical texts (after normalization) are generated once and reported for every index.
+    At most `max_parallel` upstream calls run at a time.
+    """
+    indices_by_text: Dict[str, List[int]] = {}
+    with stage_timer("validate_input"):
+        invalid: List[Tuple[int, str]] = []
+        for index, raw in enumerate(texts):
+            try:
+                text = normalize_text(validate_text(raw))
+            except ValidationError as e:
+                invalid.append((index, str(e)))
+                continue
+            indices_by_text.setdefault(text, []).append(index)
+
+    for index, message in invalid:
+        record_error("VALIDATION_ERROR")
+        yield _error_line(index, "VALIDATION_ERROR", message)
+
+    cache = response_cache.get_response_cache()
+    pending: List[str] = []
+    for text, indices in indices_by_text.items():
+        cached = await cache.lookup(text) if cache is not None else None
+        if cached is None:
+            pending.append(text)
+            continue
+        for index in indices:
+            yield _result_line(index, cached)
+
+    if not pending:
+        return
+
+    try:
+        with stage_timer("provider_acquire"):
+            provider = llm_factory.get_llm_provider()
+    except LLMProviderError as e:
+        for text in pending:
+            for index in indices_by_text[text]:
+                record_error(e.code)
+                yield _error_line(index, e.code, e.message)
+        return
+
+    units: Deque[List[str]] = deque(plan_units(pending, pack_size, pack_max_chars))
+    queue: "asyncio.Queue[Tuple[str, _Outcome]]" = asyncio.Queue()
+
+    async def worker() -> None:
+        # Every text of a unit must get a queue entry, or the consumer below waits forever
+        while units:
+            unit = units.popleft()
+            try:
+                results = await _run_unit(provider, unit)
+            except Exception as e:
+                results = [(text, e) for text in unit]
+            for text, outcome in results:
+                queue.put_nowait((text, outcome))
+            if cache is None:
+                continue
+            for text, outcome in results:
+                if isinstance(outcome, RephraseResponse):
+                    try:
+                        await cache.store(text, outcome)
+                    except Exception:
+                        logger.warning("Could not cache a batch result.", exc_info=True)
+
+    workers = [
+        asyncio.create_task(worker(), name=f"rephrase-batch-{i}")
+        for i in range(min(max(max_parallel, 1), len(units)))
+    ]
+    try:
+        for _ in range(len(pending)):
+            text, outcome = await queue.get()
+            for index in indices_by_text[text]:
+                if isinstance(outcome, RephraseResponse):
+                    yield _result_line(index, outcome)
+                else:
+                    code, message = _describe(outcome)
+                    record_error(code)
+                    yield _error_line(index, code, message)
+    finally:
+        # Client went away or we finished: stop any upstream calls still running
+        for task in workers:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,182 @@
+# backend/bench/__main__.py
+"""
+Load-test / latency benchmark for the rephrase API against a simulated upstream.
+
+  python -m bench run --requests 200 --concurrency 20 --out bench_results.json
+  python -m bench run --rate 50 --ttft lognormal:-1.2,0.5 --error-rate 0.02 --baseline prev.json
+  python -m bench run --replay sessions.jsonl --replay-speed 2
+  python -m bench compare prev.json bench_results.json --threshold 0.1
+  python -m bench prompts --out prompt_tokens.json
+
+Run from backend/. The app is started in-process (uvicorn on a background thread)
+with SimulatedLLMProvider plugged in, or a ReplayProvider playing back sessions recorded
+with LLM_RECORD_PATH, so no tokens are used.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from bench.simulated_provider import Distribution, SimulatedLLMProvider, SimulationProfile
+from bench.stats import compare
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Start the app in-process and drive it with load.")
+    run.add_argument("--endpoint", choices=("rephrase", "stream", "both"), default="both")
+    run.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint.")
+    run.add_argument("--concurrency", type=int, default=20, help="Max requests in flight.")
+    run.add_argument("--rate", type=float, default=0.0, help="Open-loop Poisson arrivals/s (0 = closed loop).")
+    run.add_argument("--warmup", type=int, default=5)
+    run.add_argument("--repeat-text", action="store_true", help="Send the same text every time (exercises cache/coalescing).")
+    run.add_argument("--cache", action="store_true", help="Keep the response cache enabled (off by default).")
+    run.add_argument("--ttft", default="lognormal:-1.6,0.4", help="Time-to-first-token distribution (seconds).")
+    run.add_argument("--inter-chunk", default="uniform:0.01,0.03", help="Delay between chunks (seconds).")
+    run.add_argument("--chunk-chars", type=int, default=4)
+    run.add_argument("--jitter", type=float, default=0.1)
+    run.add_argument("--error-rate", type=float, default=0.0)
+    run.add_argument("--mid-stream-error-rate", type=float, default=0.0)
+    run.add_argument("--error-code", default="LLM_PROVIDER_FAILURE")
+    run.add_argument("--seed", type=int, default=None)
+    run.add_argument("--replay", default=None, help="Replay this recorded session file instead of simulating.")
+    run.add_argument("--replay-speed", type=float, default=1.0, help="Replay pacing factor (2 = twice as fast).")
+    run.add_argument("--out", default="bench_results.json", help="Where to write the JSON results.")
+    run.add_argument("--baseline", default=None, help="Previous results file to compare against.")
+    run.add_argument("--threshold", type=float, default=0.1, help="Allowed relative regression (0.1 = 10%%).")
+
+    cmp_ = sub.add_parser("compare", help="Compare two result files; exit 1 on regression.")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--threshold", type=float, default=0.1)
+
+    prompts = sub.add_parser("prompts", help="Report input tokens per prompt template and the cacheable prefix.")
+    prompts.add_argument("--seed", type=int, default=0)
+    prompts.add_argument("--out", default=None, help="Also write the report as JSON.")
+    return parser
+
+
+def _report_regressions(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> int:
+    regressions = compare(baseline, current, threshold)
+    if not regressions:
+        print(f"No regressions beyond {threshold:.0%}.")
+        return 0
+    print("Regressions:")
+    for line in regressions:
+        print(f"  {line}")
+    return 1
+
+
+def _run(args: argparse.Namespace) -> int:
+    # Settings are read when the app is created, so adjust the environment first
+    os.environ["LLM_MODE"] = "fake"
+    if not args.cache:
+        os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+
+    from bench.runner import InProcessServer, LoadConfig, run_load
+
+    profile = SimulationProfile(
+        ttft=Distribution.parse(args.ttft),
+        inter_chunk=Distribution.parse(args.inter_chunk),
+        chunk_chars=args.chunk_chars,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        mid_stream_error_rate=args.mid_stream_error_rate,
+        error_code=args.error_code,
+        seed=args.seed,
+    )
+    provider: Any
+    if args.replay:
+        from app.llm.recording import ReplayProvider
+
+        provider = ReplayProvider.from_file(args.replay, speed=args.replay_speed)
+    else:
+        provider = SimulatedLLMProvider(profile)
+    endpoints: List[str] = ["rephrase", "stream"] if args.endpoint == "both" else [args.endpoint]
+
+    scenarios: Dict[str, Any] = {}
+    with InProcessServer(llm_provider=provider) as server:
+        for endpoint in endpoints:
+            cfg = LoadConfig(
+                endpoint=endpoint,
+                requests=args.requests,
+                concurrency=args.concurrency,
+                rate=args.rate or None,
+                warmup=args.warmup,
+                unique_texts=not args.repeat_text,
+                seed=args.seed,
+            )
+            scenarios[endpoint] = asyncio.run(run_load(server.base_url, cfg))
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+            "upstream_calls": provider.calls,
+            "upstream_errors_injected": provider.errors,
+            **({"replay": provider.stats()} if args.replay else {}),
+        },
+        "scenarios": scenarios,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    for name, r in scenarios.items():
+        lat = r["latency_ms"]
+        line = (
+            f"{name:>9}: {r['ok']}/{r['requests']} ok  {r['throughput_rps']} rps  "
+            f"p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms"
+        )
+        if "ttfe_ms" in r:
+            line += f"  ttfe p50={r['ttfe_ms']['p50']}ms"
+        print(line)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            return _report_regressions(json.load(f), results, args.threshold)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _build_parser().parse_args(argv)
+    if args.command == "compare":
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, "r", encoding="utf-8") as f:
+            current = json.load(f)
+        return _report_regressions(baseline, current, args.threshold)
+    if args.command == "prompts":
+        from bench.prompts import print_report, prompt_report
+
+        report = prompt_report(args.seed)
+        print_report(report)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return 0
+    return _run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# backend/bench/prompts.py
+"""
+Input-token accounting for the prompt templates: per-template system/user token counts, and for
+the per-style fan-out (four calls per request) how much of each prompt is a prefix shared by all
+four, i.e. what upstream prompt caching can serve. The pre-template layout, which put the style
+before the input text, is kept here for comparison only.
+
+Counts use tiktoken (o200k_base) when it is installed, otherwise an approximation that splits
+at word/punctuation boundaries with a leading space joined to the word, as BPE vocabularies do.
+Message framing overhead is not included.
+"""
+from __future__ import annotations
+
+import importlib.util
+import random
+import re
+from typing import Any, Callable, Dict, List, Sequence
+
+from app.llm.prompt import BATCH_TEMPLATE, PROMPT_VERSION, REPHRASE_TEMPLATE, STYLE_TEMPLATE, build_style_prompt
+from app.llm.rephrase_generator import STYLES
+
+# Azure OpenAI / OpenAI prompt caching: prompts of at least 1024 tokens, cached in 128-token steps
+CACHE_MIN_TOKENS = 1024
+CACHE_INCREMENT_TOKENS = 128
+
+_APPROX_TOKEN = re.compile(r" ?\w+| ?[^\w\s]|\s+")
+
+_WORDS = (
+    "team review document friday meeting agenda budget report customer feedback release schedule "
+    "please update quickly tomorrow project deadline draft notes design proposal summary"
+).split()
+
+
+def _legacy_style_prompt(text: str, style: str) -> str:
+    # Per-style prompt as it was before app.llm.prompt templates: style first, input last
+    return (
+        f"You are a writing assistant.\n"
+        f"Rewrite the INPUT in a {style} style.\n"
+        f"Rules:\n"
+        f"- Return ONLY the rewritten text.\n"
+        f"- Do NOT include quotes, code fences, JSON, or extra commentary.\n"
+        f"- Preserve meaning.\n\n"
+        f"INPUT:\n{text}\n"
+    )
+
+
+def get_tokenizer() -> tuple[str, Callable[[str], Sequence[Any]]]:
+    if importlib.util.find_spec("tiktoken") is not None:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+        return "tiktoken:o200k_base", encoding.encode
+    return "approx", _APPROX_TOKEN.findall
+
+
+def sample_texts(seed: int = 0) -> Dict[str, str]:
+    rng = random.Random(seed)
+
+    def words(n: int) -> str:
+        return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+    return {
+        "short": "Hey team, can someone review the attached document before Friday?",
+        "medium": words(150),
+        # Close to the 5000 character input limit
+        "long": words(640),
+    }
+
+
+def cacheable_tokens(shared_prefix: int) -> int:
+    if shared_prefix < CACHE_MIN_TOKENS:
+        return 0
+    return CACHE_MIN_TOKENS + (shared_prefix - CACHE_MIN_TOKENS) // CACHE_INCREMENT_TOKENS * CACHE_INCREMENT_TOKENS
+
+
+def _common_prefix(token_lists: List[Sequence[Any]]) -> int:
+    n = 0
+    for column in zip(*token_lists):
+        if any(tok != column[0] for tok in column[1:]):
+            break
+        n += 1
+    return n
+
+
+def fan_out_report(prompts: List[str], encode: Callable[[str], Sequence[Any]]) -> Dict[str, int]:
+    """Token totals for one request's per-style calls, made one after another."""
+    tokens = [encode(p) for p in prompts]
+    shared = _common_prefix(tokens)
+    total = sum(len(t) for t in tokens)
+    # The first call warms the cache; the others can reuse the shared prefix
+    cached = cacheable_tokens(shared) * (len(prompts) - 1)
+    return {
+        "input_tokens": total,
+        "shared_prefix_tokens": shared,
+        "cached_tokens": cached,
+        "uncached_tokens": total - cached,
+    }
+
+
+def prompt_report(seed: int = 0) -> Dict[str, Any]:
+    name, encode = get_tokenizer()
+    texts = sample_texts(seed)
+    templates = {}
+    for template in (REPHRASE_TEMPLATE, STYLE_TEMPLATE, BATCH_TEMPLATE):
+        templates[template.name] = {"version": template.version, "system_tokens": len(encode(template.system))}
+
+    samples: Dict[str, Any] = {}
+    for label, text in texts.items():
+        single = REPHRASE_TEMPLATE.render(text=text)
+        samples[label] = {
+            "text_tokens": len(encode(text)),
+            "single_call": {
+                "input_tokens": len(encode(single)),
+                # Identical in every request, so cacheable across requests once long enough
+                "stable_prefix_tokens": templates["rephrase"]["system_tokens"],
+            },
+            "per_style": fan_out_report([build_style_prompt(text, s) for s in STYLES], encode),
+            "per_style_legacy": fan_out_report([_legacy_style_prompt(text, s) for s in STYLES], encode),
+        }
+    return {"tokenizer": name, "prompt_version": PROMPT_VERSION, "templates": templates, "samples": samples}
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"tokenizer={report['tokenizer']}  prompt_version={report['prompt_version']}")
+    for name, t in report["templates"].items():
+        print(f"  template {name:<9} v{t['version']}  system={t['system_tokens']} tokens")
+    for label, s in report["samples"].items():
+        new, old = s["per_style"], s["per_style_legacy"]
+        print(
+            f"  {label:>6}: text={s['text_tokens']}  single_call={s['single_call']['input_tokens']}  "
+            f"per_style={new['input_tokens']} (shared prefix {new['shared_prefix_tokens']}, cached {new['cached_tokens']})  "
+            f"legacy per_style={old['input_tokens']} (shared prefix {old['shared_prefix_tokens']}, cached {old['cached_tokens']})"
+        )
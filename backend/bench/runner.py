@@ -0,0 +1,184 @@
+# backend/bench/runner.py
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from app.llm.provider import LLMProvider
+from bench.stats import rss_bytes, summarize_ms
+
+ENDPOINTS = {"rephrase": "/rephrase", "stream": "/rephrase/stream"}
+
+
+@dataclass(frozen=True)
+class LoadConfig:
+    endpoint: str  # key of ENDPOINTS
+    requests: int
+    concurrency: int
+    rate: Optional[float] = None  # arrivals/second (open loop); None = closed loop
+    warmup: int = 0
+    unique_texts: bool = True
+    seed: Optional[int] = None
+
+
+@dataclass
+class _Sample:
+    ok: bool
+    status: int
+    code: Optional[str]
+    latency: float
+    ttfe: Optional[float]
+    nbytes: int
+
+
+class InProcessServer:
+    """Runs the real app under uvicorn on a background thread, bound to a free local port."""
+
+    def __init__(self, llm_provider: Optional[LLMProvider] = None):
+        self._llm_provider = llm_provider
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.base_url = ""
+
+    def __enter__(self) -> "InProcessServer":
+        # Imported here so callers can adjust os.environ (settings) first
+        from app.main import create_app
+
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+
+        config = uvicorn.Config(
+            create_app(llm_provider=self._llm_provider),
+            host="127.0.0.1",
+            port=port,
+            log_level="warning",
+            lifespan="on",
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name="bench-server", daemon=True)
+        self._thread.start()
+
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Benchmark server failed to start.")
+            time.sleep(0.01)
+
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+
+def _text_for(i: int, unique: bool) -> str:
+    n = i if unique else 0
+    return f"Benchmark request {n}: hey team, can someone review the attached document before Friday?"
+
+
+async def _one_rephrase(client: httpx.AsyncClient, text: str) -> _Sample:
+    start = time.perf_counter()
+    resp = await client.post(ENDPOINTS["rephrase"], json={"text": text})
+    latency = time.perf_counter() - start
+    code = None
+    if resp.status_code != 200:
+        try:
+            code = resp.json().get("code")
+        except ValueError:
+            code = "HTTP_ERROR"
+    return _Sample(resp.status_code == 200, resp.status_code, code, latency, None, len(resp.content))
+
+
+async def _one_stream(client: httpx.AsyncClient, text: str) -> _Sample:
+    start = time.perf_counter()
+    ttfe: Optional[float] = None
+    code: Optional[str] = None
+    ok = False
+    nbytes = 0
+    event = ""
+    async with client.stream("POST", ENDPOINTS["stream"], json={"text": text}) as resp:
+        async for line in resp.aiter_lines():
+            nbytes += len(line) + 1
+            if line.startswith("event: "):
+                event = line[len("event: ") :]
+                if ttfe is None and event in ("partial", "final"):
+                    ttfe = time.perf_counter() - start
+                if event == "final":
+                    ok = True
+            elif line.startswith("data: ") and event == "error":
+                try:
+                    code = json.loads(line[len("data: ") :]).get("code")
+                except ValueError:
+                    code = "STREAM_PARSE_ERROR"
+        status = resp.status_code
+    if not ok and code is None:
+        code = "STREAM_ENDED" if status == 200 else "HTTP_ERROR"
+    return _Sample(ok and status == 200, status, code, time.perf_counter() - start, ttfe, nbytes)
+
+
+async def run_load(base_url: str, cfg: LoadConfig) -> Dict[str, Any]:
+    """Drive one endpoint and summarize latency, time-to-first-event, throughput and errors."""
+    one = _one_stream if cfg.endpoint == "stream" else _one_rephrase
+    rng = random.Random(cfg.seed)
+    limits = httpx.Limits(max_connections=cfg.concurrency, max_keepalive_connections=cfg.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        for i in range(cfg.warmup):
+            await one(client, _text_for(-1 - i, cfg.unique_texts))
+
+        samples: List[_Sample] = []
+        gate = asyncio.Semaphore(cfg.concurrency)
+
+        async def issue(i: int, scheduled: float) -> None:
+            async with gate:
+                queued = time.perf_counter() - scheduled
+                sample = await one(client, _text_for(i, cfg.unique_texts))
+            if cfg.rate:
+                # Open loop: time queued behind the concurrency cap counts (avoids coordinated omission)
+                sample.latency += queued
+                if sample.ttfe is not None:
+                    sample.ttfe += queued
+            samples.append(sample)
+
+        started = time.perf_counter()
+        tasks = []
+        next_at = started
+        for i in range(cfg.requests):
+            if cfg.rate:
+                next_at += rng.expovariate(cfg.rate)
+                await asyncio.sleep(max(next_at - time.perf_counter(), 0.0))
+            tasks.append(asyncio.create_task(issue(i, time.perf_counter())))
+        await asyncio.gather(*tasks)
+        duration = time.perf_counter() - started
+
+    ok = [s for s in samples if s.ok]
+    errors = Counter(s.code or str(s.status) for s in samples if not s.ok)
+    result: Dict[str, Any] = {
+        "endpoint": ENDPOINTS[cfg.endpoint],
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": dict(errors),
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(ok) / duration, 3) if duration > 0 else None,
+        "latency_ms": summarize_ms([s.latency for s in ok]),
+        "bytes_received": sum(s.nbytes for s in samples),
+    }
+    if cfg.endpoint == "stream":
+        result["ttfe_ms"] = summarize_ms([s.ttfe for s in ok if s.ttfe is not None])
+    result["rss_bytes"] = rss_bytes()
+    return result
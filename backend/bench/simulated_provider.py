@@ -0,0 +1,138 @@
+# backend/bench/simulated_provider.py
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from app.llm.fake_provider import detect_style, wants_json
+from app.llm.provider_errors import LLMProviderError
+
+_OUTPUTS: Dict[str, str] = {
+    "professional": "Please review the attached document at your earliest convenience.",
+    "casual": "Hey, can you take a quick look at this when you get a sec?",
+    "polite": "Could you please review the attached document when you have a moment?",
+    "social": "Hey everyone, check this out and let me know what you think!",
+}
+
+# (status_code, code, message, error_class) for injected failures, mirroring openai_provider.py
+_ERRORS: Dict[str, Tuple[int, str, str, str]] = {
+    "RATE_LIMIT_EXCEEDED": (
+        429, "RATE_LIMIT_EXCEEDED", "Too many requests. Please retry after the specified time.", "rate_limit"
+    ),
+    "LLM_TIMEOUT": (504, "LLM_TIMEOUT", "The LLM request timed out.", "timeout"),
+    "LLM_PROVIDER_FAILURE": (502, "LLM_PROVIDER_FAILURE", "Upstream provider encountered an internal error.", "server"),
+}
+
+
+@dataclass(frozen=True)
+class Distribution:
+    """
+    Latency distribution in seconds. Spec strings:
+      fixed:0.05   uniform:0.02,0.08   normal:0.05,0.01   lognormal:-3.0,0.5   exp:0.05
+    (lognormal takes mu/sigma of the underlying normal; exp takes the mean.)
+    """
+
+    kind: str
+    a: float
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Distribution":
+        kind, _, raw = spec.partition(":")
+        kind = kind.strip().lower()
+        params = [float(x) for x in raw.split(",") if x.strip()]
+        arity = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+        if kind not in arity or len(params) != arity[kind]:
+            raise ValueError(f"Invalid distribution spec {spec!r}.")
+        return cls(kind, params[0], params[1] if len(params) > 1 else 0.0)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            v = self.a
+        elif self.kind == "uniform":
+            v = rng.uniform(self.a, self.b)
+        elif self.kind == "normal":
+            v = rng.gauss(self.a, self.b)
+        elif self.kind == "lognormal":
+            v = rng.lognormvariate(self.a, self.b)
+        else:
+            v = rng.expovariate(1.0 / self.a) if self.a > 0 else 0.0
+        return max(v, 0.0)
+
+
+@dataclass(frozen=True)
+class SimulationProfile:
+    """How the simulated upstream behaves. Defaults roughly match a fast chat deployment."""
+
+    ttft: Distribution = field(default_factory=lambda: Distribution("lognormal", -1.6, 0.4))  # ~200 ms median
+    inter_chunk: Distribution = field(default_factory=lambda: Distribution("uniform", 0.01, 0.03))
+    chunk_chars: int = 4
+    jitter: float = 0.1  # +/- fraction applied to every sampled delay
+    error_rate: float = 0.0  # probability a call fails before producing output
+    mid_stream_error_rate: float = 0.0  # probability a stream fails after its first chunk
+    error_code: str = "LLM_PROVIDER_FAILURE"
+    seed: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        if self.error_code not in _ERRORS:
+            raise ValueError(f"Unknown error_code {self.error_code!r}; expected one of {sorted(_ERRORS)}.")
+
+
+class SimulatedLLMProvider:
+    """
+    LLMProvider with realistic pacing for load tests: sampled time-to-first-token,
+    per-chunk cadence, multiplicative jitter and injected failures.
+    Non-streaming calls take TTFT plus the time it would take to stream the whole payload.
+    """
+
+    def __init__(self, profile: SimulationProfile = SimulationProfile()):
+        self._profile = profile
+        self._rng = random.Random(profile.seed)
+        self.calls = 0
+        self.errors = 0
+
+    def _delay(self, dist: Distribution) -> float:
+        jitter = self._profile.jitter
+        scale = 1.0 + self._rng.uniform(-jitter, jitter) if jitter else 1.0
+        return dist.sample(self._rng) * scale
+
+    def _error(self) -> LLMProviderError:
+        self.errors += 1
+        status, code, message, error_class = _ERRORS[self._profile.error_code]
+        retry_after = 1 if status == 429 else None
+        return LLMProviderError(
+            status_code=status, code=code, message=message, retry_after_seconds=retry_after, error_class=error_class
+        )
+
+    def _chunk_count(self, text: str) -> int:
+        return -(-len(text) // max(self._profile.chunk_chars, 1))
+
+    async def complete(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self._delay(self._profile.ttft))
+        if self._rng.random() < self._profile.error_rate:
+            raise self._error()
+
+        body = json.dumps(_OUTPUTS)
+        total = sum(self._delay(self._profile.inter_chunk) for _ in range(self._chunk_count(body)))
+        await asyncio.sleep(total)
+        return body
+
+    async def complete_stream(self, prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        profile = self._profile
+        await asyncio.sleep(self._delay(profile.ttft))
+        if self._rng.random() < profile.error_rate:
+            raise self._error()
+
+        text = json.dumps(_OUTPUTS) if wants_json(prompt) else _OUTPUTS[detect_style(prompt)]
+        fail_mid_stream = self._rng.random() < profile.mid_stream_error_rate
+        step = max(profile.chunk_chars, 1)
+        for i in range(0, len(text), step):
+            if i and fail_mid_stream:
+                raise self._error()
+            yield text[i : i + step]
+            await asyncio.sleep(self._delay(profile.inter_chunk))
@@ -0,0 +1,88 @@
+# backend/bench/stats.py
+from __future__ import annotations
+
+import os
+import resource
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile (q in [0, 100]); None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    pos = (len(ordered) - 1) * (q / 100.0)
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def summarize_ms(samples_s: Sequence[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/mean/max of a list of durations in seconds, reported in milliseconds."""
+    ms = [s * 1000.0 for s in samples_s]
+
+    def r(v: Optional[float]) -> Optional[float]:
+        return round(v, 3) if v is not None else None
+
+    return {
+        "count": len(ms),
+        "p50": r(percentile(ms, 50)),
+        "p95": r(percentile(ms, 95)),
+        "p99": r(percentile(ms, 99)),
+        "mean": r(sum(ms) / len(ms)) if ms else None,
+        "max": r(max(ms)) if ms else None,
+    }
+
+
+def rss_bytes() -> Dict[str, Optional[int]]:
+    """Current and peak resident set size of this process (server + load generator)."""
+    current: Optional[int] = None
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_bytes = peak if sys.platform == "darwin" else peak * 1024
+    return {"current": current, "peak": peak_bytes, "pid": os.getpid()}
+
+
+# Metrics where a larger value is a regression (everything else reported is "higher is better")
+_LOWER_IS_BETTER = ("latency_ms", "ttfe_ms")
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compare two result files scenario by scenario.
+    Returns human-readable regressions where a metric got worse by more than `threshold` (fraction).
+    """
+    regressions: List[str] = []
+    for name, cur in current.get("scenarios", {}).items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+
+        for group in _LOWER_IS_BETTER:
+            for stat in ("p50", "p95", "p99"):
+                b = (base.get(group) or {}).get(stat)
+                c = (cur.get(group) or {}).get(stat)
+                if b and c is not None and c > b * (1 + threshold):
+                    regressions.append(f"{name}.{group}.{stat}: {b:.1f} -> {c:.1f} ms (+{(c / b - 1) * 100:.0f}%)")
+
+        b_rps, c_rps = base.get("throughput_rps"), cur.get("throughput_rps")
+        if b_rps and c_rps is not None and c_rps < b_rps * (1 - threshold):
+            regressions.append(f"{name}.throughput_rps: {b_rps:.1f} -> {c_rps:.1f} ({(c_rps / b_rps - 1) * 100:.0f}%)")
+
+        b_err, c_err = base.get("error_rate", 0.0), cur.get("error_rate", 0.0)
+        if c_err > b_err + threshold:
+            regressions.append(f"{name}.error_rate: {b_err:.3f} -> {c_err:.3f}")
+
+    return regressions
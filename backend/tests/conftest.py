@@ -0,0 +1,18 @@
+import pytest
+
+import app.cache.response_cache as response_cache
+import app.cache.speculative as speculative
+import app.routes.sse_replay as sse_replay
+
+
+@pytest.fixture(autouse=True)
+def _fresh_response_cache():
+    # Tests reuse the same inputs with different (monkeypatched) providers;
+    # never let one test's cached result answer another's request.
+    response_cache.reset_response_cache()
+    sse_replay.reset_stream_store()
+    speculative.reset_prefetch_store()
+    yield
+    response_cache.reset_response_cache()
+    sse_replay.reset_stream_store()
+    speculative.reset_prefetch_store()
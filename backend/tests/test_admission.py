@@ -0,0 +1,236 @@
+import asyncio
+import dataclasses
+
+import pytest
+
+from app.config import get_settings
+from app.llm.admission import AdmissionController, AdmissionControlledProvider, AIMDLimiter, TokenBucket
+from app.llm.priority import resolve_lane
+from app.llm.provider_errors import LLMProviderError
+
+
+def _throttle(retry_after=None):
+    return LLMProviderError(
+        status_code=429,
+        code="RATE_LIMIT_EXCEEDED",
+        message="Too many requests. Please retry after the specified time.",
+        retry_after_seconds=retry_after,
+    )
+
+
+class CountingProvider:
+    def __init__(self, delay=0.02, fail_with=None):
+        self.delay = delay
+        self.fail_with = fail_with
+        self.active = 0
+        self.peak = 0
+
+    async def complete(self, prompt: str) -> str:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail_with is not None:
+                raise self.fail_with
+            return "ok"
+        finally:
+            self.active -= 1
+
+
+def test_token_bucket_reports_wait_for_missing_units():
+    bucket = TokenBucket(per_minute=60)  # 1 unit per second
+    assert bucket.time_until(60, now=bucket._updated) == 0
+    bucket.take(60)
+    assert bucket.time_until(2, now=bucket._updated) == pytest.approx(2.0)
+
+
+def test_aimd_grows_additively_and_halves_on_throttle_once_per_cooldown():
+    limiter = AIMDLimiter(initial=4, minimum=1, maximum=10, cooldown_seconds=1.0)
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.permits == 4
+    assert limiter.limit == pytest.approx(4.9, abs=0.1)
+
+    limiter.on_throttle(now=100.0)
+    limiter.on_throttle(now=100.5)  # same burst, ignored
+    assert limiter.limit == pytest.approx(4.9 / 2, abs=0.1)
+    limiter.on_throttle(now=102.0)
+    assert limiter.limit == pytest.approx(4.9 / 4, abs=0.1)
+
+
+def test_concurrency_limit_caps_in_flight_upstream_calls():
+    async def scenario():
+        upstream = CountingProvider()
+        controller = AdmissionController(AIMDLimiter(initial=2, minimum=1, maximum=2))
+        provider = AdmissionControlledProvider(upstream, controller)
+        await asyncio.gather(*(provider.complete("p") for _ in range(6)))
+        return upstream, controller
+
+    upstream, controller = asyncio.run(scenario())
+    assert upstream.peak == 2
+    assert controller.stats()["admitted"] == 6
+    assert controller.in_flight == 0
+
+
+def test_full_queue_is_shed_with_retry_after():
+    async def scenario():
+        controller = AdmissionController(AIMDLimiter(initial=1, minimum=1, maximum=1), max_queue=1)
+        provider = AdmissionControlledProvider(CountingProvider(delay=0.05), controller)
+        return await asyncio.gather(*(provider.complete("p") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    shed = [r for r in results if isinstance(r, LLMProviderError)]
+    assert len(shed) == 1
+    assert shed[0].status_code == 429
+    assert shed[0].retry_after_seconds >= 1
+
+
+def test_request_that_cannot_be_admitted_before_deadline_is_shed_immediately():
+    async def scenario():
+        controller = AdmissionController(
+            AIMDLimiter(initial=4, minimum=1, maximum=4), requests_per_minute=1, max_wait_seconds=5
+        )
+        provider = AdmissionControlledProvider(CountingProvider(delay=0), controller)
+        await provider.complete("p")  # drains the single request token
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        with pytest.raises(LLMProviderError) as exc:
+            await provider.complete("p")
+        return loop.time() - start, exc.value
+
+    elapsed, err = asyncio.run(scenario())
+    assert elapsed < 0.5
+    assert err.retry_after_seconds >= 5
+
+
+def test_upstream_throttle_shrinks_limit_and_pauses_admission():
+    async def scenario():
+        controller = AdmissionController(AIMDLimiter(initial=8, minimum=1, maximum=8))
+        provider = AdmissionControlledProvider(CountingProvider(delay=0, fail_with=_throttle(retry_after=3)), controller)
+        with pytest.raises(LLMProviderError):
+            await provider.complete("p")
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["concurrency_limit"] == 4
+    assert stats["throttled"] == 1
+    assert stats["paused_for_seconds"] > 2
+
+
+def test_ops_endpoint_reports_admission_stats():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    body = TestClient(app).get("/ops/admission").json()
+    assert body["enabled"] is True
+    assert {"concurrency_limit", "in_flight", "queued", "shed"} <= set(body)
+    assert set(body["lanes"]) == {"interactive", "standard", "bulk"}
+
+
+def _single_slot(**kwargs):
+    return AdmissionController(AIMDLimiter(initial=1, minimum=1, maximum=1), **kwargs)
+
+
+def test_competing_lanes_are_admitted_in_proportion_to_their_weights():
+    async def scenario():
+        controller = _single_slot(lane_weights=(3, 1, 1))
+        order = []
+
+        async def call(lane):
+            await controller.acquire(1, lane=lane)
+            order.append(lane)
+            await asyncio.sleep(0.001)
+            controller.release(lane=lane)
+
+        await controller.acquire(1)  # hold the only slot while both lanes queue up
+        tasks = [asyncio.create_task(call(lane)) for lane in ["bulk"] * 6 + ["interactive"] * 6]
+        await asyncio.sleep(0.01)
+        controller.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(scenario())
+    assert order[:8].count("interactive") == 6  # 3:1 while both lanes have work
+    assert order[8:] == ["bulk"] * 4
+
+
+def test_bulk_calls_hold_at_most_their_share_of_the_limit():
+    async def scenario():
+        controller = AdmissionController(AIMDLimiter(initial=4, minimum=1, maximum=4), bulk_max_share=0.5)
+        for _ in range(2):
+            await controller.acquire(1, lane="bulk")
+        blocked = asyncio.create_task(controller.acquire(1, lane="bulk"))
+        await controller.acquire(1, lane="interactive")  # a free slot is still there for this
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        controller.release(lane="bulk")
+        await asyncio.wait_for(blocked, 1)
+        return controller.stats()["lanes"]
+
+    lanes = asyncio.run(scenario())
+    assert lanes["bulk"]["admitted"] == 3 and lanes["bulk"]["in_flight"] == 2
+    assert lanes["interactive"]["in_flight"] == 1
+
+
+def test_bulk_work_is_shed_while_a_higher_lane_misses_its_queue_slo():
+    async def scenario():
+        controller = _single_slot(queue_slo_seconds=(0.05, 0, 0))
+        await controller.acquire(1)
+        bulk = asyncio.create_task(controller.acquire(1, lane="bulk"))
+        interactive = asyncio.create_task(controller.acquire(1, lane="interactive"))
+        await asyncio.sleep(0.1)
+        assert bulk.done() and isinstance(bulk.exception(), LLMProviderError)
+        with pytest.raises(LLMProviderError):  # new bulk work is turned away at once
+            await controller.acquire(1, lane="bulk")
+        controller.release()
+        await asyncio.wait_for(interactive, 1)
+        return controller.stats()["lanes"]
+
+    lanes = asyncio.run(scenario())
+    assert lanes["bulk"]["shed"] == 2
+    assert lanes["interactive"]["admitted"] == 1 and lanes["interactive"]["slo_missed"] == 1
+
+
+def test_full_queue_sheds_a_lower_lane_to_make_room():
+    async def scenario():
+        controller = _single_slot(max_queue=1)
+        await controller.acquire(1)
+        bulk = asyncio.create_task(controller.acquire(1, lane="bulk"))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(controller.acquire(1, lane="interactive"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LLMProviderError):  # nothing below bulk to make room with
+            await controller.acquire(1, lane="bulk")
+        controller.release()
+        await asyncio.wait_for(interactive, 1)
+        return bulk
+
+    bulk = asyncio.run(scenario())
+    assert isinstance(bulk.exception(), LLMProviderError)
+
+
+def test_lane_comes_from_the_route_api_key_or_a_lower_priority_header():
+    settings = dataclasses.replace(get_settings(), priority_api_keys=(("batch-job", "bulk"), ("vip", "interactive")))
+    assert resolve_lane(settings, "/rephrase/stream", None, None) == "interactive"
+    assert resolve_lane(settings, "/rephrase/batch", None, None) == "bulk"
+    assert resolve_lane(settings, "/rephrase", None, "vip") == "interactive"
+    assert resolve_lane(settings, "/rephrase/stream", None, "batch-job") == "bulk"
+    assert resolve_lane(settings, "/rephrase/stream", "bulk", None) == "bulk"
+    assert resolve_lane(settings, "/rephrase/batch", "interactive", None) == "bulk"  # cannot raise itself
+    assert resolve_lane(settings, "/rephrase", "urgent", None) == "standard"
+
+
+def test_batch_requests_are_admitted_in_the_bulk_lane(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.main import create_app
+
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "0")
+    monkeypatch.setenv("FAKE_STREAM_DELAY_MS", "0")
+    with TestClient(create_app()) as client:
+        client.post("/rephrase/batch", json={"texts": ["one", "two"]})
+        client.post("/rephrase", json={"text": "three"}, headers={"X-Priority": "bulk"})
+        lanes = client.get("/ops/admission").json()["lanes"]
+    assert lanes["bulk"]["admitted"] == 3
+    assert lanes["interactive"]["admitted"] == lanes["standard"]["admitted"] == 0
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.llm.provider_errors import LLMProviderError
+from bench.prompts import cacheable_tokens, prompt_report
+from bench.runner import InProcessServer, LoadConfig, run_load
+from bench.simulated_provider import Distribution, SimulatedLLMProvider, SimulationProfile
+from bench.stats import compare, percentile, summarize_ms
+
+FAST = SimulationProfile(
+    ttft=Distribution("fixed", 0.001),
+    inter_chunk=Distribution("fixed", 0.0),
+    chunk_chars=16,
+    jitter=0.0,
+    seed=7,
+)
+
+
+def test_percentile_interpolates():
+    values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert percentile(values, 50) == pytest.approx(5.5)
+    assert percentile(values, 100) == 10
+    assert percentile([], 95) is None
+    assert summarize_ms([0.001, 0.003])["p50"] == pytest.approx(2.0)
+
+
+def test_distribution_parse_and_validation():
+    assert Distribution.parse("uniform:0.01,0.02") == Distribution("uniform", 0.01, 0.02)
+    assert Distribution.parse("exp:0.05").kind == "exp"
+    with pytest.raises(ValueError):
+        Distribution.parse("uniform:0.01")
+    with pytest.raises(ValueError):
+        Distribution.parse("pareto:1,2")
+
+
+def test_simulated_provider_injects_errors():
+    provider = SimulatedLLMProvider(
+        SimulationProfile(ttft=Distribution("fixed", 0.0), error_rate=1.0, error_code="LLM_TIMEOUT")
+    )
+    with pytest.raises(LLMProviderError) as exc:
+        asyncio.run(provider.complete("x"))
+    assert exc.value.code == "LLM_TIMEOUT"
+    assert provider.errors == 1
+
+
+def test_simulated_provider_streams_requested_style():
+    provider = SimulatedLLMProvider(FAST)
+
+    async def collect():
+        return "".join([d async for d in provider.complete_stream("Rewrite the INPUT in a casual style.")])
+
+    assert asyncio.run(collect()).startswith("Hey, can you")
+
+
+def test_compare_flags_latency_throughput_and_error_regressions():
+    base = {"scenarios": {"stream": {"latency_ms": {"p50": 100.0}, "throughput_rps": 50.0, "error_rate": 0.0}}}
+    same = {"scenarios": {"stream": {"latency_ms": {"p50": 105.0}, "throughput_rps": 49.0, "error_rate": 0.0}}}
+    worse = {"scenarios": {"stream": {"latency_ms": {"p50": 150.0}, "throughput_rps": 30.0, "error_rate": 0.2}}}
+
+    assert compare(base, same, threshold=0.1) == []
+    assert len(compare(base, worse, threshold=0.1)) == 3
+
+
+def test_in_process_run_reports_latency_and_ttfe(monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "0")
+    provider = SimulatedLLMProvider(FAST)
+
+    with InProcessServer(llm_provider=provider) as server:
+        stream = asyncio.run(run_load(server.base_url, LoadConfig(endpoint="stream", requests=4, concurrency=2)))
+        plain = asyncio.run(run_load(server.base_url, LoadConfig(endpoint="rephrase", requests=4, concurrency=2)))
+
+    assert stream["ok"] == plain["ok"] == 4
+    assert stream["ttfe_ms"]["count"] == 4
+    assert plain["latency_ms"]["p99"] is not None
+    assert "ttfe_ms" not in plain
+    assert provider.calls == 4 + 4  # single_call streams: one upstream call per request
+
+
+def test_prompt_report_shows_shared_prefix_gain_over_legacy_layout():
+    report = prompt_report()
+    system_tokens = report["templates"]["style"]["system_tokens"]
+    for sample in report["samples"].values():
+        new, legacy = sample["per_style"], sample["per_style_legacy"]
+        # Instructions and the whole input are shared; the legacy layout diverged at the style name
+        assert new["shared_prefix_tokens"] > system_tokens + sample["text_tokens"]
+        assert legacy["shared_prefix_tokens"] < system_tokens
+    assert cacheable_tokens(1023) == 0
+    assert cacheable_tokens(1300) == 1024 + 256
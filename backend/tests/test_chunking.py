@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+from app.llm.chunking import PARAGRAPH_SEP, split_text
+from app.llm.rephrase_generator import STYLES, _ChunkTrim, generate_rephrases, generate_rephrases_stream
+from app.llm.tokens import estimate_tokens
+
+PARAGRAPHS = [
+    "The quarterly report is attached. Please review the numbers before Friday.",
+    "Marketing wants a summary for the newsletter. Keep it short!",
+    "Finally, remember the offsite. Bring your laptop and charger.",
+]
+
+
+class EchoProvider:
+    """Answers every style with a tagged copy of the input; the chunk tagged SLOW answers last."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    @staticmethod
+    def _input(prompt) -> str:
+        return prompt.messages[1]["content"].removeprefix("Input text:\n").strip()
+
+    @classmethod
+    def _payload(cls, prompt) -> str:
+        text = cls._input(prompt)
+        return json.dumps({style: f"[{style[0]}] {text} " for style in STYLES})
+
+    async def _enter(self, prompt) -> None:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.1 if "SLOW" in prompt else 0.01)
+
+    async def complete(self, prompt: str) -> str:
+        await self._enter(prompt)
+        self.in_flight -= 1
+        return self._payload(prompt)
+
+    async def complete_stream(self, prompt: str):
+        await self._enter(prompt)
+        try:
+            payload = self._payload(prompt)
+            for i in range(0, len(payload), 7):
+                yield payload[i : i + 7]
+                await asyncio.sleep(0)
+        finally:
+            self.in_flight -= 1
+
+
+def test_split_prefers_paragraphs_then_sentences():
+    text = PARAGRAPH_SEP.join(PARAGRAPHS)
+    budget = estimate_tokens(PARAGRAPHS[0]) + 1
+    chunks = split_text(text, budget)
+    assert [c.text for c in chunks] == PARAGRAPHS
+    assert [c.sep for c in chunks] == [PARAGRAPH_SEP, PARAGRAPH_SEP, ""]
+
+    # A paragraph over budget breaks at sentence ends, never mid-sentence
+    chunks = split_text(PARAGRAPHS[0], estimate_tokens(PARAGRAPHS[0]) // 2 + 2)
+    assert [c.text for c in chunks] == ["The quarterly report is attached.", "Please review the numbers before Friday."]
+    assert chunks[0].sep == " "
+
+
+def test_oversized_sentence_is_split_between_words_within_budget():
+    sentence = " ".join(["word"] * 200)
+    chunks = split_text(sentence, 40)
+    assert all(estimate_tokens(c.text) <= 40 for c in chunks)
+    assert " ".join(c.text for c in chunks) == sentence
+    assert split_text("short text", 40)[0].text == "short text"
+
+
+def test_chunk_trim_drops_outer_whitespace_only():
+    trim = _ChunkTrim()
+    out = "".join(trim.feed(d) for d in ["  ", " Hello", " ", "\n", "world.", "  "])
+    assert out == "Hello \nworld."
+
+
+def test_long_input_is_rephrased_in_parallel_and_stitched_in_order():
+    provider = EchoProvider()
+    text = PARAGRAPH_SEP.join(["SLOW " + PARAGRAPHS[0], PARAGRAPHS[1], PARAGRAPHS[2]])
+    result = asyncio.run(generate_rephrases(provider, text, chunk_tokens=20, max_parallel_chunks=2))
+    assert result.casual == PARAGRAPH_SEP.join(f"[c] {p}" for p in ["SLOW " + PARAGRAPHS[0], *PARAGRAPHS[1:]])
+    assert provider.peak == 2
+
+
+def test_chunked_stream_keeps_each_style_in_input_order():
+    provider = EchoProvider()
+    text = PARAGRAPH_SEP.join(["SLOW " + PARAGRAPHS[0], PARAGRAPHS[1], PARAGRAPHS[2]])
+
+    async def scenario():
+        completed = set()
+        items = []
+        stream = generate_rephrases_stream(provider, text, single_call=True, chunk_tokens=20, completed=completed)
+        async for item in stream:
+            items.append(item)
+        return items, completed
+
+    items, completed = asyncio.run(scenario())
+    assert completed == set(STYLES)
+    for style in STYLES:
+        streamed = "".join(i["delta"] for i in items if i["style"] == style)
+        expected = PARAGRAPH_SEP.join(f"[{style[0]}] {p}" for p in ["SLOW " + PARAGRAPHS[0], *PARAGRAPHS[1:]])
+        assert streamed == expected
+    assert provider.peak == 3  # all chunks were generating at once
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.llm.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerProvider
+from app.llm.provider_errors import LLMProviderError
+from app.main import create_app
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _error(error_class):
+    return LLMProviderError(status_code=502, code="LLM_PROVIDER_FAILURE", message="x", error_class=error_class)
+
+
+class Upstream:
+    """Fails with `error` while it is set."""
+
+    def __init__(self):
+        self.error = None
+        self.calls = 0
+
+    async def complete(self, prompt: str) -> str:
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return '{"professional": "p", "casual": "c", "polite": "po", "social": "s"}'
+
+    async def complete_stream(self, prompt: str):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        yield "ok"
+
+
+def test_breaker_opens_and_probes_after_cooldown():
+    clock = Clock()
+    breaker = CircuitBreaker("a", failure_threshold=2, cooldown_seconds=5, clock=clock)
+    breaker.record(False)
+    assert breaker.state == CLOSED
+    breaker.record(False)
+    assert breaker.state == OPEN and not breaker.available()
+    assert breaker.retry_after() == 5
+
+    clock.now = 5
+    assert breaker.state == HALF_OPEN and breaker.available()
+    breaker.acquire()
+    assert not breaker.available()  # one probe at a time
+    breaker.record(False)
+    assert breaker.state == OPEN and breaker.retry_after() == 10  # failed probe doubles the cooldown
+
+    clock.now = 15
+    breaker.acquire()
+    breaker.record(True)
+    assert breaker.state == CLOSED and breaker.opened == 2
+
+
+def test_failure_rate_counts_only_tripping_error_classes():
+    clock = Clock()
+    breaker = CircuitBreaker(
+        "upstream",
+        failure_threshold=0,
+        failure_rate=0.5,
+        min_calls=10,
+        window_seconds=10,
+        trip_on=("timeout", "server"),
+        clock=clock,
+    )
+    for _ in range(20):
+        breaker.record(False, "rate_limit")  # throttling is admission control's business
+    for _ in range(4):
+        breaker.record(True)
+        breaker.record(False, "timeout")
+    assert breaker.state == CLOSED  # 4 of 8 calls: below min_calls
+
+    breaker.record(False, "server")
+    breaker.record(True)
+    assert breaker.state == CLOSED  # 5 of 10 calls, but the last one succeeded
+    breaker.record(False, "timeout")
+    assert breaker.state == OPEN
+    rates = breaker.stats()["window_failure_rates"]
+    assert set(rates) == {"rate_limit", "timeout", "server"}
+
+    # Outcomes older than the window are forgotten
+    breaker = CircuitBreaker("w", failure_threshold=0, failure_rate=0.5, min_calls=4, window_seconds=10, clock=clock)
+    for _ in range(3):
+        breaker.record(False)
+    clock.now += 11
+    breaker.record(False)
+    assert breaker.state == CLOSED and breaker.stats()["window_calls"] == 1
+
+
+def test_open_circuit_fails_fast_and_closes_after_probes():
+    clock = Clock()
+    upstream = Upstream()
+    provider = CircuitBreakerProvider(
+        upstream, CircuitBreaker("upstream", failure_threshold=3, probes=2, cooldown_seconds=5, clock=clock)
+    )
+
+    async def call():
+        try:
+            return await provider.complete("p")
+        except LLMProviderError as e:
+            return e
+
+    upstream.error = _error("timeout")
+    for _ in range(3):
+        asyncio.run(call())
+    error = asyncio.run(call())
+    assert upstream.calls == 3  # the fourth never reached the upstream
+    assert error.status_code == 502 and error.retry_after_seconds == 5 and provider.rejected == 1
+
+    clock.now = 5
+    upstream.error = None
+    assert isinstance(asyncio.run(call()), str)
+    assert provider.breaker.state == HALF_OPEN  # one of two probes done
+    assert isinstance(asyncio.run(call()), str)
+    assert provider.breaker.state == CLOSED
+
+
+def test_endpoint_answers_open_circuit_with_retry_after(monkeypatch):
+    monkeypatch.setenv("LLM_MODE", "fake")
+    monkeypatch.setenv("RETRY_MAX_ATTEMPTS", "1")
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "0")
+    monkeypatch.setenv("CIRCUIT_CONSECUTIVE_FAILURES", "2")
+    monkeypatch.setenv("CIRCUIT_COOLDOWN_SECONDS", "30")
+    upstream = Upstream()
+    upstream.error = _error("connection")
+    assert get_settings().circuit_enabled
+
+    with TestClient(create_app(llm_provider=upstream)) as client:
+        for i in range(2):
+            assert client.post("/rephrase", json={"text": f"hello {i}"}).status_code == 502
+        resp = client.post("/rephrase", json={"text": "hello again"})
+        assert resp.status_code == 502
+        assert resp.json()["code"] == "LLM_PROVIDER_FAILURE"
+        assert 0 < int(resp.headers["Retry-After"]) <= 30
+        assert upstream.calls == 2
+
+        stats = client.get("/ops/circuit").json()
+        assert stats["enabled"] and stats["state"] == OPEN and stats["rejected"] == 1
@@ -0,0 +1,141 @@
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.llm.factory as factory
+from app.config import get_settings, load_env_file
+from app.config_reload import ConfigReloader
+from app.llm.registry import ProviderRegistry
+from app.main import create_app
+
+
+@pytest.fixture(autouse=True)
+def _restore_env_file():
+    yield
+    load_env_file()  # tests point the loader at temp files; put the project's .env back
+
+
+class GatedStreamProvider:
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def complete(self, prompt: str) -> str:
+        return "{}"
+
+    async def complete_stream(self, prompt: str):
+        yield "first"
+        await self.release.wait()
+        yield "second"
+
+
+def test_settings_version_tracks_content(monkeypatch):
+    monkeypatch.setenv("RETRY_MAX_ATTEMPTS", "3")
+    first = get_settings()
+    assert get_settings().version == first.version
+    monkeypatch.setenv("RETRY_MAX_ATTEMPTS", "5")
+    assert get_settings().version != first.version
+
+
+def test_env_file_reload_updates_only_keys_it_owns(monkeypatch, tmp_path):
+    env_file = tmp_path / ".env"
+    monkeypatch.setenv("STREAM_MAX_IN_FLIGHT", "7")  # real environment wins over the file
+    monkeypatch.delenv("BATCH_MAX_PARALLEL", raising=False)
+    env_file.write_text("STREAM_MAX_IN_FLIGHT=1\nBATCH_MAX_PARALLEL=3\n")
+    load_env_file(str(env_file))
+    assert os.environ["STREAM_MAX_IN_FLIGHT"] == "7"
+    assert os.environ["BATCH_MAX_PARALLEL"] == "3"
+
+    env_file.write_text("")
+    load_env_file(str(env_file))
+    assert "BATCH_MAX_PARALLEL" not in os.environ
+
+
+def test_reload_swaps_registry_without_dropping_in_flight_stream(monkeypatch, tmp_path):
+    monkeypatch.setenv("CONFIG_DRAIN_TIMEOUT_SECONDS", "5")
+    monkeypatch.setenv("RETRY_MAX_ATTEMPTS", "3")
+    provider = GatedStreamProvider()
+
+    async def scenario():
+        old = ProviderRegistry(get_settings(), base_provider=provider)
+        factory.set_provider_registry(old)
+        reloader = ConfigReloader(old, base_provider=provider, env_file=str(tmp_path / "none.env"))
+
+        stream = old.get_provider().complete_stream("p")
+        assert await stream.__anext__() == "first"
+
+        monkeypatch.setenv("RETRY_MAX_ATTEMPTS", "2")
+        assert await reloader.reload("test") is True
+        new = factory.get_provider_registry()
+        assert new is not old and new.settings.retry_max_attempts == 2
+        assert reloader.generation == 2
+
+        # The old registry waits for the stream that started on it
+        await asyncio.sleep(0.2)
+        assert not old._closed
+        provider.release.set()
+        assert [d async for d in stream] == ["second"]
+        await asyncio.sleep(0.3)
+        assert old._closed
+
+        # Same settings again: nothing to do
+        assert await reloader.reload("test") is False
+        await reloader.aclose()
+        await new.aclose()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        factory.set_provider_registry(None)
+
+
+def test_invalid_reload_keeps_current_config(monkeypatch, tmp_path):
+    async def scenario():
+        registry = ProviderRegistry(get_settings())
+        factory.set_provider_registry(registry)
+        reloader = ConfigReloader(registry, env_file=str(tmp_path / "none.env"))
+        monkeypatch.setenv("STREAM_MODE", "bogus")
+        assert await reloader.reload("test") is False
+        assert factory.get_provider_registry() is registry
+        assert "STREAM_MODE" in reloader.last_error
+        await reloader.aclose()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        factory.set_provider_registry(None)
+
+
+def test_reload_to_another_llm_mode_does_not_serve_the_old_modes_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("CONFIG_ENV_FILE", str(tmp_path / "none.env"))
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "1")
+    monkeypatch.setenv("RESPONSE_CACHE_NEAR_DUPLICATE_ENABLED", "1")
+    monkeypatch.setenv("LLM_MODE", "fake")
+    monkeypatch.setenv("ALLOW_REAL_LLM", "0")
+    app = create_app()
+    text = "Please send me the quarterly report before the meeting on Friday."
+    with TestClient(app) as client:
+        assert client.post("/rephrase", json={"text": text}).status_code == 200
+        monkeypatch.setenv("LLM_MODE", "real")
+        assert client.portal.call(app.state.config_reloader.reload, "test") is True
+        exact = client.post("/rephrase", json={"text": text})
+        near = client.post("/rephrase", json={"text": text + "!"})
+        monkeypatch.setenv("LLM_MODE", "fake")
+        assert client.portal.call(app.state.config_reloader.reload, "test") is True
+        back = client.post("/rephrase", json={"text": text})
+        stats = client.get("/ops/cache").json()
+
+    # Real mode is disabled: a cache hit would have answered 200 with the fake result
+    assert exact.status_code == near.status_code == 403
+    assert back.status_code == 200
+    assert stats["hits"] == 1  # switching back finds the fake entries again
+
+
+def test_ops_config_reports_version():
+    app = create_app()
+    with TestClient(app) as client:
+        body = client.get("/ops/config").json()
+    assert body["hot_reload"] is True
+    assert body["version"] == app.state.llm_registry.settings.version
+    assert body["generation"] == 1
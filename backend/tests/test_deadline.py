@@ -0,0 +1,157 @@
+import asyncio
+import json
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.llm.factory as factory
+from app.llm.deadline import Deadline, bounded_stream, current_deadline, parse_timeout_header, within
+from app.llm.provider_errors import LLMProviderError
+from app.llm.rephrase_generator import generate_rephrases_stream
+from app.llm.retry import RetryBudget, RetryingProvider, RetryPolicy
+from app.main import app
+
+client = TestClient(app)
+
+
+class SlowStyleProvider:
+    """Streams the professional style at once; every other style stalls."""
+
+    def __init__(self):
+        self.cancelled = 0
+        self.seen_deadlines = []
+
+    async def complete(self, prompt: str) -> str:
+        self.seen_deadlines.append(current_deadline())
+        await asyncio.sleep(5)
+        return "{}"
+
+    async def complete_stream(self, prompt: str):
+        self.seen_deadlines.append(current_deadline())
+        if "professional style" in prompt:
+            yield "Please review."
+            return
+        yield "Hey"
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        yield " never"
+
+
+@pytest.fixture
+def sequential(monkeypatch):
+    monkeypatch.setenv("STREAM_MODE", "sequential")
+    monkeypatch.setenv("SSE_COALESCE_MS", "0")
+    factory.set_provider_registry(None)
+    provider = SlowStyleProvider()
+    monkeypatch.setattr(factory, "get_llm_provider", lambda: provider)
+    yield provider
+    factory.set_provider_registry(None)
+
+
+def test_timeout_header_is_capped_and_validated():
+    assert parse_timeout_header(None, default=0, maximum=300) is None
+    assert 59 < parse_timeout_header(None, default=60, maximum=30).remaining() <= 60  # default is not capped
+    assert parse_timeout_header("1000", default=60, maximum=30).remaining() <= 30
+    for bad in ("soon", "-1", "0", "nan"):
+        with pytest.raises(ValueError):
+            parse_timeout_header(bad, default=60, maximum=300)
+
+
+def test_within_cancels_and_raises_llm_timeout():
+    provider = SlowStyleProvider()
+
+    async def scenario():
+        deadline = Deadline.after(0.05)
+        with pytest.raises(LLMProviderError) as exc:
+            await within(provider.complete("p"), deadline)
+        return deadline, exc.value
+
+    deadline, error = asyncio.run(scenario())
+    assert error.status_code == 504 and error.code == "LLM_TIMEOUT"
+    assert provider.seen_deadlines == [deadline]  # visible to the provider while it runs
+    assert current_deadline() is None
+
+
+def test_nested_deadline_only_tightens():
+    async def inner():
+        return current_deadline()
+
+    async def scenario():
+        outer = Deadline.after(0.5)
+        looser = Deadline.after(5)
+        return outer, await within(within(inner(), looser), outer)
+
+    outer, seen = asyncio.run(scenario())
+    assert seen is outer
+
+
+def test_stream_deadline_reports_finished_styles():
+    provider = SlowStyleProvider()
+
+    async def scenario():
+        completed = set()
+        deltas = []
+        stream = generate_rephrases_stream(provider, "hi", deadline=Deadline.after(0.1), completed=completed)
+        with pytest.raises(LLMProviderError):
+            async for item in stream:
+                deltas.append(item)
+        return completed, deltas
+
+    completed, deltas = asyncio.run(scenario())
+    assert completed == {"professional"}
+    assert deltas == [{"style": "professional", "delta": "Please review."}, {"style": "casual", "delta": "Hey"}]
+    assert provider.cancelled == 1
+
+
+def test_retry_is_skipped_when_backoff_would_overrun_the_deadline():
+    class Failing:
+        calls = 0
+
+        async def complete(self, prompt):
+            self.calls += 1
+            raise LLMProviderError(status_code=502, code="LLM_PROVIDER_FAILURE", message="x", retryable=True)
+
+    inner = Failing()
+    provider = RetryingProvider(
+        inner,
+        RetryPolicy(base_delay_seconds=10, max_delay_seconds=10),
+        RetryBudget(min_per_second=0),
+        rng=random.Random(0),  # first backoff ~8.4s; an unseeded one is under 0.5s one time in twenty
+    )
+
+    async def scenario():
+        with pytest.raises(LLMProviderError) as exc:
+            await within(provider.complete("p"), Deadline.after(0.5))
+        return exc.value
+
+    # Without the deadline this would sleep up to 10s before trying again
+    assert asyncio.run(scenario()).code == "LLM_PROVIDER_FAILURE"
+    assert inner.calls == 1
+
+
+def test_stream_endpoint_ends_with_timeout_event(sequential):
+    with client.stream("POST", "/rephrase/stream", json={"text": "hi"}, headers={"X-Request-Timeout": "0.2"}) as resp:
+        body = "".join(resp.iter_text())
+
+    assert "event: final" not in body
+    frame = next(f for f in body.split("\n\n") if f.startswith("event: timeout"))
+    data = json.loads(next(line for line in frame.split("\n") if line.startswith("data: "))[len("data: "):])
+    assert data["code"] == "LLM_TIMEOUT"
+    assert data["completed"] == {"professional": "Please review."}
+    assert data["pending"] == ["casual", "polite", "social"]
+    assert sequential.cancelled == 1
+
+
+def test_rephrase_endpoint_times_out_with_504(sequential):
+    resp = client.post("/rephrase", json={"text": "hi"}, headers={"X-Request-Timeout": "0.1"})
+    assert resp.status_code == 504
+    assert resp.json()["code"] == "LLM_TIMEOUT"
+
+
+def test_malformed_timeout_header_is_rejected():
+    resp = client.post("/rephrase", json={"text": "hi"}, headers={"X-Request-Timeout": "soon"})
+    assert resp.status_code == 400
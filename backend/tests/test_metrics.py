@@ -0,0 +1,82 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.llm.provider_errors import LLMProviderError
+from app.main import app
+from app.observability.metrics import ERRORS, HTTP_REQUESTS, Counter, Histogram, MetricsRegistry
+
+client = TestClient(app)
+
+
+class RateLimitedProvider:
+    async def complete(self, prompt: str) -> str:
+        raise LLMProviderError(status_code=429, code="RATE_LIMIT_EXCEEDED", message="slow down")
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    h = registry.register(Histogram("demo_seconds", "Demo.", ("stage",), buckets=(0.1, 1.0)))
+    h.labels("a").observe(0.05)
+    h.labels("a").observe(0.1)
+    h.labels("a").observe(5)
+
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="a",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="a"} 3' in text
+
+
+def test_counter_escapes_label_values():
+    registry = MetricsRegistry()
+    c = registry.register(Counter("demo_total", "Demo.", ("code",)))
+    c.labels('a"b').inc(2)
+    assert 'demo_total{code="a\\"b"} 2' in registry.render()
+
+
+def test_metrics_endpoint_reports_routes_and_stages():
+    assert client.post("/rephrase", json={"text": "metrics please"}).status_code == 200
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert 'http_requests_total{method="POST",route="/rephrase",status="200"}' in body
+    assert 'rephrase_stage_duration_seconds_count{stage="validate_input"}' in body
+    assert 'rephrase_stage_duration_seconds_count{stage="provider_acquire"}' in body
+    assert 'rephrase_stage_duration_seconds_count{stage="parse_response"}' in body
+
+
+def test_stream_records_ttft_and_sse_bytes(monkeypatch):
+    monkeypatch.setenv("FAKE_STREAM_DELAY_MS", "0")
+    with client.stream("POST", "/rephrase/stream", json={"text": "metrics stream"}) as resp:
+        "".join(resp.iter_text())
+
+    body = client.get("/metrics").text
+    assert 'llm_upstream_ttft_seconds_count{kind="stream"}' in body
+    assert "sse_bytes_written_total " in body
+
+
+def test_errors_are_counted_by_provider_error_code(monkeypatch):
+    import app.llm.factory as factory
+
+    monkeypatch.setattr(factory, "get_llm_provider", lambda: RateLimitedProvider())
+    before = ERRORS.value("RATE_LIMIT_EXCEEDED")
+    requests_before = HTTP_REQUESTS.value("POST", "/rephrase", "429")
+
+    assert client.post("/rephrase", json={"text": "hello"}).status_code == 429
+
+    assert ERRORS.value("RATE_LIMIT_EXCEEDED") == before + 1
+    assert HTTP_REQUESTS.value("POST", "/rephrase", "429") == requests_before + 1
+
+
+def test_recording_overhead_is_microseconds():
+    h = Histogram("overhead_seconds", "Overhead.", ("stage",))
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        h.labels("validate_input").observe(0.002)
+    per_call = (time.perf_counter() - start) / n
+    assert per_call < 20e-6
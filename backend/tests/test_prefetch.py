@@ -0,0 +1,143 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.cache.speculative import PrefetchStore
+from app.llm.admission import AdmissionControlledProvider, AdmissionController, AIMDLimiter
+from app.llm.fake_provider import FakeLLMProvider
+from app.llm.provider_errors import LLMProviderError
+from app.main import create_app
+from app.routes.rephrase import _prefetched
+
+DRAFT = "Hi team, could you send me the report by Friday?"
+
+
+class CountingProvider(FakeLLMProvider):
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+
+    async def complete(self, prompt: str) -> str:
+        self.calls += 1
+        return await super().complete(prompt)
+
+    async def complete_stream(self, prompt: str):
+        self.calls += 1
+        try:
+            async for delta in super().complete_stream(prompt):
+                yield delta
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def _client(monkeypatch, provider, delay_ms="0"):
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "0")
+    monkeypatch.setenv("FAKE_STREAM_DELAY_MS", delay_ms)
+    return TestClient(create_app(llm_provider=provider))
+
+
+def test_stream_and_rephrase_attach_to_the_prefetched_draft(monkeypatch):
+    provider = CountingProvider()
+    with _client(monkeypatch, provider, delay_ms="5") as client:
+        assert client.post("/rephrase/prefetch", json={"text": DRAFT}).json() == {"status": "started"}
+        assert client.post("/rephrase/prefetch", json={"text": DRAFT + " "}).json()["status"] in ("running", "ready")
+        with client.stream("POST", "/rephrase/stream", json={"text": DRAFT}) as resp:
+            body = "".join(resp.iter_text())
+        rest = client.post("/rephrase", json={"text": DRAFT}).json()
+        stats = client.get("/ops/prefetch").json()
+        lanes = client.get("/ops/admission").json()["lanes"]
+
+    assert "event: partial" in body and "event: final" in body
+    assert rest["professional"] and rest["professional"] in body
+    assert provider.calls == 1  # the single_call stream started by the prefetch
+    assert lanes["bulk"]["admitted"] == 1 and lanes["interactive"]["admitted"] == 0
+    assert stats["started"] == stats["used"] == 1 and stats["wasted"] == 0
+
+
+def test_newer_draft_from_the_same_session_cancels_the_previous_one(monkeypatch):
+    provider = CountingProvider()
+    with _client(monkeypatch, provider, delay_ms="200") as client:
+        first = client.post("/rephrase/prefetch", json={"text": DRAFT, "session_id": "tab-1"})
+        client.post("/rephrase/prefetch", json={"text": "Other tab, other draft text", "session_id": "tab-2"})
+        second = client.post("/rephrase/prefetch", json={"text": DRAFT + " Thanks!", "session_id": "tab-1"})
+        stats = client.get("/ops/prefetch").json()
+
+    assert first.status_code == second.status_code == 202
+    assert stats["superseded"] == 1 and stats["running"] == 2
+    assert provider.cancelled >= 1
+
+
+def test_short_drafts_and_full_store_are_skipped(monkeypatch):
+    monkeypatch.setenv("PREFETCH_MAX_RUNNING", "1")
+    with _client(monkeypatch, CountingProvider(), delay_ms="200") as client:
+        assert client.post("/rephrase/prefetch", json={"text": "Hi"}).json() == {"status": "skipped"}
+        assert client.post("/rephrase/prefetch", json={"text": "   "}).status_code == 400
+        assert client.post("/rephrase/prefetch", json={"text": DRAFT}).json() == {"status": "started"}
+        assert client.post("/rephrase/prefetch", json={"text": DRAFT + "!"}).json() == {"status": "skipped"}
+
+
+def test_prefetch_is_disabled_by_setting(monkeypatch):
+    monkeypatch.setenv("PREFETCH_ENABLED", "0")
+    with _client(monkeypatch, CountingProvider()) as client:
+        assert client.post("/rephrase/prefetch", json={"text": DRAFT}).json() == {"status": "disabled"}
+        assert client.get("/ops/prefetch").json() == {"enabled": False}
+
+
+def test_request_does_not_attach_to_a_prefetch_still_queued_for_admission():
+    class Slow:
+        async def complete(self, prompt: str) -> str:
+            await asyncio.sleep(60)
+            return ""
+
+    async def draft(provider):
+        yield {"style": "casual", "delta": await provider.complete("draft")}
+
+    async def scenario():
+        # One upstream slot: the first prefetch takes it, the second waits in the queue
+        controller = AdmissionController(AIMDLimiter(initial=1, minimum=1, maximum=1))
+        provider = AdmissionControlledProvider(Slow(), controller)
+        store = PrefetchStore()
+        store.start("admitted", None, draft(provider), set())
+        await asyncio.sleep(0.01)
+        waiting = store.start("queued", None, draft(provider), set())
+        await asyncio.sleep(0.01)
+        claimed = store.claim("queued"), store.claim("admitted")
+        await asyncio.sleep(0)
+        stats = store.stats()
+        await store.aclose()
+        return waiting, claimed, stats
+
+    waiting, (preempted, attached), stats = asyncio.run(scenario())
+    assert preempted is None and waiting.task.cancelled()
+    assert attached is not None and attached.admitted
+    assert stats["preempted"] == 1 and stats["used"] == 1 and stats["wasted"] == 0
+
+
+def test_prefetch_is_off_with_several_workers(monkeypatch):
+    monkeypatch.setenv("SERVER_WORKERS", "2")
+    monkeypatch.setenv("SSE_RESUME_ENABLED", "0")
+    with _client(monkeypatch, CountingProvider()) as client:
+        assert client.post("/rephrase/prefetch", json={"text": DRAFT}).json() == {"status": "disabled"}
+
+
+def test_attached_request_falls_back_to_a_fresh_generation_when_the_prefetch_fails():
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise LLMProviderError(status_code=429, code="RATE_LIMIT_EXCEEDED", message="shed")
+        yield {}
+
+    async def fresh():
+        yield {"style": "casual", "delta": "fresh"}
+
+    async def scenario():
+        store = PrefetchStore(admission=False)
+        prefetch = store.start("k", None, failing(), set())
+        attached = store.claim("k")
+        items = [item async for item in _prefetched(attached, fresh, set(), None)]
+        return prefetch, items, store
+
+    prefetch, items, store = asyncio.run(scenario())
+    assert items == [{"style": "casual", "delta": "fresh"}]
+    assert prefetch.failed
+    assert store.get("k") is None  # failed drafts are forgotten
@@ -0,0 +1,38 @@
+import pytest
+
+from app.llm.fake_provider import detect_style, wants_json
+from app.llm.openai_provider import _messages
+from app.llm.prompt import PROMPT_VERSION, STYLE_TEMPLATE, PromptTemplate, build_rephrase_prompt, build_style_prompt
+
+
+def test_rendered_prompt_is_text_and_chat_messages():
+    prompt = build_rephrase_prompt("Hello {there}")
+    system, user = prompt.messages
+    assert system["role"] == "system" and "Hello" not in system["content"]
+    assert user == {"role": "user", "content": "Input text:\nHello {there}\n"}
+    assert prompt == system["content"] + "\n\n" + user["content"]
+    assert wants_json(prompt)
+    assert _messages(prompt) == [system, user]
+    assert _messages("plain") == [{"role": "user", "content": "plain"}]
+
+
+def test_style_prompts_share_everything_but_the_style_line():
+    prompts = [build_style_prompt("Review this, please.", s) for s in ("professional", "casual", "polite", "social")]
+    assert len({p.messages[0]["content"] for p in prompts}) == 1
+    assert all(p.startswith(STYLE_TEMPLATE.system + "\n\nINPUT:\nReview this, please.\n") for p in prompts)
+    assert [detect_style(p) for p in prompts] == ["professional", "casual", "polite", "social"]
+
+
+def test_template_version_tracks_wording():
+    a = PromptTemplate("t", "System.", "Text: {text}")
+    b = PromptTemplate("t", "System!", "Text: {text}")
+    assert a.version != b.version
+    assert a.fields == {"text"}
+    assert a.render(text="x").messages[1]["content"] == "Text: x"
+    assert len(PROMPT_VERSION) == 12
+
+
+@pytest.mark.parametrize("user", ["{text!r}", "{text:>10}", "{0}"])
+def test_template_rejects_unsupported_placeholders(user):
+    with pytest.raises(ValueError):
+        PromptTemplate("bad", "System.", user)
@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.llm.fake_provider import FakeLLMProvider
+from app.llm.provider_errors import LLMProviderError
+from app.llm.registry import ProviderRegistry
+from app.llm.singleflight import CoalescingProvider
+from app.main import create_app
+
+
+def _base(provider):
+    while hasattr(provider, "inner"):
+        provider = provider.inner
+    return provider
+
+
+def _real_env(monkeypatch):
+    monkeypatch.setenv("LLM_MODE", "real")
+    monkeypatch.setenv("ALLOW_REAL_LLM", "1")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com/")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT", "test-deployment")
+    monkeypatch.setenv("AZURE_OPENAI_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS", "3")
+
+
+def test_registry_reuses_one_provider_instance(monkeypatch):
+    monkeypatch.setenv("LLM_MODE", "fake")
+    monkeypatch.setenv("SINGLE_FLIGHT_ENABLED", "0")
+    registry = ProviderRegistry(get_settings())
+
+    first = registry.get_provider()
+    assert isinstance(_base(first), FakeLLMProvider)
+    assert registry.get_provider() is first
+
+
+def test_registry_wraps_provider_for_single_flight_by_default(monkeypatch):
+    monkeypatch.setenv("LLM_MODE", "fake")
+    registry = ProviderRegistry(get_settings())
+
+    provider = registry.get_provider().inner  # outermost layer only counts in-flight calls
+    assert isinstance(provider, CoalescingProvider)
+    assert isinstance(_base(provider), FakeLLMProvider)
+    assert provider.flights is registry.flights
+
+
+def test_registry_real_mode_disabled_raises_403(monkeypatch):
+    monkeypatch.setenv("LLM_MODE", "real")
+    monkeypatch.setenv("ALLOW_REAL_LLM", "0")
+    registry = ProviderRegistry(get_settings())
+
+    with pytest.raises(LLMProviderError) as exc:
+        registry.get_provider()
+    assert exc.value.code == "REAL_LLM_DISABLED"
+
+
+def test_routes_pass_the_disabled_real_mode_403_through(monkeypatch):
+    monkeypatch.setenv("LLM_MODE", "real")
+    monkeypatch.setenv("ALLOW_REAL_LLM", "0")
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "0")
+    monkeypatch.setenv("PREFETCH_ENABLED", "0")
+    with TestClient(create_app()) as client:
+        rest = client.post("/rephrase", json={"text": "hello"})
+        with client.stream("POST", "/rephrase/stream", json={"text": "hello"}) as resp:
+            stream = "".join(resp.iter_text())
+        batch = client.post("/rephrase/batch", json={"texts": ["hello", "there"]})
+
+    assert rest.status_code == 403 and rest.json()["code"] == "REAL_LLM_DISABLED"
+    assert "event: error" in stream and "REAL_LLM_DISABLED" in stream and "INTERNAL_ERROR" not in stream
+    lines = [json.loads(line) for line in batch.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1]
+    assert {line["error"]["code"] for line in lines} == {"REAL_LLM_DISABLED"}
+
+
+def test_registry_shares_pool_and_closes_it(monkeypatch):
+    _real_env(monkeypatch)
+    registry = ProviderRegistry(get_settings())
+
+    provider = registry.get_provider()
+    assert registry.get_provider() is provider
+
+    stats = registry.pool_stats()
+    assert stats["initialized"] is True
+    assert stats["max_connections"] == 7
+    assert stats["max_keepalive_connections"] == 3
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 0
+    assert stats["waiting"] == 0
+
+    client = registry._http_client
+    asyncio.run(registry.aclose())
+    assert client.is_closed
+    with pytest.raises(RuntimeError):
+        registry.get_provider()
+
+
+def test_lifespan_installs_registry_and_exposes_pool_stats():
+    app = create_app()
+    with TestClient(app) as client:
+        assert isinstance(app.state.llm_registry, ProviderRegistry)
+        resp = client.get("/ops/pool")
+        assert resp.status_code == 200
+        body = resp.json()
+        assert {"in_use", "idle", "waiting"} <= set(body.keys())
@@ -0,0 +1,132 @@
+import asyncio
+import gzip
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.llm.prompt import build_rephrase_prompt, build_style_prompt
+from app.llm.provider_errors import LLMProviderError
+from app.llm.recording import RecordingProvider, ReplayProvider, SessionRecorder, load_sessions
+from app.main import create_app
+
+
+class PacedUpstream:
+    """Streams "Hey there!" in three chunks 50 ms apart; prompts containing FAIL fail after one chunk."""
+
+    async def complete(self, prompt: str) -> str:
+        await asyncio.sleep(0.05)
+        return json.dumps({"professional": "P", "casual": "C", "polite": "Po", "social": "S"})
+
+    async def complete_stream(self, prompt: str):
+        for i, part in enumerate(("Hey", " there", "!")):
+            await asyncio.sleep(0.05)
+            if i == 1 and "FAIL" in prompt:
+                raise LLMProviderError(status_code=502, code="LLM_PROVIDER_FAILURE", message="x", retryable=True)
+            yield part
+
+
+async def _drain(stream):
+    return [d async for d in stream]
+
+
+def _record(path, prompts):
+    recorder = SessionRecorder(str(path))
+    provider = RecordingProvider(PacedUpstream(), recorder)
+
+    async def scenario():
+        for prompt in prompts:
+            try:
+                await _drain(provider.complete_stream(prompt))
+            except LLMProviderError:
+                pass
+
+    asyncio.run(scenario())
+    recorder.close()
+    return recorder
+
+
+def test_sessions_are_recorded_compactly_with_chunk_timing(tmp_path):
+    path = tmp_path / "sessions.jsonl"
+    recorder = _record(path, [build_style_prompt("hello", "casual"), build_style_prompt("FAIL", "polite")])
+    assert recorder.recorded == 2
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[0])["format"] == "rephrase-sessions"
+    ok, failed = (json.loads(line) for line in lines[1:])
+    assert ok["p"] == "style:casual" and ok["m"] == "s"
+    assert [text for _, text in ok["c"]] == ["Hey", " there", "!"]
+    assert all(40 <= ms <= 150 for ms, _ in ok["c"])
+    assert "hello" not in lines[1]  # prompts are not stored
+    assert [text for _, text in failed["c"]] == ["Hey"] and failed["e"]["code"] == "LLM_PROVIDER_FAILURE"
+
+
+def test_replay_reproduces_chunks_errors_and_scaled_pacing(tmp_path):
+    path = tmp_path / "sessions.jsonl"
+    casual, failing = build_style_prompt("hello", "casual"), build_style_prompt("FAIL", "polite")
+    _record(path, [casual, failing])
+
+    async def timed(provider, prompt):
+        start = time.perf_counter()
+        deltas = await _drain(provider.complete_stream(prompt))
+        return deltas, time.perf_counter() - start
+
+    original = ReplayProvider(load_sessions(str(path)))
+    deltas, elapsed = asyncio.run(timed(original, casual))
+    assert deltas == ["Hey", " there", "!"]
+    assert 0.12 <= elapsed < 0.4
+
+    fast = ReplayProvider(load_sessions(str(path)), speed=10)
+    _, elapsed = asyncio.run(timed(fast, casual))
+    assert elapsed < 0.05
+
+    async def partial():
+        seen = []
+        with pytest.raises(LLMProviderError) as e:
+            async for delta in fast.complete_stream(failing):
+                seen.append(delta)
+        return seen, e.value
+
+    seen, error = asyncio.run(partial())
+    assert seen == ["Hey"] and error.code == "LLM_PROVIDER_FAILURE" and error.retryable
+
+    # complete() on a streamed session returns the joined text
+    assert asyncio.run(fast.complete(casual)) == "Hey there!"
+    assert fast.stats()["hits"] == 3 and fast.stats()["errors_replayed"] == 1
+
+
+def test_unrecorded_prompt_falls_back_to_a_session_of_the_same_kind(tmp_path):
+    path = tmp_path / "sessions.jsonl.gz"
+    plain = tmp_path / "plain.jsonl"
+    _record(plain, [build_style_prompt("hello", "casual")])
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(plain.read_text(encoding="utf-8"))
+
+    replay = ReplayProvider.from_file(str(path), speed=0)
+    deltas = asyncio.run(_drain(replay.complete_stream(build_style_prompt("other", "casual"))))
+    assert deltas == ["Hey", " there", "!"]
+    assert replay.misses == 1
+
+    with pytest.raises(LLMProviderError):
+        asyncio.run(_drain(replay.complete_stream(build_style_prompt("other", "polite"))))  # no such kind
+    strict = ReplayProvider.from_file(str(path), speed=0, on_miss="error")
+    with pytest.raises(LLMProviderError):
+        asyncio.run(_drain(strict.complete_stream(build_style_prompt("other", "casual"))))
+
+
+def test_replay_mode_serves_recorded_sessions(tmp_path, monkeypatch):
+    path = tmp_path / "sessions.jsonl"
+    recorder = SessionRecorder(str(path))
+    provider = RecordingProvider(PacedUpstream(), recorder)
+    asyncio.run(provider.complete(build_rephrase_prompt("Hello world")))
+    recorder.close()
+
+    monkeypatch.setenv("LLM_MODE", "replay")
+    monkeypatch.setenv("LLM_REPLAY_PATH", str(path))
+    monkeypatch.setenv("LLM_REPLAY_SPEED", "0")
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "0")
+    with TestClient(create_app()) as client:
+        resp = client.post("/rephrase", json={"text": "Hello world"})
+        assert resp.status_code == 200 and resp.json()["casual"] == "C"
+        assert client.get("/ops/replay").json()["hits"] == 1
@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import app.cache.response_cache as response_cache
+import app.llm.factory as factory
+from app.llm.fake_provider import FakeLLMProvider
+from app.llm.parse import parse_rephrase_batch_response
+from app.llm.provider_errors import LLMProviderError
+from app.main import app
+from app.services.rephrase_batch import plan_units
+
+client = TestClient(app)
+
+STYLES_JSON = '"professional":"a","casual":"b","polite":"c","social":"d"'
+
+
+def _lines(res):
+    return [json.loads(line) for line in res.text.splitlines() if line]
+
+
+class CountingProvider(FakeLLMProvider):
+    def __init__(self, fail_on=None, delay=0.0):
+        self.prompts = []
+        self.fail_on = fail_on
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def complete(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail_on and self.fail_on in prompt:
+                raise LLMProviderError(status_code=502, code="LLM_PROVIDER_FAILURE", message="boom")
+            return await super().complete(prompt)
+        finally:
+            self.active -= 1
+
+
+def test_batch_streams_one_line_per_item_with_per_item_errors(monkeypatch):
+    provider = CountingProvider(fail_on="explode")
+    monkeypatch.setattr(factory, "get_llm_provider", lambda: provider)
+
+    res = client.post("/rephrase/batch", json={"texts": ["hello", "   ", "please explode", "hello"]})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = {line["index"]: line for line in _lines(res)}
+    assert sorted(lines) == [0, 1, 2, 3]
+    assert set(lines[0]["result"]) == {"professional", "casual", "polite", "social"}
+    assert lines[3]["result"] == lines[0]["result"]
+    assert lines[1]["error"]["code"] == "VALIDATION_ERROR"
+    assert lines[2]["error"]["code"] == "LLM_PROVIDER_FAILURE"
+    # "hello" was generated once for both indices
+    assert len(provider.prompts) == 2
+
+
+def test_batch_bounds_parallel_upstream_calls(monkeypatch):
+    provider = CountingProvider(delay=0.02)
+    monkeypatch.setattr(factory, "get_llm_provider", lambda: provider)
+    monkeypatch.setenv("BATCH_MAX_PARALLEL", "3")
+    factory.set_provider_registry(None)
+    try:
+        res = client.post("/rephrase/batch", json={"texts": [f"text {i}" for i in range(10)]})
+    finally:
+        factory.set_provider_registry(None)
+    assert len(_lines(res)) == 10
+    assert provider.peak == 3
+
+
+def test_batch_packs_short_inputs_into_one_prompt(monkeypatch):
+    provider = CountingProvider()
+    monkeypatch.setattr(factory, "get_llm_provider", lambda: provider)
+
+    res = client.post("/rephrase/batch", json={"texts": ["one", "two", "three", "four", "five"], "pack": True})
+    lines = _lines(res)
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3, 4]
+    assert all("result" in line for line in lines)
+    assert len(provider.prompts) == 2  # 4 packed + 1
+
+
+class BrokenCache:
+    async def lookup(self, text):
+        return None
+
+    async def store(self, text, result):
+        raise OSError("cache socket closed")
+
+
+def test_batch_answers_every_item_when_caching_a_result_fails(monkeypatch):
+    monkeypatch.setattr(factory, "get_llm_provider", lambda: CountingProvider())
+    response_cache.set_response_cache(BrokenCache())
+
+    res = client.post("/rephrase/batch", json={"texts": ["one", "two", "three"], "pack": True})
+    lines = _lines(res)
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    assert all("result" in line for line in lines)
+
+
+def test_batch_rejects_too_many_items(monkeypatch):
+    monkeypatch.setenv("BATCH_MAX_ITEMS", "2")
+    factory.set_provider_registry(None)
+    try:
+        res = client.post("/rephrase/batch", json={"texts": ["a", "b", "c"]})
+    finally:
+        factory.set_provider_registry(None)
+    assert res.status_code == 400
+
+
+def test_plan_units_packs_only_short_texts():
+    units = plan_units(["a", "b", "c", "x" * 50], pack_size=2, pack_max_chars=10)
+    assert units == [["a", "b"], ["c"], ["x" * 50]]
+    assert plan_units(["a", "b"], pack_size=1, pack_max_chars=10) == [["a"], ["b"]]
+
+
+def test_parse_batch_returns_none_for_missing_or_invalid_items():
+    raw = '{"items": [{"id": 1, %s}, {"id": 0, "professional": "only"}, {"id": 9, %s}]}' % (
+        STYLES_JSON,
+        STYLES_JSON,
+    )
+    results = parse_rephrase_batch_response(raw, 3)
+    assert results[0] is None
+    assert results[1] is not None and results[1].social == "d"
+    assert results[2] is None
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.llm.provider_errors import LLMProviderError
+from app.llm.rephrase_generator import STYLES, generate_rephrases_stream
+from app.main import app
+
+client = TestClient(app)
+
+
+def _style_of(prompt: str) -> str:
+    return next(s for s in STYLES if f" {s} style" in prompt)
+
+
+class SlowStreamProvider:
+    def __init__(self, chunks: int = 3, delay: float = 0.02, fail_style: str | None = None):
+        self.chunks = chunks
+        self.delay = delay
+        self.fail_style = fail_style
+        self.active = 0
+        self.peak = 0
+        self.cancelled: list[str] = []
+
+    async def complete_stream(self, prompt: str):
+        style = _style_of(prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            for i in range(self.chunks):
+                await asyncio.sleep(self.delay)
+                if style == self.fail_style:
+                    raise LLMProviderError(status_code=502, code="LLM_PROVIDER_FAILURE", message="boom")
+                yield f"{style[0]}{i}"
+        except asyncio.CancelledError:
+            self.cancelled.append(style)
+            raise
+        finally:
+            self.active -= 1
+
+
+async def _collect(provider, **kwargs):
+    out = []
+    async for item in generate_rephrases_stream(provider, "hello", **kwargs):
+        out.append(item)
+    return out
+
+
+def test_concurrent_stream_interleaves_styles_and_keeps_per_style_order():
+    provider = SlowStreamProvider()
+    items = asyncio.run(_collect(provider, concurrent=True))
+
+    assert provider.peak == 4
+    # Every style's deltas arrive, in order within the style
+    for style in STYLES:
+        assert [i["delta"] for i in items if i["style"] == style] == [f"{style[0]}{n}" for n in range(3)]
+    # ...but styles interleave instead of running back to back
+    assert [i["style"] for i in items[:4]] != ["professional"] * 4
+
+
+def test_sequential_stream_runs_one_style_at_a_time():
+    provider = SlowStreamProvider()
+    items = asyncio.run(_collect(provider))
+
+    assert provider.peak == 1
+    assert [i["style"] for i in items] == [s for s in STYLES for _ in range(3)]
+
+
+def test_concurrent_stream_respects_max_in_flight():
+    provider = SlowStreamProvider()
+    items = asyncio.run(_collect(provider, concurrent=True, max_in_flight=2))
+
+    assert provider.peak == 2
+    assert len(items) == 12
+
+
+def test_concurrent_stream_propagates_error_and_cancels_other_styles():
+    provider = SlowStreamProvider(chunks=50, fail_style="casual")
+
+    with pytest.raises(LLMProviderError):
+        asyncio.run(_collect(provider, concurrent=True))
+
+    assert provider.active == 0
+    assert set(provider.cancelled) == {"professional", "polite", "social"}
+
+
+def test_closing_concurrent_stream_cancels_every_style():
+    provider = SlowStreamProvider(chunks=50)
+
+    async def consume_one_then_close():
+        stream = generate_rephrases_stream(provider, "hello", concurrent=True)
+        await stream.__anext__()
+        await stream.aclose()
+
+    asyncio.run(consume_one_then_close())
+
+    assert provider.active == 0
+    assert set(provider.cancelled) == set(STYLES)
+
+
+def test_stream_endpoint_ends_with_final_event(monkeypatch):
+    monkeypatch.setenv("FAKE_STREAM_DELAY_MS", "0")
+    with client.stream("POST", "/rephrase/stream", json={"text": "hello"}) as resp:
+        body = "".join(resp.iter_text())
+
+    frames = [f for f in body.split("\n\n") if f.startswith("event:")]
+    events = [f.split("\n", 1)[0][len("event: "):] for f in frames]
+    assert events[-1] == "final"
+    assert set(events[:-1]) == {"partial"}
+
+    data = next(line for line in frames[-1].split("\n") if line.startswith("data: "))
+    final = json.loads(data[len("data: "):])
+    assert set(final.keys()) == set(STYLES)
@@ -0,0 +1,210 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import app.cache.response_cache as response_cache
+from app.cache.backends import MemoryCacheBackend, SQLiteCacheBackend
+from app.cache.near_duplicate import NearDuplicateIndex
+from app.cache.response_cache import ResponseCache, cache_key
+from app.main import app
+from app.schemas.rephrase import RephraseResponse
+
+client = TestClient(app)
+
+RESULT = RephraseResponse(professional="p", casual="c", polite="o", social="s")
+
+
+class CountingProvider:
+    def __init__(self):
+        self.calls = 0
+
+    async def complete(self, prompt: str) -> str:
+        self.calls += 1
+        return '{"professional":"a","casual":"b","polite":"c","social":"d"}'
+
+    async def complete_stream(self, prompt: str):
+        self.calls += 1
+        yield "x"
+
+
+def test_cache_key_normalizes_text_and_separates_versions():
+    base = cache_key("Hello world", "1", "dep")
+    assert cache_key("  Hello world\r\n", "1", "dep") == base
+    assert cache_key("Hello world", "2", "dep") != base
+    assert cache_key("Hello world", "1", "other") != base
+    assert cache_key("hello world", "1", "dep") != base
+
+
+def test_memory_backend_evicts_lru_within_byte_budget():
+    backend = MemoryCacheBackend(max_bytes=25)
+    backend.set("a", b"x" * 9, ttl_seconds=60)
+    backend.set("b", b"x" * 9, ttl_seconds=60)
+    backend.get("a")  # "b" is now least recently used
+    backend.set("c", b"x" * 9, ttl_seconds=60)
+
+    assert backend.get("b") is None
+    assert backend.get("a") is not None
+    assert backend.get("c") is not None
+    assert backend.evictions == 1
+    assert backend.stats()["bytes"] <= 25
+
+
+def test_memory_backend_expires_entries():
+    backend = MemoryCacheBackend(max_bytes=1024)
+    backend.set("a", b"x", ttl_seconds=0.01)
+    time.sleep(0.02)
+    assert backend.get("a") is None
+    assert backend.expirations == 1
+
+
+def test_sqlite_backend_survives_reopen_and_prunes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = SQLiteCacheBackend(path, max_entries=2, prune_every=1)
+    backend.set("a", b"1", ttl_seconds=60)
+    backend.set("b", b"2", ttl_seconds=60)
+    backend.set("c", b"3", ttl_seconds=60)
+    backend.close()
+
+    reopened = SQLiteCacheBackend(path, max_entries=2)
+    assert reopened.stats()["entries"] == 2
+    assert reopened.get("c") == b"3"
+    reopened.close()
+
+
+def test_response_cache_counts_hits_and_promotes_persistent_hits(tmp_path):
+    persistent = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), max_entries=10)
+    persistent.set("k", RESULT.model_dump_json().encode(), ttl_seconds=60)
+    cache = ResponseCache(MemoryCacheBackend(1024), 60, persistent=persistent)
+
+    async def scenario():
+        assert await cache.get("missing") is None
+        assert await cache.get("k") == RESULT
+        assert await cache.get("k") == RESULT
+
+    asyncio.run(scenario())
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["persistent"]["hits"] == 1
+    assert stats["memory"]["entries"] == 1
+    cache.close()
+
+
+NOTE = "Hi team, could you send me the quarterly sales report by Friday afternoon? Thanks a lot, Maria"
+
+
+def test_near_duplicate_index_matches_trivial_and_small_edits_only():
+    index = NearDuplicateIndex(threshold=0.85)
+    index.add(NOTE, "k1")
+
+    assert index.find("  hi TEAM,  could you send me the quarterly sales report by friday afternoon? "
+                      "thanks a lot, maria!!") == ("k1", 1.0)
+    key, score = index.find(NOTE.replace("Maria", "Julia"))
+    assert key == "k1" and 0.85 <= score < 1.0
+    assert index.find("Please find attached the minutes of yesterday's planning meeting.") is None
+    assert index.find(NOTE.replace("quarterly sales report", "updated travel budget")) is None
+
+
+def test_near_duplicate_index_is_bounded_and_forgets_stale_keys():
+    index = NearDuplicateIndex(max_entries=2, max_chars=200)
+    for i, text in enumerate(["first message here", "second message here", "third message here"]):
+        index.add(text, f"k{i}")
+    assert index.stats()["entries"] == 2 and index.stats()["evictions"] == 1
+    assert index.find("first message here") is None  # least recently used went first
+
+    assert index.find("third message here!")[0] == "k2"
+    index.discard("k2")
+    assert index.find("third message here") is None
+
+    index.add("x" * 300, "long")
+    assert index.find("x" * 300) is None and index.stats()["skipped"] == 1
+
+
+def test_lookup_serves_near_duplicates_and_drops_expired_ones():
+    cache = ResponseCache(MemoryCacheBackend(4096), 60, near=NearDuplicateIndex())
+
+    async def scenario():
+        await cache.store(NOTE, RESULT)
+        assert await cache.lookup(NOTE.lower() + ".") == RESULT
+        await cache.delete(cache.key_for(NOTE))  # e.g. expired
+        assert await cache.lookup(NOTE.lower() + ".") is None
+
+    asyncio.run(scenario())
+    near = cache.stats()["near_duplicate"]
+    assert near["hits"] == 1 and near["stale"] == 1 and near["entries"] == 0
+    assert cache.stats()["hits"] == 0  # exact-tier counters are separate
+
+
+def test_a_miss_computes_its_signature_once_for_lookup_and_store(monkeypatch):
+    index = NearDuplicateIndex()
+    cache = ResponseCache(MemoryCacheBackend(4096), 60, near=index)
+    signed = []
+    signature = index._signature
+    monkeypatch.setattr(index, "_signature", lambda canonical: signed.append(canonical) or signature(canonical))
+
+    async def scenario():
+        await cache.store("Unrelated text to have something indexed", RESULT)
+        signed.clear()
+        assert await cache.lookup(NOTE) is None
+        await cache.store(NOTE, RESULT)
+
+    asyncio.run(scenario())
+    assert len(signed) == 1
+    assert index.stats()["entries"] == 2
+
+
+def test_near_duplicate_request_skips_the_upstream(monkeypatch):
+    import app.llm.factory as factory
+
+    monkeypatch.setenv("RESPONSE_CACHE_NEAR_DUPLICATE_ENABLED", "1")
+    provider = CountingProvider()
+    monkeypatch.setattr(factory, "get_llm_provider", lambda: provider)
+
+    first = client.post("/rephrase", json={"text": NOTE})
+    second = client.post("/rephrase", json={"text": NOTE.upper() + "!"})
+
+    assert first.json() == second.json()
+    assert provider.calls == 1
+    near = client.get("/ops/cache").json()["near_duplicate"]
+    assert near["hits"] == 1 and near["hit_rate"] == 0.5  # the first request was a miss
+
+
+def test_rephrase_second_identical_request_is_served_from_cache(monkeypatch):
+    import app.llm.factory as factory
+
+    provider = CountingProvider()
+    monkeypatch.setattr(factory, "get_llm_provider", lambda: provider)
+
+    first = client.post("/rephrase", json={"text": "cache me"})
+    second = client.post("/rephrase", json={"text": "  cache me  "})
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert provider.calls == 1
+    assert response_cache.get_response_cache().stats()["hits"] == 1
+
+
+def test_stream_replays_cached_result_as_partial_events(monkeypatch):
+    import app.llm.factory as factory
+
+    provider = CountingProvider()
+    monkeypatch.setattr(factory, "get_llm_provider", lambda: provider)
+
+    client.post("/rephrase", json={"text": "cache me"})
+    with client.stream("POST", "/rephrase/stream", json={"text": "cache me"}) as resp:
+        body = "".join(resp.iter_text())
+
+    assert provider.calls == 1
+    assert "event: partial" in body
+    assert body.rstrip().split("\n\n")[-1].startswith("event: final")
+    assert '"professional": "a"' in body
+
+
+def test_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "0")
+    assert response_cache.get_response_cache() is None
+
+    resp = client.post("/rephrase", json={"text": "hello"})
+    assert resp.status_code == 200
@@ -0,0 +1,136 @@
+import asyncio
+import random
+
+import pytest
+
+from app.llm.provider_errors import LLMProviderError
+from app.llm.retry import RetryBudget, RetryingProvider, RetryPolicy
+
+FAST = RetryPolicy(max_attempts=3, base_delay_seconds=0.001, max_delay_seconds=0.002)
+
+
+def _transient(retry_after=None):
+    return LLMProviderError(
+        status_code=502,
+        code="LLM_PROVIDER_ERROR",
+        message="Upstream error.",
+        retry_after_seconds=retry_after,
+        retryable=True,
+    )
+
+
+class FlakyProvider:
+    """Fails the first `failures` calls with `error`, then succeeds."""
+
+    def __init__(self, failures, error, delays=None):
+        self.failures = failures
+        self.error = error
+        self.delays = list(delays or [])
+        self.calls = 0
+
+    async def complete(self, prompt: str) -> str:
+        self.calls += 1
+        delay = self.delays.pop(0) if self.delays else 0
+        await asyncio.sleep(delay)
+        if self.calls <= self.failures:
+            raise self.error
+        return f"ok-{self.calls}"
+
+    async def complete_stream(self, prompt: str):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        for part in ("a", "b"):
+            yield part
+
+
+def _retrying(inner, **kwargs):
+    return RetryingProvider(inner, FAST, RetryBudget(ratio=1.0, min_per_second=0), rng=random.Random(0), **kwargs)
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(base_delay_seconds=1.0, max_delay_seconds=3.0)
+    rng = random.Random(1)
+    delays = [policy.delay(attempt, _transient(), rng) for attempt in (1, 2, 3, 4, 5)]
+    assert all(0 <= d <= 3.0 for d in delays)
+    assert len(set(delays)) == len(delays)
+    assert policy.delay(1, _transient(retry_after=2), rng) == 2
+    assert policy.delay(1, _transient(retry_after=60), rng) is None  # too long: surface to client
+
+
+def test_transient_errors_are_retried_until_success():
+    upstream = FlakyProvider(failures=2, error=_transient())
+    assert asyncio.run(_retrying(upstream).complete("p")) == "ok-3"
+
+
+def test_non_retryable_errors_fail_immediately():
+    error = LLMProviderError(status_code=400, code="LLM_BAD_REQUEST", message="bad")
+    upstream = FlakyProvider(failures=1, error=error)
+    with pytest.raises(LLMProviderError):
+        asyncio.run(_retrying(upstream).complete("p"))
+    assert upstream.calls == 1
+
+
+def test_retry_budget_stops_retry_storms():
+    upstream = FlakyProvider(failures=100, error=_transient())
+    provider = RetryingProvider(upstream, FAST, RetryBudget(ratio=0.0, min_per_second=0))
+    provider.budget._balance = 1.0  # room for exactly one retry
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(LLMProviderError):
+                await provider.complete("p")
+
+    asyncio.run(scenario())
+    assert upstream.calls == 4  # 3 requests + 1 budgeted retry
+    assert provider.budget.exhausted >= 1
+
+
+def test_stream_retries_before_first_delta():
+    upstream = FlakyProvider(failures=1, error=_transient())
+
+    async def collect():
+        return [d async for d in _retrying(upstream).complete_stream("p")]
+
+    assert asyncio.run(collect()) == ["a", "b"]
+    assert upstream.calls == 2
+
+
+def test_stream_is_not_retried_after_first_delta():
+    class MidStreamFailure:
+        calls = 0
+
+        async def complete_stream(self, prompt: str):
+            self.calls += 1
+            yield "partial"
+            raise _transient()
+
+    upstream = MidStreamFailure()
+
+    async def collect():
+        out = []
+        with pytest.raises(LLMProviderError):
+            async for d in _retrying(upstream).complete_stream("p"):
+                out.append(d)
+        return out
+
+    assert asyncio.run(collect()) == ["partial"]
+    assert upstream.calls == 1
+
+
+def test_slow_call_is_hedged_and_the_faster_attempt_wins():
+    # The first attempt is much slower than the observed p95; the hedge returns first.
+    upstream = FlakyProvider(failures=0, error=None, delays=[1.0, 0.0])
+    provider = _retrying(upstream, hedge=True, hedge_min_samples=5)
+    for _ in range(10):
+        provider.latency.observe(0.01)
+
+    async def scenario():
+        start = asyncio.get_running_loop().time()
+        result = await provider.complete("p")
+        return result, asyncio.get_running_loop().time() - start
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == "ok-2"
+    assert elapsed < 0.5
+    assert upstream.calls == 2
@@ -0,0 +1,120 @@
+import asyncio
+import random
+
+import pytest
+
+from app.llm.circuit import OPEN, CircuitBreaker
+from app.llm.provider_errors import LLMProviderError
+from app.llm.router import RoutedBackend, RouterProvider
+
+
+def _transient():
+    return LLMProviderError(status_code=502, code="LLM_PROVIDER_FAILURE", message="Upstream error.", retryable=True)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Backend:
+    """Answers after `delay`; fails transiently on the first `failures` calls (streams: after `fail_after` deltas)."""
+
+    def __init__(self, name, delay=0.0, failures=0, fail_after=0):
+        self.name = name
+        self.delay = delay
+        self.failures = failures
+        self.fail_after = fail_after
+        self.calls = 0
+
+    async def complete(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.calls <= self.failures:
+            raise _transient()
+        return self.name
+
+    async def complete_stream(self, prompt: str):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        for i, part in enumerate((self.name, "-", "done")):
+            if i == self.fail_after and self.calls <= self.failures:
+                raise _transient()
+            yield part
+
+
+def _router(*backends, clock=Clock(), threshold=2):
+    routed = [
+        RoutedBackend(b.name, b, CircuitBreaker(b.name, failure_threshold=threshold, cooldown_seconds=5, clock=clock))
+        for b in backends
+    ]
+    return RouterProvider(routed, rng=random.Random(0))
+
+
+async def _collect(stream):
+    return "".join([d async for d in stream])
+
+
+def test_prefers_the_faster_backend():
+    fast, slow = Backend("fast", delay=0.001), Backend("slow", delay=0.03)
+    router = _router(fast, slow)
+
+    async def scenario():
+        for _ in range(10):
+            await router.complete("p")
+
+    asyncio.run(scenario())
+    assert slow.calls <= 2  # measured once, then avoided
+    assert router.stats()["backends"]["fast"]["latency_ewma_ms"] < router.stats()["backends"]["slow"]["latency_ewma_ms"]
+    assert router.decisions[-1]["picked"] == "fast"
+
+
+def test_fails_over_and_ejects_a_failing_backend():
+    broken, healthy = Backend("broken", failures=100), Backend("healthy", delay=0.01)
+    router = _router(broken, healthy)
+
+    async def scenario():
+        return [await router.complete("p") for _ in range(6)]
+
+    assert asyncio.run(scenario()) == ["healthy"] * 6
+    stats = router.stats()
+    assert stats["backends"]["broken"]["state"] == OPEN
+    assert broken.calls == 2 and stats["failovers"] == 2
+
+
+def test_stream_fails_over_before_the_first_delta_only():
+    router = _router(Backend("a", failures=1, fail_after=0), Backend("b"))
+    router.backends[1].latency = 1.0  # so "a" is tried first
+    assert asyncio.run(_collect(router.complete_stream("p"))) == "b-done"
+    assert router.failovers == 1
+
+    router = _router(Backend("a", failures=1, fail_after=1), Backend("b"))
+    router.backends[1].latency = 1.0
+
+    async def partial():
+        deltas = []
+        with pytest.raises(LLMProviderError):
+            async for delta in router.complete_stream("p"):
+                deltas.append(delta)
+        return deltas
+
+    assert asyncio.run(partial()) == ["a"]  # text already sent: no failover
+    assert router.failovers == 0
+
+
+def test_no_healthy_backend_is_a_provider_failure():
+    router = _router(Backend("a", failures=100), threshold=1)
+
+    async def scenario():
+        with pytest.raises(LLMProviderError):
+            await router.complete("p")  # the upstream error itself
+        with pytest.raises(LLMProviderError) as e:
+            await router.complete("p")
+        return e.value
+
+    error = asyncio.run(scenario())
+    assert error.code == "LLM_PROVIDER_FAILURE" and "healthy" in error.message
+    assert router.stats()["unavailable"] == 1
@@ -0,0 +1,165 @@
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from app.cache.shared import CacheServer, SharedCacheBackend
+from app.config import get_settings
+from app.llm.admission import SharedTokenBuckets
+from app.serve import check_workers
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+needs_fork = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    # Unix socket paths are limited to ~100 characters; pytest's tmp_path can be longer
+    path = f"/tmp/rephrase-test-{os.getpid()}.sock"
+    yield path
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def test_shared_cache_roundtrip_and_ttl(cache_path):
+    server = CacheServer(cache_path, max_bytes=1024)
+    server.start()
+    a, b = SharedCacheBackend(cache_path), SharedCacheBackend(cache_path)
+    try:
+        a.set("k", b"value", 60)
+        a.set("short", b"gone", 0.05)
+        assert b.get("k") == b"value"  # written by one client, read by another
+        assert b.get("missing") is None
+        time.sleep(0.1)
+        assert b.get("short") is None
+        b.delete("k")
+        assert a.get("k") is None
+        a.set("big", b"x" * 2000, 60)  # over the byte budget: not stored
+        assert a.get("big") is None
+        stats = a.stats()
+        assert stats["backend"] == "shared" and stats["max_bytes"] == 1024 and stats["errors"] == 0
+    finally:
+        a.close()
+        b.close()
+        server.stop()
+
+
+def test_shared_cache_degrades_to_misses_when_the_server_is_gone(cache_path):
+    client = SharedCacheBackend(cache_path, timeout_seconds=0.2)
+    client.set("k", b"v", 60)
+    assert client.get("k") is None
+    assert client.errors == 2
+
+    server = CacheServer(cache_path, max_bytes=1024)
+    server.start()
+    try:
+        client.set("k", b"v", 60)  # reconnects
+        assert client.get("k") == b"v"
+    finally:
+        client.close()
+        server.stop()
+
+
+def _drain_bucket(shared):
+    shared.bucket("requests", 60).take(60)
+
+
+@needs_fork
+def test_token_buckets_are_shared_across_forked_processes():
+    shared = SharedTokenBuckets()
+    bucket = shared.bucket("requests", 60)
+    assert bucket.time_until(1, time.monotonic()) == 0.0
+
+    child = multiprocessing.get_context("fork").Process(target=_drain_bucket, args=(shared,))
+    child.start()
+    child.join(5)
+    assert child.exitcode == 0
+
+    assert bucket.level < 1
+    assert 0.5 < bucket.time_until(1, time.monotonic()) <= 1.0  # 60/minute: one more in about a second
+    assert shared.bucket("tokens", 1000).level == 1000  # slots are independent
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _post(port, text):
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{port}/rephrase",
+        data=json.dumps({"text": text}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return resp.status
+
+
+def _get(port, path):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=10) as resp:
+        return json.loads(resp.read())
+
+
+def _wait_until_serving(port, proc, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert proc.poll() is None, proc.stderr.read().decode()
+        try:
+            return _get(port, "/ops/cache")
+        except OSError:
+            time.sleep(0.1)
+    raise AssertionError("launcher did not start serving")
+
+
+def test_several_workers_are_refused_while_streams_are_resumable(monkeypatch):
+    monkeypatch.setenv("SSE_RESUME_ENABLED", "1")
+    with pytest.raises(SystemExit):
+        check_workers(get_settings(), 2)
+    check_workers(get_settings(), 1)
+    monkeypatch.setenv("SSE_RESUME_ENABLED", "0")
+    check_workers(get_settings(), 2)
+
+
+@needs_fork
+def test_launcher_shares_the_cache_and_restarts_workers_in_place():
+    port = _free_port()
+    env = {
+        **os.environ,
+        "LLM_MODE": "fake",
+        "RESPONSE_CACHE_ENABLED": "1",
+        "RESPONSE_CACHE_BACKEND": "memory",
+        "SERVER_DRAIN_SECONDS": "5",
+        "SSE_RESUME_ENABLED": "0",
+        "CONFIG_ENV_FILE": os.devnull,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--workers", "2", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        _wait_until_serving(port, proc)
+        for _ in range(4):
+            assert _post(port, "Hello from every worker") == 200
+        cache = _get(port, "/ops/cache")
+        assert cache["persistent"]["backend"] == "shared" and cache["persistent"]["entries"] == 1
+
+        proc.send_signal(signal.SIGUSR2)
+        time.sleep(0.5)
+        for _ in range(10):  # served throughout the restart, from the same cache
+            assert _post(port, "Hello from every worker") == 200
+            time.sleep(0.1)
+        assert _get(port, "/ops/cache")["persistent"]["entries"] == 1
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(20) == 0
@@ -0,0 +1,210 @@
+import asyncio
+
+import pytest
+
+from app.llm.provider_errors import LLMProviderError
+from app.llm.singleflight import CoalescingProvider, SingleFlight
+
+
+class GatedProvider:
+    """Upstream that blocks until released, counting how many calls actually started."""
+
+    def __init__(self, deltas=("a", "b", "c")):
+        self.deltas = deltas
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+        self.fail = False
+
+    async def complete(self, prompt: str) -> str:
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise LLMProviderError(status_code=502, code="LLM_PROVIDER_FAILURE", message="boom")
+        return f"result:{prompt}"
+
+    async def complete_stream(self, prompt: str):
+        # First delta is immediate; the rest wait for `release`
+        self.calls += 1
+        try:
+            yield self.deltas[0]
+            await self.release.wait()
+            for d in self.deltas[1:]:
+                yield d
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def test_concurrent_identical_completions_share_one_upstream_call():
+    async def scenario():
+        upstream = GatedProvider()
+        provider = CoalescingProvider(upstream)
+        waiters = [asyncio.create_task(provider.complete("same")) for _ in range(5)]
+        other = asyncio.create_task(provider.complete("different"))
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*waiters, other)
+        return upstream, provider, results
+
+    upstream, provider, results = asyncio.run(scenario())
+    assert upstream.calls == 2
+    assert results[:5] == ["result:same"] * 5
+    assert provider.flights.stats()["coalesced_calls"] == 4
+    assert provider.flights.stats()["in_flight_calls"] == 0
+
+
+def test_errors_are_shared_by_all_waiters():
+    async def scenario():
+        upstream = GatedProvider()
+        upstream.fail = True
+        provider = CoalescingProvider(upstream)
+        waiters = [asyncio.create_task(provider.complete("same")) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return upstream, await asyncio.gather(*waiters, return_exceptions=True)
+
+    upstream, results = asyncio.run(scenario())
+    assert upstream.calls == 1
+    assert all(isinstance(r, LLMProviderError) for r in results)
+
+
+def test_completion_is_cancelled_only_when_every_waiter_is_gone():
+    async def scenario():
+        upstream = GatedProvider()
+        provider = CoalescingProvider(upstream)
+        first = asyncio.create_task(provider.complete("same"))
+        second = asyncio.create_task(provider.complete("same"))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        assert upstream.cancelled == 0
+
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0)
+        return upstream, provider
+
+    upstream, provider = asyncio.run(scenario())
+    assert upstream.calls == 1
+    assert upstream.cancelled == 1
+    assert provider.flights.stats()["in_flight_calls"] == 0
+
+
+def test_stream_subscribers_share_upstream_and_late_joiners_get_backlog():
+    async def scenario():
+        upstream = GatedProvider()
+        provider = CoalescingProvider(upstream)
+
+        async def collect():
+            return [d async for d in provider.complete_stream("same")]
+
+        early = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)  # first delta lands in the backlog
+        late = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)
+        upstream.release.set()
+        return upstream, await asyncio.gather(early, late)
+
+    upstream, (early, late) = asyncio.run(scenario())
+    assert upstream.calls == 1
+    assert early == late == ["a", "b", "c"]
+
+
+def test_stream_upstream_stops_only_after_last_subscriber_leaves():
+    async def scenario():
+        upstream = GatedProvider()
+        provider = CoalescingProvider(upstream)
+        first = provider.complete_stream("same")
+        second = provider.complete_stream("same")
+        await asyncio.gather(first.__anext__(), second.__anext__())
+
+        await first.aclose()
+        await asyncio.sleep(0)
+        cancelled_after_first = upstream.cancelled
+
+        await second.aclose()
+        await asyncio.sleep(0)
+        return upstream, provider, cancelled_after_first
+
+    upstream, provider, cancelled_after_first = asyncio.run(scenario())
+    assert cancelled_after_first == 0
+    assert upstream.cancelled == 1
+    assert provider.flights.stats()["in_flight_streams"] == 0
+
+
+def test_stream_errors_reach_every_subscriber():
+    class FailingStream:
+        async def complete_stream(self, prompt: str):
+            yield "a"
+            raise LLMProviderError(status_code=504, code="LLM_TIMEOUT", message="slow")
+
+    async def scenario():
+        provider = CoalescingProvider(FailingStream())
+
+        async def collect():
+            out = []
+            with pytest.raises(LLMProviderError):
+                async for d in provider.complete_stream("same"):
+                    out.append(d)
+            return out
+
+        return await asyncio.gather(collect(), collect())
+
+    assert asyncio.run(scenario()) == [["a"], ["a"]]
+
+
+def test_completion_arriving_while_the_abandoned_one_unwinds_starts_afresh():
+    async def scenario():
+        upstream = GatedProvider()
+        provider = CoalescingProvider(upstream)
+        abandoned = asyncio.create_task(provider.complete("same"))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        await asyncio.sleep(0)  # the last waiter left and cancelled the upstream call, which has not unwound yet
+        upstream.release.set()
+        return upstream, await provider.complete("same")
+
+    upstream, result = asyncio.run(scenario())
+    assert result == "result:same"
+    assert upstream.calls == 2 and upstream.cancelled == 1
+
+
+def test_stream_arriving_while_the_abandoned_one_unwinds_gets_the_whole_text():
+    async def scenario():
+        upstream = GatedProvider()
+        provider = CoalescingProvider(upstream)
+        abandoned = provider.complete_stream("same")
+        assert await abandoned.__anext__() == "a"
+        await abandoned.aclose()  # the last subscriber leaves; the upstream stream is being cancelled
+        upstream.release.set()
+        return upstream, [d async for d in provider.complete_stream("same")]
+
+    upstream, deltas = asyncio.run(scenario())
+    assert deltas == ["a", "b", "c"]
+    assert upstream.calls == 2
+
+
+def test_cancelled_stream_flight_is_not_followed_as_complete():
+    async def scenario():
+        upstream = GatedProvider()
+        flights = SingleFlight()
+        stream = flights.stream("k", lambda: upstream.complete_stream("p"))
+        assert await stream.__anext__() == "a"
+        [flight] = flights._streams.values()
+        flight.task.cancel()  # e.g. the loop shutting down, not a subscriber leaving
+        with pytest.raises(asyncio.CancelledError):
+            await stream.__anext__()
+        return flight
+
+    flight = asyncio.run(scenario())
+    assert isinstance(flight.error, asyncio.CancelledError)
+
+
+def test_single_flight_stats_start_empty():
+    assert SingleFlight().stats()["in_flight_streams"] == 0
@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+
+from app.llm.provider_errors import LLMProviderError
+from app.routes.sse import DisconnectWatcher, coalesce_deltas, encode_partial
+
+
+async def _deltas(items, delay=0.0, error=None):
+    for style, delta in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield {"style": style, "delta": delta}
+    if error is not None:
+        raise error
+
+
+async def _collect(source, **kwargs):
+    return [piece async for piece in coalesce_deltas(source, **kwargs)]
+
+
+@pytest.mark.parametrize("delta", ["plain", 'quote " and \\ slash', "line\nbreak", "café 😀", " "])
+def test_encode_partial_matches_json_framing(delta):
+    expected = f"event: partial\ndata: {json.dumps({'style': 'casual', 'delta': delta}, ensure_ascii=False)}\n\n"
+    assert encode_partial("casual", delta) == expected.encode("utf-8")
+
+
+def test_coalesces_per_style_and_flushes_at_size():
+    items = [("professional", "ab"), ("casual", "x"), ("professional", "cd"), ("professional", "ef")]
+    pieces = asyncio.run(_collect(_deltas(items), window_seconds=10, max_chars=4))
+    # professional hits 4 chars and goes out early; the rest is flushed at the end
+    assert pieces == [("professional", "abcd"), ("casual", "x"), ("professional", "ef")]
+
+
+def test_flushes_when_the_window_expires_even_if_upstream_stalls():
+    async def stalled():
+        yield {"style": "polite", "delta": "hi"}
+        await asyncio.sleep(0.3)
+        yield {"style": "polite", "delta": "!"}
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        stamps = []
+        async for piece in coalesce_deltas(stalled(), window_seconds=0.02, max_chars=64):
+            stamps.append((piece, loop.time() - start))
+        return stamps
+
+    stamps = asyncio.run(scenario())
+    assert [p for p, _ in stamps] == [("polite", "hi"), ("polite", "!")]
+    assert stamps[0][1] < 0.2
+
+
+def test_zero_window_passes_deltas_through():
+    items = [("social", "a"), ("social", "b")]
+    assert asyncio.run(_collect(_deltas(items), window_seconds=0, max_chars=64)) == [("social", "a"), ("social", "b")]
+
+
+def test_error_flushes_buffered_text_first():
+    error = LLMProviderError(status_code=502, code="LLM_PROVIDER_FAILURE", message="boom")
+
+    async def scenario():
+        out = []
+        with pytest.raises(LLMProviderError):
+            async for piece in coalesce_deltas(_deltas([("casual", "partial")], error=error), window_seconds=1, max_chars=64):
+                out.append(piece)
+        return out
+
+    assert asyncio.run(scenario()) == [("casual", "partial")]
+
+
+class _FakeRequest:
+    def __init__(self):
+        self.gone = asyncio.Event()
+        self.receives = 0
+
+    async def receive(self):
+        self.receives += 1
+        await self.gone.wait()
+        return {"type": "http.disconnect"}
+
+
+def test_disconnect_stops_coalescing_and_cancels_upstream():
+    cancelled = []
+
+    async def endless():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield {"style": "professional", "delta": "x"}
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        request = _FakeRequest()
+        async with DisconnectWatcher(request) as watcher:
+            asyncio.get_running_loop().call_later(0.05, request.gone.set)
+            pieces = await _collect(endless(), window_seconds=0, max_chars=64, stop=watcher.gone)
+            assert watcher.disconnected
+        return pieces, request.receives
+
+    pieces, receives = asyncio.run(scenario())
+    assert 0 < len(pieces) < 10
+    assert receives == 1  # one receive() for the whole connection, not one per delta
+    assert cancelled == [True]
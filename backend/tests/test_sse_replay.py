@@ -0,0 +1,140 @@
+import asyncio
+from contextlib import aclosing
+
+from fastapi.testclient import TestClient
+
+import app.llm.factory as factory
+from app.main import app
+from app.routes.sse_replay import StreamSessionStore, fingerprint
+
+client = TestClient(app)
+
+
+def _frame(n: int) -> bytes:
+    return f'event: partial\ndata: {{"n": {n}}}\n\n'.encode()
+
+
+async def _frames(count, gate=None, produced=None):
+    for n in range(count):
+        if gate is not None and n == 2:
+            await gate.wait()
+        if produced is not None:
+            produced.append(n)
+        yield _frame(n)
+
+
+async def _read(session, after, gone=None, limit=None):
+    out = []
+    async with aclosing(session.follow(after, gone)) as frames:
+        async for frame in frames:
+            out.append(frame)
+            if limit is not None and len(out) == limit:
+                break
+    return out
+
+
+def test_frames_carry_stream_id_and_sequence():
+    async def scenario():
+        store = StreamSessionStore()
+        session = store.start("fp", _frames(3))
+        frames = await _read(session, 0)
+        return session.id, frames
+
+    stream_id, frames = asyncio.run(scenario())
+    assert [f.decode().split("id: ")[1].strip() for f in frames] == [f"{stream_id}:{n}" for n in (1, 2, 3)]
+    assert all(f.startswith(b"event: partial\n") and f.endswith(b"\n\n") for f in frames)
+
+
+def test_reconnect_resumes_from_buffer_while_generation_continues():
+    async def scenario():
+        store = StreamSessionStore(grace_seconds=5)
+        gate = asyncio.Event()
+        produced = []
+        session = store.start("fp", _frames(5, gate, produced))
+
+        first = await _read(session, 0, limit=2)  # client drops after two events
+        await asyncio.sleep(0.01)
+        assert session.subscribers == 0 and not session.cancelled
+        gate.set()  # generation keeps going with nobody attached
+
+        resumed = store.resume(f"{session.id}:2", "fp")
+        assert resumed is not None
+        rest = await _read(*resumed)
+        return first, rest, produced
+
+    first, rest, produced = asyncio.run(scenario())
+    assert len(first) == 2 and len(rest) == 3
+    assert produced == [0, 1, 2, 3, 4]  # generated once
+
+
+def test_abandoned_stream_is_cancelled_after_grace():
+    async def scenario():
+        store = StreamSessionStore(grace_seconds=0.05)
+        gate = asyncio.Event()
+        session = store.start("fp", _frames(5, gate))
+        await _read(session, 0, limit=1)
+        await asyncio.sleep(0.15)
+        return store, session
+
+    store, session = asyncio.run(scenario())
+    assert session.cancelled
+    assert store.stats()["streams"] == 0
+    assert store.total_bytes == 0
+
+
+def test_resume_rejects_other_text_or_unknown_ids():
+    async def scenario():
+        store = StreamSessionStore()
+        session = store.start("fp", _frames(2))
+        await _read(session, 0)
+        return (
+            store.resume(f"{session.id}:1", "other"),
+            store.resume("nope:1", "fp"),
+            store.resume(f"{session.id}:x", "fp"),
+            store.resume(f"{session.id}:1", "fp") is not None,
+        )
+
+    assert asyncio.run(scenario()) == (None, None, None, True)
+
+
+def test_memory_budget_evicts_finished_streams_first():
+    async def scenario():
+        store = StreamSessionStore(max_bytes=200)
+        old = store.start("a", _frames(2))
+        await _read(old, 0)
+        new = store.start("b", _frames(3))
+        await _read(new, 0)
+        return store, old, new
+
+    store, old, new = asyncio.run(scenario())
+    assert store.resume(f"{old.id}:1", "a") is None
+    assert store.resume(f"{new.id}:1", "b") is not None  # the newest stream is kept
+    assert store.stats()["evicted"] == 1
+
+
+def test_stream_endpoint_resumes_with_last_event_id_without_new_upstream_call(monkeypatch):
+    monkeypatch.setenv("FAKE_STREAM_DELAY_MS", "0")
+    calls = []
+    real = factory.get_llm_provider
+
+    def counting():
+        calls.append(1)
+        return real()
+
+    monkeypatch.setattr(factory, "get_llm_provider", counting)
+
+    with client.stream("POST", "/rephrase/stream", json={"text": "resume me"}) as resp:
+        stream_id = resp.headers["x-stream-id"]
+        first = "".join(resp.iter_text())
+    ids = [line[len("id: "):] for line in first.split("\n") if line.startswith("id: ")]
+    assert ids[0] == f"{stream_id}:1"
+
+    headers = {"Last-Event-ID": ids[1]}
+    with client.stream("POST", "/rephrase/stream", json={"text": "resume me"}, headers=headers) as resp:
+        assert resp.headers["x-stream-id"] == stream_id
+        rest = "".join(resp.iter_text())
+
+    assert len(calls) == 1
+    assert first.endswith(rest.replace(": stream-open\n\n", "", 1))
+    assert "event: final" in rest
+    assert fingerprint(" resume me ") == fingerprint("resume me")
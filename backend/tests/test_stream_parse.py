@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import pytest
+
+from app.llm.parse import ModelOutputError
+from app.llm.rephrase_generator import STYLES, generate_rephrases_stream
+from app.llm.stream_parse import JsonFieldStreamParser
+
+PAYLOAD = {
+    "professional": 'He said "hi"\nthen left \\ quietly.',
+    "casual": "café 😀 done",
+    "polite": "Could you\tplease?",
+    "social": "/slash and {braces}, [brackets]",
+}
+
+
+def _feed_all(parser, chunks):
+    deltas = {}
+    for chunk in chunks:
+        for field, delta in parser.feed(chunk):
+            deltas[field] = deltas.get(field, "") + delta
+    return deltas
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64])
+def test_escapes_and_split_tokens_decode_like_json_loads(size):
+    # ensure_ascii=True forces \\u escapes (including a surrogate pair for the emoji)
+    raw = "Sure! Here is the JSON:\n```json\n" + json.dumps(PAYLOAD) + "\n```"
+    parser = JsonFieldStreamParser(STYLES)
+    deltas = _feed_all(parser, [raw[i : i + size] for i in range(0, len(raw), size)])
+
+    assert deltas == PAYLOAD
+    assert parser.close() == PAYLOAD
+
+
+def test_emits_deltas_while_the_value_is_still_open():
+    parser = JsonFieldStreamParser(STYLES)
+    assert parser.feed('{"professional": "Plea') == [("professional", "Plea")]
+    assert parser.feed('se review') == [("professional", "se review")]
+    assert parser.feed('.", "cas') == [("professional", ".")]
+    assert parser.feed('ual": "Hey"') == [("casual", "Hey")]
+
+
+def test_ignores_unknown_and_nested_fields():
+    raw = '{"note": "skip \\"me\\"", "meta": {"professional": "nested"}, "professional": "yes"}'
+    parser = JsonFieldStreamParser(["professional"])
+    assert _feed_all(parser, [raw]) == {"professional": "yes"}
+
+
+def test_close_reports_missing_fields():
+    parser = JsonFieldStreamParser(STYLES)
+    parser.feed('{"professional": "a", "casual": "b", "polite": "unterminated')
+    with pytest.raises(ModelOutputError):
+        parser.close()
+
+
+def test_single_call_stream_makes_one_upstream_call():
+    class JsonStreamProvider:
+        prompts = []
+
+        async def complete_stream(self, prompt: str):
+            self.prompts.append(prompt)
+            raw = json.dumps(PAYLOAD)
+            for i in range(0, len(raw), 4):
+                yield raw[i : i + 4]
+
+    provider = JsonStreamProvider()
+
+    async def collect():
+        return [item async for item in generate_rephrases_stream(provider, "hello", single_call=True)]
+
+    items = asyncio.run(collect())
+    assert len(provider.prompts) == 1
+    for style in STYLES:
+        assert "".join(i["delta"] for i in items if i["style"] == style) == PAYLOAD[style]
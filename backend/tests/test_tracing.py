@@ -0,0 +1,107 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.llm.provider_errors import LLMProviderError
+from app.main import create_app
+from app.observability.tracing import NOOP_SPAN, start_span
+
+
+class FailingProvider:
+    async def complete(self, prompt: str) -> str:
+        raise LLMProviderError(status_code=502, code="LLM_PROVIDER_FAILURE", message="Upstream failed.")
+
+    async def complete_stream(self, prompt: str):
+        raise LLMProviderError(status_code=502, code="LLM_PROVIDER_FAILURE", message="Upstream failed.")
+        yield ""
+
+
+def _traces(path):
+    lines = path.read_text().splitlines()
+    return [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"] for line in lines]
+
+
+def _env(monkeypatch, tmp_path, **values):
+    monkeypatch.setenv("TRACE_ENABLED", "1")
+    monkeypatch.setenv("TRACE_PATH", str(tmp_path / "traces.jsonl"))
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "0")
+    monkeypatch.setenv("FAKE_STREAM_DELAY_MS", "0")
+    for key, value in values.items():
+        monkeypatch.setenv(key, value)
+    return tmp_path / "traces.jsonl"
+
+
+def test_untraced_code_gets_the_shared_noop_span():
+    assert start_span("validate_input") is NOOP_SPAN
+    with TestClient(create_app()) as client:
+        resp = client.post("/rephrase", json={"text": "hello"})
+    assert "X-Trace-Id" not in resp.headers
+
+
+def test_sampled_stream_has_a_span_per_stage_and_style(monkeypatch, tmp_path):
+    path = _env(monkeypatch, tmp_path, TRACE_SAMPLE_RATE="1", STREAM_MODE="concurrent")
+    with TestClient(create_app()) as client:
+        with client.stream("POST", "/rephrase/stream", json={"text": "Trace this please"}) as resp:
+            assert "event: final" in "".join(resp.iter_text())
+            trace_id = resp.headers["X-Trace-Id"]
+        stats = client.get("/ops/tracing").json()
+
+    spans = _traces(path)[0]  # the second line is the /ops/tracing request
+    assert stats["kept"]["head"] == 1
+    by_name = {}
+    for span in spans:
+        assert span["traceId"] == trace_id
+        by_name.setdefault(span["name"], []).append(span)
+    root = by_name["POST /rephrase/stream"][0]
+    assert "parentSpanId" not in root and root["kind"] == 2
+    assert {"validate_input", "provider_acquire", "generate_rephrases_stream"} <= set(by_name)
+    assert len(by_name["llm.stream"]) == len(by_name["upstream.admission"]) == 4
+
+    generation = by_name["generate_rephrases_stream"][0]
+    casual = by_name["stream.casual"][0]
+    assert casual["parentSpanId"] == generation["spanId"]
+    assert [e["name"] for e in casual["events"]] == ["first_token"]
+    assert int(casual["endTimeUnixNano"]) >= int(casual["events"][0]["timeUnixNano"])
+    ids = {span["spanId"] for span in spans}
+    assert all(span.get("parentSpanId", root["spanId"]) in ids for span in spans)
+
+
+def test_tail_sampling_keeps_failed_requests_and_drops_fast_ones(monkeypatch, tmp_path):
+    path = _env(monkeypatch, tmp_path, TRACE_SAMPLE_RATE="0", TRACE_SLOW_MS="60000", RETRY_MAX_ATTEMPTS="1")
+    with TestClient(create_app(llm_provider=FailingProvider())) as client:
+        failed = client.post("/rephrase", json={"text": "this fails"})
+        client.get("/ops/pool")
+        stats = client.get("/ops/tracing").json()
+
+    assert failed.status_code == 502
+    assert stats["kept"] == {"head": 0, "slow": 0, "error": 1}
+    assert stats["dropped"] == 1  # /ops/pool: fast and fine
+    [spans] = _traces(path)
+    assert spans[0]["traceId"] == failed.headers["X-Trace-Id"]
+    failed_spans = [s for s in spans if s["status"]]
+    assert {s["name"] for s in failed_spans} >= {"llm.complete", "generate_rephrases", "POST /rephrase"}
+
+
+def test_tail_sampling_drops_rejected_input(monkeypatch, tmp_path):
+    path = _env(monkeypatch, tmp_path, TRACE_SAMPLE_RATE="0", TRACE_SLOW_MS="60000")
+    with TestClient(create_app()) as client:
+        rejected = client.post("/rephrase", json={"text": "   "})
+        stats = client.get("/ops/tracing").json()
+
+    assert rejected.status_code == 400
+    assert stats["kept"] == {"head": 0, "slow": 0, "error": 0}
+    assert not path.exists() or _traces(path) == []
+
+
+def test_incoming_traceparent_is_continued(monkeypatch, tmp_path):
+    path = _env(monkeypatch, tmp_path, TRACE_SAMPLE_RATE="0", TRACE_SLOW_MS="0")
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    with TestClient(create_app()) as client:
+        traceparent = f"00-{trace_id}-{parent_id}-01"
+        resp = client.post("/rephrase", json={"text": "hello"}, headers={"traceparent": traceparent})
+        unsampled = client.post("/rephrase", json={"text": "hello"})
+
+    assert resp.headers["X-Trace-Id"] == trace_id
+    assert "X-Trace-Id" not in unsampled.headers  # neither head- nor tail-sampled: not traced at all
+    [spans] = _traces(path)
+    assert spans[0]["parentSpanId"] == parent_id
@@ -0,0 +1,118 @@
+import asyncio
+import dataclasses
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.llm.openai_provider import AzureOpenAIProvider
+from app.llm.prompt import build_rephrase_prompt, build_style_prompt
+from app.llm.tokens import heuristic_tokens
+from app.llm.usage import USAGE, begin_request, end_request
+from app.main import create_app
+
+
+@pytest.fixture(autouse=True)
+def _fresh_usage():
+    USAGE.reset()
+    yield
+    USAGE.reset()
+
+
+def test_heuristic_token_counts_follow_bpe_pieces():
+    assert heuristic_tokens("Hello world") == 2
+    assert heuristic_tokens("") == 1
+    sentence = "Hi team, could you send me the quarterly sales report by Friday afternoon? Thanks a lot, Maria"
+    assert 20 <= heuristic_tokens(sentence) <= 24  # 21 with cl100k_base
+    assert heuristic_tokens("1234567") == 3  # digits go in groups of three
+    assert heuristic_tokens("这是一个测试句子") >= 8  # about one token per CJK character
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.kwargs = None
+
+    async def create(self, **kwargs):
+        self.kwargs = kwargs
+        usage = SimpleNamespace(
+            prompt_tokens=120, completion_tokens=9, prompt_tokens_details=SimpleNamespace(cached_tokens=64)
+        )
+        if not kwargs.get("stream"):
+            message = SimpleNamespace(content='{"professional": "x"}')
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+        async def events():
+            for part in ("Hey", " there"):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))], usage=None)
+            yield SimpleNamespace(choices=[], usage=usage)  # include_usage: the last event
+
+        return events()
+
+
+def _azure(stream_usage=True):
+    settings = dataclasses.replace(
+        get_settings(),
+        azure_endpoint="https://example.invalid",
+        azure_api_key="k",
+        azure_api_version="2024-10-21",
+        azure_deployment="d",
+        azure_stream_usage=stream_usage,
+    )
+    provider = AzureOpenAIProvider(settings)
+    completions = FakeCompletions()
+    provider._client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return provider, completions
+
+
+def test_azure_usage_is_captured_on_both_paths_and_attached_to_the_request():
+    provider, completions = _azure()
+
+    async def scenario():
+        request, token = begin_request()
+        await provider.complete(build_rephrase_prompt("hello"))
+        assert [d async for d in provider.complete_stream(build_style_prompt("hello", "casual"))] == ["Hey", " there"]
+        end_request(request, token, "/rephrase")
+        return request
+
+    request = asyncio.run(scenario())
+    assert completions.kwargs["stream_options"] == {"include_usage": True}
+    assert request.calls == 2 and request.prompt_tokens == 240 and request.cached_tokens == 128
+    assert not request.estimated
+
+    stats = USAGE.stats()
+    assert stats["by_style"]["casual"]["avg_completion_tokens"] == 9
+    assert stats["by_style"]["all"]["cached_share"] == round(64 / 120, 4)
+    assert any(key.startswith("style@") for key in stats["by_prompt_version"])
+    assert stats["by_style"]["casual"]["prompt_estimate_ratio"] is not None
+    assert stats["most_expensive_requests"][0]["calls"] == 2
+
+
+def test_streams_without_reported_usage_fall_back_to_estimates():
+    provider, completions = _azure(stream_usage=False)
+
+    async def scenario():
+        async for _ in provider.complete_stream(build_style_prompt("hello", "polite")):
+            pass
+
+    # The upstream still answers with usage here; only what is asked for changes
+    asyncio.run(scenario())
+    assert "stream_options" not in completions.kwargs
+    assert USAGE.stats()["calls"] == 1
+
+
+def test_usage_endpoint_groups_calls_by_style_and_lists_expensive_inputs(monkeypatch):
+    monkeypatch.setenv("FAKE_STREAM_DELAY_MS", "0")
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "0")
+    monkeypatch.setenv("STREAM_MODE", "concurrent")
+    with TestClient(create_app()) as local:
+        with local.stream("POST", "/rephrase/stream", json={"text": "Count my tokens please"}) as resp:
+            assert "event: final" in "".join(resp.iter_text())
+        local.post("/rephrase", json={"text": "short"})
+        stats = local.get("/ops/usage").json()
+
+    assert set(stats["by_style"]) == {"professional", "casual", "polite", "social", "all"}
+    assert stats["estimated_calls"] == stats["calls"] == 5  # the fake upstream reports estimates
+    expensive = stats["most_expensive_requests"]
+    assert [r["route"] for r in expensive] == ["/rephrase/stream", "/rephrase"]
+    assert expensive[0]["calls"] == 4 and expensive[0]["input_chars"] == len("Count my tokens please")
@@ -1,9 +1,13 @@
-import React, { useMemo, useRef, useState } from "react";
+import React, { useEffect, useMemo, useRef, useState } from "react";
 import { rephraseStream } from "./api/rephraseStream";
 import { rephrase, type RephraseResponse } from "./api/rephrase";
+import { prefetchRephrase } from "./api/prefetch";
 
 type Status = "idle" | "loading" | "success" | "error";
 
+// Prefetch a draft once typing pauses this long
+const PREFETCH_DEBOUNCE_MS = 600;
+
 
 const emptyResult: RephraseResponse = {
   professional: "",
@@ -46,8 +50,25 @@ export default function App() {
   const [useStreaming, setUseStreaming] = useState<boolean>(false);
 
   const abortRef = useRef<AbortController | null>(null);
+  // Last text sent to /rephrase(/stream): prefetching it again would only waste a generation
+  const submittedRef = useRef<string | null>(null);
 
   const isLoading = status === "loading";
+
+  // Start generating the draft in the background so submitting it is (nearly) instant.
+  // Only edits re-run this: a request finishing must not prefetch the text it just used.
+  useEffect(() => {
+    const trimmed = text.trim();
+    if (!trimmed) return;
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      if (trimmed !== submittedRef.current) prefetchRephrase(trimmed, controller.signal);
+    }, PREFETCH_DEBOUNCE_MS);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [text]);
   const canSubmit = useMemo(
     () => text.trim().length > 0 && !isLoading,
     [text, isLoading]
@@ -66,6 +87,7 @@ export default function App() {
 
     // Cancel any in-flight request
     abortRef.current?.abort();
+    submittedRef.current = trimmed;
 
     const controller = new AbortController();
     abortRef.current = controller;
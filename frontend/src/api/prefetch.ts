@@ -0,0 +1,25 @@
+// frontend/src/api/prefetch.ts
+
+// Identifies this tab, so the backend cancels our previous draft when a newer one arrives
+const sessionId =
+  typeof crypto !== "undefined" && "randomUUID" in crypto
+    ? crypto.randomUUID()
+    : Math.random().toString(36).slice(2);
+
+/**
+ * Ask the backend to start rephrasing a draft while the user is still typing.
+ * A later rephrase()/rephraseStream() of the same text attaches to that generation.
+ * Best effort: failures are ignored, the submit path works without it.
+ */
+export async function prefetchRephrase(text: string, signal?: AbortSignal): Promise<void> {
+  try {
+    await fetch("/rephrase/prefetch", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ text, session_id: sessionId }),
+      signal,
+    });
+  } catch {
+    // ignore: aborted, offline or prefetch unsupported
+  }
+}
@@ -145,8 +145,8 @@ export async function* rephraseStream(
             type: "error",
             error: { code: "STREAM_PARSE_ERROR", message: "Invalid final response shape." },
           };
-        } else if (eventType === "error") {
-          // Expect your Error shape
+        } else if (eventType === "error" || eventType === "timeout") {
+          // Expect your Error shape (timeout adds completed/pending styles; partials already arrived)
           const code = typeof data?.code === "string" ? data.code : "STREAM_ERROR";
           const message = typeof data?.message === "string" ? data.message : "Stream error";
           const details = Array.isArray(data?.details) ? data.details : [];